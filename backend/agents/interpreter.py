@@ -2,8 +2,9 @@
 监察院 (Interpreter)
 解释生成专家，基于事实和知识库，生成可理解的解释说明
 """
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import httpx
 import json
@@ -14,20 +15,24 @@ logger = logging.getLogger(__name__)
 class InterpreterAgent:
     """监察院"""
     
-    def __init__(self, genie_api_base_url: str, model_path: str, knowledge_base_path: str = None):
+    def __init__(self, genie_api_base_url: str, model_path: str, knowledge_base_path: str = None,
+                 context_top_k: int = 3):
         """
         初始化
         
         参数：
             genie_api_base_url: GenieAPIService基础URL
             model_path: 模型路径
-            knowledge_base_path: 知识库路径（可选）
+            knowledge_base_path: 知识库路径（可选，太史阁记忆库 SQLite 文件，用于向量检索上下文）
+            context_top_k: 每个事实检索的上下文条数
         """
         self.genie_api_base_url = genie_api_base_url
         self.model_path = model_path
         self.knowledge_base_path = knowledge_base_path
+        self.context_top_k = context_top_k
         self.task_status = "未执行"
         self.log = []
+        self._knowledge_base = None
     
     async def generate_explanations(self, facts: Dict, user_query: str, current_date: str) -> Dict:
         """
@@ -45,16 +50,23 @@ class InterpreterAgent:
             self.task_status = "执行中"
             self.log.append(f"[监察院] 开始生成解释说明")
             
-            # 1. 上下文检索
-            context = await self._retrieve_context(user_query, current_date)
-            self.log.append(f"[监察院] 上下文检索完成: {len(context)}条上下文")
+            # 1. 上下文检索（用户查询与全部事实一次批量检索）
+            all_facts = [fact for fact_list in facts.values() for fact in fact_list]
+            context, fact_contexts = await self._retrieve_context(user_query, current_date, all_facts)
+            self.log.append(
+                f"[监察院] 上下文检索完成: {len(context)}条公共上下文, "
+                f"{sum(len(c) for c in fact_contexts)}条事实相关上下文"
+            )
             
             # 2. 解释生成
             explanations = {}
+            fact_index = 0
             for color, fact_list in facts.items():
                 explanations[color] = []
                 for fact in fact_list:
-                    explanation = await self._generate_explanation(fact, context, user_query)
+                    fact_context = context + fact_contexts[fact_index]
+                    fact_index += 1
+                    explanation = await self._generate_explanation(fact, fact_context, user_query)
                     explanations[color].append(explanation)
             
             self.log.append(f"[监察院] 解释生成完成: {sum(len(v) for v in explanations.values())}个解释")
@@ -84,32 +96,41 @@ class InterpreterAgent:
             logger.error(f"解释生成失败: {e}", exc_info=True)
             raise
     
-    async def _retrieve_context(self, user_query: str, current_date: str) -> List[str]:
+    async def _retrieve_context(self, user_query: str, current_date: str,
+                                facts: Optional[List[Dict]] = None) -> Tuple[List[str], List[List[str]]]:
         """
         检索上下文
         
+        规则上下文与用户查询的向量检索结果为所有事实共用；
+        知识库可用时，用户查询与全部事实合并为一次批量向量检索
+        
         参数：
             user_query: 用户查询
             current_date: 当前日期
+            facts: 事实卡片列表（可选）
         
         返回：
-            上下文列表
+            (公共上下文, 与 facts 顺序一致的事实相关上下文)
         """
+        facts = facts or []
+        fact_contexts: List[List[str]] = [[] for _ in facts]
         try:
-            # TODO: 实现向量检索
+            context = self._rule_based_retrieval(user_query, current_date)
+            
             # 如果知识库可用，使用向量检索相关上下文
             if self.knowledge_base_path:
-                # 调用向量检索（需要实现）
-                context = await self._vector_search(user_query)
-            else:
-                # 使用规则检索
-                context = self._rule_based_retrieval(user_query, current_date)
+                queries = [user_query] + [self._fact_query(fact) for fact in facts]
+                hits = await self._vector_search_batch(queries)
+                context = context + hits[0]
+                fact_contexts = [
+                    [item for item in fact_hits if item not in hits[0]] for fact_hits in hits[1:]
+                ]
             
-            return context
+            return context, fact_contexts
         
         except Exception as e:
             logger.error(f"检索上下文失败: {e}", exc_info=True)
-            return []
+            return [], fact_contexts
     
     def _rule_based_retrieval(self, user_query: str, current_date: str) -> List[str]:
         """
@@ -152,15 +173,49 @@ class InterpreterAgent:
         返回：
             检索结果
         """
+        return (await self._vector_search_batch([query]))[0]
+    
+    async def _vector_search_batch(self, queries: List[str]) -> List[List[str]]:
+        """
+        批量向量检索（太史阁记忆库的哈希 TF-IDF 向量索引）
+        
+        所有查询一次编码、每个知识类型一次倒排表查询与一次矩阵乘积，在线程中执行不阻塞事件循环
+        
+        参数：
+            queries: 查询文本列表
+        
+        返回：
+            与 queries 顺序一致的上下文列表
+        """
         try:
-            # TODO: 实现向量检索
-            # 使用BGE-M3模型向量化
-            # 使用FAISS或Chroma检索
-            return []
+            knowledge_base = self._get_knowledge_base()
+            results = await asyncio.to_thread(
+                knowledge_base.search_knowledge_batch, queries, self.context_top_k
+            )
+            return [[self._format_context(item) for item in items] for items in results]
         
         except Exception as e:
             logger.error(f"向量检索失败: {e}", exc_info=True)
-            return []
+            return [[] for _ in queries]
+    
+    def _get_knowledge_base(self):
+        """获取知识库（首次使用时创建，同一数据库的向量矩阵在进程内共享）"""
+        if self._knowledge_base is None:
+            from agents.memory import MemoryAgent
+            
+            self._knowledge_base = MemoryAgent(db_path=self.knowledge_base_path)
+        return self._knowledge_base
+    
+    @staticmethod
+    def _fact_query(fact: Dict) -> str:
+        """事实卡片的检索文本"""
+        return f"{fact.get('title', '')} {fact.get('description', '')}".strip()
+    
+    @staticmethod
+    def _format_context(item: Dict) -> str:
+        """将知识库检索结果格式化为上下文"""
+        description = item.get("description") or ""
+        return f"相关知识[{item.get('knowledge_type')}]：{item.get('title') or ''} {description[:100]}".strip()
     
     async def _generate_explanation(self, fact: Dict, context: List[str], user_query: str) -> Dict:
         """
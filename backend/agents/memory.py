@@ -9,7 +9,11 @@ import json
 import os
 import sqlite3
 import math
-from collections import Counter
+
+import numpy as np
+
+from services import memory_text_index as text_index
+from services.memory_vector_store import encode_embedding, get_memory_vector_store
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,7 @@ class MemoryAgent:
         self.db_path = db_path
         self.task_status = "未执行"
         self.log = []
+        self.vector_store = get_memory_vector_store(db_path)  # 按知识类型镜像的向量矩阵
         self._ensure_db_directory()
         self._init_db()  # 初始化数据库
     
@@ -56,13 +61,15 @@ class MemoryAgent:
                     description TEXT,
                     content TEXT,
                     keywords TEXT,
-                    embedding TEXT,
+                    embedding BLOB,
                     relations TEXT,
                     created_at TEXT,
                     updated_at TEXT
                 )
             """)
 
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_type ON knowledge(knowledge_type)")
+
             # 创建关联表
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS knowledge_relations (
@@ -76,6 +83,9 @@ class MemoryAgent:
                 )
             """)
 
+            # 创建倒排索引表
+            text_index.ensure_text_index(conn)
+
             conn.commit()
             conn.close()
             logger.info(f"数据库初始化完成: {self.db_path}")
@@ -189,7 +199,119 @@ class MemoryAgent:
             self.log.append(f"[太史阁] 检索异常: {str(e)}")
             logger.error(f"知识检索失败: {e}", exc_info=True)
             raise
-    
+
+    def search_knowledge(self, query: str, limit: int = 10,
+                         knowledge_types: Optional[List[str]] = None) -> List[Dict]:
+        """
+        跨知识类型检索（同步，不记录任务日志，供混合检索并发调用）
+
+        参数：
+            query: 查询内容
+            limit: 返回数量限制
+            knowledge_types: 检索的知识类型（None 表示库中已有的全部类型）
+
+        返回：
+            按相似度排序的检索结果
+        """
+        return self.search_knowledge_batch([query], limit=limit, knowledge_types=knowledge_types)[0]
+
+    def search_knowledge_batch(self, queries: List[str], limit: int = 10,
+                               knowledge_types: Optional[List[str]] = None) -> List[List[Dict]]:
+        """
+        批量跨类型检索
+
+        每个知识类型只查询一次 IDF 与倒排表（取所有查询词项的并集），
+        所有查询向量与候选行一次矩阵乘积打分，结果按ID一次读取
+
+        参数：
+            queries: 查询内容列表
+            limit: 每个查询的返回数量限制
+            knowledge_types: 检索的知识类型（None 表示库中已有的全部类型）
+
+        返回：
+            与 queries 顺序一致的检索结果列表，每个按相似度排序
+        """
+        query_terms = [text_index.term_counts(query) for query in queries]
+        active = [i for i, terms in enumerate(query_terms) if terms]
+        if not active or limit <= 0:
+            return [[] for _ in queries]
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            if knowledge_types is None:
+                knowledge_types = [row[0] for row in cursor.execute("SELECT DISTINCT knowledge_type FROM knowledge")]
+
+            # 合并查询词项（取最大词频）
+            union_terms: Dict[int, int] = {}
+            for i in active:
+                for term, count in query_terms[i].items():
+                    union_terms[term] = max(count, union_terms.get(term, 0))
+
+            top_by_query: List[List] = [[] for _ in queries]
+            for knowledge_type in knowledge_types:
+                # 该类型首次检索时补建索引并加载向量矩阵
+                self._ensure_vectors_loaded(knowledge_type)
+
+                idf = text_index.idf_weights(cursor, knowledge_type, union_terms)
+                candidates = text_index.candidate_ids(cursor, knowledge_type, union_terms, idf, limit * len(active))
+                if not candidates:
+                    continue
+
+                query_matrix = np.vstack([text_index.dense_vector(query_terms[i], idf) for i in active])
+                batch = self.vector_store.search_batch(
+                    knowledge_type, query_matrix, limit, min_score=0.1, candidates=candidates
+                )
+                for i, top in zip(active, batch):
+                    top_by_query[i].extend(top)
+
+            for i, top in enumerate(top_by_query):
+                top.sort(key=lambda item: item[1], reverse=True)
+                del top[limit:]
+
+            rows = self._fetch_knowledge(cursor, {knowledge_id for top in top_by_query for knowledge_id, _ in top})
+        finally:
+            conn.close()
+
+        return [self._build_results(top, rows) for top in top_by_query]
+
+    def _fetch_knowledge(self, cursor, knowledge_ids) -> Dict[str, sqlite3.Row]:
+        """按ID读取知识行（不读取向量列）"""
+        knowledge_ids = list(knowledge_ids)
+        if not knowledge_ids:
+            return {}
+        placeholders = ", ".join("?" * len(knowledge_ids))
+        cursor.execute(f"""
+            SELECT id, knowledge_type, title, description, content, keywords, created_at, updated_at
+            FROM knowledge
+            WHERE id IN ({placeholders})
+        """, knowledge_ids)
+        return {row["id"]: row for row in cursor.fetchall()}
+
+    def _build_results(self, top: List, rows: Dict[str, sqlite3.Row]) -> List[Dict]:
+        """将 [(知识ID, 相似度)] 转换为检索结果"""
+        results = []
+        for knowledge_id, similarity in top:
+            row = rows.get(knowledge_id)
+            if row is None:
+                continue
+            try:
+                results.append({
+                    "id": row["id"],
+                    "knowledge_type": row["knowledge_type"],
+                    "title": row["title"],
+                    "description": row["description"],
+                    "content": json.loads(row["content"]),
+                    "keywords": json.loads(row["keywords"]),
+                    "score": similarity,
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"]
+                })
+            except Exception as e:
+                logger.warning(f"处理检索结果失败: {e}")
+                continue
+        return results
+
     async def update_knowledge(self, knowledge_id: str, data: Dict) -> Dict:
         """
         更新知识
@@ -302,8 +424,8 @@ class MemoryAgent:
             # 提取关键词
             indexed["keywords"] = self._extract_keywords(data)
             
-            # 生成向量表示（简化实现）
-            indexed["embedding"] = self._generate_embedding(data)
+            # 哈希词频（向量在写入时按当前 IDF 生成）
+            indexed["terms"] = text_index.term_counts(self._knowledge_text(data))
             
             return indexed
         
@@ -341,70 +463,46 @@ class MemoryAgent:
             logger.error(f"提取关键词失败: {e}", exc_info=True)
             return []
     
-    def _generate_embedding(self, data: Dict) -> List[float]:
+    def _knowledge_text(self, data: Dict) -> str:
         """
-        生成向量表示（真实实现：基于TF-IDF）
-
-        使用TF-IDF算法生成文本向量表示
+        合并标题、描述和内容作为索引文本
 
         参数：
             data: 知识数据
 
         返回：
-            向量表示（固定512维）
+            索引文本
         """
-        try:
-            # 合并标题和描述作为文本
-            title = data.get("title", "")
-            description = data.get("description", "")
-            content = data.get("content", "")
-
-            text_parts = [title, description]
-            if isinstance(content, dict):
-                content_text = content.get("description", "")
-                text_parts.append(content_text)
-            elif isinstance(content, str):
-                text_parts.append(content)
-
-            full_text = " ".join([t for t in text_parts if t])
-
-            if not full_text:
-                return [0.0] * 512
-
-            # 提取词汇
-            words = full_text.lower().split()
-
-            if not words:
-                return [0.0] * 512
+        title = data.get("title", "")
+        description = data.get("description", "")
+        content = data.get("content", "")
 
-            # 计算词频（TF）
-            word_counts = Counter(words)
-            total_words = len(words)
+        text_parts = [title, description]
+        if isinstance(content, dict):
+            content_text = content.get("description", "")
+            text_parts.append(content_text)
+        elif isinstance(content, str):
+            text_parts.append(content)
 
-            # 计算TF-IDF
-            vocab_size = min(len(word_counts), 512)
-            embedding = [0.0] * 512
+        return " ".join([t for t in text_parts if t])
 
-            for i, (word, count) in enumerate(word_counts.most_common(512)):
-                # TF (词频)
-                tf = count / total_words
-
-                # IDF (文档频率倒数，这里简化为常数)
-                # 在实际应用中，应该从整个文档集计算
-                idf = 1.0
-
-                # TF-IDF
-                tfidf = tf * idf
+    def _generate_embedding(self, cursor, knowledge_type: str, terms: Dict[int, int]) -> List[float]:
+        """
+        生成向量表示（哈希 TF-IDF）
 
-                # 填充向量
-                embedding[i] = tfidf
+        词项哈希折叠到固定维度，按该类型语料的文档频率计算 IDF
 
-            # 归一化向量
-            norm = math.sqrt(sum(x**2 for x in embedding))
-            if norm > 0:
-                embedding = [x / norm for x in embedding]
+        参数：
+            cursor: 数据库游标
+            knowledge_type: 知识类型
+            terms: 哈希词频
 
-            return embedding
+        返回：
+            向量表示（固定512维）
+        """
+        try:
+            idf = text_index.idf_weights(cursor, knowledge_type, terms)
+            return text_index.dense_vector(terms, idf).tolist()
 
         except Exception as e:
             logger.error(f"生成向量表示失败: {e}", exc_info=True)
@@ -514,10 +612,16 @@ class MemoryAgent:
             conn = self._get_connection()
             cursor = conn.cursor()
 
+            # 写入倒排索引并更新文档频率，再按当前 IDF 生成向量
+            terms = data.get("terms")
+            if terms is None:
+                terms = text_index.term_counts(self._knowledge_text(data))
+            text_index.add_document(cursor, knowledge_type, knowledge_id, terms)
+            embedding = data.get("embedding") or self._generate_embedding(cursor, knowledge_type, terms)
+
             # 序列化数据
             content_json = json.dumps(data.get("content", {}), ensure_ascii=False)
             keywords_json = json.dumps(data.get("keywords", []), ensure_ascii=False)
-            embedding_json = json.dumps(data.get("embedding", []), ensure_ascii=False)
             relations_json = json.dumps(data.get("relations", []), ensure_ascii=False)
 
             # 插入知识记录
@@ -531,7 +635,7 @@ class MemoryAgent:
                 data.get("description", ""),
                 content_json,
                 keywords_json,
-                embedding_json,
+                encode_embedding(embedding),
                 relations_json,
                 datetime.now().isoformat(),
                 datetime.now().isoformat()
@@ -547,6 +651,9 @@ class MemoryAgent:
             conn.commit()
             conn.close()
 
+            # 增量写入内存向量矩阵
+            self.vector_store.upsert(knowledge_type, knowledge_id, embedding)
+
             logger.info(f"知识已存储到数据库: {knowledge_id}")
 
             return {"id": knowledge_id}
@@ -581,9 +688,9 @@ class MemoryAgent:
     
     def _search_in_db(self, knowledge_type: str, analyzed_query: Dict, limit: int) -> List[Dict]:
         """
-        在数据库中检索（真实实现：向量相似度检索）
+        在数据库中检索（真实实现：倒排索引 + 向量相似度检索）
 
-        使用余弦相似度进行语义检索
+        先从倒排表取与查询共享词项的候选，再对候选计算哈希 TF-IDF 向量的余弦相似度
 
         参数：
             knowledge_type: 知识类型
@@ -594,79 +701,99 @@ class MemoryAgent:
             检索结果
         """
         try:
-            # 生成查询向量
+            # 生成查询词项
             query_keywords = analyzed_query.get("keywords", [])
             query_text = " ".join(query_keywords)
 
-            if not query_text:
+            terms = text_index.term_counts(query_text)
+            if not terms:
                 return []
 
-            # 计算查询的TF-IDF向量
-            query_words = query_text.lower().split()
-            word_counts = Counter(query_words)
-            total_words = len(query_words)
+            # 该类型首次检索时补建索引并加载向量矩阵
+            self._ensure_vectors_loaded(knowledge_type)
 
-            vocab_size = min(len(word_counts), 512)
-            query_embedding = [0.0] * 512
-
-            for i, (word, count) in enumerate(word_counts.most_common(512)):
-                tf = count / total_words
-                idf = 1.0  # 简化处理
-                query_embedding[i] = tf * idf
-
-            # 归一化查询向量
-            query_norm = math.sqrt(sum(x**2 for x in query_embedding))
-            if query_norm > 0:
-                query_embedding = [x / query_norm for x in query_embedding]
-
-            # 从数据库检索
             conn = self._get_connection()
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                SELECT id, knowledge_type, title, description, content, keywords, embedding, created_at, updated_at
-                FROM knowledge
-                WHERE knowledge_type = ?
-            """, (knowledge_type,))
+            try:
+                cursor = conn.cursor()
 
-            rows = cursor.fetchall()
-            conn.close()
+                # 计算查询的TF-IDF向量
+                idf = text_index.idf_weights(cursor, knowledge_type, terms)
+                query_embedding = text_index.dense_vector(terms, idf)
 
-            # 计算相似度
-            results = []
-            for row in rows:
-                try:
-                    # 解码存储的向量
-                    stored_embedding = json.loads(row["embedding"])
-
-                    # 计算余弦相似度
-                    similarity = self._cosine_similarity(query_embedding, stored_embedding)
-
-                    if similarity > 0.1:  # 只保留相似度大于0.1的结果
-                        results.append({
-                            "id": row["id"],
-                            "knowledge_type": row["knowledge_type"],
-                            "title": row["title"],
-                            "description": row["description"],
-                            "content": json.loads(row["content"]),
-                            "keywords": json.loads(row["keywords"]),
-                            "score": similarity,
-                            "created_at": row["created_at"],
-                            "updated_at": row["updated_at"]
-                        })
-                except Exception as e:
-                    logger.warning(f"处理检索结果失败: {e}")
-                    continue
+                # 从倒排表取候选，只对候选计算余弦相似度
+                candidates = text_index.candidate_ids(cursor, knowledge_type, terms, idf, limit)
+                top = self.vector_store.search(
+                    knowledge_type, query_embedding, limit, min_score=0.1, candidates=candidates
+                )
+                if not top:
+                    return []
 
-            # 按相似度排序
-            results.sort(key=lambda x: x["score"], reverse=True)
+                # 只读取并解码前N条结果
+                rows = self._fetch_knowledge(cursor, [knowledge_id for knowledge_id, _ in top])
+            finally:
+                conn.close()
 
-            # 返回前N个结果
-            return results[:limit]
+            return self._build_results(top, rows)
 
         except Exception as e:
             logger.error(f"在数据库中检索失败: {e}", exc_info=True)
             return []
+
+    def _ensure_vectors_loaded(self, knowledge_type: str):
+        """
+        加载某类型的向量矩阵
+
+        尚未进入倒排索引的旧数据先补建索引，并按哈希 TF-IDF 重新生成向量（float32 BLOB）
+
+        参数：
+            knowledge_type: 知识类型
+        """
+        if self.vector_store.is_loaded(knowledge_type):
+            return
+
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT k.id, k.title, k.description, k.content
+                FROM knowledge k
+                LEFT JOIN {text_index.INDEXED_TABLE} i ON i.knowledge_id = k.id
+                WHERE k.knowledge_type = ? AND i.knowledge_id IS NULL
+            """, (knowledge_type,))
+
+            # 先写入全部倒排记录，使重新生成的向量使用完整语料的 IDF
+            pending = []
+            for row in cursor.fetchall():
+                try:
+                    content = json.loads(row["content"]) if row["content"] else {}
+                except ValueError:
+                    content = row["content"]
+                terms = text_index.term_counts(self._knowledge_text({
+                    "title": row["title"],
+                    "description": row["description"],
+                    "content": content
+                }))
+                pending.append((row["id"], terms))
+
+            if pending:
+                text_index.add_documents(cursor, knowledge_type, pending)
+                idf = text_index.idf_weights(cursor, knowledge_type, None)
+                cursor.executemany("UPDATE knowledge SET embedding = ? WHERE id = ?", [
+                    (encode_embedding(text_index.dense_vector(terms, idf)), knowledge_id)
+                    for knowledge_id, terms in pending
+                ])
+                conn.commit()
+                logger.info(f"已为 {len(pending)} 条旧知识补建倒排索引: {knowledge_type}")
+
+            cursor.execute(
+                "SELECT id, embedding FROM knowledge WHERE knowledge_type = ?",
+                (knowledge_type,)
+            )
+            self.vector_store.load(
+                knowledge_type, ((row["id"], row["embedding"]) for row in cursor.fetchall())
+            )
+        finally:
+            conn.close()
     
     def _sort_results(self, results: List[Dict], query: str) -> List[Dict]:
         """
@@ -725,21 +852,37 @@ class MemoryAgent:
             cursor = conn.cursor()
 
             # 检查知识是否存在
-            cursor.execute("SELECT id FROM knowledge WHERE id = ?", (knowledge_id,))
-            if cursor.fetchone() is None:
+            cursor.execute(
+                "SELECT id, knowledge_type, title, description, content FROM knowledge WHERE id = ?",
+                (knowledge_id,)
+            )
+            existing = cursor.fetchone()
+            if existing is None:
                 conn.close()
                 raise ValueError(f"知识ID {knowledge_id} 不存在")
 
+            # 标题、描述或内容变化时重建倒排记录，未显式提供向量则按更新后的文本重新生成
+            embedding = data.get("embedding")
+            if any(data.get(field) for field in ("title", "description", "content")):
+                terms = text_index.term_counts(self._knowledge_text({
+                    "title": data.get("title") or existing["title"],
+                    "description": data.get("description") or existing["description"],
+                    "content": data.get("content") or json.loads(existing["content"] or "{}")
+                }))
+                text_index.remove_document(cursor, knowledge_id)
+                text_index.add_document(cursor, existing["knowledge_type"], knowledge_id, terms)
+                if embedding is None:
+                    embedding = self._generate_embedding(cursor, existing["knowledge_type"], terms)
+
             # 序列化数据
             content_json = json.dumps(data.get("content", {}), ensure_ascii=False) if data.get("content") else None
             keywords_json = json.dumps(data.get("keywords", []), ensure_ascii=False)
-            embedding_json = json.dumps(data.get("embedding", []), ensure_ascii=False)
+            embedding_blob = encode_embedding(embedding) if embedding else None
             relations_json = json.dumps(data.get("relations", []), ensure_ascii=False)
 
             # 更新数据库
             update_fields = []
             update_values = []
-            update_values.append(knowledge_id)  # WHERE条件
 
             if data.get("title"):
                 update_fields.append("title = ?")
@@ -757,9 +900,9 @@ class MemoryAgent:
                 update_fields.append("keywords = ?")
                 update_values.append(keywords_json)
 
-            if embedding_json:
+            if embedding_blob:
                 update_fields.append("embedding = ?")
-                update_values.append(embedding_json)
+                update_values.append(embedding_blob)
 
             if relations_json:
                 update_fields.append("relations = ?")
@@ -772,11 +915,15 @@ class MemoryAgent:
             # 构建UPDATE语句
             if update_fields:
                 sql = f"UPDATE knowledge SET {', '.join(update_fields)} WHERE id = ?"
-                cursor.execute(sql, update_values)
+                cursor.execute(sql, update_values + [knowledge_id])  # WHERE条件
 
                 conn.commit()
                 conn.close()
 
+                # 增量更新内存向量矩阵
+                if embedding:
+                    self.vector_store.upsert(existing["knowledge_type"], knowledge_id, embedding)
+
                 logger.info(f"知识已更新: {knowledge_id}")
 
                 return {"id": knowledge_id, "updated": True}
@@ -4,18 +4,21 @@
 """
 import requests
 import json
+import logging
 import time
 from typing import Dict, List, Optional
 import sys
 import os
+import threading
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-YICHUANSI_API = "http://127.0.0.1:8000/yichuansi/"
+from services.card_repository import CardRepository, get_card_repository
+
+logger = logging.getLogger(__name__)
 
-# 模拟知识库（实际开发替换为向量数据库）
-knowledge_base = []
+YICHUANSI_API = "http://127.0.0.1:8000/yichuansi/"
 
 # 尝试导入向量检索模块
 try:
@@ -23,23 +26,22 @@ try:
     VECTOR_RETRIEVAL_AVAILABLE = True
 except ImportError:
     VECTOR_RETRIEVAL_AVAILABLE = False
-    print("  向量检索模块未安装，将使用基础检索功能")
+    logger.warning("向量检索模块未安装，将使用基础检索功能")
 
 
 class TaishigeAgent:
     """太史阁"""
     
-    def __init__(self, task_id: str):
+    def __init__(self, task_id: str, card_repository: Optional[CardRepository] = None):
         self.task_id = task_id
         self.agent_name = "taishige"
         
-        # 初始化向量检索（如果可用）
-        if VECTOR_RETRIEVAL_AVAILABLE:
-            self.vector_retrieval = VectorRetrieval()
-            print("向量检索模块已初始化")
-        else:
-            self.vector_retrieval = None
-            print("  向量检索模块未初始化，使用基础检索")
+        # 卡片仓库（SQLite 持久化，默认使用全局仓库）
+        self.card_repository = card_repository or get_card_repository()
+        
+        # 向量检索在首次检索案例时初始化（卡片管理不需要加载向量模型）
+        self._vector_retrieval = None
+        self._vector_retrieval_loaded = False
         
         # 知识图谱引导应用数据库
         self.knowledge_graph_db = {
@@ -64,6 +66,18 @@ class TaishigeAgent:
             "dimension_index": 0
         }
     
+    @property
+    def vector_retrieval(self):
+        """向量检索实例（首次访问时初始化，不可用时为 None）"""
+        if not self._vector_retrieval_loaded:
+            self._vector_retrieval_loaded = True
+            if VECTOR_RETRIEVAL_AVAILABLE:
+                self._vector_retrieval = VectorRetrieval()
+                logger.info("向量检索模块已初始化")
+            else:
+                logger.warning("向量检索模块未初始化，使用基础检索")
+        return self._vector_retrieval
+    
     def store_knowledge(self, all_results: dict) -> dict:
         """
         存储Agent成果至知识库
@@ -74,127 +88,58 @@ class TaishigeAgent:
         返回：
             store_status: dict
         """
-        knowledge_item = {
-            "knowledge_id": f"K{self.task_id}",
-            "content": all_results,
-            "create_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-            "tags": ["项目进度", "资源不足", "进度滞后"]
-        }
-        knowledge_base.append(knowledge_item)
-        return {"store_status": "success", "knowledge_id": knowledge_item["knowledge_id"]}
+        knowledge_id = f"K{self.task_id}"
+        self.card_repository.add_knowledge(
+            knowledge_id, all_results, tags=["项目进度", "资源不足", "进度滞后"]
+        )
+        return {"store_status": "success", "knowledge_id": knowledge_id}
 
     # ========== 卡片管理方法 ==========
 
-    def get_cards(self, card_type: Optional[str] = None, limit: int = 50, offset: int = 0) -> tuple[list, int]:
+    def get_cards(self, card_type: Optional[str] = None, limit: int = 50, offset: int = 0,
+                  cursor: Optional[str] = None) -> tuple[list, int]:
         """
-        获取卡片列表
-
-        从知识库中提取卡片数据
+        获取卡片列表（按时间倒序）
 
         参数：
             card_type: 卡片类型过滤（blue/green/yellow/red）
             limit: 返回数量限制
             offset: 偏移量
+            cursor: 翻页游标（见 get_cards_page）
 
         返回：
             (cards_list, total_count)
         """
-        all_cards = []
-
-        # 从知识库中提取卡片
-        for knowledge_item in knowledge_base:
-            content = knowledge_item.get('content', {})
-            if isinstance(content, dict):
-                # 检查是否包含cards字段
-                if 'cards' in content:
-                    cards = content['cards']
-                    for card in cards:
-                        # 添加元数据
-                        card_with_meta = {
-                            'id': f"{knowledge_item['knowledge_id']}_{card.get('id', 'unknown')}",
-                            'knowledge_id': knowledge_item['knowledge_id'],
-                            'type': card.get('type', 'blue'),
-                            'title': card.get('title', '无标题'),
-                            'content': card,
-                            'confidence': card.get('confidence', 0.8),
-                            'timestamp': knowledge_item.get('create_time', time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())),
-                            'tags': card.get('tags', []),
-                            'references': card.get('references', [])
-                        }
-                        all_cards.append(card_with_meta)
-                else:
-                    # 如果内容本身就是一个卡片
-                    if 'type' in content and 'title' in content:
-                        card_with_meta = {
-                            'id': knowledge_item['knowledge_id'],
-                            'knowledge_id': knowledge_item['knowledge_id'],
-                            'type': content.get('type', 'blue'),
-                            'title': content.get('title', '无标题'),
-                            'content': content,
-                            'confidence': content.get('confidence', 0.8),
-                            'timestamp': knowledge_item.get('create_time', time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())),
-                            'tags': content.get('tags', []),
-                            'references': content.get('references', [])
-                        }
-                        all_cards.append(card_with_meta)
-
-        # 应用类型过滤
-        if card_type:
-            all_cards = [card for card in all_cards if card['type'] == card_type]
-
-        total = len(all_cards)
-
-        # 应用分页
-        cards = all_cards[offset:offset + limit]
-
+        cards, total, _ = self.get_cards_page(card_type=card_type, limit=limit, cursor=cursor, offset=offset)
         return cards, total
 
+    def get_cards_page(self, card_type: Optional[str] = None, limit: int = 50,
+                       cursor: Optional[str] = None, offset: int = 0) -> tuple[list, int, Optional[str]]:
+        """
+        按游标翻页获取卡片列表
+
+        参数：
+            card_type: 卡片类型过滤
+            limit: 返回数量限制
+            cursor: 上一页返回的游标（None 表示第一页）
+            offset: 偏移量（提供 cursor 时忽略）
+
+        返回：
+            (cards_list, total_count, next_cursor)
+        """
+        return self.card_repository.list_cards(card_type=card_type, limit=limit, offset=offset, cursor=cursor)
+
     def get_card(self, card_id: str) -> Optional[dict]:
         """
         获取单个卡片详情
 
         参数：
-            card_id: 卡片ID
+            card_id: 卡片ID（或创建时的原始卡片ID）
 
         返回：
             卡片详情字典，如果未找到返回None
         """
-        for knowledge_item in knowledge_base:
-            content = knowledge_item.get('content', {})
-            if isinstance(content, dict):
-                # 检查cards字段
-                if 'cards' in content:
-                    for card in content['cards']:
-                        full_id = f"{knowledge_item['knowledge_id']}_{card.get('id', 'unknown')}"
-                        if full_id == card_id or card.get('id') == card_id:
-                            return {
-                                'id': full_id,
-                                'knowledge_id': knowledge_item['knowledge_id'],
-                                'type': card.get('type', 'blue'),
-                                'title': card.get('title', '无标题'),
-                                'content': card,
-                                'confidence': card.get('confidence', 0.8),
-                                'timestamp': knowledge_item.get('create_time', time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())),
-                                'tags': card.get('tags', []),
-                                'references': card.get('references', [])
-                            }
-                else:
-                    # 检查内容本身是否是卡片
-                    if content.get('type') and content.get('title'):
-                        if knowledge_item['knowledge_id'] == card_id:
-                            return {
-                                'id': knowledge_item['knowledge_id'],
-                                'knowledge_id': knowledge_item['knowledge_id'],
-                                'type': content.get('type', 'blue'),
-                                'title': content.get('title', '无标题'),
-                                'content': content,
-                                'confidence': content.get('confidence', 0.8),
-                                'timestamp': knowledge_item.get('create_time', time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())),
-                                'tags': content.get('tags', []),
-                                'references': content.get('references', [])
-                            }
-
-        return None
+        return self.card_repository.get_card(card_id)
 
     def create_card(self, card_data: dict) -> dict:
         """
@@ -207,22 +152,16 @@ class TaishigeAgent:
             创建结果，包含card_id和status
         """
         card_id = card_data.get('id', f"card_{int(time.time() * 1000)}")
+        card_data = {**card_data, 'id': card_id}
+        knowledge_id = f"C{card_id}"
 
-        # 构建知识项
-        knowledge_item = {
-            'knowledge_id': f"C{card_id}",
-            'content': {
-                'cards': [card_data]
-            },
-            'create_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-            'tags': card_data.get('tags', [])
-        }
-
-        knowledge_base.append(knowledge_item)
+        self.card_repository.add_knowledge(
+            knowledge_id, {'cards': [card_data]}, tags=card_data.get('tags', [])
+        )
 
         return {
             'card_id': card_id,
-            'knowledge_id': knowledge_item['knowledge_id'],
+            'knowledge_id': knowledge_id,
             'status': 'created'
         }
 
@@ -231,34 +170,12 @@ class TaishigeAgent:
         删除卡片
 
         参数：
-            card_id: 卡片ID
+            card_id: 卡片ID（或创建时的原始卡片ID）
 
         返回：
             是否成功删除
         """
-        global knowledge_base
-
-        for idx, knowledge_item in enumerate(knowledge_base):
-            content = knowledge_item.get('content', {})
-            if isinstance(content, dict):
-                # 检查cards字段
-                if 'cards' in content:
-                    for card_idx, card in enumerate(content['cards']):
-                        full_id = f"{knowledge_item['knowledge_id']}_{card.get('id', 'unknown')}"
-                        if full_id == card_id or card.get('id') == card_id:
-                            # 从列表中删除卡片
-                            content['cards'].pop(card_idx)
-                            # 如果列表为空，删除整个知识项
-                            if not content['cards']:
-                                knowledge_base.pop(idx)
-                            return True
-                else:
-                    # 检查内容本身是否是卡片
-                    if knowledge_item['knowledge_id'] == card_id:
-                        knowledge_base.pop(idx)
-                        return True
-
-        return False
+        return self.card_repository.delete_card(card_id)
     
     def retrieve_cases(self, keywords: list, top_k: int = 5) -> list:
         """
@@ -855,6 +772,27 @@ Python的基础语法包括：
         return response.json()
 
 
+# 全局太史阁实例（卡片与检索接口共用，避免每个请求重新创建 Agent 与向量模型）
+_shared_agent: Optional[TaishigeAgent] = None
+_shared_agent_lock = threading.Lock()
+
+
+def get_taishige_agent() -> TaishigeAgent:
+    """
+    获取全局太史阁实例
+
+    返回：
+        太史阁实例
+    """
+    global _shared_agent
+
+    with _shared_agent_lock:
+        if _shared_agent is None:
+            _shared_agent = TaishigeAgent(task_id="shared_api")
+
+    return _shared_agent
+
+
 # 测试
 if __name__ == "__main__":
     # 测试知识图谱引导应用
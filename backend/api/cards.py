@@ -25,32 +25,36 @@ class CardListResponse(BaseModel):
     """卡片列表响应"""
     cards: List[Card]
     total: int
+    next_cursor: Optional[str] = None  # 下一页游标，没有更多数据时为 None
 
 @router.get("", response_model=CardListResponse)
 async def get_cards(
     card_type: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     获取卡片列表
 
-    从太史阁（Taishige）知识库获取真实的卡片数据
+    从太史阁（Taishige）卡片仓库按时间倒序获取卡片
 
     参数：
         card_type: 卡片类型（blue/green/yellow/red）
         limit: 返回数量限制
-        offset: 偏移量
+        offset: 偏移量（提供 cursor 时忽略）
+        cursor: 翻页游标（上一页响应中的 next_cursor）
 
     返回：
-        卡片列表和总数
+        卡片列表、总数和下一页游标
     """
     try:
         # 从太史阁获取卡片
-        from agents.taishige import TaishigeAgent
+        from agents.taishige import get_taishige_agent
 
-        taishi_ge = TaishigeAgent(task_id="cards_api")
-        cards_raw, total = taishi_ge.get_cards(card_type=card_type, limit=limit, offset=offset)
+        cards_raw, total, next_cursor = get_taishige_agent().get_cards_page(
+            card_type=card_type, limit=limit, cursor=cursor, offset=offset
+        )
 
         # 转换为Card模型
         cards = []
@@ -66,8 +70,10 @@ async def get_cards(
                 references=card_data.get('references', [])
             ))
 
-        return CardListResponse(cards=cards, total=total)
+        return CardListResponse(cards=cards, total=total, next_cursor=next_cursor)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取卡片列表失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -87,9 +93,9 @@ async def create_card(card: Card):
     """
     try:
         # 存储到太史阁
-        from agents.taishige import TaishigeAgent
+        from agents.taishige import get_taishige_agent
 
-        taishi_ge = TaishigeAgent(task_id="create_card_api")
+        taishi_ge = get_taishige_agent()
 
         # 转换Card模型为字典
         card_dict = {
@@ -121,7 +127,7 @@ async def get_card(card_id: str):
     """
     获取单个卡片详情
 
-    从太史阁（Taishige）知识库获取卡片
+    从太史阁（Taishige）卡片仓库获取卡片
 
     参数：
         card_id: 卡片ID
@@ -131,9 +137,9 @@ async def get_card(card_id: str):
     """
     try:
         # 从太史阁获取卡片
-        from agents.taishige import TaishigeAgent
+        from agents.taishige import get_taishige_agent
 
-        taishi_ge = TaishigeAgent(task_id="get_card_api")
+        taishi_ge = get_taishige_agent()
         card_data = taishi_ge.get_card(card_id)
 
         if card_data is None:
@@ -171,9 +177,9 @@ async def delete_card(card_id: str):
     """
     try:
         # 从太史阁删除卡片
-        from agents.taishige import TaishigeAgent
+        from agents.taishige import get_taishige_agent
 
-        taishi_ge = TaishigeAgent(task_id="delete_card_api")
+        taishi_ge = get_taishige_agent()
         success = taishi_ge.delete_card(card_id)
 
         if not success:
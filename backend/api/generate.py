@@ -1,9 +1,9 @@
 """
 报告生成API路由
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Optional
+from typing import Awaitable, Callable, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +15,7 @@ class GenerateRequest(BaseModel):
     query: str
     data_source: Optional[str] = None
     analysis_type: Optional[str] = None
+    use_cache: Optional[bool] = None  # 是否使用推理结果缓存（默认仅 temperature=0 时使用）
 
 
 class GenerateResponse(BaseModel):
@@ -24,32 +25,70 @@ class GenerateResponse(BaseModel):
     execution_time: float
 
 
+async def _infer(
+    prompt: str,
+    max_new_tokens: int,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    use_cache: Optional[bool] = None
+) -> str:
+    """
+    提交到推理工作线程（排队、背压与优先级由工作线程统一处理）
+
+    Raises:
+        HTTPException: 队列已满（429）、客户端断开（499）或推理失败（500）
+    """
+    from models.inference_worker import (
+        get_inference_worker,
+        InferencePriority,
+        QueueFullError,
+        JobCancelledError
+    )
+
+    try:
+        return await get_inference_worker().submit(
+            prompt=prompt,
+            max_new_tokens=max_new_tokens,
+            temperature=0.7,
+            priority=InferencePriority.BATCH,
+            is_disconnected=is_disconnected,
+            use_cache=use_cache
+        )
+    except QueueFullError as e:
+        logger.warning(f"推理队列已满: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except JobCancelledError as e:
+        logger.info(f"生成已取消: {e}")
+        raise HTTPException(status_code=499, detail=str(e))
+    except Exception as e:
+        logger.error(f"NPU推理失败: {e}")
+        raise HTTPException(status_code=500, detail=f"NPU推理失败: {str(e)}")
+
+
 @router.post("/cards")
-async def generate_cards(request: GenerateRequest):
+async def generate_cards(request: GenerateRequest, http_request: Request):
     """
     生成四色卡片（使用NPU推理）- 优化版
 
     参数：
         request: 生成请求
+        http_request: HTTP 请求（用于检测客户端断开）
 
     返回：
         四色卡片
     """
+    return await _generate_cards(request, http_request.is_disconnected)
+
+
+async def _generate_cards(
+    request: GenerateRequest,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> dict:
+    """生成四色卡片（/cards 与 /batch 共用；is_disconnected 为客户端断开检测）"""
     try:
         import time
-        from models.model_loader import get_model_loader
 
         start_time = time.time()
 
-        # 检查模型是否加载
-        loader = get_model_loader()
-        if not loader.is_loaded:
-            logger.warning("模型未加载，尝试加载...")
-            try:
-                loader.load()
-            except Exception as e:
-                raise HTTPException(status_code=503, detail=f"模型加载失败: {str(e)}")
-
         # 构造简化的分析提示词（减少token数量）
         analysis_prompt = f"""请简要分析：{request.query}
 
@@ -59,18 +98,14 @@ async def generate_cards(request: GenerateRequest):
 3. 风险：[1-2句话]
 4. 行动：[1-2句话]"""
 
-        # NPU推理（减少max_tokens以加快速度）
+        # NPU推理（减少max_tokens以加快速度，提交到推理工作线程）
         inference_start = time.time()
-        try:
-            raw_output = loader.infer(
-                prompt=analysis_prompt,
-                max_new_tokens=128,  # 从512减少到128
-                temperature=0.7
-            )
-        except Exception as e:
-            logger.error(f"NPU推理失败: {e}")
-            raise HTTPException(status_code=500, detail=f"NPU推理失败: {str(e)}")
-            
+        raw_output = await _infer(
+            analysis_prompt,
+            max_new_tokens=128,  # 从512减少到128
+            is_disconnected=is_disconnected,
+            use_cache=request.use_cache
+        )
         inference_time = (time.time() - inference_start) * 1000
 
         # 解析输出生成四色卡片
@@ -101,32 +136,30 @@ async def generate_cards(request: GenerateRequest):
             "execution_time": total_time
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"生成卡片失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/report")
-async def generate_report(request: GenerateRequest):
+async def generate_report(request: GenerateRequest, http_request: Request):
     """
     生成完整报告
 
     参数：
         request: 生成请求
+        http_request: HTTP 请求（用于检测客户端断开）
 
     返回：
         完整报告
     """
     try:
         import time
-        from models.model_loader import get_model_loader
 
         start_time = time.time()
 
-        # 使用NPU模型生成报告
-        loader = get_model_loader()
-        model = loader.load()
-
         # 构造报告生成提示词
         report_prompt = f"""
 请为以下查询生成完整的分析报告，包含：摘要、事实、解释、风险和行动建议。
@@ -146,12 +179,13 @@ async def generate_report(request: GenerateRequest):
 - 行动要有明确的优先级和预期效果
 """
 
-        # NPU推理
+        # NPU推理（提交到推理工作线程，不阻塞事件循环）
         inference_start = time.time()
-        raw_output = loader.infer(
-            prompt=report_prompt,
+        raw_output = await _infer(
+            report_prompt,
             max_new_tokens=1024,
-            temperature=0.7
+            is_disconnected=http_request.is_disconnected,
+            use_cache=request.use_cache
         )
         inference_time = (time.time() - inference_start) * 1000
 
@@ -180,22 +214,21 @@ async def generate_report(request: GenerateRequest):
             "execution_time": total_time
         }
 
-    except Exception as e:
-        logger.error(f"生成报告失败: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"生成报告失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/batch")
-async def batch_generate(requests: list):
+async def batch_generate(requests: List[GenerateRequest], http_request: Request):
     """
     批量生成
     
     参数：
         requests: 生成请求列表
+        http_request: HTTP 请求（客户端断开时取消剩余的生成）
     
     返回：
         生成结果列表
@@ -205,7 +238,7 @@ async def batch_generate(requests: list):
         
         for request in requests:
             try:
-                result = await generate_cards(request)
+                result = await _generate_cards(request, http_request.is_disconnected)
                 results.append({
                     "query": request.query,
                     "status": "success",
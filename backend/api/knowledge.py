@@ -46,57 +46,46 @@ async def get_knowledge_graph(
         节点和边的列表
     """
     try:
-        # 从太史阁Agent获取图谱数据
-        from agents.taishige import TaishigeAgent
+        # 从太史阁卡片仓库获取图谱数据
+        from agents.taishige import get_taishige_agent
 
-        # 创建太史阁实例
-        taishi_ge = TaishigeAgent(task_id="knowledge_api")
-
-        # 从太史阁的知识库中提取节点和边
-        # knowledge_base 包含存储的知识项
-        nodes = []
-        edges = []
-
-        # 如果有知识库数据，提取节点
-        if hasattr(taishi_ge, 'knowledge_base') and len(taishi_ge.knowledge_base) > 0:
-            for idx, knowledge_item in enumerate(taishi_ge.knowledge_base[:limit]):
-                # 将知识项转换为节点
-                content = knowledge_item.get('content', {})
-                if isinstance(content, dict):
-                    # 从内容中提取卡片信息
-                    cards = content.get('cards', []) if 'cards' in content else [content]
-
-                    for card in cards:
-                        card_type = card.get('type', 'blue')
-                        layer = 'fact'
-                        if card_type == 'green':
-                            layer = 'analysis'
-                        elif card_type == 'yellow':
-                            layer = 'creative'
-                        elif card_type == 'red':
-                            layer = 'risk'
-
-                        nodes.append(Node(
-                            id=f"{knowledge_item['knowledge_id']}_{len(nodes)}",
-                            label=card.get('title', card.get('content', '无标题')[:50]),
-                            type=card_type,
-                            layer=layer
-                        ))
-
-                    # 创建节点之间的关联边
-                    if len(nodes) > 1:
-                        for i in range(len(nodes) - 1):
-                            edges.append(Edge(
-                                source=nodes[i].id,
-                                target=nodes[i + 1].id,
-                                label="关联",
-                                relation_type="related"
-                            ))
-        else:
+        cards, _ = get_taishige_agent().get_cards(limit=limit)
+        if not cards:
             # 如果知识库为空，返回空数据（而非模拟数据）
             logger.warning("太史阁知识库为空，返回空图谱")
             return KnowledgeGraphResponse(nodes=[], edges=[])
 
+        nodes = []
+        edges = []
+        previous_by_knowledge = {}
+        for card in cards:
+            card_type = card['type']
+            layer = 'fact'
+            if card_type == 'green':
+                layer = 'analysis'
+            elif card_type == 'yellow':
+                layer = 'creative'
+            elif card_type == 'red':
+                layer = 'risk'
+
+            nodes.append(Node(
+                id=card['id'],
+                label=card['title'][:50],
+                type=card_type,
+                layer=layer
+            ))
+
+            # 同一知识项中的卡片依次关联
+            previous = previous_by_knowledge.get(card['knowledge_id'])
+            if previous is not None:
+                edges.append(Edge(
+                    source=previous,
+                    target=card['id'],
+                    label="关联",
+                    relation_type="related"
+                ))
+            previous_by_knowledge[card['knowledge_id']] = card['id']
+
         return KnowledgeGraphResponse(nodes=nodes, edges=edges)
 
     except Exception as e:
@@ -122,10 +111,9 @@ async def search_knowledge(
     """
     try:
         # 从太史阁Agent进行语义检索
-        from agents.taishige import TaishigeAgent
+        from agents.taishige import get_taishige_agent
 
-        # 创建太史阁实例
-        taishi_ge = TaishigeAgent(task_id="search_api")
+        taishi_ge = get_taishige_agent()
 
         # 提取关键词用于检索
         keywords = query.split()
@@ -9,6 +9,7 @@
 
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 
 class Settings(BaseSettings):
     """应用配置 - 骁龙X Elite AIPC端侧AI配置"""
@@ -29,7 +30,10 @@ class Settings(BaseSettings):
     # 模型路径: C:\model\Qwen2.0-7B-SSD-8380-2.34\
     MODEL_NAME: str = "Qwen2.0-7B-SSD"
     MODEL_PATH: Path = Path("C:/model/Qwen2.0-7B-SSD-8380-2.34")
-    AUTO_LOAD_MODEL: bool = True  # 启动时自动加载模型
+    AUTO_LOAD_MODEL: bool = True  # 启动时在后台加载模型（加载完成前依赖模型的接口返回 503）
+    MODEL_WARMUP_QUERIES: int = 2  # 加载后执行的预热查询条数（0 表示不预热）
+    MODEL_LOADING_RETRY_AFTER_S: int = 5  # 加载/预热期间 503 响应的 Retry-After
+    MODEL_LOAD_FAILED_RETRY_S: int = 30  # 加载失败后重新加载的间隔
 
     # QNN配置
     # Backend: HTP (Hexagon Tensor Processor) = NPU
@@ -39,9 +43,57 @@ class Settings(BaseSettings):
     QNN_PERFORMANCE_MODE: str = "BURST"  # BURST高性能模式 | DEFAULT | POWER_SAVER
     QNN_LOG_LEVEL: str = "DEBUG"  # DEBUG | TRACE | INFO | WARN | ERROR
 
+    # 推理调度配置
+    # 所有 GenieContext.Query 由单一工作线程执行，路由通过异步队列提交任务
+    INFERENCE_BACKEND: str = "genie"  # genie（真实NPU） | fake（模拟后端，仅用于测试）
+    INFERENCE_QUEUE_MAX_INTERACTIVE: int = 16  # 交互式对话最大排队数，超出返回 429
+    INFERENCE_QUEUE_MAX_BATCH: int = 8  # 批量分析最大排队数，超出返回 429
+    INFERENCE_BATCH_MAX_SIZE: int = 4  # 微批处理最大任务数（1 表示关闭合并）
+    INFERENCE_BATCH_MAX_WAIT_MS: float = 5.0  # 凑批最长等待时间（毫秒）
+    MODEL_POOL_MEMORY_BUDGET_MB: int = 10240  # 常驻模型池内存预算，超出时按 LRU 卸载空闲模型
+
+    # 推理结果缓存（内存 LRU + SQLite），temperature > 0 时默认跳过
+    INFERENCE_CACHE_ENABLED: bool = True
+    INFERENCE_CACHE_DB_PATH: Path = Path("./data/inference_cache.db")
+    INFERENCE_CACHE_MEMORY_ENTRIES: int = 256  # 内存 LRU 条目上限
+    INFERENCE_CACHE_MAX_ENTRIES: int = 10000  # SQLite 条目上限
+    INFERENCE_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # 条目有效期
+
+    # 推理会话复用（模板前缀快照 + 多轮对话驻留），上下文不支持时自动退回无状态调用
+    INFERENCE_SESSION_REUSE: bool = True
+    INFERENCE_SESSION_SNAPSHOT_DIR: Path = Path("./data/dialog_snapshots")
+    INFERENCE_SESSION_MAX_TEMPLATES: int = 16  # 模板快照上限（LRU 淘汰）
+    INFERENCE_SESSION_MAX_CONVERSATIONS: int = 32  # 保留对话记录的会话上限（LRU 淘汰）
+    INFERENCE_SESSION_MAX_TURNS: int = 8  # 单个会话驻留轮数上限，超出后截断历史并重新预填充
+
+    # 模型路由：按实际推理观测（首 token 延迟、解码速度、失败率）预测延迟
+    MODEL_ROUTER_DB_PATH: Path = Path("./data/model_performance.db")
+
+    # 混合检索（知识卡片全文 + 记忆库向量 + 历史案例向量，RRF 融合）
+    HYBRID_SEARCH_RRF_K: int = 60  # RRF 平滑常数
+    HYBRID_SEARCH_CANDIDATES: int = 20  # 每个后端取回的候选数
+    HYBRID_SEARCH_TIMEOUT_SECONDS: float = 2.0  # 单个后端超时，超时的后端不参与融合
+
+    # 知识卡片检索结果缓存（内存 LRU，卡片写入后按知识代数自动失效）
+    CARD_SEARCH_CACHE_ENTRIES: int = 512  # 条目上限
+    CARD_SEARCH_CACHE_MAX_MB: int = 32  # 估算内存上限
+
+    # 性能基准测试
+    BENCHMARK_RESULTS_DIR: Path = Path("./data/benchmarks")
+    BENCHMARK_REFERENCE_BACKEND: Optional[str] = None  # CPU 参考后端（名称或 "模块:工厂函数"），None 表示不对比
+
     # 数据配置
     DATA_DIR: Path = Path("./data")
     DB_PATH: Path = Path("./data/antinet.db")
+    TAISHIGE_CARD_DB_PATH: Path = Path("./data/taishige_cards.db")  # 太史阁卡片仓库
+
+    # SQLite 连接池（每个数据库文件一个，连接创建时配置 WAL 与以下参数）
+    DB_POOL_MAX_CONNECTIONS: int = 8  # 最大连接数
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0  # 等待空闲连接超时
+    DB_CACHE_SIZE_KB: int = 16384  # 每个连接的页缓存
+    DB_MMAP_SIZE_MB: int = 256  # 内存映射大小（0 表示不使用）
+    DB_BUSY_TIMEOUT_MS: int = 5000  # 数据库被锁时的重试等待时间
+    DB_EXECUTOR_WORKERS: int = 4  # 数据库线程池线程数（路由的数据库操作在此执行，不阻塞事件循环）
 
     # 安全配置
     DATA_STAYS_LOCAL: bool = True  # 数据不出域
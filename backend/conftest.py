@@ -0,0 +1,43 @@
+"""
+pytest 公共夹具
+
+运行: 在 backend 目录下执行 pytest
+"""
+import itertools
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from services.migrations import migrate
+
+
+@pytest.fixture
+def make_db_path(tmp_path):
+    """返回创建函数：每次调用新建一个已迁移到最新结构的临时数据库（WAL 模式，与连接池一致），返回文件路径"""
+    counter = itertools.count()
+
+    def _make() -> Path:
+        path = tmp_path / f"antinet{next(counter)}.db"
+        conn = sqlite3.connect(str(path))
+        conn.execute("PRAGMA journal_mode = WAL")
+        migrate(conn)
+        conn.close()
+        return path
+
+    return _make
+
+
+@pytest.fixture
+def db_path(make_db_path) -> Path:
+    """已迁移到最新结构的临时数据库文件"""
+    return make_db_path()
+
+
+@pytest.fixture
+def db(db_path):
+    """db_path 的连接（行为 sqlite3.Row），测试结束时关闭"""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
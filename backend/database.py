@@ -2,13 +2,19 @@
 """
 初始化和管理SQLite数据库，处理硬编码的默认数据
 """
-import sqlite3
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import json
 from datetime import datetime
 import logging
 
+from services.card_bulk_import import recover_bulk_import
+from services.card_search import ensure_card_fts, sync_bigram_index
+from services.gtd_repository import TASK_FIELDS
+from services.migrations import migrate
+from services.pagination import DEFAULT_PAGE_SIZE, Page, fetch_page, parse_fields
+from services.sqlite_pool import get_connection_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,145 +25,34 @@ class DatabaseManager:
         self.init_database()
 
     def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """
+        从连接池借出数据库连接（WAL 模式）
+
+        close() 或 with 块结束时归还到连接池，而不是关闭
+        """
+        return get_connection_pool(self.db_path).connect()
 
     def init_database(self):
-        """初始化数据库表结构"""
+        """初始化数据库表结构（见 services/migrations.py）"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            # 1. 团队成员表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS team_members (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    avatar TEXT,
-                    online BOOLEAN DEFAULT 0,
-                    join_date TEXT,
-                    last_active TEXT,
-                    permissions TEXT,  -- JSON数组
-                    contribution INTEGER DEFAULT 0,
-                    email TEXT,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 2. 知识空间表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS knowledge_spaces (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    members TEXT,  -- JSON数组
-                    owner TEXT,
-                    created_at TEXT,
-                    updated_at TEXT,
-                    card_count INTEGER DEFAULT 0,
-                    is_public BOOLEAN DEFAULT 0
-                )
-            """)
+            # 按编号执行尚未执行的结构迁移（建表、统一知识卡片结构、热点查询索引）
+            applied = migrate(conn)
+            if applied:
+                logger.info(f"数据库结构已迁移到版本 {applied[-1]}")
 
-            # 3. 团队协作活动表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS collaboration_activities (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_name TEXT NOT NULL,
-                    action TEXT NOT NULL,
-                    content TEXT,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    space_id INTEGER,
-                    metadata TEXT  -- JSON
-                )
-            """)
+            # 中途退出的批量导入：补齐全文索引，恢复触发器与索引
+            recover_bulk_import(conn)
 
-            # 4. 分析报告数据表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS analytics_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category TEXT NOT NULL,  -- growth, network, heatmap, roi
-                    data_json TEXT NOT NULL,  -- JSON格式的数据
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 5. 评论表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS comments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_name TEXT NOT NULL,
-                    user_avatar TEXT,
-                    content TEXT NOT NULL,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    target_id INTEGER,  -- 关联的目标ID
-                    target_type TEXT,  -- space, card, etc.
-                    parent_id INTEGER,  -- 父评论ID
-                    metadata TEXT  -- JSON
-                )
-            """)
-
-            # 6. 知识卡片表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS knowledge_cards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    card_type TEXT DEFAULT 'blue',
-                    category TEXT,
-                    similarity REAL DEFAULT 0.0,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 7. 检查清单数据表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS checklist_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data_json TEXT NOT NULL,  -- sections数组的JSON
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 8. GTD任务表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS gtd_tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    priority TEXT CHECK(priority IN ('low', 'medium', 'high')),
-                    due_date TEXT,
-                    category TEXT CHECK(category IN ('inbox', 'today', 'later', 'archive', 'projects')),
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # 8. 知识库卡片表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS knowledge_cards (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    type TEXT CHECK(type IN ('blue', 'green', 'yellow', 'red')),
-                    category TEXT CHECK(category IN ('事实', '解释', '风险', '行动')),
-                    similarity REAL DEFAULT 0.0,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            conn.commit()
+            # 知识卡片全文索引（触发器随卡片写入同步）
+            ensure_card_fts(conn)
 
         # 插入默认数据（只插入一次）
         self.insert_default_data()
 
+        # 补齐启动前写入（其他进程、旧版本）的卡片的二字片段索引
+        with self.get_connection() as conn:
+            sync_bigram_index(conn)
+
     def insert_default_data(self):
         """插入默认的硬编码数据"""
         with self.get_connection() as conn:
@@ -663,6 +558,19 @@ class DatabaseManager:
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
 
+    def get_gtd_tasks_page(self, category: Optional[str] = None, cursor: Optional[str] = None,
+                           limit: Optional[int] = DEFAULT_PAGE_SIZE, fields: Optional[str] = None) -> Page:
+        """
+        按创建时间倒序分页获取GTD任务（游标分页，见 services/pagination.py；limit 与 cursor 都为空时返回全部任务，最多 MAX_UNPAGED_ROWS 条）
+
+        Raises:
+            ValueError: 游标或 fields 无效
+        """
+        columns = parse_fields(fields, TASK_FIELDS)
+        filters = [("category", category)] if category else []
+        with self.get_connection() as conn:
+            return fetch_page(conn, "gtd_tasks", columns, filters, cursor, limit)
+
     def add_gtd_task(self, title: str, description: str, priority: str, category: str, due_date: Optional[str] = None) -> Dict[str, Any]:
         """添加GTD任务"""
         with self.get_connection() as conn:
@@ -4,10 +4,17 @@
 导入预设知识卡片到数据库
 将原来硬编码的37张卡片导入到 knowledge_cards 表
 """
+import os
+import sys
 import sqlite3
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.card_bulk_import import bulk_import_cards
+from services.migrations import migrate
+
 # 数据库路径
 DB_PATH = Path("C:/test/antinet/backend/data/antinet.db")
 
@@ -265,8 +272,9 @@ PRESET_KNOWLEDGE_CARDS = [
 def import_cards():
     """导入预设卡片到数据库"""
     try:
-        # 连接数据库
+        # 连接数据库（确保表结构为最新版本）
         conn = sqlite3.connect(DB_PATH)
+        migrate(conn)
         cursor = conn.cursor()
         
         # 检查现有卡片数量
@@ -274,32 +282,17 @@ def import_cards():
         existing_count = cursor.fetchone()[0]
         print(f"数据库中现有卡片数量: {existing_count}")
         
-        # 清空现有卡片（自动模式）
+        # 追加导入（已导入过的卡片按内容哈希跳过）
         if existing_count > 0:
             print(f"检测到现有 {existing_count} 张卡片，将追加导入新卡片")
-            # 不清空，直接追加
-        
-        # 插入预设卡片
-        inserted = 0
-        for card in PRESET_KNOWLEDGE_CARDS:
-            try:
-                cursor.execute("""
-                    INSERT INTO knowledge_cards (title, content, category, card_type, similarity, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    card['title'],
-                    card['content'],
-                    card['category'],
-                    card['card_type'],
-                    0.9,  # 默认相似度
-                    datetime.now().isoformat()
-                ))
-                inserted += 1
-            except Exception as e:
-                print(f"插入卡片失败: {card['title']} - {e}")
         
-        conn.commit()
-        print(f"\n[OK] 成功导入 {inserted} 张卡片到数据库")
+        # 批量插入预设卡片
+        created_at = datetime.now().isoformat()
+        stats = bulk_import_cards(conn, (
+            {**card, "similarity": 0.9, "created_at": created_at}  # 默认相似度
+            for card in PRESET_KNOWLEDGE_CARDS
+        ))
+        print(f"\n[OK] 成功导入 {stats['success']} 张卡片到数据库（跳过重复 {stats['duplicates']} 张）")
         
         # 验证导入结果
         cursor.execute('SELECT COUNT(*) FROM knowledge_cards')
@@ -53,7 +53,7 @@ print(f"  - qai_libs: {lib_path}")
 print(f"  - bridge libs: {bridge_lib_path}")
 print(f"  - PATH updated: {lib_path in os.environ['PATH']}")
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
@@ -79,6 +79,7 @@ except Exception as e:
     chat_router = None
 
 from database import DatabaseManager
+from routes.readiness import require_model_ready
 
 # 配置日志
 logging.basicConfig(
@@ -146,7 +147,12 @@ except Exception as e:
 # 注册报告生成路由
 try:
     from api.generate import router as generate_router
-    app.include_router(generate_router, prefix="/api/generate", tags=["报告生成"])
+    app.include_router(
+        generate_router,
+        prefix="/api/generate",
+        tags=["报告生成"],
+        dependencies=[Depends(require_model_ready)]  # 报告生成全部依赖模型
+    )
     logger.info("[OK] 报告生成路由已注册")
 except Exception as e:
     logger.warning(f"无法导入报告生成路由: {e}")
@@ -370,75 +376,46 @@ async def startup_event():
     # 创建必要的目录
     settings.DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-        # 检查是否自动加载模型（为 True 时启动时加载，False 时按需加载）
+    # 检查是否自动加载模型（为 True 时在后台加载，False 时按需加载）
+    # 模型在后台线程中加载并预热，进程立即开始接受请求：
+    # GTD、数据、知识库等路由不受影响，依赖模型的路由在就绪前返回 503 + Retry-After
     if settings.AUTO_LOAD_MODEL:
-        # 使用全局单例加载器（确保 /api/npu/status 能正确返回状态）
         try:
-            logger.info("[startup_event] 开始初始化模型加载器...")
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            logger.info(f"[startup_event] get_model_loader() returned: {loader}")
-            logger.info(f"[startup_event] loader.is_loaded before load(): {loader.is_loaded}")
-
-            model = loader.load()
-            logger.info(f"[startup_event] loader.load() completed")
-            logger.info(f"[startup_event] loader.is_loaded after load(): {loader.is_loaded}")
-            logger.info(f"[startup_event] loader.model exists: {loader.model is not None}")
-
-            # 验证模型是否真的加载成功
-            if not loader.is_loaded:
-                logger.error(f"[startup_event] loader.is_loaded=False，但 load() 没有抛出异常")
-                raise RuntimeError("模型加载器报告 is_loaded=False，但未抛出异常")
-
-            logger.info("[OK] 全局模型加载器已初始化")
-            logger.info(f"  - 模型: {loader.model_config['name']}")
-            logger.info(f"  - 参数: {loader.model_config['params']}")
-            logger.info(f"  - 量化: {loader.model_config['quantization']}")
-            logger.info(f"  - 状态: 已加载")
-
-            # 验证全局变量
-            from models.model_loader import _global_model_loader
-            logger.info(f"[startup_event] _global_model_loader: {_global_model_loader}")
-            logger.info(f"[startup_event] _global_model_loader is loader: {_global_model_loader is loader}")
-
+            from models.model_readiness import get_model_readiness
+            get_model_readiness().start()
+            logger.info("[startup_event] 模型已开始后台加载，可通过 /api/health/ready 查询就绪状态")
         except ImportError as e:
             logger.warning(f"NPU 模型加载器不可用: {e}")
             logger.warning("NPU 功能将被禁用，但其他 API 仍可正常工作")
         except Exception as e:
-            logger.error(f" 模型加载失败: {e}")
-            logger.error(f"错误类型: {type(e).__name__}")
-            import traceback
-            logger.error(f"完整堆栈:\n{traceback.format_exc()}")
-
-            # 特殊处理NPU设备创建错误
-            error_msg = str(e)
-            if "14001" in error_msg or "Failed to create device" in error_msg:
-                logger.error("")
-                logger.error("=" * 60)
-                logger.error("CRITICAL: NPU设备创建失败（错误代码14001）")
-                logger.error("=" * 60)
-                logger.error("")
-                logger.error("可能原因:")
-                logger.error("  1. NPU驱动未正确安装")
-                logger.error("  2. 另一个进程已占用NPU资源")
-                logger.error("  3. DLL版本不匹配")
-                logger.error("  4. 系统权限不足")
-                logger.error("")
-                logger.error("建议操作:")
-                logger.error("  1. 运行 fix_npu_device.bat 修复NPU占用")
-                logger.error("  2. 重启AIPC以完全释放NPU资源")
-                logger.error("  3. 检查Windows事件查看器 -> Windows日志 -> 应用")
-                logger.error("  4. 确认NPU驱动在设备管理器中正常运行")
-                logger.error("")
-                logger.error("临时方案:")
-                logger.error("  - 系统将忽略NPU错误继续启动")
-                logger.error("  - API仍可使用，但NPU推理功能不可用")
-                logger.error("=" * 60)
-                logger.error("")
+            logger.error(f" 启动后台模型加载失败: {e}")
     else:
         logger.info("[startup_event] AUTO_LOAD_MODEL=False，跳过启动时自动加载模型")
         logger.info("[startup_event] 模型将在首次使用时按需加载")
-        # 不再吞掉异常，让问题暴露出来
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭事件：停止推理工作线程、卸载模型池并关闭数据库连接池"""
+    try:
+        from models.inference_worker import shutdown_inference_worker
+        shutdown_inference_worker()
+    except Exception as e:
+        logger.warning(f"停止推理工作线程失败: {e}")
+
+    try:
+        from models.model_pool import shutdown_model_pool
+        shutdown_model_pool()
+    except Exception as e:
+        logger.warning(f"卸载模型池失败: {e}")
+
+    try:
+        from services.async_db import shutdown_async_databases
+        from services.sqlite_pool import close_all_pools
+        shutdown_async_databases()
+        close_all_pools()
+    except Exception as e:
+        logger.warning(f"关闭数据库连接池失败: {e}")
 
 
 @app.get("/")
@@ -462,65 +439,81 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """健康检查"""
-    logger.info("[/api/health] 开始健康检查")
-
-    try:
-        # 导入全局模型加载器
-        from models.model_loader import _global_model_loader
+    """健康检查（不触发模型加载，模型状态见 /api/health/ready）"""
+    readiness = _model_readiness_status()
+    is_loaded = readiness["state"] == "ready" or _model_loaded()
+    status = "healthy" if is_loaded else "degraded"
+    logger.info(f"[/api/health] 状态: {status}, 模型状态: {readiness['state']}")
 
-        # 如果全局加载器不存在，创建它
-        if _global_model_loader is None:
-            logger.info("[/api/health] 全局模型加载器为空，正在初始化...")
-            from models.model_loader import get_model_loader
-            _global_model_loader = get_model_loader()
-            logger.info(f"[/api/health] 创建了加载器: {_global_model_loader}")
-        
-        # 检查模型是否已加载
-        is_loaded = False
-        model_exists = _global_model_loader.model is not None
-        
-        if _global_model_loader.is_loaded:
-            is_loaded = True
-            logger.info(f"[/api/health] 模型已加载 (is_loaded=True)")
-        elif model_exists and not _global_model_loader.is_loaded:
-            # 模型实例存在但is_loaded=False，修正状态
-            logger.warning("[/api/health] 模型实例存在但is_loaded=False，修正状态")
-            _global_model_loader.is_loaded = True
-            is_loaded = True
-            logger.info("[/api/health] 已设置is_loaded=True")
-        else:
-            # 尝试加载模型
-            logger.info("[/api/health] 尝试加载模型...")
-            try:
-                model = _global_model_loader.load()
-                is_loaded = _global_model_loader.is_loaded
-                logger.info(f"[/api/health] 模型加载结果: is_loaded={is_loaded}")
-            except Exception as load_err:
-                logger.error(f"[/api/health] 模型加载失败: {load_err}")
-                is_loaded = False
-        
-        status = "healthy" if is_loaded else "degraded"
-        logger.info(f"[/api/health] 最终状态: {status}, model_loaded={is_loaded}")
-        
-    except Exception as e:
-        logger.error(f"[/api/health] 健康检查异常: {e}")
-        import traceback
-        logger.error(f"[/api/health] 详细堆栈:\n{traceback.format_exc()}")
-        is_loaded = False
-        status = "degraded"
-    
     return {
         "status": status,
         "model": settings.MODEL_NAME,
         "model_loaded": is_loaded,
+        "model_state": readiness["state"],
         "device": settings.QNN_DEVICE,
         "data_stays_local": settings.DATA_STAYS_LOCAL,
         "qai_libs_path": os.environ.get('QAI_LIBS_PATH', 'Not set')
     }
 
 
-@app.post("/api/analyze", response_model=AnalysisResult)
+@app.get("/api/health/live")
+async def liveness_check():
+    """存活检查：进程能够响应请求即返回 200"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/database")
+async def database_health_check():
+    """
+    数据库连接池状态
+
+    检查各连接池的空闲连接，返回打开/空闲/借出中的连接数与借出等待时间，
+    以及数据库线程池的排队数与查询耗时分位数
+    """
+    from services.async_db import get_async_database_stats
+    from services.sqlite_pool import get_pool_stats
+
+    pools = get_pool_stats(check_health=True)
+    healthy = all(pool["health"]["healthy"] for pool in pools)
+    return {"status": "healthy" if healthy else "degraded", "pools": pools, "executors": get_async_database_stats()}
+
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """
+    就绪检查：模型已加载并完成预热时返回 200，
+    加载中、预热中或加载失败时返回 503 + Retry-After
+    """
+    readiness = _model_readiness_status()
+    if readiness["state"] in ("ready", "idle"):
+        return {"status": "ready", "model": readiness}
+
+    from routes.readiness import model_not_ready_error
+    error = model_not_ready_error()
+    headers = error.headers if error is not None else None
+    return JSONResponse(status_code=503, content={"status": "not_ready", "model": readiness}, headers=headers)
+
+
+def _model_loaded() -> bool:
+    """全局模型加载器是否已加载"""
+    try:
+        from models.model_loader import _global_model_loader
+        return _global_model_loader is not None and _global_model_loader.is_loaded
+    except Exception:
+        return False
+
+
+def _model_readiness_status() -> Dict[str, Any]:
+    """获取后台模型加载状态（模块不可用时视为按需加载）"""
+    try:
+        from models.model_readiness import get_model_readiness
+        return get_model_readiness().get_status()
+    except Exception as e:
+        logger.warning(f"获取模型就绪状态失败: {e}")
+        return {"state": "idle", "error": str(e)}
+
+
+@app.post("/api/analyze", response_model=AnalysisResult, dependencies=[Depends(require_model_ready)])
 async def analyze_data(request: QueryRequest):
     """
     数据分析接口 - 核心功能
@@ -0,0 +1,199 @@
+"""
+模拟 GenieContext 后端
+
+在没有骁龙 NPU / qai_appbuilder 的普通 Linux 环境下，提供与 GenieContext
+相同的 SetParams / Query / release 接口，用于验证推理调度、排队和回调逻辑。
+
+与真实对话一样，Query 之间保留对话状态，只预填充本次传入的 token；
+Reset / Prefill / Save / Restore 模拟 Genie Dialog 的状态管理接口，
+processed_prompt_tokens 统计实际预填充的 token 数，用于验证会话复用的收益。
+QueryBatch 模拟支持多提示的后端：各提示并行预填充，解码按步共享一次耗时。
+
+通过环境变量 INFERENCE_BACKEND=fake 或 NPUModelLoader(backend="fake") 启用。
+"""
+import re
+import time
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 粗粒度分词：单个汉字、连续字母数字、单个标点各算一个 token
+_TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_\u4e00-\u9fff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为模拟 token
+
+    Args:
+        text: 输入文本
+
+    Returns:
+        token 列表
+    """
+    return _TOKEN_PATTERN.findall(text)
+
+
+class FakeGenieContext:
+    """模拟 GenieContext（逐 token 回调，可配置预填充与解码耗时）"""
+
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        prefill_delay_per_token: float = 0.0002,
+        decode_delay: float = 0.002,
+        response_tokens: int = 32
+    ):
+        """
+        初始化模拟上下文
+
+        Args:
+            config_path: 模型配置路径（仅记录，不读取）
+            prefill_delay_per_token: 每个提示 token 的预填充耗时（秒）
+            decode_delay: 每个生成 token 的解码耗时（秒）
+            response_tokens: 未达到 max_tokens 时的自然回答长度
+        """
+        self.config_path = config_path
+        self.prefill_delay_per_token = prefill_delay_per_token
+        self.decode_delay = decode_delay
+        self.response_tokens = response_tokens
+
+        self.max_tokens = 64
+        self.temperature = 0.7
+        self.top_k = 40
+        self.top_p = 0.95
+
+        # 统计信息（测试中用于断言）
+        self.query_count = 0
+        self.batch_query_count = 0
+        self.processed_prompt_tokens = 0
+        self.generated_tokens = 0
+        self.released = False
+        # 对话中已驻留的 token 数，以及按路径保存的对话快照
+        self.dialog_tokens = 0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self._active_queries = 0
+        self.max_concurrent_queries = 0
+
+    def SetParams(self, max_tokens: str, temperature: str, top_k: str, top_p: str) -> bool:
+        """设置采样参数（与 GenieContext 一致，参数均为字符串）"""
+        self.max_tokens = int(max_tokens)
+        self.temperature = float(temperature)
+        self.top_k = int(top_k)
+        self.top_p = float(top_p)
+        return True
+
+    def Query(self, prompt: str, callback: Callable[[str], bool]) -> bool:
+        """
+        执行一次模拟推理
+
+        Args:
+            prompt: 已格式化的完整提示
+            callback: token 回调，返回 False 时提前结束生成
+
+        Returns:
+            是否正常完成
+        """
+        with self._lock:
+            self._active_queries += 1
+            self.max_concurrent_queries = max(self.max_concurrent_queries, self._active_queries)
+            self.query_count += 1
+
+        try:
+            prompt_tokens = tokenize(prompt)
+            self._prefill(len(prompt_tokens))
+            return self._decode(prompt_tokens, callback)
+        finally:
+            with self._lock:
+                self._active_queries -= 1
+
+    def QueryBatch(self, prompts: List[str], callbacks: List[Callable[[str], bool]]) -> bool:
+        """
+        在一次调用中为多条提示生成结果
+
+        Args:
+            prompts: 已格式化的完整提示列表
+            callbacks: 与 prompts 对应的 token 回调，返回 False 时结束该提示的生成
+
+        Returns:
+            是否正常完成
+        """
+        with self._lock:
+            self._active_queries += 1
+            self.max_concurrent_queries = max(self.max_concurrent_queries, self._active_queries)
+            self.query_count += 1
+            self.batch_query_count += 1
+
+        try:
+            token_lists = [tokenize(prompt) for prompt in prompts]
+            with self._lock:
+                self.processed_prompt_tokens += sum(len(tokens) for tokens in token_lists)
+            longest = max((len(tokens) for tokens in token_lists), default=0)
+            if self.prefill_delay_per_token > 0 and longest > 0:
+                time.sleep(self.prefill_delay_per_token * longest)
+
+            sources = [[t for t in tokens if t not in ("<", "|", ">")] or ["好"] for tokens in token_lists]
+            active = set(range(len(prompts)))
+            for step in range(min(self.max_tokens, self.response_tokens)):
+                if not active:
+                    break
+                if self.decode_delay > 0:
+                    time.sleep(self.decode_delay)
+                for i in sorted(active):
+                    with self._lock:
+                        self.generated_tokens += 1
+                    if callbacks[i](sources[i][step % len(sources[i])]) is False:
+                        active.discard(i)
+            return True
+        finally:
+            with self._lock:
+                self._active_queries -= 1
+
+    def Reset(self):
+        """清空对话状态"""
+        self.dialog_tokens = 0
+
+    def Prefill(self, prompt: str):
+        """只预填充提示，不生成"""
+        self._prefill(len(tokenize(prompt)))
+
+    def Save(self, path: str):
+        """保存当前对话状态"""
+        self._snapshots[path] = self.dialog_tokens
+
+    def Restore(self, path: str):
+        """恢复已保存的对话状态"""
+        if path not in self._snapshots:
+            raise FileNotFoundError(f"对话快照不存在: {path}")
+        self.dialog_tokens = self._snapshots[path]
+
+    def _prefill(self, token_count: int):
+        """模拟预填充阶段"""
+        with self._lock:
+            self.processed_prompt_tokens += token_count
+            self.dialog_tokens += token_count
+        if self.prefill_delay_per_token > 0 and token_count > 0:
+            time.sleep(self.prefill_delay_per_token * token_count)
+
+    def _decode(self, prompt_tokens: List[str], callback: Callable[[str], bool]) -> bool:
+        """模拟解码阶段：复述提示中的内容 token"""
+        source = [t for t in prompt_tokens if t not in ("<", "|", ">")] or ["好"]
+        limit = min(self.max_tokens, self.response_tokens)
+
+        for i in range(limit):
+            if self.decode_delay > 0:
+                time.sleep(self.decode_delay)
+            with self._lock:
+                self.generated_tokens += 1
+                self.dialog_tokens += 1
+            if callback(source[i % len(source)]) is False:
+                return True
+        return True
+
+    def release(self):
+        """释放资源"""
+        self.released = True
+        logger.info("[FakeGenie] 模拟上下文已释放")
@@ -0,0 +1,179 @@
+"""
+生成策略
+
+按调用点声明生成的停止条件，由推理回调逐 token 检查，满足任一条件即通知
+GenieContext 提前结束生成（回调返回 False）：
+- token 预算
+- 停止字符串（如 <|im_end|>），命中后从结果中截去
+- 最长生成时间
+- 结构化输出完成判定（如 JSON 对象已闭合、代码块已闭合）
+"""
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 模型对话结束标记，出现在输出中说明回答已结束
+DEFAULT_STOP_STRINGS = ["<|im_end|>", "<|endoftext|>"]
+
+
+def json_object_complete(text: str) -> bool:
+    """
+    判断输出中的第一个 JSON 对象是否已闭合
+
+    忽略字符串内的括号与转义字符，对象之前的说明文字或代码块标记不影响判断。
+    """
+    start = text.find("{")
+    if start < 0:
+        return False
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for ch in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return True
+    return False
+
+
+def code_fence_closed(text: str) -> bool:
+    """判断输出中的第一个 ``` 代码块是否已闭合"""
+    return text.count("```") >= 2
+
+
+class GenerationPolicy:
+    """单个调用点的生成策略"""
+
+    def __init__(
+        self,
+        name: str,
+        max_new_tokens: Optional[int] = None,
+        stop_strings: Optional[List[str]] = None,
+        max_time_s: Optional[float] = None,
+        is_complete: Optional[Callable[[str], bool]] = None,
+        complete_triggers: Optional[str] = None
+    ):
+        """
+        初始化生成策略
+
+        Args:
+            name: 策略名（用于日志、统计和缓存键）
+            max_new_tokens: token 预算（与调用方传入的 max_new_tokens 取较小值）
+            stop_strings: 停止字符串，命中后结束生成并从结果中截去
+            max_time_s: 最长生成时间（秒，从开始查询计时）
+            is_complete: 结构化输出完成判定，参数为已生成的文本
+            complete_triggers: 仅当 token 含这些字符时才调用 is_complete（None 表示每个 token 都检查）
+        """
+        self.name = name
+        self.max_new_tokens = max_new_tokens
+        self.stop_strings = list(DEFAULT_STOP_STRINGS if stop_strings is None else stop_strings)
+        self.max_time_s = max_time_s
+        self.is_complete = is_complete
+        self.complete_triggers = complete_triggers
+
+    def budget(self, max_new_tokens: int) -> int:
+        """计算实际 token 预算"""
+        if self.max_new_tokens is None:
+            return max_new_tokens
+        return min(max_new_tokens, self.max_new_tokens)
+
+    def start(self, max_new_tokens: int) -> "PolicyMonitor":
+        """为一次生成创建检查器"""
+        return PolicyMonitor(self, self.budget(max_new_tokens))
+
+    def __repr__(self) -> str:
+        return f"GenerationPolicy({self.name})"
+
+
+class PolicyMonitor:
+    """一次生成中的策略检查状态"""
+
+    def __init__(self, policy: GenerationPolicy, budget: int):
+        self.policy = policy
+        self.budget = budget
+        self.started_at = time.time()
+        self.tokens = 0
+        self.stop_reason: Optional[str] = None
+        self.text = ""
+        # 停止字符串可能跨越多个 token，只需检查末尾的窗口
+        self._window = max((len(s) for s in policy.stop_strings), default=0)
+
+    def feed(self, token: str) -> bool:
+        """
+        记录一个 token 并检查停止条件
+
+        Returns:
+            True 表示应结束生成
+        """
+        self.tokens += 1
+        self.text += token
+
+        if self.policy.stop_strings:
+            tail = self.text[-(self._window + len(token)):]
+            if any(s in tail for s in self.policy.stop_strings):
+                return self._stop("stop_string")
+        if self.policy.is_complete is not None and self._may_complete(token) and self.policy.is_complete(self.text):
+            return self._stop("complete")
+        if self.tokens >= self.budget:
+            return self._stop("budget")
+        if self.policy.max_time_s is not None and time.time() - self.started_at >= self.policy.max_time_s:
+            return self._stop("timeout")
+        return False
+
+    def _may_complete(self, token: str) -> bool:
+        triggers = self.policy.complete_triggers
+        return triggers is None or any(ch in token for ch in triggers)
+
+    def _stop(self, reason: str) -> bool:
+        self.stop_reason = reason
+        return True
+
+    def finalize(self, text: str) -> str:
+        """截去停止字符串及其之后的内容"""
+        cut = len(text)
+        for s in self.policy.stop_strings:
+            index = text.find(s)
+            if 0 <= index < cut:
+                cut = index
+        return text[:cut]
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "policy": self.policy.name,
+            "stop_reason": self.stop_reason or "eos",
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "elapsed_ms": round((time.time() - self.started_at) * 1000, 2)
+        }
+
+
+def json_skill_policy(name: str, max_new_tokens: int, max_time_s: float = 60.0) -> GenerationPolicy:
+    """
+    创建 JSON 输出技能的生成策略（输出的 JSON 对象闭合即结束）
+
+    Args:
+        name: 技能名
+        max_new_tokens: token 预算
+        max_time_s: 最长生成时间（秒）
+    """
+    return GenerationPolicy(
+        name=name,
+        max_new_tokens=max_new_tokens,
+        max_time_s=max_time_s,
+        is_complete=json_object_complete,
+        complete_triggers="}"
+    )
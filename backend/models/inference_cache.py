@@ -0,0 +1,272 @@
+"""
+推理结果缓存
+
+两级缓存，位于 NPUModelLoader.infer 之前：
+- 一级：进程内 LRU（微秒级命中）
+- 二级：SQLite 持久化（重启后仍可命中，一级未命中时回填）
+
+缓存键由 (model_key, _format_prompt 格式化后的提示, max_new_tokens, temperature, top_k, top_p)
+计算得出。temperature > 0 时输出带随机性，默认不缓存，调用方可显式 use_cache=True 开启。
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def build_cache_key(
+    model_key: str,
+    formatted_prompt: str,
+    max_new_tokens: int,
+    temperature: float,
+    top_k: int,
+    top_p: float,
+    variant: Optional[str] = None
+) -> str:
+    """
+    计算缓存键
+
+    Args:
+        variant: 影响输出的其他条件（如生成策略名），None 时不参与计算
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    values = [model_key, formatted_prompt, int(max_new_tokens), float(temperature), int(top_k), float(top_p)]
+    if variant is not None:
+        values.append(variant)
+    payload = json.dumps(values, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class InferenceCache:
+    """两级推理结果缓存（内存 LRU + SQLite）"""
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        memory_entries: int = 256,
+        max_entries: int = 10000,
+        ttl_seconds: float = 7 * 24 * 3600
+    ):
+        """
+        初始化缓存
+
+        Args:
+            db_path: SQLite 文件路径（None 时仅使用内存缓存）
+            memory_entries: 内存 LRU 最大条目数
+            max_entries: SQLite 最大条目数，超出时按最近访问时间淘汰
+            ttl_seconds: 条目有效期（秒）
+        """
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "expired": 0,
+            "evicted": 0
+        }
+
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS inference_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model_key TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_inference_cache_access ON inference_cache(last_access)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def should_cache(temperature: float, use_cache: Optional[bool]) -> bool:
+        """
+        判断本次调用是否使用缓存
+
+        Args:
+            temperature: 温度参数
+            use_cache: 调用方选择（None 表示自动：仅 temperature == 0 时缓存）
+        """
+        if use_cache is None:
+            return temperature <= 0
+        return use_cache
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存
+
+        Args:
+            key: build_cache_key 计算的键
+
+        Returns:
+            缓存的生成结果，未命中返回 None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return result
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT result, created_at FROM inference_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    result, created_at = row
+                    if created_at + self.ttl_seconds > now:
+                        self._conn.execute(
+                            "UPDATE inference_cache SET last_access = ? WHERE cache_key = ?", (now, key)
+                        )
+                        self._conn.commit()
+                        self._remember(key, result, created_at + self.ttl_seconds)
+                        self.stats["disk_hits"] += 1
+                        return result
+                    self._conn.execute("DELETE FROM inference_cache WHERE cache_key = ?", (key,))
+                    self._conn.commit()
+                    self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, result: str, model_key: str):
+        """
+        写入缓存
+
+        Args:
+            key: build_cache_key 计算的键
+            result: 生成结果
+            model_key: 模型键名（便于按模型清理）
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, result, now + self.ttl_seconds)
+            self.stats["stores"] += 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO inference_cache "
+                    "(cache_key, model_key, result, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, model_key, result, now, now)
+                )
+                self._prune_disk(now)
+                self._conn.commit()
+
+    def _remember(self, key: str, result: str, expires_at: float):
+        """写入内存 LRU（调用方持有锁）"""
+        self._memory[key] = (result, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self, now: float):
+        """清理过期条目，并按最近访问时间淘汰超出上限的条目（调用方持有锁）"""
+        cursor = self._conn.execute(
+            "DELETE FROM inference_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+        )
+        self.stats["expired"] += cursor.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+        if count > self.max_entries:
+            cursor = self._conn.execute(
+                "DELETE FROM inference_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM inference_cache ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            self.stats["evicted"] += cursor.rowcount
+
+    def record_bypass(self):
+        """记录一次因 temperature > 0 跳过缓存的调用"""
+        with self._lock:
+            self.stats["bypassed"] += 1
+
+    def clear(self, model_key: Optional[str] = None):
+        """
+        清空缓存
+
+        Args:
+            model_key: 仅清空指定模型的条目（None 表示全部）
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                if model_key is None:
+                    self._conn.execute("DELETE FROM inference_cache")
+                else:
+                    self._conn.execute("DELETE FROM inference_cache WHERE model_key = ?", (model_key,))
+                self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            disk_entries = 0
+            if self._conn is not None:
+                disk_entries = self._conn.execute("SELECT COUNT(*) FROM inference_cache").fetchone()[0]
+            return {
+                **self.stats,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries
+            }
+
+
+# 全局推理缓存（单例模式）
+_global_inference_cache: Optional[InferenceCache] = None
+_global_cache_lock = threading.Lock()
+
+
+def get_inference_cache() -> Optional[InferenceCache]:
+    """
+    获取全局推理缓存（INFERENCE_CACHE_ENABLED=False 时返回 None）
+
+    Returns:
+        推理缓存实例
+    """
+    global _global_inference_cache
+
+    with _global_cache_lock:
+        if _global_inference_cache is None:
+            from config import settings
+
+            if not settings.INFERENCE_CACHE_ENABLED:
+                return None
+            _global_inference_cache = InferenceCache(
+                db_path=settings.INFERENCE_CACHE_DB_PATH,
+                memory_entries=settings.INFERENCE_CACHE_MEMORY_ENTRIES,
+                max_entries=settings.INFERENCE_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.INFERENCE_CACHE_TTL_SECONDS
+            )
+            logger.info(f"[InferenceCache] 推理缓存已启用: {settings.INFERENCE_CACHE_DB_PATH}")
+
+    return _global_inference_cache
@@ -0,0 +1,293 @@
+"""
+推理会话（对话状态复用）
+
+GenieContext 内部维护一个对话（KV cache）。无状态调用每次都重新预填充完整提示，
+而技能模板和多轮对话的提示大部分是重复的。DialogSessionManager 在同一个上下文上复用对话状态：
+
+- 模板会话：固定指令前缀只预填充一次并保存快照，之后恢复快照，只预填充可变部分
+- 对话会话：同一 session_id 连续调用时对话仍驻留在上下文中，只发送新一轮用户输入
+
+上下文能力（对应 Genie Dialog API）：
+- Reset()：清空对话（GenieDialog_reset），对话会话需要
+- Prefill(text) / Save(path) / Restore(path)：仅预填充不生成、保存/恢复对话状态
+  （GenieDialog_query SENTENCE_BEGIN / GenieDialog_save / GenieDialog_restore），模板会话需要
+
+上下文不具备相应能力时自动退回无状态调用，结果与原有行为一致。
+"""
+import hashlib
+import logging
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 提示格式（从 prompt.conf 解析）
+PROMPT_TAGS_1 = "<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\n"
+PROMPT_TAGS_2 = "<|im_end|>\n<|im_start|>assistant\n"
+# 多轮对话中，上一轮回答之后开始新一轮用户输入
+PROMPT_TURN_SEPARATOR = "<|im_end|>\n<|im_start|>user\n"
+
+
+def format_conversation(turns: List[Tuple[str, Optional[str]]]) -> str:
+    """
+    将多轮对话格式化为完整提示
+
+    Args:
+        turns: [(用户输入, 模型回答)]，最后一轮的回答为 None
+
+    Returns:
+        格式化后的完整提示
+    """
+    parts = [PROMPT_TAGS_1]
+    for i, (user_input, response) in enumerate(turns):
+        if i > 0:
+            parts.append(PROMPT_TURN_SEPARATOR)
+        parts.append(user_input + PROMPT_TAGS_2)
+        if response is not None:
+            parts.append(response)
+    return "".join(parts)
+
+
+class DialogSessionManager:
+    """在单个 GenieContext 上管理模板快照与多轮对话的驻留状态"""
+
+    def __init__(
+        self,
+        context: Any,
+        snapshot_dir: Optional[Path] = None,
+        namespace: Optional[str] = None,
+        max_templates: int = 16,
+        max_conversations: int = 32,
+        max_turns: int = 8
+    ):
+        """
+        初始化会话管理器
+
+        Args:
+            context: GenieContext（或兼容的模拟上下文）
+            snapshot_dir: 模板快照目录
+            namespace: 快照子目录（模型键名）：多个模型共用快照目录时，快照互不覆盖、不被其他模型恢复或淘汰
+            max_templates: 模板快照上限，超出时淘汰最久未使用的快照
+            max_conversations: 保留对话记录的会话上限，超出时淘汰最久未使用的会话
+            max_turns: 单个会话驻留轮数上限，超出后只保留最近一半轮次并重新预填充
+        """
+        self.context = context
+        self.snapshot_dir = Path(snapshot_dir or "./data/dialog_snapshots")
+        if namespace:
+            self.snapshot_dir = self.snapshot_dir / namespace
+        self.max_templates = max_templates
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+
+        self._templates: "OrderedDict[str, Path]" = OrderedDict()
+        self._conversations: "OrderedDict[str, List[Tuple[str, str]]]" = OrderedDict()
+        # 当前驻留在上下文中的会话（None 表示空对话或无状态调用的残留）
+        self._resident: Optional[str] = None
+        self._lock = threading.RLock()
+
+        self.stats = {
+            "stateless": 0,
+            "batched": 0,
+            "template_hits": 0,
+            "template_misses": 0,
+            "conversation_hits": 0,
+            "conversation_misses": 0,
+            "resets": 0,
+            "evictions": 0,
+            "prompt_chars_sent": 0,
+            "prompt_chars_stateless": 0
+        }
+
+    @property
+    def supports_conversation(self) -> bool:
+        """上下文是否支持对话驻留"""
+        return callable(getattr(self.context, "Reset", None))
+
+    @property
+    def supports_templates(self) -> bool:
+        """上下文是否支持模板快照"""
+        return self.supports_conversation and all(
+            callable(getattr(self.context, name, None)) for name in ("Prefill", "Save", "Restore")
+        )
+
+    def query(
+        self,
+        prompt: str,
+        callback: Callable[[str], bool],
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None
+    ):
+        """
+        执行一次推理，尽量复用已预填充的对话状态
+
+        Args:
+            prompt: 未格式化的用户输入（对话会话中为本轮输入）
+            callback: token 回调，返回 False 时提前结束生成
+            session_id: 对话会话标识（None 表示非对话调用）
+            prompt_prefix: prompt 的固定前缀（技能模板），可复用其预填充结果
+        """
+        with self._lock:
+            if session_id is not None:
+                self._query_conversation(session_id, prompt, callback)
+            elif prompt_prefix and self.supports_templates and prompt.startswith(prompt_prefix):
+                self._query_template(prompt_prefix, prompt, callback)
+            else:
+                self._query_stateless(prompt, callback)
+
+    def _query_stateless(self, prompt: str, callback: Callable[[str], bool]):
+        """无状态调用：发送完整提示（上下文残留会话状态时先清空）"""
+        if self._resident is not None:
+            self._reset()
+        formatted = PROMPT_TAGS_1 + prompt + PROMPT_TAGS_2
+        self.stats["stateless"] += 1
+        self._account(formatted, formatted)
+        self.context.Query(formatted, callback)
+
+    def query_batch(self, prompts: List[str], callbacks: List[Callable[[str], bool]]):
+        """
+        多提示批量调用（上下文需支持 QueryBatch），按无状态方式发送完整提示
+
+        Args:
+            prompts: 未格式化的用户输入列表
+            callbacks: 与 prompts 对应的 token 回调
+        """
+        with self._lock:
+            if self._resident is not None:
+                self._reset()
+            formatted = [PROMPT_TAGS_1 + prompt + PROMPT_TAGS_2 for prompt in prompts]
+            self.stats["batched"] += len(prompts)
+            for text in formatted:
+                self._account(text, text)
+            self.context.QueryBatch(formatted, callbacks)
+
+    def _query_template(self, prefix: str, prompt: str, callback: Callable[[str], bool]):
+        """模板调用：恢复前缀快照，只预填充可变部分（快照缺失或恢复失败时重新预填充）"""
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]
+        snapshot = self._templates.get(key)
+
+        if snapshot is not None:
+            try:
+                self.context.Restore(str(snapshot))
+            except Exception as e:
+                logger.warning(f"[DialogSession] 恢复模板快照失败，重新预填充: {key} ({e})")
+                del self._templates[key]
+                snapshot = None
+
+        if snapshot is not None:
+            self._templates.move_to_end(key)
+            self.stats["template_hits"] += 1
+            sent_prefix = ""
+        else:
+            self._reset()
+            self.context.Prefill(PROMPT_TAGS_1 + prefix)
+            snapshot = self.snapshot_dir / key
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            self.context.Save(str(snapshot))
+            self._templates[key] = snapshot
+            self._evict_templates()
+            self.stats["template_misses"] += 1
+            sent_prefix = PROMPT_TAGS_1 + prefix
+            logger.info(f"[DialogSession] 已保存模板快照: {key}")
+
+        rest = prompt[len(prefix):] + PROMPT_TAGS_2
+        self._account(sent_prefix + rest, PROMPT_TAGS_1 + prompt + PROMPT_TAGS_2)
+        # 生成结果写入了对话，下次调用前需要恢复快照或清空
+        self._resident = f"template:{key}"
+        self.context.Query(rest, callback)
+
+    def _query_conversation(self, session_id: str, user_input: str, callback: Callable[[str], bool]):
+        """对话调用：会话仍驻留时只发送本轮输入，否则按保留的历史重建（不支持驻留时每轮都重建）"""
+        resident_key = f"conversation:{session_id}"
+        turns = self._conversations.pop(session_id, [])
+
+        warm = self.supports_conversation and self._resident == resident_key
+        if warm and turns and len(turns) < self.max_turns:
+            text = PROMPT_TURN_SEPARATOR + user_input + PROMPT_TAGS_2
+            self.stats["conversation_hits"] += 1
+        else:
+            if len(turns) >= self.max_turns:
+                turns = turns[-(self.max_turns // 2):] if self.max_turns > 1 else []
+                logger.info(f"[DialogSession] 会话 {session_id} 超过 {self.max_turns} 轮，截断历史后重建")
+            self._reset()
+            text = format_conversation(turns + [(user_input, None)])
+            self.stats["conversation_misses"] += 1
+
+        self._account(text, format_conversation(turns + [(user_input, None)]))
+
+        parts: List[str] = []
+        completed = True
+
+        def collect(token: str) -> bool:
+            nonlocal completed
+            parts.append(token)
+            if callback(token) is False:
+                completed = False
+                return False
+            return True
+
+        self._resident = f"partial:{session_id}"
+        self.context.Query(text, collect)
+
+        turns.append((user_input, "".join(parts)))
+        self._conversations[session_id] = turns
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+            self.stats["evictions"] += 1
+        # 被中止的回答不完整，下一轮按历史重建
+        self._resident = resident_key if completed else f"partial:{session_id}"
+
+    def _reset(self):
+        """清空上下文中的对话"""
+        if self.supports_conversation:
+            self.context.Reset()
+            self.stats["resets"] += 1
+        self._resident = None
+
+    def _evict_templates(self):
+        """淘汰超出上限的模板快照"""
+        while len(self._templates) > self.max_templates:
+            _, snapshot = self._templates.popitem(last=False)
+            shutil.rmtree(snapshot, ignore_errors=True)
+            self.stats["evictions"] += 1
+
+    def _account(self, sent: str, stateless: str):
+        """记录实际发送与无状态调用需要发送的提示长度"""
+        self.stats["prompt_chars_sent"] += len(sent)
+        self.stats["prompt_chars_stateless"] += len(stateless)
+
+    def reset_session(self, session_id: Optional[str] = None):
+        """
+        结束会话
+
+        Args:
+            session_id: 要结束的会话（None 表示清空所有会话和模板快照）
+        """
+        with self._lock:
+            if session_id is None:
+                self._conversations.clear()
+                for snapshot in self._templates.values():
+                    shutil.rmtree(snapshot, ignore_errors=True)
+                self._templates.clear()
+                self._reset()
+                return
+            self._conversations.pop(session_id, None)
+            if self._resident in (f"conversation:{session_id}", f"partial:{session_id}"):
+                self._reset()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话复用统计"""
+        with self._lock:
+            sent = self.stats["prompt_chars_sent"]
+            stateless = self.stats["prompt_chars_stateless"]
+            return {
+                **self.stats,
+                "prefill_saved_ratio": round(1 - sent / stateless, 4) if stateless else 0.0,
+                "supports_conversation": self.supports_conversation,
+                "supports_templates": self.supports_templates,
+                "templates": len(self._templates),
+                "conversations": len(self._conversations),
+                "resident": self._resident
+            }
@@ -0,0 +1,745 @@
+"""
+NPU 推理工作线程
+
+GenieContext.Query 是同步阻塞调用，直接在 async 路由中执行会卡住整个事件循环
+（包括 /api/health）。本模块提供一个独占 GenieContext 的单一工作线程：
+
+- 路由通过 await submit(...) 提交任务，事件循环不再被推理阻塞
+- 任务按优先级排队（交互式对话优先于批量分析）
+- 每个优先级有独立的队列深度上限，超限时抛出 QueueFullError（路由返回 429）
+- 客户端断开或协程被取消时，排队中的任务直接丢弃，执行中的任务在下一个 token 处中止
+- stream(...) 返回 TokenStream，按 GenieContext 回调逐 token 推送，并统计首 token 延迟
+- 配置推理结果缓存时，submit(...) 在入队前查询缓存，命中则不占用 NPU
+- 配置性能存储时，每次推理结束后记录首 token 延迟、token 数与失败，供模型路由器预测延迟
+- 开启微批处理（max_batch_size > 1）时，非会话任务在 max_batch_wait_ms 内
+  按 (优先级, 模型, 采样参数, 生成策略) 合并：上下文支持 QueryBatch 时一次调用生成全部结果，
+  否则在同一次模型借用内依次执行（不重复借用模型和设置参数），结果分别回填各自的 Future
+"""
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, ContextManager, Dict, List, Optional
+
+from models.generation_policy import GenerationPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePriority(IntEnum):
+    """推理任务优先级（数值越小越先执行）"""
+    INTERACTIVE = 0  # 交互式对话
+    BATCH = 1        # 批量分析
+
+
+class QueueFullError(RuntimeError):
+    """推理队列已满"""
+
+    def __init__(self, priority: InferencePriority, depth: int):
+        self.priority = priority
+        self.depth = depth
+        super().__init__(f"推理队列已满（优先级 {priority.name}，排队 {depth} 个任务）")
+
+
+class JobCancelledError(RuntimeError):
+    """推理任务被取消（客户端断开或调用方取消）"""
+
+
+class InferenceJob:
+    """单个推理任务"""
+
+    def __init__(
+        self,
+        job_id: int,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float,
+        priority: InferencePriority,
+        model_key: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        cache_key: Optional[str] = None,
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ):
+        self.job_id = job_id
+        self.model_key = model_key
+        self.on_token = on_token
+        self.cache_key = cache_key
+        self.session_id = session_id
+        self.prompt_prefix = prompt_prefix
+        self.policy = policy
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.priority = priority
+        self.future: Future = Future()
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+
+    def cancel(self):
+        """取消任务：排队中直接取消，执行中在下一个 token 处中止"""
+        self.cancel_event.set()
+        self.future.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+
+class InferenceWorker:
+    """独占 GenieContext 的单线程推理调度器"""
+
+    def __init__(
+        self,
+        lease_loader: Callable[[Optional[str]], ContextManager[Any]],
+        max_queue_depth: Optional[Dict[InferencePriority, int]] = None,
+        disconnect_poll_interval: float = 0.2,
+        result_cache: Any = None,
+        performance_store: Any = None,
+        max_batch_size: int = 1,
+        max_batch_wait_ms: float = 5.0
+    ):
+        """
+        初始化推理工作线程
+
+        Args:
+            lease_loader: 按模型键名借用加载器的上下文管理器（None 表示默认模型，
+                如 ModelPool.lease），加载器需提供
+                infer(prompt, max_new_tokens, temperature, should_stop)
+            max_queue_depth: 各优先级最大排队数
+            disconnect_poll_interval: 客户端断开检测间隔（秒）
+            result_cache: 可选的推理结果缓存（models.inference_cache.InferenceCache）
+            performance_store: 可选的性能观测存储（models.model_performance.ModelPerformanceStore）
+            max_batch_size: 微批处理的最大任务数（1 表示不合并）
+            max_batch_wait_ms: 凑批的最长等待时间（毫秒）
+        """
+        self.lease_loader = lease_loader
+        self.max_queue_depth = max_queue_depth or {
+            InferencePriority.INTERACTIVE: 16,
+            InferencePriority.BATCH: 8
+        }
+        self.disconnect_poll_interval = disconnect_poll_interval
+        self.result_cache = result_cache
+        self.performance_store = performance_store
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait_ms = max_batch_wait_ms
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._pending = {p: 0 for p in InferencePriority}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._current_job: Optional[InferenceJob] = None
+        self._current_batch: List[InferenceJob] = []
+
+        self.batch_stats = {
+            "dispatches": 0,         # 可合并任务的执行次数（含只有 1 个任务的批次）
+            "jobs": 0,               # 上述批次中的任务总数
+            "multi_prompt": 0,       # 以 QueryBatch 一次执行的批次数
+            "pipelined": 0,          # 在同一次模型借用内依次执行的批次数
+            "total_collect_ms": 0.0  # 凑批等待时间
+        }
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "rejected": 0,
+            "total_queue_wait_ms": 0.0,
+            "total_inference_ms": 0.0
+        }
+
+    # ==================== 生命周期 ====================
+
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="npu-inference-worker", daemon=True)
+        self._thread.start()
+        logger.info("[InferenceWorker] 推理工作线程已启动")
+
+    def stop(self, timeout: float = 5.0):
+        """停止工作线程，取消所有排队中的任务"""
+        self._stopping.set()
+        for job in list(self._current_batch) or [self._current_job]:
+            if job is not None:
+                job.cancel()
+        # 哨兵任务唤醒阻塞中的 get()
+        self._queue.put((-1, -1, None))
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._drain()
+        logger.info("[InferenceWorker] 推理工作线程已停止")
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stopping.is_set()
+
+    # ==================== 提交任务 ====================
+
+    def submit_nowait(
+        self,
+        prompt: str,
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        priority: InferencePriority = InferencePriority.BATCH,
+        model_key: Optional[str] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        cache_key: Optional[str] = None,
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> InferenceJob:
+        """
+        同步提交任务（不等待结果）
+
+        on_token 在工作线程中调用，不能阻塞；cache_key 非空时结果写入推理缓存；
+        session_id / prompt_prefix / policy 见 NPUModelLoader.infer
+
+        Raises:
+            QueueFullError: 该优先级的队列已满
+        """
+        if not self.is_running:
+            self.start()
+
+        with self._lock:
+            depth = self._pending[priority]
+            if depth >= self.max_queue_depth[priority]:
+                self.stats["rejected"] += 1
+                raise QueueFullError(priority, depth)
+            self._pending[priority] += 1
+            self.stats["submitted"] += 1
+            job = InferenceJob(
+                next(self._seq), prompt, max_new_tokens, temperature, priority, model_key, on_token, cache_key,
+                session_id=session_id, prompt_prefix=prompt_prefix, policy=policy
+            )
+
+        self._queue.put((int(priority), job.job_id, job))
+        return job
+
+    async def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        priority: InferencePriority = InferencePriority.BATCH,
+        model_key: Optional[str] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        use_cache: Optional[bool] = None,
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> str:
+        """
+        提交任务并等待结果
+
+        Args:
+            prompt: 提示词
+            max_new_tokens: 最大生成token数
+            temperature: 温度参数
+            priority: 任务优先级
+            model_key: 模型键名（None 表示默认模型）
+            is_disconnected: 可选的客户端断开检测（如 fastapi Request.is_disconnected）
+            use_cache: 是否使用推理结果缓存（None 表示仅 temperature == 0 时使用）
+            session_id: 多轮对话会话标识（prompt 为本轮输入，不使用结果缓存）
+            prompt_prefix: prompt 的固定前缀，预填充结果跨调用复用
+            policy: 生成策略（models.generation_policy.GenerationPolicy），满足停止条件时提前结束生成
+
+        Returns:
+            生成的文本
+
+        Raises:
+            QueueFullError: 队列已满
+            JobCancelledError: 客户端断开导致任务取消
+        """
+        cache_key = None
+        if session_id is None:
+            cache_key = self._cache_key_for(prompt, max_new_tokens, temperature, model_key, use_cache, policy)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        job = self.submit_nowait(
+            prompt, max_new_tokens, temperature, priority, model_key,
+            cache_key=cache_key, session_id=session_id, prompt_prefix=prompt_prefix, policy=policy
+        )
+        result_future = asyncio.wrap_future(job.future)
+
+        try:
+            if is_disconnected is None:
+                return await result_future
+
+            while True:
+                done, _ = await asyncio.wait({result_future}, timeout=self.disconnect_poll_interval)
+                if done:
+                    return result_future.result()
+                if await is_disconnected():
+                    logger.info(f"[InferenceWorker] 客户端已断开，取消任务 #{job.job_id}")
+                    job.cancel()
+                    result_future.cancel()
+                    raise JobCancelledError(f"客户端已断开，任务 #{job.job_id} 已取消")
+        except asyncio.CancelledError:
+            job.cancel()
+            result_future.cancel()
+            raise
+
+    def _cache_key_for(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float,
+        model_key: Optional[str],
+        use_cache: Optional[bool],
+        policy: Optional[GenerationPolicy] = None
+    ) -> Optional[str]:
+        """计算推理缓存键（未启用缓存或本次跳过缓存时返回 None）"""
+        if self.result_cache is None:
+            return None
+        if not self.result_cache.should_cache(temperature, use_cache):
+            if use_cache is None:
+                self.result_cache.record_bypass()
+            return None
+
+        from models.model_loader import ModelConfig, inference_cache_key
+        return inference_cache_key(
+            model_key or ModelConfig.DEFAULT_MODEL, prompt, max_new_tokens, temperature, policy
+        )
+
+    def stream(
+        self,
+        prompt: str,
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        priority: InferencePriority = InferencePriority.INTERACTIVE,
+        model_key: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> "TokenStream":
+        """
+        提交流式推理任务
+
+        任务在调用时立即入队（队列已满时直接抛出 QueueFullError，
+        便于路由在开始发送流之前返回 429）；迭代返回的 TokenStream 获取 token。
+        session_id 非空时 prompt 为该多轮对话的本轮输入。
+
+        Returns:
+            TokenStream 实例（必须在事件循环中调用）
+        """
+        token_stream = TokenStream(asyncio.get_running_loop())
+        token_stream.job = self.submit_nowait(
+            prompt, max_new_tokens, temperature, priority, model_key,
+            on_token=token_stream.push, session_id=session_id
+        )
+        token_stream.job.future.add_done_callback(token_stream.finish)
+        return token_stream
+
+    # ==================== 工作线程 ====================
+
+    def _run(self):
+        """工作线程主循环"""
+        while not self._stopping.is_set():
+            item = self._queue.get()
+            if item[2] is None:
+                continue
+
+            jobs = self._collect_batch(item)
+            runnable = []
+            for job in jobs:
+                with self._lock:
+                    self._pending[job.priority] -= 1
+                if job.cancelled or not job.future.set_running_or_notify_cancel():
+                    self.stats["cancelled"] += 1
+                    continue
+                runnable.append(job)
+
+            if len(runnable) == 1:
+                self._execute(runnable[0])
+            elif runnable:
+                self._execute_batch(runnable)
+
+    # ==================== 微批处理 ====================
+
+    @staticmethod
+    def _batchable(job: InferenceJob) -> bool:
+        """会话任务依赖各自的对话状态，不参与合并"""
+        return job.session_id is None
+
+    @staticmethod
+    def _batch_key(job: InferenceJob) -> tuple:
+        return (job.priority, job.model_key, job.max_new_tokens, job.temperature, id(job.policy))
+
+    def _collect_batch(self, item: tuple) -> List[InferenceJob]:
+        """
+        以 item 为首个任务凑批：在 max_batch_wait_ms 内取出可合并的后续任务
+
+        遇到不可合并的任务（含更高优先级任务）时放回队列并停止等待，
+        放回的任务保留原有的 (优先级, 序号)，排队顺序不变。
+        """
+        first = item[2]
+        if self.max_batch_size <= 1 or not self._batchable(first):
+            return [first]
+
+        batch = [first]
+        key = self._batch_key(first)
+        collect_start = time.time()
+        deadline = collect_start + self.max_batch_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            try:
+                next_item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            job = next_item[2]
+            if job is None or not self._batchable(job) or self._batch_key(job) != key:
+                self._queue.put(next_item)
+                break
+            batch.append(job)
+
+        self.batch_stats["dispatches"] += 1
+        self.batch_stats["jobs"] += len(batch)
+        self.batch_stats["total_collect_ms"] += (time.time() - collect_start) * 1000
+        return batch
+
+    def _execute_batch(self, jobs: List[InferenceJob]):
+        """
+        执行一批参数相同的任务
+
+        上下文支持 QueryBatch 时一次调用生成全部结果；否则在同一次模型借用内依次执行。
+        """
+        first = jobs[0]
+        started_at = time.time()
+        self._current_job = first
+        self._current_batch = jobs
+        for job in jobs:
+            job.started_at = started_at
+            self.stats["total_queue_wait_ms"] += (started_at - job.submitted_at) * 1000
+
+        try:
+            with self.lease_loader(first.model_key) as loader:
+                model_key = getattr(loader, "model_key", first.model_key)
+                if len(jobs) > 1 and getattr(loader, "supports_batch_query", False):
+                    self.batch_stats["multi_prompt"] += 1
+                    self._run_multi_prompt(loader, model_key, jobs)
+                else:
+                    self.batch_stats["pipelined"] += 1
+                    for job in jobs:
+                        self._run_job(loader, model_key, job)
+        except Exception as e:
+            # 借用模型失败：批次中尚未完成的任务全部失败
+            for job in jobs:
+                if not job.future.done():
+                    self._settle(job, None, e, job.model_key, 0, None)
+        finally:
+            self._current_job = None
+            self._current_batch = []
+
+    def _run_multi_prompt(self, loader: Any, model_key: Optional[str], jobs: List[InferenceJob]):
+        """以一次 QueryBatch 调用执行整批任务，并将结果分发给各任务"""
+        counters = [_TokenCounter(job) for job in jobs]
+        first = jobs[0]
+        try:
+            results = loader.infer_batch(
+                [job.prompt for job in jobs],
+                max_new_tokens=first.max_new_tokens,
+                temperature=first.temperature,
+                should_stop=[job.cancel_event.is_set for job in jobs],
+                on_token=[counter.on_token for counter in counters],
+                policy=first.policy
+            )
+        except Exception as e:
+            logger.error(f"[InferenceWorker] 批量推理失败 ({len(jobs)} 个任务): {e}")
+            for job, counter in zip(jobs, counters):
+                self._settle(job, None, e, model_key, counter.tokens, counter.first_token_at)
+            return
+        for job, counter, result in zip(jobs, counters, results):
+            self._settle(job, result, None, model_key, counter.tokens, counter.first_token_at)
+
+    def _run_job(self, loader: Any, model_key: Optional[str], job: InferenceJob):
+        """在已借用的模型上执行单个任务"""
+        if job.cancelled:
+            self._settle(job, None, None, model_key, 0, None)
+            return
+        job.started_at = time.time()
+        counter = _TokenCounter(job)
+        try:
+            result = loader.infer(
+                prompt=job.prompt,
+                max_new_tokens=job.max_new_tokens,
+                temperature=job.temperature,
+                should_stop=job.cancel_event.is_set,
+                on_token=counter.on_token,
+                use_cache=False,  # 缓存由工作线程在入队前查询、完成后写入
+                session_id=job.session_id,
+                prompt_prefix=job.prompt_prefix,
+                policy=job.policy
+            )
+        except Exception as e:
+            self._settle(job, None, e, model_key, counter.tokens, counter.first_token_at)
+            return
+        self._settle(job, result, None, model_key, counter.tokens, counter.first_token_at)
+
+    def _settle(
+        self,
+        job: InferenceJob,
+        result: Optional[str],
+        error: Optional[Exception],
+        model_key: Optional[str],
+        tokens: int,
+        first_token_at: Optional[float]
+    ):
+        """回填任务结果，写入推理缓存并记录性能观测"""
+        elapsed_ms = (time.time() - job.started_at) * 1000
+        self.stats["total_inference_ms"] += elapsed_ms
+
+        # 先记录观测再回填结果：提交方拿到结果时，本次观测已可用于路由
+        if self.performance_store is not None and model_key is not None and not job.cancelled:
+            ttft_ms = (first_token_at - job.started_at) * 1000 if first_token_at is not None else None
+            self.performance_store.record(model_key, elapsed_ms, tokens=tokens, ttft_ms=ttft_ms, failed=error is not None)
+
+        if error is not None:
+            self.stats["failed"] += 1
+            logger.error(f"[InferenceWorker] 任务 #{job.job_id} 推理失败: {error}")
+            job.future.set_exception(error)
+        elif job.cancelled:
+            self.stats["cancelled"] += 1
+            job.future.set_exception(JobCancelledError(f"任务 #{job.job_id} 已取消"))
+        else:
+            self.stats["completed"] += 1
+            if job.cache_key is not None:
+                self.result_cache.put(job.cache_key, result, model_key)
+            job.future.set_result(result)
+
+    def _execute(self, job: InferenceJob):
+        """执行单个任务并回填结果"""
+        self._current_job = job
+        job.started_at = time.time()
+        self.stats["total_queue_wait_ms"] += (job.started_at - job.submitted_at) * 1000
+
+        try:
+            with self.lease_loader(job.model_key) as loader:
+                self._run_job(loader, getattr(loader, "model_key", job.model_key), job)
+        except Exception as e:
+            if not job.future.done():
+                self._settle(job, None, e, job.model_key, 0, None)
+        finally:
+            self._current_job = None
+
+    def _drain(self):
+        """清空队列，取消剩余任务"""
+        while True:
+            try:
+                _, _, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                continue
+            with self._lock:
+                self._pending[job.priority] -= 1
+            job.cancel()
+            self.stats["cancelled"] += 1
+
+    # ==================== 统计 ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列与执行统计"""
+        with self._lock:
+            pending = {p.name.lower(): self._pending[p] for p in InferencePriority}
+        finished = self.stats["completed"] + self.stats["failed"]
+        started = finished + (1 if self._current_job is not None else 0)
+        return {
+            "running": self.is_running,
+            "busy": self._current_job is not None,
+            "pending": pending,
+            "max_queue_depth": {p.name.lower(): d for p, d in self.max_queue_depth.items()},
+            **self.stats,
+            "avg_queue_wait_ms": round(self.stats["total_queue_wait_ms"] / started, 2) if started else 0.0,
+            "avg_inference_ms": round(self.stats["total_inference_ms"] / finished, 2) if finished else 0.0,
+            "batching": self._batching_stats()
+        }
+
+    def _batching_stats(self) -> Dict[str, Any]:
+        """微批处理统计：平均批大小、填充率（批大小 / max_batch_size）与凑批等待"""
+        dispatches = self.batch_stats["dispatches"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_batch_wait_ms": self.max_batch_wait_ms,
+            **self.batch_stats,
+            "avg_batch_size": round(self.batch_stats["jobs"] / dispatches, 2) if dispatches else 0.0,
+            "fill_ratio": round(self.batch_stats["jobs"] / (dispatches * self.max_batch_size), 4) if dispatches else 0.0,
+            "avg_collect_ms": round(self.batch_stats["total_collect_ms"] / dispatches, 2) if dispatches else 0.0
+        }
+
+
+class _TokenCounter:
+    """统计单个任务的 token 数与首 token 时间，并转发给任务自身的 on_token"""
+
+    def __init__(self, job: InferenceJob):
+        self.job = job
+        self.tokens = 0
+        self.first_token_at: Optional[float] = None
+
+    def on_token(self, text: str):
+        self.tokens += 1
+        if self.first_token_at is None:
+            self.first_token_at = time.time()
+        if self.job.on_token is not None:
+            self.job.on_token(text)
+
+
+_STREAM_END = object()
+
+
+class TokenStream:
+    """
+    流式推理结果
+
+    工作线程通过 push() 写入 token，事件循环中以 async for 读取；
+    迭代提前结束（客户端断开、break）时自动取消推理任务。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.job: Optional[InferenceJob] = None
+        self.text_parts: List[str] = []
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._token_times: List[float] = []
+        self._created_at = time.perf_counter()
+        self._finished_at: Optional[float] = None
+
+    def push(self, token: str):
+        """工作线程回调：记录到达时间并转交事件循环"""
+        self._token_times.append(time.perf_counter())
+        try:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, token)
+        except RuntimeError:
+            # 事件循环已关闭（调用方已退出），停止生成
+            self.cancel()
+
+    def finish(self, _future: Future):
+        """任务结束回调（在工作线程或取消方线程中调用）"""
+        self._finished_at = time.perf_counter()
+        try:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, _STREAM_END)
+        except RuntimeError:
+            pass
+
+    def cancel(self):
+        """取消推理任务"""
+        if self.job is not None:
+            self.job.cancel()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        completed = False
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _STREAM_END:
+                    break
+                self.text_parts.append(item)
+                yield item
+            completed = True
+        finally:
+            if not completed:
+                self.cancel()
+
+        if self.job.future.cancelled():
+            raise JobCancelledError(f"任务 #{self.job.job_id} 已取消")
+        error = self.job.future.exception()
+        if error is not None:
+            raise error
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.text_parts)
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """
+        流式延迟指标
+
+        - ttft_ms: 从提交到第一个 token 的时间（含排队与预填充）
+        - queue_wait_ms: 排队等待时间
+        - inter_token_ms: 相邻 token 间隔的统计（解码速度）
+        """
+        times = list(self._token_times)
+        end = self._finished_at or time.perf_counter()
+        gaps = sorted((b - a) * 1000 for a, b in zip(times, times[1:]))
+
+        def pct(p: float) -> float:
+            return round(gaps[min(len(gaps) - 1, int(p * len(gaps)))], 2) if gaps else 0.0
+
+        queue_wait_ms = 0.0
+        if self.job is not None and self.job.started_at is not None:
+            queue_wait_ms = (self.job.started_at - self.job.submitted_at) * 1000
+
+        decode_seconds = (times[-1] - times[0]) if len(times) > 1 else 0.0
+        return {
+            "tokens": len(times),
+            "ttft_ms": round((times[0] - self._created_at) * 1000, 2) if times else None,
+            "queue_wait_ms": round(queue_wait_ms, 2),
+            "inter_token_ms": {
+                "avg": round(sum(gaps) / len(gaps), 2) if gaps else 0.0,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(gaps[-1], 2) if gaps else 0.0
+            },
+            "decode_tokens_per_second": round((len(times) - 1) / decode_seconds, 2) if decode_seconds else 0.0,
+            "total_ms": round((end - self._created_at) * 1000, 2)
+        }
+
+
+# 全局推理工作线程（单例模式）
+_global_inference_worker: Optional[InferenceWorker] = None
+_global_worker_lock = threading.Lock()
+
+
+def get_inference_worker() -> InferenceWorker:
+    """
+    获取全局推理工作线程（单例模式，首次调用时启动）
+
+    Returns:
+        推理工作线程实例
+    """
+    global _global_inference_worker
+
+    with _global_worker_lock:
+        if _global_inference_worker is None:
+            from config import settings
+            from models.model_pool import get_model_pool
+            from models.inference_cache import get_inference_cache
+            from models.model_performance import get_model_performance_store
+
+            _global_inference_worker = InferenceWorker(
+                get_model_pool().lease,
+                max_queue_depth={
+                    InferencePriority.INTERACTIVE: settings.INFERENCE_QUEUE_MAX_INTERACTIVE,
+                    InferencePriority.BATCH: settings.INFERENCE_QUEUE_MAX_BATCH
+                },
+                result_cache=get_inference_cache(),
+                performance_store=get_model_performance_store(),
+                max_batch_size=settings.INFERENCE_BATCH_MAX_SIZE,
+                max_batch_wait_ms=settings.INFERENCE_BATCH_MAX_WAIT_MS
+            )
+        _global_inference_worker.start()
+
+    return _global_inference_worker
+
+
+def shutdown_inference_worker():
+    """停止全局推理工作线程（应用关闭时调用）"""
+    global _global_inference_worker
+
+    with _global_worker_lock:
+        if _global_inference_worker is not None:
+            _global_inference_worker.stop()
+            _global_inference_worker = None
@@ -11,9 +11,13 @@ import os
 import sys
 import time
 import logging
-from typing import Optional, Dict, Any, List
+import threading
+from typing import Optional, Dict, Any, List, Callable
 from pathlib import Path
 
+from models.inference_session import DialogSessionManager, PROMPT_TAGS_1, PROMPT_TAGS_2
+from models.generation_policy import GenerationPolicy
+
 # 强制禁用 qai_hub_models 依赖，防止因缺少该库导致崩溃
 HAS_QAI_HUB = False
 
@@ -54,9 +58,16 @@ try:
     os.environ['QNN_LOG_LEVEL'] = qnn_log_level
     logger.info(f"[OK] QNN 日志级别设置为: {qnn_log_level}")
 except ImportError:
+    settings = None
     os.environ['QNN_LOG_LEVEL'] = "DEBUG"
     logger.info("[INFO] 使用默认 QNN 日志级别: DEBUG")
 
+# 推理后端: genie（真实NPU） | fake（模拟GenieContext，仅用于无NPU环境的测试）
+INFERENCE_BACKEND = os.environ.get(
+    'INFERENCE_BACKEND',
+    getattr(settings, 'INFERENCE_BACKEND', 'genie')
+)
+
 # 设置 QNN 其他环境变量以启用详细日志
 os.environ['QNN_DEBUG'] = "1"
 os.environ['QNN_VERBOSE'] = "1"
@@ -104,11 +115,14 @@ try:
 except ImportError:
     logger.warning("[INFO] qai_hub_models 未安装，将使用默认性能配置")
 
+GenieContext = None
 try:
     from qai_appbuilder import GenieContext
     logger.info("[OK] GenieContext导入成功")
 except ImportError as e:
-    raise RuntimeError(f"无法导入GenieContext: {e}。请确保已安装qai_appbuilder库。")
+    if INFERENCE_BACKEND != 'fake':
+        raise RuntimeError(f"无法导入GenieContext: {e}。请确保已安装qai_appbuilder库。")
+    logger.warning(f"[INFO] GenieContext 不可用，使用模拟后端: {e}")
 
 
 
@@ -126,6 +140,7 @@ class ModelConfig:
             "quantization": "QNN 2.34",
             "description": "推荐首选，对话/分析，速度快，中文支持好",
             "max_tokens": 2048,
+            "memory_mb": 4800,  # 常驻内存估算（模型池预算用）
             "recommended": True
         },
         "llama3.1-8b": {
@@ -135,6 +150,7 @@ class ModelConfig:
             "quantization": "QNN 2.38",
             "description": "对话生成，英文效果好，推理能力强",
             "max_tokens": 2048,
+            "memory_mb": 5400,  # 常驻内存估算（模型池预算用）
             "recommended": False
         },
         "llama3.2-3b": {
@@ -144,6 +160,7 @@ class ModelConfig:
             "quantization": "QNN 2.37",
             "description": "轻量级场景，响应最快，内存占用小",
             "max_tokens": 2048,
+            "memory_mb": 2400,  # 常驻内存估算（模型池预算用）
             "recommended": False
         }
     }
@@ -152,15 +169,90 @@ class ModelConfig:
     DEFAULT_MODEL = "qwen2-7b-ssd"
 
 
+# 采样参数（SetParams 的 top_k / top_p）
+DEFAULT_TOP_K = 40
+DEFAULT_TOP_P = 0.95
+
+
+def inference_cache_key(
+    model_key: str,
+    prompt: str,
+    max_new_tokens: int,
+    temperature: float,
+    policy: Optional[GenerationPolicy] = None
+) -> str:
+    """
+    计算推理结果缓存键
+
+    Args:
+        model_key: 模型键名
+        prompt: 未格式化的用户提示
+        max_new_tokens: 最大生成token数
+        temperature: 温度参数
+        policy: 生成策略（提前停止会改变输出，按策略名区分）
+
+    Returns:
+        缓存键
+    """
+    from models.inference_cache import build_cache_key
+    return build_cache_key(
+        model_key,
+        NPUModelLoader._format_prompt(prompt),
+        max_new_tokens,
+        temperature,
+        DEFAULT_TOP_K,
+        DEFAULT_TOP_P,
+        variant=policy.name if policy is not None else None
+    )
+
+
+def default_result_cache() -> Any:
+    """获取全局推理结果缓存（配置不可用时返回 None）"""
+    try:
+        from models.inference_cache import get_inference_cache
+        return get_inference_cache()
+    except Exception as e:
+        logger.warning(f"[WARNING] 推理缓存不可用: {e}")
+        return None
+
+
+def default_session_manager(context: Any, model_key: Optional[str] = None) -> Optional[DialogSessionManager]:
+    """
+    为模型上下文创建会话管理器（INFERENCE_SESSION_REUSE=False 时返回 None）
+
+    Args:
+        context: GenieContext 实例
+        model_key: 模型键名（模板快照按模型分目录保存）
+    """
+    try:
+        from config import settings as app_settings
+    except Exception as e:
+        logger.warning(f"[WARNING] 会话复用配置不可用，使用默认配置: {e}")
+        return DialogSessionManager(context, namespace=model_key)
+
+    if not app_settings.INFERENCE_SESSION_REUSE:
+        return None
+    return DialogSessionManager(
+        context,
+        snapshot_dir=app_settings.INFERENCE_SESSION_SNAPSHOT_DIR,
+        namespace=model_key,
+        max_templates=app_settings.INFERENCE_SESSION_MAX_TEMPLATES,
+        max_conversations=app_settings.INFERENCE_SESSION_MAX_CONVERSATIONS,
+        max_turns=app_settings.INFERENCE_SESSION_MAX_TURNS
+    )
+
+
 class NPUModelLoader:
     """NPU 模型加载器（使用 GenieContext）"""
 
-    def __init__(self, model_key: str = None):
+    def __init__(self, model_key: str = None, backend: str = None, result_cache: Any = None):
         """
         初始化模型加载器
 
         Args:
             model_key: 模型键名，如 "qwen2-7b-ssd"
+            backend: 推理后端 genie | fake（默认读取 INFERENCE_BACKEND）
+            result_cache: 可选的推理结果缓存（models.inference_cache.InferenceCache）
         """
         self.model_key = model_key or ModelConfig.DEFAULT_MODEL
         self.model_config = ModelConfig.MODELS.get(self.model_key)
@@ -168,8 +260,18 @@ class NPUModelLoader:
         if not self.model_config:
             raise ValueError(f"未知模型: {self.model_key}，可用模型: {list(ModelConfig.MODELS.keys())}")
 
+        self.backend = backend or INFERENCE_BACKEND
+        self.result_cache = result_cache
         self.model: Optional[Any] = None
         self.is_loaded = False
+        # 对话状态复用（绑定到当前 GenieContext，首次推理时创建）
+        self.sessions: Optional[DialogSessionManager] = None
+        # 各生成策略的结束原因统计 {策略名: {原因: 次数}}
+        self.policy_stats: Dict[str, Dict[str, int]] = {}
+        # GenieContext 不支持并发 Query，所有推理调用在此锁内串行执行
+        self._infer_lock = threading.RLock()
+        # 最近一次 SetParams 的 (上下文, 参数)，参数不变时跳过重复设置
+        self._applied_params: Optional[tuple] = None
 
     def load(self) -> Any:
         """
@@ -190,6 +292,13 @@ class NPUModelLoader:
             logger.info(f"[DEBUG load] 修正后 self.is_loaded={self.is_loaded}")
             return self.model
 
+        if self.backend == 'fake':
+            from models.fake_genie import FakeGenieContext
+            self.model = FakeGenieContext(self.model_config['path'])
+            self.is_loaded = True
+            logger.info(f"[OK] 模拟后端已加载: {self.model_config['name']}")
+            return self.model
+
         logger.info(f"正在加载模型: {self.model_config['name']}...")
         logger.info(f"模型路径: {self.model_config['path']}")
 
@@ -301,7 +410,8 @@ class NPUModelLoader:
         # 不应到达此处
         raise RuntimeError(f"NPU模型加载失败，未知错误: {last_exception}")
 
-    def _format_prompt(self, user_input: str) -> str:
+    @staticmethod
+    def _format_prompt(user_input: str) -> str:
         """
         格式化用户输入为模型期望的提示格式
         
@@ -315,17 +425,24 @@ class NPUModelLoader:
         Returns:
             格式化后的完整提示
         """
-        # 硬编码的提示格式（从prompt.conf解析）
-        prompt_tags_1 = "<|im_start|>system\nYou are a helpful assistant.<|im_end|>\n<|im_start|>user\n"
-        prompt_tags_2 = "<|im_end|>\n<|im_start|>assistant\n"
-        
-        # 构建完整提示
-        formatted_prompt = prompt_tags_1 + user_input + prompt_tags_2
+        # 构建完整提示（提示格式从prompt.conf解析，见 inference_session）
+        formatted_prompt = PROMPT_TAGS_1 + user_input + PROMPT_TAGS_2
         logger.debug(f"提示格式化: 用户输入={repr(user_input)}, 格式化后长度={len(formatted_prompt)}")
         
         return formatted_prompt
 
-    def infer(self, prompt: str, max_new_tokens: int = 64, temperature: float = 0.7) -> str:
+    def infer(
+        self,
+        prompt: str,
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        use_cache: Optional[bool] = None,
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> str:
         """
         执行推理
 
@@ -333,6 +450,13 @@ class NPUModelLoader:
             prompt: 输入提示词
             max_new_tokens: 最大生成token数（默认64以优化性能）
             temperature: 温度参数
+            should_stop: 可选的中止检查函数，返回 True 时在下一个 token 处结束生成
+            on_token: 可选的 token 回调，每收到一段生成文本即调用（用于流式输出）
+            use_cache: 是否使用推理结果缓存（None 表示仅 temperature == 0 时使用）
+            session_id: 多轮对话会话标识，prompt 为本轮用户输入，历史轮次驻留在对话中
+            prompt_prefix: prompt 的固定前缀（如技能指令模板），预填充结果跨调用复用
+            policy: 生成策略（token 预算、停止字符串、最长时间、结构化输出完成判定），
+                在 token 回调中检查，满足条件即提前结束生成
 
         Returns:
             生成的文本
@@ -345,8 +469,66 @@ class NPUModelLoader:
             logger.warning(f"模型实例存在但 is_loaded=False，在 infer() 中修正状态")
             self.is_loaded = True
         
+        # 对话会话的输出依赖历史轮次，不使用结果缓存
+        cache_key = None
+        if session_id is None:
+            cache_key = self._cache_key_for(prompt, max_new_tokens, temperature, use_cache, policy)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[OK] 推理缓存命中: {self.model_key}")
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        with self._infer_lock:
+            result = self._infer_locked(
+                prompt, max_new_tokens, temperature, should_stop, on_token, session_id, prompt_prefix, policy
+            )
+
+        # 被中止的生成结果不完整，不写入缓存
+        if cache_key is not None and not (should_stop is not None and should_stop()):
+            self.result_cache.put(cache_key, result, self.model_key)
+        return result
+
+    def _cache_key_for(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float,
+        use_cache: Optional[bool],
+        policy: Optional[GenerationPolicy] = None
+    ) -> Optional[str]:
+        """计算推理缓存键（未启用缓存或本次跳过缓存时返回 None）"""
+        if self.result_cache is None:
+            return None
+        if not self.result_cache.should_cache(temperature, use_cache):
+            if use_cache is None:
+                self.result_cache.record_bypass()
+            return None
+        return inference_cache_key(self.model_key, prompt, max_new_tokens, temperature, policy)
+
+    def _infer_locked(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float,
+        should_stop: Optional[Callable[[], bool]],
+        on_token: Optional[Callable[[str], None]],
+        session_id: Optional[str] = None,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> str:
+        """在推理锁内执行一次 GenieContext.Query"""
         if not self.is_loaded:
             self.load()
+        if self.sessions is None or self.sessions.context is not self.model:
+            self.sessions = default_session_manager(self.model, self.model_key)
+
+        # 生成策略：预算与调用方的 max_new_tokens 取较小值，其余条件在回调中检查
+        monitor = policy.start(max_new_tokens) if policy is not None else None
+        if monitor is not None:
+            max_new_tokens = monitor.budget
 
         try:
             start_time = time.time()
@@ -356,18 +538,7 @@ class NPUModelLoader:
             logger.debug(f"推理提示词: {repr(prompt[:100])}... -> 格式化后长度: {len(formatted_prompt)}")
             
             # 设置推理参数
-            if hasattr(self.model, 'SetParams'):
-                try:
-                    # SetParams需要字符串参数
-                    max_tokens_str = str(max_new_tokens)
-                    temp_str = str(temperature)
-                    top_k_str = str(40)  # top_k参数
-                    top_p_str = str(0.95)  # top_p参数
-                    logger.debug(f"设置推理参数: max_tokens={max_tokens_str}, temperature={temp_str}")
-                    success = self.model.SetParams(max_tokens_str, temp_str, top_k_str, top_p_str)
-                    logger.debug(f"SetParams返回: {success}")
-                except Exception as param_error:
-                    logger.warning(f"SetParams失败，使用默认参数: {param_error}")
+            self._set_params(max_new_tokens, temperature)
 
             # 创建回调函数收集结果
             result_parts = []
@@ -377,16 +548,30 @@ class NPUModelLoader:
                 nonlocal callback_count
                 callback_count += 1
                 result_parts.append(text)
+                if on_token is not None:
+                    on_token(text)
                 # 只记录前几次回调，避免日志过多
                 if callback_count <= 5:
                     logger.debug(f"回调 #{callback_count}: {repr(text[:50])}...")
+                # 返回 False 通知 GenieContext 提前结束生成
+                if should_stop is not None and should_stop():
+                    logger.info(f"[INFO] 推理在第 {callback_count} 个回调处被中止")
+                    return False
+                if monitor is not None and monitor.feed(text):
+                    return False
                 return True
             
-            # 执行推理
+            # 执行推理（会话管理器按需复用已预填充的对话状态）
             logger.debug(f"开始NPU推理...")
-            self.model.Query(formatted_prompt, callback)
+            if self.sessions is not None:
+                self.sessions.query(prompt, callback, session_id=session_id, prompt_prefix=prompt_prefix)
+            else:
+                self.model.Query(formatted_prompt, callback)
             logger.debug(f"推理完成，回调总次数: {callback_count}")
             result = ''.join(result_parts)
+            if monitor is not None:
+                result = monitor.finalize(result)
+                self._record_policy_stop(monitor.summary())
             logger.debug(f"总结果长度: {len(result)}")
 
             inference_time = (time.time() - start_time) * 1000
@@ -426,6 +611,101 @@ class NPUModelLoader:
             logger.error(f"详细堆栈:\n{traceback.format_exc()}")
             raise
 
+    def _set_params(self, max_new_tokens: int, temperature: float):
+        """设置采样参数（与上次相同时跳过，连续的同参数调用只设置一次）"""
+        if not hasattr(self.model, 'SetParams'):
+            return
+        # SetParams需要字符串参数
+        params = (str(max_new_tokens), str(temperature), str(DEFAULT_TOP_K), str(DEFAULT_TOP_P))
+        if self._applied_params is not None and self._applied_params[0] is self.model and self._applied_params[1] == params:
+            return
+        try:
+            logger.debug(f"设置推理参数: max_tokens={params[0]}, temperature={params[1]}")
+            success = self.model.SetParams(*params)
+            logger.debug(f"SetParams返回: {success}")
+            self._applied_params = (self.model, params)
+        except Exception as param_error:
+            self._applied_params = None
+            logger.warning(f"SetParams失败，使用默认参数: {param_error}")
+
+    @property
+    def supports_batch_query(self) -> bool:
+        """上下文是否支持一次传入多条提示（QueryBatch）"""
+        return self.model is not None and callable(getattr(self.model, 'QueryBatch', None))
+
+    def infer_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        should_stop: Optional[List[Optional[Callable[[], bool]]]] = None,
+        on_token: Optional[List[Optional[Callable[[str], None]]]] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> List[str]:
+        """
+        在一次 NPU 调用中为多条提示生成结果（上下文不支持 QueryBatch 时逐条执行）
+
+        Args:
+            prompts: 输入提示词列表
+            max_new_tokens: 最大生成token数（所有提示相同）
+            temperature: 温度参数（所有提示相同）
+            should_stop: 与 prompts 对应的中止检查函数
+            on_token: 与 prompts 对应的 token 回调
+            policy: 生成策略（每条提示独立检查）
+
+        Returns:
+            与 prompts 一一对应的生成文本
+        """
+        should_stop = should_stop or [None] * len(prompts)
+        on_token = on_token or [None] * len(prompts)
+
+        with self._infer_lock:
+            if not self.is_loaded:
+                self.load()
+            if not self.supports_batch_query:
+                return [
+                    self._infer_locked(prompt, max_new_tokens, temperature, stop, callback, policy=policy)
+                    for prompt, stop, callback in zip(prompts, should_stop, on_token)
+                ]
+            if self.sessions is None or self.sessions.context is not self.model:
+                self.sessions = default_session_manager(self.model, self.model_key)
+
+            monitors = [policy.start(max_new_tokens) if policy is not None else None for _ in prompts]
+            if policy is not None:
+                max_new_tokens = monitors[0].budget
+            self._set_params(max_new_tokens, temperature)
+
+            parts: List[List[str]] = [[] for _ in prompts]
+
+            def make_callback(i: int) -> Callable[[str], bool]:
+                def callback(text):
+                    parts[i].append(text)
+                    if on_token[i] is not None:
+                        on_token[i](text)
+                    if should_stop[i] is not None and should_stop[i]():
+                        return False
+                    if monitors[i] is not None and monitors[i].feed(text):
+                        return False
+                    return True
+                return callback
+
+            start_time = time.time()
+            callbacks = [make_callback(i) for i in range(len(prompts))]
+            if self.sessions is not None:
+                self.sessions.query_batch(prompts, callbacks)
+            else:
+                self.model.QueryBatch([self._format_prompt(p) for p in prompts], callbacks)
+
+            results = []
+            for i, monitor in enumerate(monitors):
+                result = ''.join(parts[i])
+                if monitor is not None:
+                    result = monitor.finalize(result)
+                    self._record_policy_stop(monitor.summary())
+                results.append(result)
+            logger.info(f"[OK] 批量推理完成: {len(prompts)} 条提示, {(time.time() - start_time) * 1000:.2f}ms")
+            return results
+
     def get_performance_stats(self) -> Dict[str, Any]:
         """
         获取性能统计数据
@@ -440,17 +720,54 @@ class NPUModelLoader:
             "is_loaded": self.is_loaded,
             "device": "NPU (Hexagon)",
             "runtime": "HTP",
-            "log_level": "INFO"
+            "log_level": "INFO",
+            "generation_policies": self.policy_stats
         }
 
-    def unload(self):
-        """卸载模型释放资源"""
-        if self.model and hasattr(self.model, 'release'):
-            self.model.release()
+    def _record_policy_stop(self, summary: Dict[str, Any]):
+        """记录生成策略的结束原因"""
+        reasons = self.policy_stats.setdefault(summary["policy"], {})
+        reasons[summary["stop_reason"]] = reasons.get(summary["stop_reason"], 0) + 1
+        logger.info(
+            f"[OK] 生成策略 {summary['policy']}: {summary['stop_reason']} "
+            f"({summary['tokens']}/{summary['budget']} tokens, {summary['elapsed_ms']}ms)"
+        )
 
-        self.model = None
-        self.is_loaded = False
+    def reset_session(self, session_id: Optional[str] = None):
+        """
+        结束对话会话，释放其驻留状态
+
+        Args:
+            session_id: 会话标识（None 表示清空所有会话和模板快照）
+        """
+        with self._infer_lock:
+            if self.sessions is not None:
+                self.sessions.reset_session(session_id)
+
+    def unload(self, wait: bool = True) -> bool:
+        """
+        卸载模型释放资源（持有推理锁，不会在推理中途释放上下文）
+
+        Args:
+            wait: 模型正在推理时是否等待推理结束（False 时不等待，直接返回 False）
+
+        Returns:
+            是否已卸载
+        """
+        if not self._infer_lock.acquire(blocking=wait):
+            return False
+        try:
+            if self.model and hasattr(self.model, 'release'):
+                self.model.release()
+
+            self.model = None
+            self.sessions = None
+            self._applied_params = None
+            self.is_loaded = False
+        finally:
+            self._infer_lock.release()
         logger.info(f"[OK] 模型已卸载: {self.model_config['name']}")
+        return True
 
     @staticmethod
     def list_available_models() -> Dict[str, Dict[str, Any]]:
@@ -498,7 +815,7 @@ def get_model_loader(model_key: str = None) -> NPUModelLoader:
 
     if _global_model_loader is None:
         logger.info(f"[get_model_loader] Creating new NPUModelLoader with key: {model_key}")
-        _global_model_loader = NPUModelLoader(model_key)
+        _global_model_loader = NPUModelLoader(model_key, result_cache=default_result_cache())
         logger.info(f"[get_model_loader] Created: {_global_model_loader}")
     else:
         logger.info(f"[get_model_loader] Returning existing: {_global_model_loader}")
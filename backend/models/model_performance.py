@@ -0,0 +1,177 @@
+"""
+模型性能观测存储
+
+推理工作线程在每次推理结束后记录一次观测（首 token 延迟、生成 token 数、总耗时、
+是否失败），按模型汇总为指数加权移动平均（EWMA），持久化到本地 SQLite，
+供模型路由器预测延迟。缓存命中与被取消的任务不计入观测。
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelPerformanceStore:
+    """按模型汇总的推理性能观测（内存 + SQLite）"""
+
+    def __init__(self, db_path: Optional[Path] = None, alpha: float = 0.2):
+        """
+        初始化性能存储
+
+        Args:
+            db_path: SQLite 文件路径（None 时仅保存在内存中）
+            alpha: EWMA 平滑系数，越大越偏重最近的观测
+        """
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._records: Dict[str, Dict[str, Any]] = {}
+
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS model_performance (
+                    model_key TEXT PRIMARY KEY,
+                    samples INTEGER NOT NULL,
+                    failures INTEGER NOT NULL,
+                    ttft_ms REAL,
+                    tokens_per_s REAL,
+                    latency_ms REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+            for row in self._conn.execute(
+                "SELECT model_key, samples, failures, ttft_ms, tokens_per_s, latency_ms, updated_at FROM model_performance"
+            ):
+                self._records[row[0]] = {
+                    "samples": row[1],
+                    "failures": row[2],
+                    "ttft_ms": row[3],
+                    "tokens_per_s": row[4],
+                    "latency_ms": row[5],
+                    "updated_at": row[6]
+                }
+
+    def _ewma(self, previous: Optional[float], value: Optional[float]) -> Optional[float]:
+        if value is None:
+            return previous
+        if previous is None:
+            return value
+        return previous + self.alpha * (value - previous)
+
+    def record(
+        self,
+        model_key: str,
+        latency_ms: float,
+        tokens: int = 0,
+        ttft_ms: Optional[float] = None,
+        failed: bool = False
+    ):
+        """
+        记录一次推理观测
+
+        Args:
+            model_key: 模型键名
+            latency_ms: 推理总耗时（毫秒）
+            tokens: 生成的 token 数（回调次数）
+            ttft_ms: 首 token 延迟（毫秒），未产生 token 时为 None
+            failed: 推理是否失败（失败只计入失败率，不更新延迟）
+        """
+        with self._lock:
+            record = self._records.setdefault(model_key, {
+                "samples": 0,
+                "failures": 0,
+                "ttft_ms": None,
+                "tokens_per_s": None,
+                "latency_ms": None,
+                "updated_at": 0.0
+            })
+            record["samples"] += 1
+            record["updated_at"] = time.time()
+            if failed:
+                record["failures"] += 1
+            else:
+                record["latency_ms"] = self._ewma(record["latency_ms"], latency_ms)
+                record["ttft_ms"] = self._ewma(record["ttft_ms"], ttft_ms)
+                decode_ms = latency_ms - (ttft_ms or 0.0)
+                if tokens > 1 and decode_ms > 0:
+                    record["tokens_per_s"] = self._ewma(
+                        record["tokens_per_s"], (tokens - 1) / decode_ms * 1000
+                    )
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO model_performance "
+                        "(model_key, samples, failures, ttft_ms, tokens_per_s, latency_ms, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (model_key, record["samples"], record["failures"], record["ttft_ms"],
+                         record["tokens_per_s"], record["latency_ms"], record["updated_at"])
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"[ModelPerformance] 写入观测失败: {e}")
+
+    def get(self, model_key: str) -> Optional[Dict[str, Any]]:
+        """
+        获取模型的性能汇总
+
+        Returns:
+            {samples, failures, failure_rate, ttft_ms, tokens_per_s, latency_ms, updated_at}，
+            尚无观测时返回 None
+        """
+        with self._lock:
+            record = self._records.get(model_key)
+            if record is None:
+                return None
+            return {
+                **record,
+                "failure_rate": record["failures"] / record["samples"] if record["samples"] else 0.0
+            }
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有模型的性能汇总"""
+        with self._lock:
+            keys = list(self._records)
+        return {key: self.get(key) for key in keys}
+
+    def clear(self):
+        """清空所有观测"""
+        with self._lock:
+            self._records.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM model_performance")
+                self._conn.commit()
+
+
+# 全局性能存储（单例模式）
+_global_performance_store: Optional[ModelPerformanceStore] = None
+_global_store_lock = threading.Lock()
+
+
+def get_model_performance_store() -> ModelPerformanceStore:
+    """
+    获取全局模型性能存储（配置不可用时仅使用内存）
+
+    Returns:
+        性能存储实例
+    """
+    global _global_performance_store
+
+    with _global_store_lock:
+        if _global_performance_store is None:
+            try:
+                from config import settings
+                db_path = settings.MODEL_ROUTER_DB_PATH
+            except Exception as e:
+                logger.warning(f"[WARNING] 模型路由配置不可用，性能观测仅保存在内存中: {e}")
+                db_path = None
+            _global_performance_store = ModelPerformanceStore(db_path)
+
+    return _global_performance_store
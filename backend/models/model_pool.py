@@ -0,0 +1,368 @@
+"""
+常驻多模型池
+
+按 ModelConfig.MODELS 键名缓存已加载的 NPUModelLoader，避免每次路由请求都重新
+创建 GenieContext、读取 config.json 和设置 BURST 模式：
+
+- LRU 淘汰：总内存估算超过预算时，卸载最久未使用的空闲模型
+- 引用计数：正在推理的模型（refcount > 0）永远不会被卸载
+- 后台预加载：路由选定模型后立即在后台加载；并根据历史选择序列
+  预测下一个模型，在预算允许时提前加载
+"""
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolEntry:
+    """模型池条目"""
+
+    def __init__(self, loader: Any):
+        self.loader = loader
+        self.refcount = 0
+        self.last_used = time.time()
+        self.load_lock = threading.Lock()
+        self.hits = 0
+
+
+class ModelPool:
+    """按 model_key 常驻的模型池"""
+
+    def __init__(
+        self,
+        memory_budget_mb: int,
+        loader_factory: Optional[Callable[[str], Any]] = None,
+        default_memory_mb: int = 4000
+    ):
+        """
+        初始化模型池
+
+        Args:
+            memory_budget_mb: 已加载模型的总内存预算（MB）
+            loader_factory: 按键名创建加载器的函数（默认 NPUModelLoader）
+            default_memory_mb: 模型配置中缺少 memory_mb 时的估算值
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self.default_memory_mb = default_memory_mb
+        self._loader_factory = loader_factory or self._create_npu_loader
+
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._transitions: Dict[Optional[str], Counter] = {}
+        self._last_selected: Optional[str] = None
+        self._preloading: Dict[str, threading.Thread] = {}
+
+        self.stats = {
+            "acquires": 0,
+            "hits": 0,
+            "loads": 0,
+            "evictions": 0,
+            "preloads": 0,
+            "load_time_ms": 0.0
+        }
+
+    @staticmethod
+    def _create_npu_loader(model_key: str) -> Any:
+        from models.model_loader import NPUModelLoader, default_result_cache
+        return NPUModelLoader(model_key, result_cache=default_result_cache())
+
+    def _memory_of(self, loader: Any) -> int:
+        return int(loader.model_config.get("memory_mb", self.default_memory_mb))
+
+    def _required_mb(self, model_key: str) -> int:
+        entry = self._entries.get(model_key)
+        if entry is not None:
+            return self._memory_of(entry.loader)
+        from models.model_loader import ModelConfig
+        return int(ModelConfig.MODELS.get(model_key, {}).get("memory_mb", self.default_memory_mb))
+
+    def _loaded_memory_mb(self, exclude: Optional[str] = None) -> int:
+        return sum(
+            self._memory_of(e.loader)
+            for key, e in self._entries.items()
+            if e.loader.is_loaded and key != exclude
+        )
+
+    # ==================== 获取 / 释放 ====================
+
+    def adopt(self, loader: Any):
+        """
+        将已有加载器纳入模型池（如全局单例 get_model_loader()）
+
+        Args:
+            loader: 模型加载器
+        """
+        with self._lock:
+            if loader.model_key not in self._entries:
+                self._entries[loader.model_key] = _PoolEntry(loader)
+                logger.info(f"[ModelPool] 纳入已有加载器: {loader.model_key}")
+
+    def acquire(self, model_key: str) -> Any:
+        """
+        获取已加载的模型（引用计数 +1，必要时加载并淘汰空闲模型）
+
+        Args:
+            model_key: 模型键名
+
+        Returns:
+            已加载的模型加载器
+        """
+        with self._lock:
+            entry = self._entries.get(model_key)
+            if entry is None:
+                entry = _PoolEntry(self._loader_factory(model_key))
+                self._entries[model_key] = entry
+            entry.refcount += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(model_key)
+            self.stats["acquires"] += 1
+
+        try:
+            self._ensure_loaded(model_key, entry)
+        except Exception:
+            with self._lock:
+                entry.refcount -= 1
+                if not entry.loader.is_loaded and entry.refcount == 0:
+                    self._entries.pop(model_key, None)
+            raise
+
+        return entry.loader
+
+    def release(self, model_key: str):
+        """
+        归还模型（引用计数 -1）
+
+        Args:
+            model_key: 模型键名
+        """
+        with self._lock:
+            entry = self._entries.get(model_key)
+            if entry is None or entry.refcount <= 0:
+                logger.warning(f"[ModelPool] 释放未持有的模型: {model_key}")
+                return
+            entry.refcount -= 1
+            entry.last_used = time.time()
+
+    @contextmanager
+    def lease(self, model_key: Optional[str] = None) -> Iterator[Any]:
+        """
+        以上下文管理器方式借用模型
+
+        Args:
+            model_key: 模型键名（None 表示默认模型）
+        """
+        if model_key is None:
+            from models.model_loader import ModelConfig
+            model_key = ModelConfig.DEFAULT_MODEL
+        loader = self.acquire(model_key)
+        try:
+            yield loader
+        finally:
+            self.release(model_key)
+
+    def _ensure_loaded(self, model_key: str, entry: _PoolEntry):
+        """在条目锁内加载模型，同一模型的并发加载只执行一次"""
+        with entry.load_lock:
+            if entry.loader.is_loaded:
+                with self._lock:
+                    entry.hits += 1
+                    self.stats["hits"] += 1
+                return
+
+            self._make_room(model_key, self._memory_of(entry.loader))
+            start = time.time()
+            entry.loader.load()
+            load_ms = (time.time() - start) * 1000
+            with self._lock:
+                self.stats["loads"] += 1
+                self.stats["load_time_ms"] += load_ms
+            logger.info(f"[ModelPool] 模型已加载: {model_key} ({load_ms:.0f}ms)")
+
+    def _make_room(self, model_key: str, required_mb: int):
+        """按 LRU 顺序卸载空闲模型，直到满足预算（跳过引用计数为 0 但仍在推理的模型）"""
+        busy = set()
+        with self._lock:
+            while self._loaded_memory_mb(exclude=model_key) + required_mb > self.memory_budget_mb:
+                victim = next(
+                    (key for key, e in self._entries.items()
+                     if key != model_key and key not in busy and e.refcount == 0 and e.loader.is_loaded),
+                    None
+                )
+                if victim is None:
+                    logger.warning(
+                        f"[ModelPool] 无可淘汰的空闲模型，加载 {model_key} 后将超出预算 "
+                        f"{self.memory_budget_mb}MB"
+                    )
+                    return
+                if not self._evict(victim, wait=False):
+                    busy.add(victim)
+
+    def _evict(self, model_key: str, wait: bool = True) -> bool:
+        """
+        卸载模型（保留条目，下次获取时重新加载同一加载器）
+
+        Args:
+            model_key: 模型键名
+            wait: 模型正在推理时（如未经模型池直接调用 infer）是否等待推理结束
+
+        Returns:
+            是否已卸载（wait=False 且模型正在推理时返回 False）
+        """
+        entry = self._entries[model_key]
+        try:
+            if not entry.loader.unload(wait=wait):
+                logger.info(f"[ModelPool] 模型正在推理，暂不淘汰: {model_key}")
+                return False
+        except Exception as e:
+            logger.warning(f"[ModelPool] 卸载模型失败 {model_key}: {e}")
+        self.stats["evictions"] += 1
+        logger.info(f"[ModelPool] LRU 淘汰模型: {model_key}")
+        return True
+
+    # ==================== 预加载 ====================
+
+    def preload(self, model_key: str, evict: bool = True) -> bool:
+        """
+        后台预加载模型
+
+        Args:
+            model_key: 模型键名
+            evict: 是否允许淘汰空闲模型腾出空间；为 False 时仅在预算内有空余时加载
+
+        Returns:
+            是否启动了预加载
+        """
+        with self._lock:
+            entry = self._entries.get(model_key)
+            if entry is not None and entry.loader.is_loaded:
+                return False
+            if model_key in self._preloading and self._preloading[model_key].is_alive():
+                return False
+            if not evict and self._loaded_memory_mb() + self._required_mb(model_key) > self.memory_budget_mb:
+                return False
+
+            thread = threading.Thread(
+                target=self._preload_worker, args=(model_key,),
+                name=f"model-preload-{model_key}", daemon=True
+            )
+            self._preloading[model_key] = thread
+            self.stats["preloads"] += 1
+
+        thread.start()
+        return True
+
+    def _preload_worker(self, model_key: str):
+        try:
+            self.acquire(model_key)
+            self.release(model_key)
+            logger.info(f"[ModelPool] 后台预加载完成: {model_key}")
+        except Exception as e:
+            logger.warning(f"[ModelPool] 后台预加载失败 {model_key}: {e}")
+        finally:
+            with self._lock:
+                self._preloading.pop(model_key, None)
+
+    def record_selection(self, model_key: str) -> Optional[str]:
+        """
+        记录路由选择结果：立即后台加载本次模型，并预测、预加载下一个模型
+
+        Args:
+            model_key: 本次路由选定的模型
+
+        Returns:
+            预测的下一个模型键名（无历史时为 None）
+        """
+        with self._lock:
+            self._transitions.setdefault(self._last_selected, Counter())[model_key] += 1
+            self._last_selected = model_key
+            successors = self._transitions.get(model_key)
+            predicted = successors.most_common(1)[0][0] if successors else None
+
+        self.preload(model_key)
+        if predicted is not None and predicted != model_key:
+            self.preload(predicted, evict=False)
+        return predicted
+
+    # ==================== 统计 ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取模型池状态"""
+        with self._lock:
+            models = {
+                key: {
+                    "loaded": e.loader.is_loaded,
+                    "refcount": e.refcount,
+                    "hits": e.hits,
+                    "memory_mb": self._memory_of(e.loader),
+                    "idle_seconds": round(time.time() - e.last_used, 1),
+                    "sessions": e.loader.sessions.get_stats() if getattr(e.loader, "sessions", None) else None
+                }
+                for key, e in self._entries.items()
+            }
+            return {
+                "memory_budget_mb": self.memory_budget_mb,
+                "loaded_memory_mb": self._loaded_memory_mb(),
+                "lru_order": list(self._entries.keys()),
+                "models": models,
+                "preloading": [k for k, t in self._preloading.items() if t.is_alive()],
+                **self.stats
+            }
+
+    def reset_session(self, session_id: Optional[str] = None):
+        """
+        结束各常驻模型上的对话会话（会等待正在执行的推理完成）
+
+        Args:
+            session_id: 会话标识（None 表示清空所有会话和模板快照）
+        """
+        with self._lock:
+            loaders = [e.loader for e in self._entries.values()]
+        for loader in loaders:
+            if hasattr(loader, "reset_session"):
+                loader.reset_session(session_id)
+
+    def shutdown(self):
+        """卸载池中全部模型"""
+        with self._lock:
+            for key in list(self._entries.keys()):
+                self._evict(key)
+
+
+# 全局模型池（单例模式）
+_global_model_pool: Optional[ModelPool] = None
+_global_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """
+    获取全局模型池（单例模式，默认模型复用 get_model_loader() 单例）
+
+    Returns:
+        模型池实例
+    """
+    global _global_model_pool
+
+    with _global_pool_lock:
+        if _global_model_pool is None:
+            from config import settings
+            from models.model_loader import get_model_loader
+
+            _global_model_pool = ModelPool(settings.MODEL_POOL_MEMORY_BUDGET_MB)
+            _global_model_pool.adopt(get_model_loader())
+
+    return _global_model_pool
+
+
+def shutdown_model_pool():
+    """卸载全局模型池中的全部模型（应用关闭时调用）"""
+    global _global_model_pool
+
+    with _global_pool_lock:
+        if _global_model_pool is not None:
+            _global_model_pool.shutdown()
+            _global_model_pool = None
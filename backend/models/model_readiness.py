@@ -0,0 +1,198 @@
+"""
+模型就绪状态
+
+启动时在后台线程中加载默认模型并执行预热查询，进程启动后立即接受请求：
+
+- 状态：idle（未自动加载，首次使用时按需加载）→ loading → warming → ready / failed
+- 依赖模型的路由在 loading / warming / failed 状态下返回 503 + Retry-After
+- 加载失败后，经过重试间隔的下一次检查会在后台重新加载
+"""
+import logging
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 预热查询：覆盖短提示与带模板的提示，触发 NPU 图初始化与内存分配
+DEFAULT_WARMUP_PROMPTS = [
+    "你好",
+    "请用一句话总结：本季度销售额环比增长12%。"
+]
+
+
+class ModelState(str, Enum):
+    """模型加载状态"""
+    IDLE = "idle"
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class ModelReadiness:
+    """后台加载默认模型并跟踪就绪状态"""
+
+    def __init__(
+        self,
+        lease_loader: Callable[[Optional[str]], ContextManager[Any]],
+        model_key: Optional[str] = None,
+        warmup_prompts: Optional[List[str]] = None,
+        warmup_max_new_tokens: int = 8,
+        retry_after_s: int = 5,
+        failed_retry_s: int = 30
+    ):
+        """
+        初始化就绪状态
+
+        Args:
+            lease_loader: 按模型键名借用加载器的上下文管理器（如 ModelPool.lease）
+            model_key: 启动时加载的模型（None 表示默认模型）
+            warmup_prompts: 加载后执行的预热查询（空列表表示不预热）
+            warmup_max_new_tokens: 每条预热查询生成的 token 数
+            retry_after_s: 加载中返回给客户端的 Retry-After（秒）
+            failed_retry_s: 加载失败后重新加载的间隔（秒），同时作为失败时的 Retry-After
+        """
+        self.lease_loader = lease_loader
+        self.model_key = model_key
+        self.warmup_prompts = DEFAULT_WARMUP_PROMPTS if warmup_prompts is None else list(warmup_prompts)
+        self.warmup_max_new_tokens = warmup_max_new_tokens
+        self.retry_after_s = retry_after_s
+        self.failed_retry_s = failed_retry_s
+
+        self.state = ModelState.IDLE
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.load_time_ms: Optional[float] = None
+        self.warmup_time_ms: Optional[float] = None
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def start(self) -> bool:
+        """
+        在后台线程中开始加载（已在加载或已就绪时不重复启动）
+
+        Returns:
+            是否启动了新的加载
+        """
+        with self._lock:
+            if self.state in (ModelState.LOADING, ModelState.WARMING, ModelState.READY):
+                return False
+            self.state = ModelState.LOADING
+            self.error = None
+            self.attempts += 1
+            self.started_at = time.time()
+            self.finished_at = None
+            self._done.clear()
+            self._thread = threading.Thread(target=self._run, name="model-startup-load", daemon=True)
+            self._thread.start()
+        logger.info(f"[ModelReadiness] 开始后台加载模型 (第 {self.attempts} 次)")
+        return True
+
+    def _run(self):
+        try:
+            with self.lease_loader(self.model_key) as loader:
+                load_start = time.time()
+                if not loader.is_loaded:
+                    loader.load()
+                self.load_time_ms = (time.time() - load_start) * 1000
+
+                with self._lock:
+                    self.state = ModelState.WARMING
+                warmup_start = time.time()
+                for prompt in self.warmup_prompts:
+                    loader.infer(prompt, max_new_tokens=self.warmup_max_new_tokens, temperature=0.0, use_cache=False)
+                self.warmup_time_ms = (time.time() - warmup_start) * 1000
+
+            with self._lock:
+                self.state = ModelState.READY
+                self.finished_at = time.time()
+            logger.info(
+                f"[ModelReadiness] 模型已就绪 (加载 {self.load_time_ms:.0f}ms, "
+                f"预热 {len(self.warmup_prompts)} 条 {self.warmup_time_ms:.0f}ms)"
+            )
+        except Exception as e:
+            with self._lock:
+                self.state = ModelState.FAILED
+                self.error = str(e)
+                self.finished_at = time.time()
+            logger.error(f"[ModelReadiness] 后台加载模型失败: {e}")
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待当前加载结束（用于测试和命令行工具）"""
+        return self._done.wait(timeout)
+
+    def check(self) -> Optional[Tuple[int, str]]:
+        """
+        检查依赖模型的请求能否执行
+
+        Returns:
+            None 表示可以执行；否则返回 (Retry-After 秒数, 原因)
+        """
+        with self._lock:
+            state = self.state
+            finished_at = self.finished_at
+
+        if state in (ModelState.READY, ModelState.IDLE):
+            return None
+        if state == ModelState.FAILED:
+            if finished_at is not None and time.time() - finished_at >= self.failed_retry_s:
+                self.start()
+                return self.retry_after_s, "模型加载失败，正在重新加载"
+            return self.failed_retry_s, f"模型加载失败: {self.error}"
+        return self.retry_after_s, "模型正在加载" if state == ModelState.LOADING else "模型正在预热"
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == ModelState.READY
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取就绪状态"""
+        now = time.time()
+        with self._lock:
+            return {
+                "state": self.state.value,
+                "model_key": self.model_key,
+                "error": self.error,
+                "attempts": self.attempts,
+                "elapsed_s": round(((self.finished_at or now) - self.started_at), 2) if self.started_at else None,
+                "load_time_ms": round(self.load_time_ms, 2) if self.load_time_ms is not None else None,
+                "warmup_time_ms": round(self.warmup_time_ms, 2) if self.warmup_time_ms is not None else None,
+                "warmup_prompts": len(self.warmup_prompts)
+            }
+
+
+# 全局就绪状态（单例模式）
+_global_model_readiness: Optional[ModelReadiness] = None
+_global_readiness_lock = threading.Lock()
+
+
+def get_model_readiness() -> ModelReadiness:
+    """
+    获取全局模型就绪状态（默认模型通过全局模型池加载）
+
+    Returns:
+        就绪状态实例
+    """
+    global _global_model_readiness
+
+    with _global_readiness_lock:
+        if _global_model_readiness is None:
+            from config import settings
+            from models.model_pool import get_model_pool
+
+            _global_model_readiness = ModelReadiness(
+                get_model_pool().lease,
+                warmup_prompts=DEFAULT_WARMUP_PROMPTS[:settings.MODEL_WARMUP_QUERIES],
+                retry_after_s=settings.MODEL_LOADING_RETRY_AFTER_S,
+                failed_retry_s=settings.MODEL_LOAD_FAILED_RETRY_S
+            )
+
+    return _global_model_readiness
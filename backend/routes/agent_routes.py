@@ -3,7 +3,7 @@
 提供完整的 Agent 协作 API
 """
 import logging
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -20,12 +20,24 @@ from agents import (
     ActionAdvisorAgent,
     MessengerAgent
 )
-from models.model_loader import get_model_loader
+from models.inference_worker import (
+    get_inference_worker,
+    InferencePriority,
+    QueueFullError,
+    JobCancelledError
+)
 from config import settings
+from routes.pagination import invalid_page_request, page_response
+from routes.readiness import require_model_ready
+from services.async_db import get_async_database
+from services.knowledge_repository import KnowledgeRepository
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/agent", tags=["8-Agent系统"])
 
+# 知识卡片仓库（查询在数据库线程池中执行，不阻塞事件循环）
+card_repository = KnowledgeRepository(get_async_database(settings.DB_PATH))
+
 # 全局 Agent 实例
 _orchestrator: Optional[OrchestratorAgent] = None
 _memory: Optional[MemoryAgent] = None
@@ -142,8 +154,8 @@ async def get_agent_status():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/analyze", response_model=AnalysisReport)
-async def analyze_with_agents(request: AgentTaskRequest):
+@router.post("/analyze", response_model=AnalysisReport, dependencies=[Depends(require_model_ready)])
+async def analyze_with_agents(request: AgentTaskRequest, http_request: Request):
     """
     使用 8-Agent 系统进行数据分析
     
@@ -163,13 +175,8 @@ async def analyze_with_agents(request: AgentTaskRequest):
         # 更新状态
         agent_status["orchestrator"] = "executing"
         
-        # 使用 NPU 模型进行推理
-        loader = get_model_loader()
-        if not loader.is_loaded:
-            loader.load()
-        
-        # 执行推理
-        inference_result = loader.infer(
+        # 执行推理（提交到推理工作线程，不阻塞事件循环）
+        inference_result = await get_inference_worker().submit(
             prompt=f"""
 你是Antinet系统的锦衣卫总指挥使，负责协调8个专业Agent完成数据分析任务。
 
@@ -191,7 +198,9 @@ async def analyze_with_agents(request: AgentTaskRequest):
 }}
 """,
             max_new_tokens=1024,
-            temperature=0.7
+            temperature=0.7,
+            priority=InferencePriority.BATCH,
+            is_disconnected=http_request.is_disconnected
         )
         
         # 解析结果
@@ -275,6 +284,14 @@ async def analyze_with_agents(request: AgentTaskRequest):
         logger.info(f"[AgentSystem] 分析完成: {len(cards)} 张卡片")
         return report
         
+    except QueueFullError as e:
+        logger.warning(f"[AgentSystem] 推理队列已满: {e}")
+        agent_status["orchestrator"] = "idle"
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except JobCancelledError as e:
+        logger.info(f"[AgentSystem] 分析已取消: {e}")
+        agent_status["orchestrator"] = "idle"
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f"[AgentSystem] 分析失败: {e}", exc_info=True)
         agent_status["orchestrator"] = "failed"
@@ -339,41 +356,44 @@ async def retrieve_knowledge(knowledge_type: str, query: str, limit: int = 10):
 
 
 @router.get("/cards")
-async def get_all_cards():
-    """获取所有四色卡片（整合现有知识库）"""
+async def get_all_cards(
+    request: Request,
+    card_type: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    按创建时间倒序获取四色卡片（整合现有知识库，传 limit 或 cursor 时分页）
+
+    参数：
+        card_type: 卡片颜色过滤
+        limit: 每页数量（与 cursor 都不传时返回全部卡片，最多 5000 张）
+        cursor: 翻页游标（上一页返回的 next_cursor）
+        fields: 逗号分隔的返回字段（如 title,card_type,category，列表视图可不取正文）
+    """
     try:
-        # 从数据库读取卡片
-        from database import DatabaseManager
-        db = DatabaseManager(settings.DB_PATH)
-        
-        # 获取所有卡片
-        cursor = db.conn.execute("""
-            SELECT * FROM knowledge_cards
-            ORDER BY created_at DESC
-            LIMIT 100
-        """)
-        rows = cursor.fetchall()
-        
-        cards = []
-        for row in rows:
-            cards.append(FourColorCard(
-                card_id=row['card_id'],
-                card_type=row['card_type'],
-                title=row['title'],
-                content=row['content'],
-                category=row.get('category', '未知'),
-                similarity=row.get('similarity'),
-                created_at=row['created_at']
-            ))
-        
-        return {
-            "cards": cards,
-            "total": len(cards)
-        }
+        page = await card_repository.list_page(card_type, cursor=cursor, limit=limit, fields=fields)
+    except ValueError as e:
+        raise invalid_page_request(e)
     except Exception as e:
         logger.error(f"获取卡片失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    cards = []
+    for row in page["items"]:
+        card = {"card_id": f"db_{row['id']}"}
+        card.update({name: value for name, value in row.items() if name != "id"})
+        if "category" in card:
+            card["category"] = card["category"] or "未知"
+        cards.append(card)
+
+    return page_response(request, page, {
+        "cards": cards,
+        "total": len(cards),
+        "next_cursor": page["next_cursor"]
+    })
+
 
 @router.post("/cards")
 async def create_card(card_data: Dict[str, Any]):
@@ -402,23 +422,23 @@ async def create_card(card_data: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/chat")
-async def chat_with_agent(query: str, context: Optional[Dict[str, Any]] = None):
+@router.post("/chat", dependencies=[Depends(require_model_ready)])
+async def chat_with_agent(
+    query: str,
+    context: Optional[Dict[str, Any]] = None,
+    session_id: Optional[str] = None
+):
     """
     使用 8-Agent 系统进行对话
     
     参数：
         query: 用户问题
         context: 对话上下文
+        session_id: 多轮对话会话标识（同一会话的后续问题只预填充新一轮输入）
     """
     try:
         await ensure_agents_initialized()
         
-        # 使用 NPU 进行推理
-        loader = get_model_loader()
-        if not loader.is_loaded:
-            loader.load()
-        
         # 构建提示
         prompt = f"""
 你是Antinet智能知识管家的AI助手。
@@ -428,11 +448,13 @@ async def chat_with_agent(query: str, context: Optional[Dict[str, Any]] = None):
 请提供专业、有用的回答。
 """
         
-        # 执行推理
-        response = loader.infer(
+        # 执行推理（交互式对话优先执行）
+        response = await get_inference_worker().submit(
             prompt=prompt,
             max_new_tokens=512,
-            temperature=0.7
+            temperature=0.7,
+            priority=InferencePriority.INTERACTIVE,
+            session_id=session_id
         )
         
         # 返回结果
@@ -441,6 +463,9 @@ async def chat_with_agent(query: str, context: Optional[Dict[str, Any]] = None):
             "sources": [],
             "cards": []
         }
+    except QueueFullError as e:
+        logger.warning(f"推理队列已满: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"对话失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -454,14 +479,14 @@ async def get_system_stats():
         db = DatabaseManager(settings.DB_PATH)
         
         # 统计各类型卡片数量
-        cursor = db.conn.execute("""
-            SELECT type, COUNT(*) as count
-            FROM knowledge_cards
-            GROUP BY type
-        """)
-        rows = cursor.fetchall()
-
-        card_stats = {row['type']: row['count'] for row in rows}
+        with db.get_connection() as conn:
+            rows = conn.execute("""
+                SELECT card_type, COUNT(*) as count
+                FROM knowledge_cards
+                GROUP BY card_type
+            """).fetchall()
+
+        card_stats = {row['card_type']: row['count'] for row in rows}
         
         return {
             "total_cards": sum(card_stats.values()),
@@ -1,13 +1,20 @@
 #!/usr/bin/env python3
 # backend/routes/chat_routes.py - 知识库聊天路由
 """
-提供知识库查询和对话机器人功能（简化版，不依赖向量检索）
+提供知识库查询和对话机器人功能（查询接口使用混合检索：卡片全文 + 记忆库/案例向量，RRF 融合）
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import logging
 
+from routes.pagination import invalid_page_request, page_response
+from services.async_db import get_async_database
+from services.hybrid_search import get_hybrid_retriever
+from services.knowledge_repository import KnowledgeRepository, card_color
+from services.pagination import DEFAULT_PAGE_SIZE
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/chat", tags=["聊天机器人"])
@@ -27,6 +34,8 @@ class ChatRequest(BaseModel):
     query: str = Field(..., description="用户查询")
     conversation_history: List[ChatMessage] = Field(default_factory=list, description="对话历史")
     context: Dict[str, Any] = Field(default_factory=dict, description="上下文信息")
+    stream: bool = Field(False, description="是否使用 NPU 生成回答并以 SSE 逐 token 返回")
+    session_id: Optional[str] = Field(None, description="多轮对话会话标识（流式模式下复用已预填充的对话历史）")
 
 
 class CardSource(BaseModel):
@@ -58,60 +67,49 @@ class CardSearchResponse(BaseModel):
     total: int = 0
 
 
-def _search_cards_by_keyword(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+def _get_repository() -> Optional[KnowledgeRepository]:
+    """知识卡片仓库（查询在数据库线程池中执行），数据库管理器未初始化时返回 None"""
+    if db_manager is None:
+        return None
+    return KnowledgeRepository(get_async_database(db_manager.db_path))
+
+
+async def _search_cards_by_keyword(query: str, limit: int = 10, card_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    使用关键词搜索数据库中的知识卡片
+    使用全文索引搜索数据库中的知识卡片（结果经检索缓存，卡片写入后自动失效）
 
     参数：
         query: 查询关键词
         limit: 返回数量限制
+        card_type: 卡片类型过滤
 
     返回：
         匹配的卡片列表
     """
-    global db_manager
-    if db_manager is None:
+    repository = _get_repository()
+    if repository is None:
         logger.error("数据库管理器未初始化")
         return []
 
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        # FTS5 全文索引检索，按 BM25 相关度排序
+        rows = await repository.search(query, limit=limit, card_type=card_type)
 
-        # 使用 SQL LIKE 进行模糊匹配
-        query_lower = query.lower()
-        print(f"[DEBUG] 搜索关键词: {query_lower}")
-        
-        sql = """
-            SELECT id, title, content, card_type, category, created_at
-            FROM knowledge_cards
-            WHERE LOWER(title) LIKE ? OR LOWER(content) LIKE ?
-            ORDER BY id DESC
-            LIMIT ?
-        """
-        params = (f"%{query_lower}%", f"%{query_lower}%", limit)
-        print(f"[DEBUG] SQL: {sql}")
-        print(f"[DEBUG] 参数: {params}")
-        
-        cursor.execute(sql, params)
-
-        rows = cursor.fetchall()
         cards = []
-
         for row in rows:
             cards.append({
-                "card_id": f"db_{row[0]}",
-                "id": row[0],
-                "title": row[1],
+                "card_id": f"db_{row['id']}",
+                "id": row["id"],
+                "title": row["title"],
                 "content": {
-                    "description": row[2]
+                    "description": row["content"]
                 },
-                "card_type": row[3] if row[3] else "blue",
-                "category": row[4],
-                "similarity": 0.8  # 简单相似度评分
+                "card_type": card_color(row),
+                "category": row.get("category"),
+                "similarity": row["similarity"],
+                "snippet": row["snippet"]
             })
 
-        conn.close()
         return cards
 
     except Exception as e:
@@ -119,6 +117,45 @@ def _search_cards_by_keyword(query: str, limit: int = 10) -> List[Dict[str, Any]
         return []
 
 
+async def _search_cards_hybrid(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    使用混合检索获取知识卡片（失败时退回全文检索）
+
+    参数：
+        query: 查询文本
+        limit: 返回数量限制
+
+    返回：
+        与 _search_cards_by_keyword 格式一致的卡片列表（另含 source、rrf_score）
+    """
+    try:
+        result = await get_hybrid_retriever().search(query, limit=limit)
+    except Exception as e:
+        logger.error(f"混合检索失败，退回全文检索: {e}", exc_info=True)
+        return await _search_cards_by_keyword(query, limit=limit)
+
+    cards = []
+    for item in result["results"]:
+        card_id = f"db_{item['source_id']}" if item["source"] == "cards" else f"{item['source']}_{item['source_id']}"
+        cards.append({
+            "card_id": card_id,
+            "id": item["source_id"],
+            "title": item["title"],
+            "content": {
+                "description": item["body"]
+            },
+            "card_type": item.get("card_type") or "blue",
+            "category": item.get("category"),
+            "similarity": item["similarity"],
+            "snippet": item.get("snippet"),
+            "source": item["source"],
+            "rrf_score": item["rrf_score"]
+        })
+
+    logger.info(f"[ChatRoutes] 混合检索耗时: {result['timings']}")
+    return cards
+
+
 def _generate_response(query: str, relevant_cards: List[Dict]) -> str:
     """
     生成回复（基于检索到的卡片）
@@ -190,6 +227,35 @@ def _generate_response(query: str, relevant_cards: List[Dict]) -> str:
         return "抱歉，生成回复时出现了错误。"
 
 
+def _build_chat_prompt(query: str, relevant_cards: List[Dict], history: List[ChatMessage]) -> str:
+    """
+    构建基于知识卡片的 NPU 对话提示词
+
+    参数：
+        query: 用户查询
+        relevant_cards: 相关卡片
+        history: 对话历史
+
+    返回：
+        提示词
+    """
+    knowledge_lines = []
+    for card in relevant_cards[:5]:
+        content = card.get("content", {})
+        desc = content.get("description", "") if isinstance(content, dict) else str(content)
+        knowledge_lines.append(f"- [{card.get('card_type', 'blue')}] {card.get('title', '无标题')}: {desc[:200]}")
+
+    history_lines = [f"{m.role}: {m.content}" for m in history[-4:]]
+
+    prompt_parts = ["你是Antinet智能知识管家的AI助手，请基于知识库内容回答用户问题。"]
+    if knowledge_lines:
+        prompt_parts.append("知识库相关卡片：\n" + "\n".join(knowledge_lines))
+    if history_lines:
+        prompt_parts.append("对话历史：\n" + "\n".join(history_lines))
+    prompt_parts.append(f"用户问题：{query}")
+    return "\n\n".join(prompt_parts)
+
+
 def _generate_suggested_questions(query: str, relevant_cards: List[Dict]) -> List[str]:
     """
     根据查询和相关卡片生成推荐问题
@@ -309,13 +375,15 @@ async def chat_query(request: ChatRequest):
     """
     知识库查询接口
 
-    接收用户查询，返回基于知识库的回复
+    接收用户查询，返回基于知识库的回复。
+    stream=true 时使用 NPU 生成回答，以 text/event-stream 返回：
+    start 事件（来源卡片与推荐问题）→ token 事件 → done 事件（完整回答与延迟指标）
     """
     logger.info(f"[ChatRoutes] 收到查询: {request.query}")
 
     try:
-        # 使用关键词搜索预设的知识卡片
-        cards = _search_cards_by_keyword(request.query, limit=10)
+        # 混合检索知识卡片、记忆库与历史案例
+        cards = await _search_cards_hybrid(request.query, limit=10)
         print(f"[DEBUG] 搜索到 {len(cards)} 张卡片")
         
         if cards:
@@ -323,6 +391,9 @@ async def chat_query(request: ChatRequest):
         else:
             print(f"[DEBUG] 没有找到卡片，查询词: {request.query}")
 
+        if request.stream:
+            return _stream_chat_response(request, cards)
+
         # 生成回复
         response = _generate_response(request.query, cards)
         print(f"[DEBUG] 生成回复长度: {len(response)}")
@@ -349,11 +420,68 @@ async def chat_query(request: ChatRequest):
         logger.info(f"[ChatRoutes] 查询完成: {len(cards)}条相关卡片, {len(suggested_questions)}个推荐问题")
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[ChatRoutes] 查询失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _stream_chat_response(request: ChatRequest, cards: List[Dict[str, Any]]) -> StreamingResponse:
+    """
+    使用 NPU 流式生成基于知识卡片的回答
+
+    参数：
+        request: 聊天请求
+        cards: 检索到的相关卡片
+
+    返回：
+        SSE 流式响应
+    """
+    from models.inference_worker import get_inference_worker, InferencePriority, QueueFullError
+    from routes.streaming import SSE_HEADERS, sse_token_events
+    from routes.readiness import model_not_ready_error
+
+    not_ready = model_not_ready_error()
+    if not_ready is not None:
+        raise not_ready
+
+    # 会话模式下历史轮次已驻留在对话中，提示只包含本轮内容
+    history = [] if request.session_id else request.conversation_history
+
+    try:
+        token_stream = get_inference_worker().stream(
+            prompt=_build_chat_prompt(request.query, cards, history),
+            max_new_tokens=512,
+            temperature=0.7,
+            priority=InferencePriority.INTERACTIVE,
+            session_id=request.session_id
+        )
+    except QueueFullError as e:
+        logger.warning(f"[ChatRoutes] 推理队列已满: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    start = {
+        "sources": [
+            {
+                "card_id": card["card_id"],
+                "card_type": card["card_type"],
+                "title": card["title"],
+                "similarity": card.get("similarity", 0.8)
+            }
+            for card in cards[:5]
+        ],
+        "cards": cards[:10],
+        "suggested_questions": _generate_suggested_questions(request.query, cards)
+    }
+
+    return StreamingResponse(
+        sse_token_events(token_stream, start=start, build_done=lambda text: {"response": text}),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
 @router.post("/search", response_model=CardSearchResponse)
 async def search_cards(request: CardSearchRequest):
     """
@@ -364,12 +492,8 @@ async def search_cards(request: CardSearchRequest):
     logger.info(f"[ChatRoutes] 搜索卡片: {request.query} (类型: {request.card_type})")
 
     try:
-        # 使用关键词搜索
-        cards = _search_cards_by_keyword(request.query, limit=request.limit)
-
-        # 如果指定了卡片类型，进行过滤
-        if request.card_type:
-            cards = [c for c in cards if c.get("card_type") == request.card_type]
+        # 使用关键词搜索（指定卡片类型时一并过滤）
+        cards = await _search_cards_by_keyword(request.query, limit=request.limit, card_type=request.card_type)
 
         result = CardSearchResponse(
             cards=cards,
@@ -386,72 +510,57 @@ async def search_cards(request: CardSearchRequest):
 
 @router.get("/cards")
 async def list_cards(
+    request: Request,
     card_type: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
-    列出知识卡片
+    按创建时间倒序分页列出知识卡片
 
     参数：
         card_type: 卡片类型过滤（可选）
-        limit: 返回数量限制（默认50）
-        offset: 偏移量（默认0）
+        limit: 每页数量（默认50）
+        offset: 偏移量（兼容旧客户端，提供 cursor 时忽略）
+        cursor: 翻页游标（上一页返回的 next_cursor）
+        fields: 逗号分隔的返回字段（如 title,card_type,category，列表视图可不取正文）
+
+    返回：
+        cards、next_cursor；total 仅在第一页（未提供 cursor）时统计
     """
-    global db_manager
     logger.info(f"[ChatRoutes] 列出卡片 (类型: {card_type}, 限制: {limit})")
 
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-
-        # 构建查询
-        if card_type:
-            cursor.execute("""
-                SELECT id, title, content, card_type, category, created_at
-                FROM knowledge_cards
-                WHERE card_type = ?
-                ORDER BY id DESC
-                LIMIT ? OFFSET ?
-            """, (card_type, limit, offset))
-        else:
-            cursor.execute("""
-                SELECT id, title, content, card_type, category, created_at
-                FROM knowledge_cards
-                ORDER BY id DESC
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
-
-        rows = cursor.fetchall()
-        cards = []
-
-        for row in rows:
-            cards.append({
-                "card_id": f"db_{row[0]}",
-                "id": row[0],
-                "title": row[1],
-                "content": {
-                    "description": row[2]
-                },
-                "card_type": row[3] if row[3] else "blue",
-                "category": row[4],
-                "similarity": 0.8
-            })
-
-        # 获取总数
-        if card_type:
-            cursor.execute("SELECT COUNT(*) FROM knowledge_cards WHERE card_type = ?", (card_type,))
-        else:
-            cursor.execute("SELECT COUNT(*) FROM knowledge_cards")
-        total = cursor.fetchone()[0]
+        repository = _get_repository()
+        if repository is None:
+            raise RuntimeError("数据库管理器未初始化")
+        page = await repository.list_page(card_type, cursor=cursor, limit=limit, fields=fields, offset=offset)
+        total = None if cursor else await repository.count(card_type)
 
-        conn.close()
-
-        return {
+        cards = []
+        for row in page["items"]:
+            card = {"card_id": f"db_{row['id']}", "id": row["id"]}
+            if "title" in row:
+                card["title"] = row["title"]
+            if "content" in row:
+                card["content"] = {"description": row["content"]}
+            if "card_type" in row:
+                card["card_type"] = card_color(row)
+            if "category" in row:
+                card["category"] = row["category"]
+            card["similarity"] = 0.8
+            cards.append(card)
+
+        return page_response(request, page, {
             "cards": cards,
-            "total": total
-        }
+            "total": total,
+            "next_cursor": page["next_cursor"]
+        })
 
+    except ValueError as e:
+        raise invalid_page_request(e)
     except Exception as e:
         logger.error(f"[ChatRoutes] 列出卡片失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -468,7 +577,6 @@ async def get_card(card_id: str):
     返回：
         卡片详情
     """
-    global db_manager
     logger.info(f"[ChatRoutes] 获取卡片: {card_id}")
 
     try:
@@ -478,17 +586,10 @@ async def get_card(card_id: str):
         else:
             db_id = int(card_id)
 
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT id, type, title, content, source, category, created_at
-            FROM knowledge_cards
-            WHERE id = ?
-        """, (db_id,))
-
-        row = cursor.fetchone()
-        conn.close()
+        repository = _get_repository()
+        if repository is None:
+            raise RuntimeError("数据库管理器未初始化")
+        row = await repository.get_card(db_id)
 
         if not row:
             raise HTTPException(
@@ -497,15 +598,15 @@ async def get_card(card_id: str):
             )
 
         return {
-            "card_id": f"db_{row[0]}",
-            "id": row[0],
-            "card_type": row[1] if row[1] else "blue",  # 修正：type 在第2列
-            "title": row[2],
+            "card_id": f"db_{row['id']}",
+            "id": row["id"],
+            "card_type": card_color(row),
+            "title": row["title"],
             "content": {
-                "description": row[3]
+                "description": row["content"]
             },
-            "source": row[4],
-            "category": row[5],  # 修正：category 在第6列
+            "source": row.get("source"),
+            "category": row.get("category"),
             "similarity": 0.8
         }
 
@@ -531,7 +632,7 @@ async def health_check():
         return {
             "status": "healthy",
             "database_initialized": True,
-            "search_type": "keyword_match"  # 使用关键词匹配而非向量检索
+            "search_type": "hybrid_rrf"  # 全文检索与向量检索按 RRF 融合
         }
     except Exception as e:
         logger.error(f"[ChatRoutes] 健康检查失败: {e}", exc_info=True)
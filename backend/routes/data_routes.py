@@ -2,11 +2,14 @@
 """
 提供团队成员、知识空间、协作活动等数据的CRUD接口
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, List, Optional
 import logging
 
+from routes.pagination import invalid_page_request, page_response
+from services.async_db import get_async_database
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/data", tags=["数据管理"])
@@ -94,13 +97,18 @@ def get_db_manager():
     return _db_manager
 
 
+async def _call(method: Callable, *args, **kwargs) -> Any:
+    """在数据库线程池中执行数据库管理器的方法，不阻塞事件循环"""
+    return await get_async_database(get_db_manager().db_path).call(method, *args, **kwargs)
+
+
 # ========== 团队成员API ==========
 @router.get("/team-members", response_model=List[TeamMember])
 async def get_team_members():
     """获取所有团队成员"""
     try:
         db = get_db_manager()
-        members = db.get_all_team_members()
+        members = await _call(db.get_all_team_members)
         return members
     except Exception as e:
         logger.error(f"获取团队成员失败: {e}")
@@ -112,7 +120,8 @@ async def add_team_member(member: TeamMember):
     """添加团队成员"""
     try:
         db = get_db_manager()
-        new_member = db.add_team_member(
+        new_member = await _call(
+            db.add_team_member,
             name=member.name,
             role=member.role,
             avatar=member.avatar,
@@ -130,7 +139,8 @@ async def update_team_member(member_id: int, member: TeamMember):
     """更新团队成员信息"""
     try:
         db = get_db_manager()
-        success = db.update_team_member(
+        success = await _call(
+            db.update_team_member,
             member_id,
             name=member.name,
             role=member.role,
@@ -153,7 +163,7 @@ async def delete_team_member(member_id: int):
     """删除团队成员"""
     try:
         db = get_db_manager()
-        success = db.delete_team_member(member_id)
+        success = await _call(db.delete_team_member, member_id)
         if not success:
             raise HTTPException(status_code=404, detail="成员不存在")
         return {"success": True, "message": "删除成功"}
@@ -170,7 +180,7 @@ async def get_knowledge_spaces():
     """获取所有知识空间"""
     try:
         db = get_db_manager()
-        spaces = db.get_all_knowledge_spaces()
+        spaces = await _call(db.get_all_knowledge_spaces)
         return spaces
     except Exception as e:
         logger.error(f"获取知识空间失败: {e}")
@@ -182,7 +192,8 @@ async def add_knowledge_space(space: KnowledgeSpace):
     """添加知识空间"""
     try:
         db = get_db_manager()
-        new_space = db.add_knowledge_space(
+        new_space = await _call(
+            db.add_knowledge_space,
             name=space.name,
             description=space.description,
             owner=space.owner,
@@ -201,7 +212,7 @@ async def get_activities(limit: int = 20):
     """获取最近的协作活动"""
     try:
         db = get_db_manager()
-        activities = db.get_recent_activities(limit)
+        activities = await _call(db.get_recent_activities, limit)
         # 转换为字典列表，确保可以序列化
         result = []
         for activity in activities:
@@ -221,7 +232,8 @@ async def add_activity(activity: Activity):
     """添加协作活动"""
     try:
         db = get_db_manager()
-        new_activity = db.add_activity(
+        new_activity = await _call(
+            db.add_activity,
             user_name=activity.user_name,
             action=activity.action,
             content=activity.content,
@@ -240,7 +252,7 @@ async def get_comments(target_id: int, target_type: str = "space"):
     """获取评论"""
     try:
         db = get_db_manager()
-        comments = db.get_comments(target_id, target_type)
+        comments = await _call(db.get_comments, target_id, target_type)
         return comments
     except Exception as e:
         logger.error(f"获取评论失败: {e}")
@@ -252,7 +264,8 @@ async def add_comment(comment: Comment):
     """添加评论"""
     try:
         db = get_db_manager()
-        new_comment = db.add_comment(
+        new_comment = await _call(
+            db.add_comment,
             user_name=comment.user_name,
             user_avatar=comment.user_avatar,
             content=comment.content,
@@ -272,7 +285,7 @@ async def get_analytics_data(category: str):
     """获取分析数据"""
     try:
         db = get_db_manager()
-        data = db.get_analytics_data(category)
+        data = await _call(db.get_analytics_data, category)
         if not data:
             return {"category": category, "data": []}
         return data
@@ -286,7 +299,7 @@ async def update_analytics_data(category: str, data: Dict[str, Any]):
     """更新分析数据"""
     try:
         db = get_db_manager()
-        updated = db.update_analytics_data(category, data)
+        updated = await _call(db.update_analytics_data, category, data)
         return updated
     except Exception as e:
         logger.error(f"更新分析数据失败: {e}")
@@ -299,7 +312,7 @@ async def get_checklist_data():
     """获取检查清单数据"""
     try:
         db = get_db_manager()
-        data = db.get_checklist_data()
+        data = await _call(db.get_checklist_data)
         if not data:
             return {"data": []}
         return data
@@ -313,7 +326,7 @@ async def update_checklist_data(data_json: str):
     """更新检查清单数据"""
     try:
         db = get_db_manager()
-        updated = db.update_checklist_data(data_json)
+        updated = await _call(db.update_checklist_data, data_json)
         return updated
     except Exception as e:
         logger.error(f"更新检查清单失败: {e}")
@@ -322,12 +335,20 @@ async def update_checklist_data(data_json: str):
 
 # ========== GTD任务API ==========
 @router.get("/gtd-tasks")
-async def get_gtd_tasks(category: Optional[str] = None):
-    """获取GTD任务"""
+async def get_gtd_tasks(
+    request: Request,
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None
+):
+    """按创建时间倒序获取GTD任务（传 limit 或 cursor 时分页，下一页游标见响应头 X-Next-Cursor；都不传时返回全部任务，最多 5000 条）"""
     try:
         db = get_db_manager()
-        tasks = db.get_gtd_tasks(category)
-        return tasks
+        page = await _call(db.get_gtd_tasks_page, category, cursor, limit, fields)
+        return page_response(request, page)
+    except ValueError as e:
+        raise invalid_page_request(e)
     except Exception as e:
         logger.error(f"获取GTD任务失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -338,7 +359,8 @@ async def add_gtd_task(task: GtdTask):
     """添加GTD任务"""
     try:
         db = get_db_manager()
-        new_task = db.add_gtd_task(
+        new_task = await _call(
+            db.add_gtd_task,
             title=task.title,
             description=task.description,
             priority=task.priority,
@@ -356,7 +378,7 @@ async def update_gtd_task(task_id: int, task: Dict[str, Any]):
     """更新GTD任务"""
     try:
         db = get_db_manager()
-        updated = db.update_gtd_task(task_id, **task)
+        updated = await _call(db.update_gtd_task, task_id, **task)
         return {"success": updated}
     except Exception as e:
         logger.error(f"更新GTD任务失败: {e}")
@@ -368,7 +390,7 @@ async def delete_gtd_task(task_id: int):
     """删除GTD任务"""
     try:
         db = get_db_manager()
-        deleted = db.delete_gtd_task(task_id)
+        deleted = await _call(db.delete_gtd_task, task_id)
         return {"success": deleted}
     except Exception as e:
         logger.error(f"删除GTD任务失败: {e}")
@@ -3,13 +3,16 @@ GTD 任务管理 API 路由
 提供 GTD (Getting Things Done) 任务管理功能
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
-import sqlite3
 from pathlib import Path
 
+from routes.pagination import invalid_page_request, page_response
+from services.async_db import get_async_database
+from services.gtd_repository import GTDRepository
+
 router = APIRouter(prefix="/api/data/gtd", tags=["GTD任务管理"])
 
 # 数据库路径
@@ -46,162 +49,75 @@ class GTDTaskUpdate(BaseModel):
     due_date: Optional[str] = None
 
 
-def get_db():
-    """获取数据库连接"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# GTD 任务仓库（查询在数据库线程池中执行，不阻塞事件循环）
+repository = GTDRepository(get_async_database(DB_PATH))
 
 
-@router.get("/tasks", response_model=List[GTDTask])
-async def get_all_tasks():
-    """获取所有 GTD 任务"""
+async def _task_page(request: Request, category: Optional[str], cursor: Optional[str],
+                     limit: Optional[int], fields: Optional[str]):
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, category, priority, due_date, 
-                   created_at, updated_at
-            FROM gtd_tasks
-            ORDER BY created_at DESC
-        """)
-        
-        tasks = []
-        for row in cursor.fetchall():
-            tasks.append({
-                "id": row["id"],
-                "title": row["title"],
-                "description": row["description"],
-                "category": row["category"],
-                "priority": row["priority"],
-                "due_date": row["due_date"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"]
-            })
-        
-        conn.close()
-        return tasks
-    
+        page = await repository.list_page(category, cursor, limit, fields)
+    except ValueError as e:
+        raise invalid_page_request(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取任务失败: {str(e)}")
+    return page_response(request, page)
+
+
+@router.get("/tasks", response_model=List[GTDTask])
+async def get_all_tasks(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None
+):
+    """
+    按创建时间倒序获取 GTD 任务（传 limit 或 cursor 时分页）
+
+    Args:
+        cursor: 上一页响应头 X-Next-Cursor 的值（为空取第一页）
+        limit: 每页数量（与 cursor 都不传时返回全部任务，最多 5000 条；只传 cursor 时每页 50 条）
+        fields: 逗号分隔的返回字段（id、created_at 总会返回）
+    """
+    return await _task_page(request, None, cursor, limit, fields)
 
 
 @router.get("/tasks/category/{category}", response_model=List[GTDTask])
-async def get_tasks_by_category(category: str):
-    """按类别获取任务"""
-    try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, category, priority, due_date,
-                   created_at, updated_at
-            FROM gtd_tasks
-            WHERE category = ?
-            ORDER BY created_at DESC
-        """, (category,))
-        
-        tasks = []
-        for row in cursor.fetchall():
-            tasks.append({
-                "id": row["id"],
-                "title": row["title"],
-                "description": row["description"],
-                "category": row["category"],
-                "priority": row["priority"],
-                "due_date": row["due_date"],
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"]
-            })
-        
-        conn.close()
-        return tasks
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"获取任务失败: {str(e)}")
+async def get_tasks_by_category(
+    request: Request,
+    category: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None
+):
+    """按类别获取任务（参数同 /tasks，传 limit 或 cursor 时分页）"""
+    return await _task_page(request, category, cursor, limit, fields)
 
 
 @router.get("/tasks/{task_id}", response_model=GTDTask)
 async def get_task(task_id: int):
     """获取单个任务"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, title, description, category, priority, due_date,
-                   created_at, updated_at
-            FROM gtd_tasks
-            WHERE id = ?
-        """, (task_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="任务不存在")
-        
-        return {
-            "id": row["id"],
-            "title": row["title"],
-            "description": row["description"],
-            "category": row["category"],
-            "priority": row["priority"],
-            "due_date": row["due_date"],
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"]
-        }
-    
-    except HTTPException:
-        raise
+        task = await repository.get_task(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取任务失败: {str(e)}")
 
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return task
+
 
 @router.post("/tasks", response_model=GTDTask)
 async def create_task(task: GTDTaskCreate):
     """创建新任务"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO gtd_tasks (title, description, category, priority, due_date, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, datetime('now'), datetime('now'))
-        """, (
+        return await repository.create_task(
             task.title,
             task.description,
             task.category,
             task.priority,
             task.due_date
-        ))
-        
-        task_id = cursor.lastrowid
-        conn.commit()
-        
-        # 获取创建的任务
-        cursor.execute("""
-            SELECT id, title, description, category, priority, due_date,
-                   created_at, updated_at
-            FROM gtd_tasks
-            WHERE id = ?
-        """, (task_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        return {
-            "id": row["id"],
-            "title": row["title"],
-            "description": row["description"],
-            "category": row["category"],
-            "priority": row["priority"],
-            "due_date": row["due_date"],
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"]
-        }
-    
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
 
@@ -210,142 +126,33 @@ async def create_task(task: GTDTaskCreate):
 async def update_task(task_id: int, task: GTDTaskUpdate):
     """更新任务"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # 检查任务是否存在
-        cursor.execute("SELECT id FROM gtd_tasks WHERE id = ?", (task_id,))
-        if not cursor.fetchone():
-            conn.close()
-            raise HTTPException(status_code=404, detail="任务不存在")
-        
-        # 构建更新语句
-        update_fields = []
-        update_values = []
-        
-        if task.title is not None:
-            update_fields.append("title = ?")
-            update_values.append(task.title)
-        
-        if task.description is not None:
-            update_fields.append("description = ?")
-            update_values.append(task.description)
-        
-        if task.category is not None:
-            update_fields.append("category = ?")
-            update_values.append(task.category)
-        
-        if task.priority is not None:
-            update_fields.append("priority = ?")
-            update_values.append(task.priority)
-        
-        if task.due_date is not None:
-            update_fields.append("due_date = ?")
-            update_values.append(task.due_date)
-        
-        update_fields.append("updated_at = datetime('now')")
-        update_values.append(task_id)
-        
-        if update_fields:
-            sql = f"UPDATE gtd_tasks SET {', '.join(update_fields)} WHERE id = ?"
-            cursor.execute(sql, update_values)
-            conn.commit()
-        
-        # 获取更新后的任务
-        cursor.execute("""
-            SELECT id, title, description, category, priority, due_date,
-                   created_at, updated_at
-            FROM gtd_tasks
-            WHERE id = ?
-        """, (task_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
-        
-        return {
-            "id": row["id"],
-            "title": row["title"],
-            "description": row["description"],
-            "category": row["category"],
-            "priority": row["priority"],
-            "due_date": row["due_date"],
-            "created_at": row["created_at"],
-            "updated_at": row["updated_at"]
-        }
-    
-    except HTTPException:
-        raise
+        updated = await repository.update_task(task_id, task.dict())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"更新任务失败: {str(e)}")
 
+    if updated is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return updated
+
 
 @router.delete("/tasks/{task_id}")
 async def delete_task(task_id: int):
     """删除任务"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # 检查任务是否存在
-        cursor.execute("SELECT id FROM gtd_tasks WHERE id = ?", (task_id,))
-        if not cursor.fetchone():
-            conn.close()
-            raise HTTPException(status_code=404, detail="任务不存在")
-        
-        # 删除任务
-        cursor.execute("DELETE FROM gtd_tasks WHERE id = ?", (task_id,))
-        conn.commit()
-        conn.close()
-        
-        return {"success": True, "message": "任务已删除"}
-    
-    except HTTPException:
-        raise
+        deleted = await repository.delete_task(task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除任务失败: {str(e)}")
 
+    if not deleted:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return {"success": True, "message": "任务已删除"}
+
 
 @router.get("/stats")
 async def get_stats():
     """获取 GTD 统计信息"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        # 统计各类别任务数
-        cursor.execute("""
-            SELECT category, COUNT(*) as count
-            FROM gtd_tasks
-            GROUP BY category
-        """)
-        
-        stats = {}
-        for row in cursor.fetchall():
-            stats[row["category"]] = row["count"]
-        
-        # 统计优先级
-        cursor.execute("""
-            SELECT priority, COUNT(*) as count
-            FROM gtd_tasks
-            GROUP BY priority
-        """)
-        
-        priority_stats = {}
-        for row in cursor.fetchall():
-            priority_stats[row["priority"]] = row["count"]
-        
-        # 总任务数
-        cursor.execute("SELECT COUNT(*) as total FROM gtd_tasks")
-        total = cursor.fetchone()["total"]
-        
-        conn.close()
-        
-        return {
-            "total": total,
-            "by_category": stats,
-            "by_priority": priority_stats
-        }
-    
+        return await repository.get_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计信息失败: {str(e)}")
 
@@ -354,12 +161,7 @@ async def get_stats():
 async def health_check():
     """健康检查"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM gtd_tasks")
-        count = cursor.fetchone()[0]
-        conn.close()
-        
+        count = await repository.count()
         return {
             "status": "healthy",
             "database": "connected",
@@ -2,22 +2,31 @@
 知识管理路由
 提供知识库的 CRUD 接口
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import logging
 
 from config import settings
 from database import DatabaseManager
+from routes.pagination import invalid_page_request, page_response
+from services.async_db import get_async_database
+from services.card_search_cache import get_card_search_cache
+from services.knowledge_repository import KnowledgeRepository
+from services.pagination import DEFAULT_PAGE_SIZE
+from services.hybrid_search import get_hybrid_retriever
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/knowledge", tags=["知识管理"])
 
 
-# 创建数据库管理器实例
+# 创建数据库管理器实例（负责建表）
 db_manager = DatabaseManager(settings.DB_PATH)
 
+# 知识卡片仓库（查询在数据库线程池中执行，不阻塞事件循环）
+repository = KnowledgeRepository(get_async_database(settings.DB_PATH))
+
 
 class SearchRequest(BaseModel):
     """知识库搜索请求"""
@@ -25,6 +34,13 @@ class SearchRequest(BaseModel):
     limit: int = Field(10, description="返回数量限制")
 
 
+class HybridSearchRequest(BaseModel):
+    """混合检索请求"""
+    query: str = Field(..., description="查询文本")
+    limit: int = Field(10, ge=1, le=100, description="返回数量限制")
+    backends: Optional[List[str]] = Field(None, description="参与检索的后端（cards/memory/cases），默认全部")
+
+
 @router.get("/graph")
 async def get_knowledge_graph(
     card_type: Optional[str] = None,
@@ -46,26 +62,8 @@ async def get_knowledge_graph(
         # 获取技能注册表
         registry = get_skill_registry()
         
-        # 获取所有卡片
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM knowledge_cards WHERE 1=1"
-        params = []
-        
-        if card_type:
-            query += " AND card_type = ?"
-            params.append(card_type)
-        
-        query += " LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        # 转换为字典列表
-        cards = [dict(row) for row in rows]
+        # 获取卡片
+        cards = await repository.list_for_graph(card_type, limit)
         
         # 调用知识图谱可视化技能
         result = await registry.execute_skill(
@@ -83,7 +81,7 @@ async def get_knowledge_graph(
 class KnowledgeCard(BaseModel):
     """知识卡片模型"""
     id: Optional[int] = None
-    type: str  # 使用 type 与数据库一致
+    type: str  # 卡片颜色，存入 card_type 列
     title: str
     content: str
     source: Optional[str] = None
@@ -101,45 +99,33 @@ class KnowledgeSource(BaseModel):
 
 @router.get("/cards")
 async def get_cards(
+    request: Request,
     card_type: Optional[str] = None,
     category: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
     """
-    获取知识卡片列表
+    按创建时间倒序分页获取知识卡片列表
 
     Args:
         card_type: 卡片类型过滤（blue/green/yellow/red）
         category: 分类过滤
-        limit: 返回数量限制
-        offset: 偏移量
+        limit: 每页数量
+        offset: 偏移量（兼容旧客户端，提供 cursor 时忽略）
+        cursor: 上一页响应头 X-Next-Cursor 的值
+        fields: 逗号分隔的返回字段（id、created_at 总会返回）
 
     Returns:
         卡片列表
     """
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM knowledge_cards WHERE 1=1"
-    params = []
-
-    if card_type:
-        query += " AND type = ?"
-        params.append(card_type)
-
-    if category:
-        query += " AND category = ?"
-        params.append(category)
-
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
-
-    cursor.execute(query, params)
-    cards = [dict(row) for row in cursor.fetchall()]
-
-    conn.close()
-    return cards
+    try:
+        page = await repository.list_page(card_type, category, cursor, limit, fields, offset)
+    except ValueError as e:
+        raise invalid_page_request(e)
+    return page_response(request, page)
 
 
 @router.get("/cards/{card_id}")
@@ -153,18 +139,11 @@ async def get_card(card_id: int):
     Returns:
         卡片详情
     """
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM knowledge_cards WHERE id = ?", (card_id,))
-    card = cursor.fetchone()
-
-    conn.close()
-
+    card = await repository.get_card(card_id)
     if not card:
         raise HTTPException(status_code=404, detail="卡片不存在")
 
-    return dict(card)
+    return card
 
 
 @router.post("/cards")
@@ -179,40 +158,21 @@ async def create_card(card: KnowledgeCard):
         创建的卡片
     """
     logger.info(f"[CREATE_CARD] 收到创建卡片请求: {card.dict()}")
-    
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
 
     try:
-        logger.info(f"[CREATE_CARD] 准备插入数据库，type={card.type}")
-        
-        cursor.execute('''
-            INSERT INTO knowledge_cards (type, title, content, source, url, category)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+        new_card = await repository.create_card(
             card.type,
             card.title,
             card.content,
-            card.source,
-            card.url,
-            card.category
-        ))
-
-        conn.commit()
-        
-        logger.info(f"[CREATE_CARD] 插入成功，lastrowid={cursor.lastrowid}")
-
-        # 获取新插入的卡片
-        cursor.execute("SELECT * FROM knowledge_cards WHERE id = ?", (cursor.lastrowid,))
-        new_card = dict(cursor.fetchone())
-
-        conn.close()
-        logger.info(f"[CREATE_CARD] 返回新卡片: {new_card}")
+            source=card.source,
+            url=card.url,
+            category=card.category
+        )
+        logger.info(f"[CREATE_CARD] 插入成功，id={new_card['id']}")
         return new_card
 
     except Exception as e:
         logger.error(f"[CREATE_CARD] 创建失败: {e}", exc_info=True)
-        conn.close()
         raise HTTPException(status_code=400, detail=f"创建失败: {str(e)}")
 
 
@@ -227,14 +187,7 @@ async def delete_card(card_id: int):
     Returns:
         删除结果
     """
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM knowledge_cards WHERE id = ?", (card_id,))
-    conn.commit()
-
-    conn.close()
-
+    await repository.delete_card(card_id)
     return {"success": True, "message": "卡片已删除"}
 
 
@@ -247,28 +200,7 @@ async def get_stats():
         统计信息
     """
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-
-        # 总卡片数
-        cursor.execute("SELECT COUNT(*) FROM knowledge_cards")
-        total_cards = cursor.fetchone()[0]
-
-        # 按类型分组 - 使用 type 字段（数据库字段名）
-        cursor.execute("SELECT type, COUNT(*) as count FROM knowledge_cards WHERE type IS NOT NULL GROUP BY type")
-        cards_by_type = {row[0]: row[1] for row in cursor.fetchall() if row[0] is not None}
-
-        # 按分类分组
-        cursor.execute("SELECT category, COUNT(*) as count FROM knowledge_cards WHERE category IS NOT NULL GROUP BY category")
-        cards_by_category = {row[0]: row[1] for row in cursor.fetchall() if row[0] is not None}
-
-        conn.close()
-
-        return {
-            "total_cards": total_cards,
-            "cards_by_type": cards_by_type,
-            "cards_by_category": cards_by_category
-        }
+        return await repository.get_stats()
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
@@ -277,35 +209,49 @@ async def get_stats():
 @router.post("/search")
 async def search_cards(request: SearchRequest):
     """
-    搜索知识卡片
+    搜索知识卡片（FTS5 全文索引，按 BM25 相关度排序）
 
     Args:
         request: 搜索请求（包含关键词和限制）
 
     Returns:
-        匹配的卡片列表
+        匹配的卡片列表（另含 score、similarity 和带 <mark> 标记的 snippet）
     """
     try:
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
+        return await repository.search(request.keyword, limit=request.limit)
+    except Exception as e:
+        logger.error(f"搜索失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
+
 
-        keyword = request.keyword
-        limit = request.limit
+@router.get("/search-cache")
+async def search_cache_status():
+    """
+    知识卡片检索缓存状态
+
+    返回命中/未命中次数、命中率、条目数、估算内存占用与各数据库的当前缓存代数
+    """
+    return get_card_search_cache().get_stats()
 
-        cursor.execute('''
-            SELECT * FROM knowledge_cards
-            WHERE title LIKE ? OR content LIKE ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (f'%{keyword}%', f'%{keyword}%', limit))
 
-        cards = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+@router.post("/hybrid-search")
+async def hybrid_search(request: HybridSearchRequest):
+    """
+    混合检索（知识卡片全文 + 记忆库向量 + 历史案例向量，并发检索后按 RRF 融合去重）
 
-        return cards
+    Args:
+        request: 检索请求
+
+    Returns:
+        融合结果（含 rrf_score、similarity 与各后端命中 matches）、各后端状态与各阶段耗时
+    """
+    try:
+        return await get_hybrid_retriever().search(request.query, limit=request.limit, backends=request.backends)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"搜索失败: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
+        logger.error(f"混合检索失败: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"混合检索失败: {str(e)}")
 
 
 @router.get("/sources")
@@ -316,14 +262,7 @@ async def get_sources():
     Returns:
         来源列表
     """
-    conn = db_manager.get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM knowledge_sources ORDER BY last_imported DESC")
-    sources = [dict(row) for row in cursor.fetchall()]
-
-    conn.close()
-    return sources
+    return await repository.list_sources()
 
 
 @router.post("/import")
@@ -1,16 +1,44 @@
 """
 智能模型路由器
 根据查询复杂度自动选择合适的模型
+
+调用方给出延迟 SLA 时，按实际推理观测（models.model_performance）预测各模型的延迟，
+在满足复杂度要求的模型中选择成本（常驻内存）最低且预计满足 SLA 的模型。
 """
 import re
 import logging
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
+# 复杂度级别（数值越大要求越高）
+COMPLEXITY_LEVELS = {'simple': 1, 'medium': 2, 'complex': 3}
+
+# 各模型可胜任的最高复杂度
+MODEL_QUALITY_TIERS = {
+    'llama3.2-3b': 'simple',
+    'llama3.1-8b': 'medium',
+    'qwen2-7b-ssd': 'complex'
+}
+
+# 无观测数据时的先验性能（首 token 延迟 ms、解码 tokens/s），有足够观测后以实测为准
+PRIOR_PERFORMANCE = {
+    'llama3.2-3b': {'ttft_ms': 150.0, 'tokens_per_s': 40.0},
+    'llama3.1-8b': {'ttft_ms': 400.0, 'tokens_per_s': 15.0},
+    'qwen2-7b-ssd': {'ttft_ms': 350.0, 'tokens_per_s': 18.0}
+}
+
+# 观测样本数达到该值后使用实测性能预测延迟
+MIN_OBSERVED_SAMPLES = 3
+
+# 失败率超过该值（且样本足够）的模型不参与路由
+MAX_FAILURE_RATE = 0.5
+
+
 def estimate_complexity(query: str) -> Dict[str, Any]:
     """
-    估算查询复杂度
+    估算查询复杂度（相同查询的结果会被缓存）
 
     返回:
         {
@@ -19,6 +47,12 @@ def estimate_complexity(query: str) -> Dict[str, Any]:
             'reasons': ['...']
         }
     """
+    estimation = _estimate_complexity_cached(query)
+    return {**estimation, 'reasons': list(estimation['reasons'])}
+
+
+@lru_cache(maxsize=1024)
+def _estimate_complexity_cached(query: str) -> Dict[str, Any]:
     complexity_score = 0
     reasons = []
 
@@ -91,7 +125,128 @@ def estimate_complexity(query: str) -> Dict[str, Any]:
     }
 
 
-def select_model(query: str) -> str:
+def predict_latency(model_key: str, max_new_tokens: int = 128, store: Any = None) -> Dict[str, Any]:
+    """
+    预测模型生成 max_new_tokens 个 token 的延迟
+
+    延迟 = 首 token 延迟 + 剩余 token 数 / 解码速度，再按失败率折算重试成本。
+
+    Args:
+        model_key: 模型键名
+        max_new_tokens: 最大生成 token 数
+        store: 性能存储（None 表示全局存储）
+
+    Returns:
+        {'latency_ms', 'source': 'observed'|'prior', 'samples', 'failure_rate', 'ttft_ms', 'tokens_per_s'}
+    """
+    if store is None:
+        from models.model_performance import get_model_performance_store
+        store = get_model_performance_store()
+
+    prior = PRIOR_PERFORMANCE.get(model_key, PRIOR_PERFORMANCE['qwen2-7b-ssd'])
+    observed = store.get(model_key)
+    samples = observed['samples'] if observed else 0
+    failure_rate = observed['failure_rate'] if observed else 0.0
+
+    source = 'prior'
+    ttft_ms = prior['ttft_ms']
+    tokens_per_s = prior['tokens_per_s']
+    if observed and samples - observed['failures'] >= MIN_OBSERVED_SAMPLES:
+        source = 'observed'
+        ttft_ms = observed['ttft_ms'] if observed['ttft_ms'] is not None else ttft_ms
+        tokens_per_s = observed['tokens_per_s'] or tokens_per_s
+
+    latency_ms = ttft_ms + max(0, max_new_tokens - 1) / tokens_per_s * 1000
+    if failure_rate > 0:
+        latency_ms /= max(1.0 - failure_rate, 0.1)
+
+    return {
+        'latency_ms': round(latency_ms, 2),
+        'source': source,
+        'samples': samples,
+        'failure_rate': round(failure_rate, 4),
+        'ttft_ms': round(ttft_ms, 2),
+        'tokens_per_s': round(tokens_per_s, 2)
+    }
+
+
+def route_model(
+    query: str,
+    latency_sla_ms: Optional[float] = None,
+    max_new_tokens: int = 128,
+    store: Any = None
+) -> Dict[str, Any]:
+    """
+    综合复杂度与实测性能选择模型，并给出决策依据
+
+    - 未给出 SLA 时沿用复杂度映射（select_model 的默认策略）
+    - 给出 SLA 时，在可胜任该复杂度的模型中按常驻内存从小到大选择第一个预计满足 SLA 的模型；
+      都不满足时选择预测延迟最低的模型（meets_sla=False）
+    - 失败率过高的模型不参与选择
+
+    Returns:
+        {'model_key', 'complexity', 'latency_sla_ms', 'predicted_latency_ms', 'meets_sla',
+         'candidates': [...], 'reason'}
+    """
+    from models.model_loader import ModelConfig
+
+    estimation = estimate_complexity(query)
+    required = COMPLEXITY_LEVELS[estimation['complexity']]
+
+    candidates: List[Dict[str, Any]] = []
+    for model_key, config in sorted(ModelConfig.MODELS.items(), key=lambda item: item[1].get('memory_mb', 0)):
+        prediction = predict_latency(model_key, max_new_tokens, store)
+        tier = MODEL_QUALITY_TIERS.get(model_key, 'complex')
+        candidate = {
+            'model_key': model_key,
+            'memory_mb': config.get('memory_mb'),
+            'quality_tier': tier,
+            'predicted': prediction,
+            'eligible': True,
+            'meets_sla': latency_sla_ms is None or prediction['latency_ms'] <= latency_sla_ms,
+            'note': ''
+        }
+        if COMPLEXITY_LEVELS[tier] < required:
+            candidate['eligible'] = False
+            candidate['note'] = f"质量等级不足（{tier} < {estimation['complexity']}）"
+        elif prediction['samples'] >= MIN_OBSERVED_SAMPLES and prediction['failure_rate'] > MAX_FAILURE_RATE:
+            candidate['eligible'] = False
+            candidate['note'] = f"失败率过高（{prediction['failure_rate']:.0%}）"
+        elif not candidate['meets_sla']:
+            candidate['note'] = f"预测延迟 {prediction['latency_ms']}ms 超过 SLA {latency_sla_ms}ms"
+        candidates.append(candidate)
+
+    eligible = [c for c in candidates if c['eligible']] or candidates
+    if latency_sla_ms is None:
+        model_key = select_model(query)
+        chosen = next(c for c in candidates if c['model_key'] == model_key)
+        reason = f"未指定 SLA，按复杂度（{estimation['complexity']}）选择"
+    else:
+        meeting = [c for c in eligible if c['meets_sla']]
+        if meeting:
+            chosen = meeting[0]
+            reason = f"满足复杂度（{estimation['complexity']}）且预计满足 SLA 的模型中成本最低"
+        else:
+            chosen = min(eligible, key=lambda c: c['predicted']['latency_ms'])
+            reason = "没有模型预计满足 SLA，选择预测延迟最低的模型"
+
+    decision = {
+        'model_key': chosen['model_key'],
+        'complexity': estimation,
+        'latency_sla_ms': latency_sla_ms,
+        'predicted_latency_ms': chosen['predicted']['latency_ms'],
+        'meets_sla': chosen['meets_sla'],
+        'candidates': candidates,
+        'reason': reason
+    }
+    logger.info(
+        f"[ModelRouter] 路由决策: {chosen['model_key']} "
+        f"(预测 {chosen['predicted']['latency_ms']}ms, SLA {latency_sla_ms}) - {reason}"
+    )
+    return decision
+
+
+def select_model(query: str, latency_sla_ms: Optional[float] = None, max_new_tokens: int = 128) -> str:
     """
     根据查询复杂度选择模型
 
@@ -99,7 +254,15 @@ def select_model(query: str) -> str:
     - simple (<30分): llama3.2-3b (<1秒)
     - medium (30-59分): llama3.1-8b (3-5秒)
     - complex (>=60分): qwen2-7b-ssd (20秒，中文最佳)
+
+    给出 latency_sla_ms 时改用 route_model 按实测性能选择。
     """
+    if latency_sla_ms is not None:
+        try:
+            return route_model(query, latency_sla_ms, max_new_tokens)['model_key']
+        except Exception as e:
+            logger.error(f"[ModelRouter] SLA 路由失败，退回复杂度映射: {e}", exc_info=True)
+
     try:
         # 估算复杂度
         estimation = estimate_complexity(query)
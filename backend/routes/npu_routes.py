@@ -2,9 +2,11 @@
 FastAPI 路由 - NPU 模型推理接口
 整合远程 AIPC 预装模型
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
+import asyncio
 import time
 import logging
 
@@ -13,7 +15,17 @@ from models.model_loader import (
     load_model_if_needed,
     ModelConfig
 )
-from routes.model_router import select_model, get_model_info, estimate_complexity
+from models.model_pool import get_model_pool
+from models.inference_worker import (
+    get_inference_worker,
+    InferencePriority,
+    QueueFullError,
+    JobCancelledError
+)
+from config import settings
+from routes.model_router import select_model, route_model, get_model_info, estimate_complexity
+from routes.streaming import SSE_HEADERS, sse_token_events, websocket_token_messages
+from routes.readiness import require_model_ready, model_not_ready_error
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +40,9 @@ class AnalyzeRequest(BaseModel):
     max_tokens: Optional[int] = Field(128, description="最大生成token数", ge=32, le=512)
     temperature: Optional[float] = Field(0.7, description="温度参数", ge=0.0, le=2.0)
     model: Optional[str] = Field(None, description="指定模型（可选）")
+    stream: bool = Field(False, description="是否以 SSE 逐 token 返回")
+    use_cache: Optional[bool] = Field(None, description="是否使用推理结果缓存（默认仅 temperature=0 时使用）")
+    latency_sla_ms: Optional[float] = Field(None, description="延迟 SLA（毫秒，可选），智能路由选择预计满足 SLA 的最低成本模型", gt=0)
 
 
 class FourColorCard(BaseModel):
@@ -53,10 +68,20 @@ class BenchmarkResponse(BaseModel):
     avg_latency_ms: float
     min_latency_ms: float
     max_latency_ms: float
-    cpu_vs_npu_speedup: float
-    memory_usage_mb: float
+    p50_latency_ms: float
+    p95_latency_ms: float
+    p99_latency_ms: float
+    ttft_p50_ms: float
+    ttft_p95_ms: float
+    prefill_tokens_per_s: float
+    decode_tokens_per_s: float
+    cpu_vs_npu_speedup: float  # 未配置 CPU 参考后端时为 0
+    reference_backend: Optional[str] = None
+    memory_usage_mb: float  # 测量结束时的进程 RSS
+    peak_memory_mb: Optional[float] = None  # 测量期间的进程 RSS 峰值
     test_count: int
     status: str
+    result_file: Optional[str] = None
 
 
 class ModelInfo(BaseModel):
@@ -72,8 +97,8 @@ class ModelInfo(BaseModel):
 
 # ==================== API 路由 ====================
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_data(request: AnalyzeRequest):
+@router.post("/analyze", response_model=AnalyzeResponse, dependencies=[Depends(require_model_ready)])
+async def analyze_data(request: AnalyzeRequest, http_request: Request):
     """
     数据分析接口 - 核心功能
 
@@ -83,28 +108,65 @@ async def analyze_data(request: AnalyzeRequest):
     - **max_tokens**: 最大生成token数（默认128）
     - **temperature**: 温度参数（默认0.7）
     - **model**: 指定模型键名（可选，默认使用智能路由）
+    - **latency_sla_ms**: 延迟 SLA（可选），智能路由按实测性能选择预计满足 SLA 的最低成本模型
+    - **stream**: 为 true 时返回 text/event-stream（token 事件 + 含四色卡片与延迟指标的 done 事件）
     """
     try:
         start_time = time.time()
 
         # 智能模型选择（如果未指定）
         if request.model is None:
-            selected_model_key = select_model(request.query)
+            selected_model_key = select_model(request.query, request.latency_sla_ms, request.max_tokens)
             logger.info(f"[NPU] 自动选择模型: {selected_model_key}")
         else:
             selected_model_key = request.model
             logger.info(f"[NPU] 用户指定模型: {selected_model_key}")
 
-        # 加载模型
-        loader = NPUModelLoader(selected_model_key)
-        model = loader.load()
-
-        # NPU 推理
+        if selected_model_key not in ModelConfig.MODELS:
+            raise HTTPException(status_code=400, detail=f"未知模型: {selected_model_key}")
+
+        # 排队期间后台加载选定模型，并预加载预测的下一个模型
+        predicted_next = get_model_pool().record_selection(selected_model_key)
+
+        if request.stream:
+            token_stream = get_inference_worker().stream(
+                prompt=request.query,
+                max_new_tokens=request.max_tokens,
+                temperature=request.temperature,
+                priority=InferencePriority.INTERACTIVE,
+                model_key=selected_model_key
+            )
+
+            def build_done(raw_output: str) -> Dict[str, Any]:
+                cards = generate_four_color_cards(raw_output, request.query)
+                return {
+                    "success": True,
+                    "query": request.query,
+                    "cards": [card.model_dump() for card in cards],
+                    "raw_output": raw_output,
+                    "model_key": selected_model_key
+                }
+
+            return StreamingResponse(
+                sse_token_events(
+                    token_stream,
+                    start={"query": request.query, "model_key": selected_model_key},
+                    build_done=build_done
+                ),
+                media_type="text/event-stream",
+                headers=SSE_HEADERS
+            )
+
+        # NPU 推理（提交到推理工作线程，不阻塞事件循环）
         inference_start = time.time()
-        raw_output = loader.infer(
+        raw_output = await get_inference_worker().submit(
             prompt=request.query,
             max_new_tokens=request.max_tokens,
-            temperature=request.temperature
+            temperature=request.temperature,
+            priority=InferencePriority.BATCH,
+            model_key=selected_model_key,
+            is_disconnected=http_request.is_disconnected,
+            use_cache=request.use_cache
         )
         inference_time = (time.time() - inference_start) * 1000
 
@@ -119,10 +181,11 @@ async def analyze_data(request: AnalyzeRequest):
             "inference_time_ms": round(inference_time, 2),
             "total_time_ms": round(total_time, 2),
             "model_key": selected_model_key,
-            "model_name": loader.model_config['name'],
-            "model_params": loader.model_config['params'],
+            "model_name": model_info['name'],
+            "model_params": model_info['params'],
             "device": "NPU",
             "tokens_generated": request.max_tokens,
+            "predicted_next_model": predicted_next,
             "meets_target": inference_time < 500  # 目标 < 500ms
         }
 
@@ -140,11 +203,73 @@ async def analyze_data(request: AnalyzeRequest):
             performance=performance
         )
 
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        logger.warning(f" 推理队列已满: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except JobCancelledError as e:
+        logger.info(f" 分析已取消: {e}")
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         logger.error(f" 分析失败: {e}")
         raise HTTPException(status_code=500, detail=f"分析失败: {str(e)}")
 
 
+@router.websocket("/stream")
+async def stream_inference(websocket: WebSocket):
+    """
+    WebSocket 流式推理
+
+    客户端发送 {"query": ..., "max_tokens": 128, "temperature": 0.7, "model": null}，
+    服务端逐条返回 {"type": "token", "text": ...}，最后返回
+    {"type": "done", "text": ..., "model_key": ..., "metrics": {ttft_ms, inter_token_ms, ...}}。
+    同一连接可连续发送多个请求。
+    """
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            try:
+                request = AnalyzeRequest(**message)
+                not_ready = model_not_ready_error()
+                if not_ready is not None:
+                    await websocket.send_json({
+                        "type": "error",
+                        "status": 503,
+                        "detail": not_ready.detail,
+                        "retry_after": int(not_ready.headers["Retry-After"])
+                    })
+                    continue
+                model_key = request.model or select_model(request.query, request.latency_sla_ms, request.max_tokens)
+                if model_key not in ModelConfig.MODELS:
+                    await websocket.send_json({"type": "error", "detail": f"未知模型: {model_key}"})
+                    continue
+                get_model_pool().record_selection(model_key)
+
+                token_stream = get_inference_worker().stream(
+                    prompt=request.query,
+                    max_new_tokens=request.max_tokens,
+                    temperature=request.temperature,
+                    priority=InferencePriority.INTERACTIVE,
+                    model_key=model_key
+                )
+                await websocket_token_messages(
+                    websocket,
+                    token_stream,
+                    build_done=lambda text: {"text": text, "model_key": model_key}
+                )
+            except QueueFullError as e:
+                await websocket.send_json({"type": "error", "status": 429, "detail": str(e)})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f" WebSocket 流式推理失败: {e}")
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    except WebSocketDisconnect:
+        logger.info("[NPU] WebSocket 客户端已断开")
+
+
 @router.get("/models", response_model=List[ModelInfo])
 async def list_models():
     """
@@ -174,58 +299,138 @@ async def list_models():
         raise HTTPException(status_code=500, detail=f"获取模型列表失败: {str(e)}")
 
 
-@router.get("/benchmark", response_model=BenchmarkResponse)
-async def performance_benchmark():
+@router.get("/benchmark", response_model=BenchmarkResponse, dependencies=[Depends(require_model_ready)])
+async def performance_benchmark(
+    corpus: str = Query("default", description="内置语料名（default/mixed/long）或 JSON 语料文件路径"),
+    runs: int = Query(3, ge=1, le=50, description="每个提示的测量次数"),
+    warmup: int = Query(2, ge=0, le=20, description="预热轮数"),
+    max_new_tokens: int = Query(64, ge=1, le=2048),
+    reference: Optional[str] = Query(None, description="CPU 参考后端（默认读取 BENCHMARK_REFERENCE_BACKEND）"),
+    save: bool = Query(True, description="是否保存 JSON 结果")
+):
     """
     性能基准测试
 
-    测试 NPU 推理性能，验证是否满足 < 500ms 目标
+    预热后测量 NPU 推理的 p50/p95/p99 延迟、首 token 延迟、预填充与解码吞吐和进程内存，
+    可选与 CPU 参考后端对比，验证是否满足 < 500ms 目标
     """
-    try:
-        loader = NPUModelLoader()
-        loader.load()
-
-        test_prompts = [
-            "分析这段数据的趋势",
-            "总结关键信息",
-            "提供解决方案",
-            "评估风险因素",
-            "制定行动计划"
-        ]
-
-        latencies = []
-
-        for prompt in test_prompts:
-            start_time = time.time()
-            loader.infer(prompt, max_new_tokens=64)
-            latency = (time.time() - start_time) * 1000
-            latencies.append(latency)
-
-        avg_latency = sum(latencies) / len(latencies)
-        min_latency = min(latencies)
-        max_latency = max(latencies)
-
-        # CPU vs NPU 加速比（需要真实CPU基准测试）
-        # 暂时返回占位符值，需要实现真实CPU推理对比
-        cpu_vs_npu_speedup = 0.0  # 需要真实测试
-
-        stats = loader.get_performance_stats()
-
-        return BenchmarkResponse(
-            model_name=stats['model_name'],
-            avg_latency_ms=round(avg_latency, 2),
-            min_latency_ms=round(min_latency, 2),
-            max_latency_ms=round(max_latency, 2),
-            cpu_vs_npu_speedup=cpu_vs_npu_speedup,
-            memory_usage_mb=1800.0,  # 典型值
-            test_count=len(latencies),
-            status="通过" if avg_latency < 500 else "超标"
-        )
+    from services.npu_benchmark import NPUBenchmark, create_reference_backend, save_result
+
+    reference_spec = reference or settings.BENCHMARK_REFERENCE_BACKEND
+
+    def run_benchmark():
+        # 复用模型池中的常驻模型，避免每次基准测试重新加载
+        with get_model_pool().lease(ModelConfig.DEFAULT_MODEL) as loader:
+            benchmark = NPUBenchmark(
+                loader,
+                corpus=corpus,
+                warmup_runs=warmup,
+                runs=runs,
+                max_new_tokens=max_new_tokens,
+                reference=create_reference_backend(reference_spec),
+                reference_name=reference_spec
+            )
+            result = benchmark.run()
+            result["model_name"] = loader.get_performance_stats()["model_name"]
+        if save:
+            result["result_file"] = str(save_result(result, settings.BENCHMARK_RESULTS_DIR))
+        return result
 
+    try:
+        # 基准测试耗时较长，在线程池中执行，避免阻塞事件循环
+        result = await asyncio.get_running_loop().run_in_executor(None, run_benchmark)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f" 性能测试失败: {e}")
         raise HTTPException(status_code=500, detail=f"性能测试失败: {str(e)}")
 
+    summary = result["npu"]["summary"]
+    memory = result["npu"]["memory"]
+    return BenchmarkResponse(
+        model_name=result["model_name"],
+        avg_latency_ms=summary["avg_latency_ms"],
+        min_latency_ms=summary["min_latency_ms"],
+        max_latency_ms=summary["max_latency_ms"],
+        p50_latency_ms=summary["p50_latency_ms"],
+        p95_latency_ms=summary["p95_latency_ms"],
+        p99_latency_ms=summary["p99_latency_ms"],
+        ttft_p50_ms=summary["ttft_p50_ms"],
+        ttft_p95_ms=summary["ttft_p95_ms"],
+        prefill_tokens_per_s=summary["prefill_tokens_per_s"],
+        decode_tokens_per_s=summary["decode_tokens_per_s"],
+        cpu_vs_npu_speedup=result["cpu_vs_npu_speedup"] or 0.0,
+        reference_backend=reference_spec,
+        memory_usage_mb=memory["rss_end_mb"] or 0.0,
+        peak_memory_mb=memory["rss_peak_mb"],
+        test_count=summary["count"],
+        status="通过" if summary["p50_latency_ms"] < 500 else "超标",
+        result_file=result.get("result_file")
+    )
+
+
+@router.get("/queue")
+async def queue_status():
+    """
+    推理队列状态
+
+    返回推理工作线程的排队深度、执行统计和拒绝次数
+    """
+    try:
+        return get_inference_worker().get_stats()
+    except Exception as e:
+        logger.error(f" 获取队列状态失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取队列状态失败: {str(e)}")
+
+
+@router.get("/cache")
+async def cache_status():
+    """
+    推理缓存状态
+
+    返回内存/SQLite 两级缓存的命中、未命中、跳过次数与条目数
+    """
+    from models.inference_cache import get_inference_cache
+
+    cache = get_inference_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.get_stats()}
+
+
+@router.delete("/cache")
+async def clear_cache(model: Optional[str] = Query(None, description="仅清空指定模型的缓存")):
+    """清空推理缓存"""
+    from models.inference_cache import get_inference_cache
+
+    cache = get_inference_cache()
+    if cache is None:
+        return {"enabled": False, "cleared": False}
+    cache.clear(model)
+    return {"enabled": True, "cleared": True, "model": model}
+
+
+@router.delete("/sessions")
+async def reset_sessions(session_id: Optional[str] = Query(None, description="仅结束指定会话")):
+    """结束多轮对话会话，释放驻留的对话状态（不指定时同时清空模板快照）"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, get_model_pool().reset_session, session_id)
+    return {"reset": True, "session_id": session_id}
+
+
+@router.get("/pool")
+async def pool_status():
+    """
+    模型池状态
+
+    返回常驻模型、引用计数、内存预算和 LRU 顺序
+    """
+    try:
+        return get_model_pool().get_stats()
+    except Exception as e:
+        logger.error(f" 获取模型池状态失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取模型池状态失败: {str(e)}")
+
 
 @router.get("/status")
 async def model_status():
@@ -263,21 +468,26 @@ async def model_status():
 
 
 @router.post("/test-router")
-async def test_router(query: str = Query(..., description="测试查询文本")):
+async def test_router(
+    query: str = Query(..., description="测试查询文本"),
+    latency_sla_ms: Optional[float] = Query(None, gt=0, description="延迟 SLA（毫秒，可选）"),
+    max_tokens: int = Query(128, ge=1, le=2048, description="最大生成token数（用于预测延迟）")
+):
     """
     测试智能路由器
 
-    返回给定查询的模型选择结果
+    返回给定查询的模型选择结果、各候选模型的预测延迟（实测或先验）与选择理由
     """
     try:
-        estimation = estimate_complexity(query)
-        selected_model = select_model(query)
+        decision = route_model(query, latency_sla_ms, max_tokens)
+        selected_model = decision['model_key']
 
         return {
             "query": query,
-            "complexity": estimation,
+            "complexity": decision['complexity'],
             "selected_model": selected_model,
-            "model_info": get_model_info(selected_model)
+            "model_info": get_model_info(selected_model),
+            "routing": decision
         }
 
     except Exception as e:
@@ -0,0 +1,41 @@
+"""
+分页响应
+
+列表路由返回一页结果（见 services/pagination.py）：
+- ETag 为页内容（自定义响应体时为响应体）的弱 ETag，请求带匹配的 If-None-Match 时返回 304（不传输响应体）
+- 下一页游标放在 X-Next-Cursor 响应头（响应体为列表的接口保持原格式）；没有下一页时不返回该头
+"""
+from typing import Any, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from services.pagination import Page, etag_matches, page_etag
+
+
+def page_response(request: Request, page: Page, body: Optional[Any] = None) -> Response:
+    """
+    构造分页响应
+
+    Args:
+        request: 请求（读取 If-None-Match）
+        page: 一页结果
+        body: 响应体（默认为页内的行列表）
+
+    Returns:
+        JSON 响应，或 304 响应
+    """
+    content = page["items"] if body is None else body
+    etag = page["etag"] if body is None else page_etag(body, page["next_cursor"])
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
+
+
+def invalid_page_request(error: ValueError) -> HTTPException:
+    """游标或 fields 参数无效时的 400 响应"""
+    return HTTPException(status_code=400, detail=str(error))
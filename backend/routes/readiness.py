@@ -0,0 +1,40 @@
+"""
+模型就绪检查
+
+依赖模型的路由通过 Depends(require_model_ready) 声明：模型仍在后台加载、预热或加载失败时
+直接返回 503 + Retry-After，不进入推理队列；GTD、数据、知识库等路由不受影响。
+"""
+import logging
+from typing import Optional
+
+from fastapi import HTTPException
+
+from models.model_readiness import get_model_readiness
+
+logger = logging.getLogger(__name__)
+
+
+def model_not_ready_error() -> Optional[HTTPException]:
+    """
+    检查模型就绪状态
+
+    Returns:
+        未就绪时返回 503 异常，就绪时返回 None
+    """
+    blocked = get_model_readiness().check()
+    if blocked is None:
+        return None
+    retry_after, reason = blocked
+    return HTTPException(
+        status_code=503,
+        detail=reason,
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def require_model_ready():
+    """路由依赖：模型未就绪时返回 503 + Retry-After"""
+    error = model_not_ready_error()
+    if error is not None:
+        logger.info(f"[Readiness] 拒绝请求: {error.detail}")
+        raise error
@@ -0,0 +1,100 @@
+"""
+流式推理输出工具
+
+将推理工作线程的 TokenStream 转换为 Server-Sent Events（SSE）或 WebSocket 消息。
+
+SSE 事件格式：
+    event: start  data: {...路由自定义的开始信息...}
+    event: token  data: {"text": "..."}
+    event: done   data: {...路由自定义的结果..., "metrics": {...}}
+    event: error  data: {"detail": "..."}
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi import WebSocket
+
+from models.inference_worker import TokenStream, JobCancelledError
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # 关闭反向代理缓冲，保证 token 即时送达
+}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    格式化单条 SSE 消息
+
+    Args:
+        event: 事件名
+        data: 可 JSON 序列化的数据
+
+    Returns:
+        SSE 文本
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_token_events(
+    token_stream: TokenStream,
+    start: Optional[Dict[str, Any]] = None,
+    build_done: Optional[Callable[[str], Dict[str, Any]]] = None
+) -> AsyncIterator[str]:
+    """
+    将 TokenStream 转换为 SSE 事件流
+
+    Args:
+        token_stream: 推理工作线程返回的流
+        start: 开始事件的数据（如检索到的知识来源）
+        build_done: 根据完整生成文本构建结束事件数据的函数
+
+    Yields:
+        SSE 文本
+    """
+    if start is not None:
+        yield format_sse("start", start)
+
+    try:
+        async for token in token_stream:
+            yield format_sse("token", {"text": token})
+    except JobCancelledError as e:
+        logger.info(f"[Streaming] 流式推理已取消: {e}")
+        return
+    except Exception as e:
+        logger.error(f"[Streaming] 流式推理失败: {e}")
+        yield format_sse("error", {"detail": str(e)})
+        return
+
+    done = build_done(token_stream.text) if build_done is not None else {"text": token_stream.text}
+    done["metrics"] = token_stream.metrics
+    logger.info(
+        f"[Streaming] 完成: {done['metrics']['tokens']} tokens, "
+        f"TTFT {done['metrics']['ttft_ms']}ms"
+    )
+    yield format_sse("done", done)
+
+
+async def websocket_token_messages(
+    websocket: WebSocket,
+    token_stream: TokenStream,
+    build_done: Optional[Callable[[str], Dict[str, Any]]] = None
+):
+    """
+    通过 WebSocket 逐 token 发送推理结果
+
+    消息格式：{"type": "token", "text": ...} / {"type": "done", ..., "metrics": {...}}
+
+    Args:
+        websocket: 已接受的 WebSocket 连接
+        token_stream: 推理工作线程返回的流
+        build_done: 根据完整生成文本构建结束消息的函数
+    """
+    async for token in token_stream:
+        await websocket.send_json({"type": "token", "text": token})
+
+    done = build_done(token_stream.text) if build_done is not None else {"text": token_stream.text}
+    await websocket.send_json({"type": "done", **done, "metrics": token_stream.metrics})
@@ -0,0 +1,246 @@
+"""
+异步数据库访问
+
+路由处理函数是 async def，直接调用 sqlite3 会阻塞事件循环：一条慢查询或一次锁等待会拖住所有在途请求。
+这里把数据库操作提交到专用的数据库线程池执行，事件循环只等待结果：
+
+- 每个数据库文件一个 AsyncDatabase，连接从该文件的连接池借出（WAL，读写不互相阻塞）
+- run(fn, ...) 以借出的连接调用 fn(conn, ...)，成功时提交、异常时回滚，之后归还连接
+- fetch_all / fetch_one / fetch_value / execute 为常用查询的快捷方式，行以字典返回
+- call(fn, ...) 在数据库线程池中执行任意阻塞函数（如 DatabaseManager 的方法）
+- 线程池独立于默认执行器，重查询只占用其中一个线程，轻查询在其余线程上继续执行；
+  统计排队数、执行中的任务数与最近查询耗时的分位数
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 耗时分位数统计的样本窗口
+LATENCY_WINDOW = 1024
+
+
+def _percentile(samples: Sequence[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+class AsyncDatabase:
+    """在专用线程池中执行数据库操作"""
+
+    def __init__(self, db_path: Path, max_workers: int = 4, pool=None):
+        """
+        初始化异步数据库
+
+        Args:
+            db_path: 数据库文件路径
+            max_workers: 数据库线程数
+            pool: 连接池（默认使用该数据库文件的全局连接池）
+        """
+        self.db_path = Path(db_path)
+        self.max_workers = max_workers
+        self._pool = pool
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._pending = 0
+        self._active = 0
+        self.stats = {
+            "calls": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "max_queue_ms": 0.0
+        }
+
+    @property
+    def pool(self):
+        """连接池"""
+        if self._pool is None:
+            from services.sqlite_pool import get_connection_pool
+
+            self._pool = get_connection_pool(self.db_path)
+        return self._pool
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+            return self._executor
+
+    def _invoke(self, submitted: float, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+            self.stats["max_queue_ms"] = max(self.stats["max_queue_ms"], (start - submitted) * 1000)
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self._active -= 1
+                self.stats["calls"] += 1
+                self.stats["total_ms"] += elapsed_ms
+                self.stats["max_ms"] = max(self.stats["max_ms"], elapsed_ms)
+                if failed:
+                    self.stats["errors"] += 1
+                self._latencies.append(elapsed_ms)
+
+    async def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在数据库线程池中执行阻塞函数
+
+        Args:
+            fn: 阻塞函数
+            *args, **kwargs: 传给 fn 的参数
+
+        Returns:
+            fn 的返回值
+        """
+        with self._lock:
+            self._pending += 1
+        future = self._get_executor().submit(self._invoke, time.perf_counter(), fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # 任务开始执行前被取消（如请求断开）时修正排队数
+        if future.cancelled():
+            with self._lock:
+                self._pending -= 1
+
+    def _with_connection(self, fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        conn = self.pool.connect()
+        try:
+            result = fn(conn, *args, **kwargs)
+            if conn.in_transaction:
+                conn.commit()
+            return result
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        借出连接并在数据库线程池中调用 fn(conn, *args, **kwargs)，成功提交、异常回滚
+
+        Returns:
+            fn 的返回值
+        """
+        return await self.call(self._with_connection, fn, args, kwargs)
+
+    async def fetch_all(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """查询多行，以字典列表返回"""
+        def _fetch(conn):
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        return await self.run(_fetch)
+
+    async def fetch_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
+        """查询单行，没有结果返回 None"""
+        def _fetch(conn):
+            row = conn.execute(sql, params).fetchone()
+            return dict(row) if row is not None else None
+        return await self.run(_fetch)
+
+    async def fetch_value(self, sql: str, params: Sequence[Any] = (), default: Any = None) -> Any:
+        """查询单个值（第一行第一列），没有结果返回 default"""
+        def _fetch(conn):
+            row = conn.execute(sql, params).fetchone()
+            return row[0] if row is not None else default
+        return await self.run(_fetch)
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> Tuple[int, int]:
+        """
+        执行写语句并提交
+
+        Returns:
+            (lastrowid, rowcount)
+        """
+        def _execute(conn):
+            cursor = conn.execute(sql, params)
+            return cursor.lastrowid, cursor.rowcount
+        return await self.run(_execute)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取排队、执行中任务数与耗时分位数"""
+        with self._lock:
+            calls = self.stats["calls"]
+            samples = list(self._latencies)
+            return {
+                **self.stats,
+                "total_ms": round(self.stats["total_ms"], 3),
+                "max_ms": round(self.stats["max_ms"], 3),
+                "max_queue_ms": round(self.stats["max_queue_ms"], 3),
+                "avg_ms": round(self.stats["total_ms"] / calls, 3) if calls else 0.0,
+                "p50_ms": _percentile(samples, 0.5),
+                "p99_ms": _percentile(samples, 0.99),
+                "pending": self._pending,
+                "active": self._active,
+                "max_workers": self.max_workers
+            }
+
+    def shutdown(self, wait: bool = True):
+        """关闭数据库线程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+# 全局异步数据库（每个数据库文件一个）
+_global_databases: Dict[str, AsyncDatabase] = {}
+_global_databases_lock = threading.Lock()
+
+
+def get_async_database(db_path: Path) -> AsyncDatabase:
+    """
+    获取数据库文件对应的全局异步数据库
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        异步数据库实例
+    """
+    key = str(Path(db_path).resolve())
+    with _global_databases_lock:
+        database = _global_databases.get(key)
+        if database is None:
+            from config import settings
+
+            database = AsyncDatabase(db_path, max_workers=settings.DB_EXECUTOR_WORKERS)
+            _global_databases[key] = database
+    return database
+
+
+def get_async_database_stats() -> List[Dict[str, Any]]:
+    """获取所有异步数据库的统计"""
+    with _global_databases_lock:
+        databases = list(_global_databases.items())
+    return [{"database": key, **database.get_stats()} for key, database in databases]
+
+
+def shutdown_async_databases():
+    """关闭所有数据库线程池（应用关闭时调用，应先于关闭连接池）"""
+    with _global_databases_lock:
+        databases = list(_global_databases.values())
+        _global_databases.clear()
+    for database in databases:
+        database.shutdown()
@@ -0,0 +1,291 @@
+"""
+知识卡片批量导入
+
+逐条 INSERT 导入大批卡片时，每张卡片都要同步维护全文索引、代数触发器和各二级索引，且重复导入无法识别。
+批量导入的做法：
+
+- 按内容哈希（标题 + 正文合并空白后的 SHA-1，content_hash 列唯一索引）以 INSERT OR IGNORE 去重，
+  同一来源重复导入不会产生重复卡片；逐条创建卡片时同样写入哈希（见 KnowledgeRepository.create_card），
+  导入前再为其他途径（脚本、旧版本）写入、缺少哈希的卡片补齐哈希（fill_content_hashes）
+- 卡片流按 batch_size 分批，每批一次 executemany、一个事务，每批提交后回调进度
+- 导入期间放宽连接参数（synchronous=OFF、加大页缓存、临时表放内存），结束后恢复
+- 导入期间移除插入触发器（全文索引、知识代数），可选地移除 knowledge_cards 的二级索引（defer_indexes，
+  适合向空表或小表导入大批卡片），结束时一次性补齐尚未进入全文索引的新卡片、重建索引、递增代数，再恢复触发器
+
+导入期间其他连接（如另一进程启动时的 ensure_card_fts）可能已重建触发器：恢复时触发器/索引按
+IF NOT EXISTS 创建，全文索引只补齐缺少的行（按 FTS5 的 docsize 影子表判断），不会报错或重复索引。
+导入完成后随即补齐新卡片的二字片段索引，避免导入后的第一次短词检索承担全部同步开销。
+
+移除的触发器/索引定义与导入前的最大 ID 先记录在 knowledge_cards_bulk_import 表中：
+导入中途进程退出时，下次导入或后端启动时据此补齐全文索引并恢复（见 recover_bulk_import）。
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from services import card_search
+
+logger = logging.getLogger(__name__)
+
+BULK_IMPORT_TABLE = "knowledge_cards_bulk_import"
+
+# 去重用的唯一索引（导入期间保留）
+CONTENT_HASH_INDEX = "idx_knowledge_cards_content_hash"
+
+INSERT_SQL = """
+    INSERT OR IGNORE INTO knowledge_cards
+        (card_type, title, content, source, url, category, similarity, created_at, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 0.0), COALESCE(?, CURRENT_TIMESTAMP), ?)
+"""
+
+# CREATE [UNIQUE] INDEX / CREATE TRIGGER 语句开头（恢复时改为 IF NOT EXISTS）
+_CREATE_PATTERN = re.compile(r"^\s*CREATE\s+(UNIQUE\s+)?(INDEX|TRIGGER)\s+(?!IF\s+NOT\s+EXISTS\b)", re.IGNORECASE)
+
+# 导入期间的连接参数
+BULK_PRAGMAS = {
+    "synchronous": "OFF",
+    "cache_size": "-65536",
+    "temp_store": "MEMORY",
+}
+
+
+def _normalize(text: str) -> str:
+    # 不做 NFKC：含全角标点的中文正文走不了快速路径，十万张卡片要多花数秒
+    return " ".join((text or "").split())
+
+
+def content_hash(title: str, content: str) -> str:
+    """
+    卡片内容哈希（标题与正文去掉首尾空白、合并连续空白后计算 SHA-1）
+
+    Args:
+        title: 标题
+        content: 正文
+
+    Returns:
+        十六进制哈希
+    """
+    key = f"{_normalize(title)}\x1f{_normalize(content)}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def fill_content_hashes(conn) -> int:
+    """
+    为缺少内容哈希的卡片补齐哈希（已有相同内容的卡片时保持为空，不违反唯一索引）
+
+    只处理 content_hash 为空的行（按唯一索引定位），卡片都有哈希时几乎没有开销
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        补齐的卡片数
+    """
+    conn.create_function("card_content_hash", 2, content_hash, deterministic=True)
+    cursor = conn.execute("""
+        UPDATE knowledge_cards SET content_hash = card_content_hash(title, content)
+        WHERE id IN (
+            SELECT MIN(id) FROM knowledge_cards WHERE content_hash IS NULL
+            GROUP BY card_content_hash(title, content)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM knowledge_cards existing
+            WHERE existing.content_hash = card_content_hash(knowledge_cards.title, knowledge_cards.content)
+        )
+    """)
+    conn.commit()
+    if cursor.rowcount > 0:
+        logger.info(f"[BulkImport] 已为 {cursor.rowcount} 张卡片补齐内容哈希")
+    return cursor.rowcount
+
+
+def _row(card: Dict[str, Any]) -> Optional[tuple]:
+    title = card.get("title")
+    content = card.get("content")
+    if not title or not content:
+        return None
+    return (
+        card.get("card_type") or "blue",
+        title,
+        content,
+        card.get("source", ""),
+        card.get("url", ""),
+        card.get("category", "未分类"),
+        card.get("similarity"),
+        card.get("created_at"),
+        content_hash(title, content),
+    )
+
+
+def _deferred_schema(conn, defer_indexes: bool) -> List[Dict[str, str]]:
+    # 插入触发器（全文索引、知识代数）与可选的二级索引
+    rows = conn.execute("""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name = 'knowledge_cards' AND sql IS NOT NULL
+          AND (type = 'trigger' OR type = 'index')
+    """).fetchall()
+    deferred = []
+    for kind, name, sql in rows:
+        if kind == "trigger" and name in (f"{card_search.FTS_TABLE}_ai", f"{card_search.GENERATION_TABLE}_ai"):
+            deferred.append({"type": kind, "name": name, "sql": sql})
+        elif kind == "index" and defer_indexes and name != CONTENT_HASH_INDEX:
+            deferred.append({"type": kind, "name": name, "sql": sql})
+    return deferred
+
+
+def _if_not_exists(sql: str) -> str:
+    return _CREATE_PATTERN.sub(lambda m: f"CREATE {m.group(1) or ''}{m.group(2).upper()} IF NOT EXISTS ", sql, count=1)
+
+
+def _finish(conn, start_id: int, deferred: List[Dict[str, str]]):
+    # 补齐新卡片的全文索引、恢复触发器与索引、递增代数，并清除导入记录（同一事务）
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (card_search.FTS_TABLE,)
+        ).fetchone():
+            # 导入期间其他连接重建的触发器已索引部分新卡片，只补齐缺少的行
+            conn.execute(f"""
+                INSERT INTO {card_search.FTS_TABLE}(rowid, title, content)
+                SELECT id, title, content FROM knowledge_cards
+                WHERE id > ? AND id NOT IN (SELECT id FROM {card_search.FTS_TABLE}_docsize WHERE id > ?)
+            """, (start_id, start_id))
+        for item in deferred:
+            conn.execute(_if_not_exists(item["sql"]))
+        conn.execute(f"UPDATE {card_search.GENERATION_TABLE} SET generation = generation + 1 WHERE id = 1")
+        conn.execute(f"DELETE FROM {BULK_IMPORT_TABLE}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def recover_bulk_import(conn) -> bool:
+    """
+    恢复中途退出的批量导入（补齐全文索引，恢复触发器与索引）
+
+    恢复失败时只记录错误、保留导入记录（下次再试），不抛出异常，不阻塞后端启动
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        是否完成了恢复
+    """
+    try:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (BULK_IMPORT_TABLE,)
+        ).fetchone():
+            return False
+        row = conn.execute(f"SELECT start_id, deferred_json FROM {BULK_IMPORT_TABLE}").fetchone()
+        if row is None:
+            return False
+
+        logger.warning(f"[BulkImport] 检测到未完成的批量导入（起始 ID {row[0]}），补齐全文索引并恢复触发器与索引")
+        _finish(conn, row[0], json.loads(row[1]))
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"[BulkImport] 恢复未完成的批量导入失败: {e}", exc_info=True)
+        return False
+    return True
+
+
+def bulk_import_cards(conn, cards: Iterable[Dict[str, Any]], batch_size: int = 2000,
+                      defer_indexes: bool = False,
+                      progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """
+    批量导入知识卡片
+
+    Args:
+        conn: 数据库连接（knowledge_cards 需已迁移到含 content_hash 列的结构，见 services/migrations.py）
+        cards: 卡片字典的可迭代对象（可为生成器，按批读取），键同 knowledge_cards 列；
+               缺少标题或正文的卡片计入失败
+        batch_size: 每批（每个事务）的卡片数
+        defer_indexes: 导入期间是否移除二级索引、结束时重建（向空表或小表导入大批卡片时开启；
+                       已有大量卡片而只导入少量时重建索引反而更慢）
+        progress: 每批提交后以当前统计调用
+
+    Returns:
+        导入统计（processed、success、duplicates、failed、batches、elapsed_ms）
+    """
+    start = time.perf_counter()
+    stats = {"processed": 0, "success": 0, "duplicates": 0, "failed": 0, "batches": 0, "elapsed_ms": 0}
+
+    if conn.in_transaction:
+        conn.commit()
+    recover_bulk_import(conn)
+    fill_content_hashes(conn)
+    fts_ready = card_search.ensure_card_fts(conn)
+    card_search.ensure_card_generation(conn)
+
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BULK_IMPORT_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            start_id INTEGER NOT NULL,
+            deferred_json TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        start_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM knowledge_cards").fetchone()[0]
+        deferred = _deferred_schema(conn, defer_indexes)
+        conn.execute(
+            f"INSERT INTO {BULK_IMPORT_TABLE} (id, start_id, deferred_json) VALUES (1, ?, ?)",
+            (start_id, json.dumps(deferred, ensure_ascii=False))
+        )
+        for item in deferred:
+            conn.execute(f"DROP {item['type'].upper()} IF EXISTS {item['name']}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    saved_pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in BULK_PRAGMAS}
+    for name, value in BULK_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    try:
+        iterator = iter(cards)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            rows = [row for row in map(_row, batch) if row is not None]
+            stats["failed"] += len(batch) - len(rows)
+            try:
+                inserted = conn.executemany(INSERT_SQL, rows).rowcount if rows else 0
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                stats["failed"] += len(rows)
+                logger.error(f"[BulkImport] 第 {stats['batches'] + 1} 批导入失败: {e}")
+                inserted = 0
+            else:
+                stats["success"] += inserted
+                stats["duplicates"] += len(rows) - inserted
+            stats["processed"] += len(batch)
+            stats["batches"] += 1
+            stats["elapsed_ms"] = int((time.perf_counter() - start) * 1000)
+            if progress is not None:
+                progress(dict(stats))
+    finally:
+        for name, value in saved_pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        _finish(conn, start_id, deferred)
+
+    if fts_ready:
+        card_search.sync_bigram_index(conn)
+    stats["elapsed_ms"] = int((time.perf_counter() - start) * 1000)
+    logger.info(
+        f"[BulkImport] 导入 {stats['success']} 张卡片（重复 {stats['duplicates']}，失败 {stats['failed']}），"
+        f"{stats['batches']} 批，耗时 {stats['elapsed_ms']}ms"
+    )
+    return stats
@@ -0,0 +1,298 @@
+"""
+太史阁卡片仓库
+
+以 SQLite 持久化太史阁的知识项与卡片，替代进程内的知识列表：
+
+- 知识项原样存入 taishige_knowledge；其中的卡片在写入时展开到 taishige_cards，
+  读取时不再逐项扫描、重建元数据
+- 卡片ID、原始卡片ID 唯一索引，按 ID 查询为 O(log n)
+- 列表按 (timestamp, seq) 倒序，类型过滤与时间排序走复合索引；
+  翻页使用游标（上一页最后一条的 timestamp 与 seq），深翻页不需要跳过前面的行
+"""
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIDENCE = 0.8
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+
+
+def encode_cursor(timestamp: str, seq: int) -> str:
+    """将排序键编码为翻页游标"""
+    return base64.urlsafe_b64encode(json.dumps([timestamp, seq]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    解析翻页游标
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        timestamp, seq = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(timestamp), int(seq)
+    except Exception as e:
+        raise ValueError(f"无效的翻页游标: {cursor}") from e
+
+
+def extract_cards(knowledge_id: str, content: Any) -> List[Dict[str, Any]]:
+    """
+    从知识项内容中提取卡片（包含 cards 列表，或内容本身就是一张卡片）
+
+    Args:
+        knowledge_id: 知识项ID
+        content: 知识项内容
+
+    Returns:
+        [{"id", "source_id", "card"}]
+    """
+    if not isinstance(content, dict):
+        return []
+    if "cards" in content:
+        return [
+            {
+                "id": f"{knowledge_id}_{card.get('id', 'unknown')}",
+                "source_id": card.get("id"),
+                "card": card
+            }
+            for card in content["cards"] if isinstance(card, dict)
+        ]
+    if content.get("type") and content.get("title"):
+        return [{"id": knowledge_id, "source_id": None, "card": content}]
+    return []
+
+
+class CardRepository:
+    """太史阁卡片仓库"""
+
+    def __init__(self, db_path: Path):
+        """
+        初始化卡片仓库
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = Path(db_path)
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS taishige_knowledge (
+                    knowledge_id TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    tags TEXT,
+                    create_time TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS taishige_cards (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    source_id TEXT,
+                    knowledge_id TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    confidence REAL NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    tags TEXT,
+                    refs TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_taishige_cards_source_id ON taishige_cards(source_id);
+                CREATE INDEX IF NOT EXISTS idx_taishige_cards_knowledge_id ON taishige_cards(knowledge_id);
+                CREATE INDEX IF NOT EXISTS idx_taishige_cards_timestamp ON taishige_cards(timestamp, seq);
+                CREATE INDEX IF NOT EXISTS idx_taishige_cards_type_timestamp ON taishige_cards(type, timestamp, seq);
+            """)
+            self._conn.commit()
+
+    @staticmethod
+    def _to_card(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "knowledge_id": row["knowledge_id"],
+            "type": row["type"],
+            "title": row["title"],
+            "content": json.loads(row["content"]),
+            "confidence": row["confidence"],
+            "timestamp": row["timestamp"],
+            "tags": json.loads(row["tags"]) if row["tags"] else [],
+            "references": json.loads(row["refs"]) if row["refs"] else []
+        }
+
+    def add_knowledge(self, knowledge_id: str, content: Any, tags: Optional[List[str]] = None,
+                      create_time: Optional[str] = None) -> List[str]:
+        """
+        写入知识项并展开其中的卡片（同一知识项ID再次写入时整体替换）
+
+        Args:
+            knowledge_id: 知识项ID
+            content: 知识项内容
+            tags: 标签
+            create_time: 创建时间（默认当前时间）
+
+        Returns:
+            写入的卡片ID列表
+        """
+        create_time = create_time or _now()
+        cards = extract_cards(knowledge_id, content)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO taishige_knowledge (knowledge_id, content, tags, create_time) VALUES (?, ?, ?, ?)",
+                (knowledge_id, json.dumps(content, ensure_ascii=False),
+                 json.dumps(tags or [], ensure_ascii=False), create_time)
+            )
+            self._conn.execute("DELETE FROM taishige_cards WHERE knowledge_id = ?", (knowledge_id,))
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO taishige_cards
+                    (id, source_id, knowledge_id, type, title, content, confidence, timestamp, tags, refs)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    item["id"],
+                    item["source_id"],
+                    knowledge_id,
+                    item["card"].get("type", "blue"),
+                    item["card"].get("title", "无标题"),
+                    json.dumps(item["card"], ensure_ascii=False),
+                    item["card"].get("confidence", DEFAULT_CONFIDENCE),
+                    create_time,
+                    json.dumps(item["card"].get("tags", []), ensure_ascii=False),
+                    json.dumps(item["card"].get("references", []), ensure_ascii=False)
+                )
+                for item in cards
+            ])
+        return [item["id"] for item in cards]
+
+    def get_card(self, card_id: str) -> Optional[Dict[str, Any]]:
+        """
+        按卡片ID（或创建时的原始卡片ID）获取卡片
+
+        Args:
+            card_id: 卡片ID
+
+        Returns:
+            卡片字典，未找到返回 None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM taishige_cards WHERE id = ?", (card_id,)).fetchone()
+            if row is None:
+                row = self._conn.execute(
+                    "SELECT * FROM taishige_cards WHERE source_id = ? ORDER BY seq LIMIT 1", (card_id,)
+                ).fetchone()
+        return self._to_card(row) if row else None
+
+    def list_cards(self, card_type: Optional[str] = None, limit: int = 50, offset: int = 0,
+                   cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        按时间倒序列出卡片
+
+        Args:
+            card_type: 卡片类型过滤
+            limit: 返回数量
+            offset: 偏移量（兼容旧接口；提供 cursor 时忽略）
+            cursor: 翻页游标（上一页返回的 next_cursor）
+
+        Returns:
+            (卡片列表, 总数, 下一页游标)，没有更多数据时游标为 None
+
+        Raises:
+            ValueError: 游标格式无效
+        """
+        where = []
+        params: List[Any] = []
+        if card_type:
+            where.append("type = ?")
+            params.append(card_type)
+        count_sql = "SELECT COUNT(*) FROM taishige_cards" + (" WHERE " + " AND ".join(where) if where else "")
+        count_params = list(params)
+
+        if cursor:
+            timestamp, seq = decode_cursor(cursor)
+            where.append("(timestamp, seq) < (?, ?)")
+            params.extend([timestamp, seq])
+            offset = 0
+
+        sql = "SELECT * FROM taishige_cards"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, seq DESC LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])
+
+        with self._lock:
+            total = self._conn.execute(count_sql, count_params).fetchone()[0]
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["timestamp"], rows[-1]["seq"])
+        return [self._to_card(row) for row in rows], total, next_cursor
+
+    def delete_card(self, card_id: str) -> bool:
+        """
+        删除卡片（卡片ID或原始卡片ID）
+
+        Returns:
+            是否删除了卡片
+        """
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM taishige_cards WHERE id = ?", (card_id,)).rowcount
+            if not deleted:
+                row = self._conn.execute(
+                    "SELECT seq FROM taishige_cards WHERE source_id = ? ORDER BY seq LIMIT 1", (card_id,)
+                ).fetchone()
+                if row is not None:
+                    deleted = self._conn.execute("DELETE FROM taishige_cards WHERE seq = ?", (row[0],)).rowcount
+        return deleted > 0
+
+    def count(self) -> int:
+        """卡片总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM taishige_cards").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+# 全局卡片仓库（单例模式）
+_global_card_repository: Optional[CardRepository] = None
+_global_repository_lock = threading.Lock()
+
+
+def get_card_repository() -> CardRepository:
+    """
+    获取全局卡片仓库
+
+    Returns:
+        卡片仓库实例
+    """
+    global _global_card_repository
+
+    with _global_repository_lock:
+        if _global_card_repository is None:
+            from config import settings
+
+            _global_card_repository = CardRepository(settings.TAISHIGE_CARD_DB_PATH)
+            logger.info(f"[CardRepository] 卡片仓库已打开: {settings.TAISHIGE_CARD_DB_PATH}")
+
+    return _global_card_repository
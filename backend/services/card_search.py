@@ -0,0 +1,443 @@
+"""
+知识卡片全文检索
+
+在 knowledge_cards 上建立 FTS5 外部内容索引（trigram 分词，适合没有空格分词的中文），
+由触发器随卡片的插入、更新、删除同步：
+
+- 查询按连续文字切分，每段拆为重叠的三字片段，以 OR 组合后用 BM25 排序
+  （标题权重高于正文），命中片段越多、越集中的卡片排名越靠前
+- 正文命中处生成带 <mark> 标记的摘要
+- 查询中的两字词（如“风险”“库存”）trigram 索引无法匹配，另查二字片段索引
+  （knowledge_cards_bigram，unicode61 分词，内容为空格分隔的重叠二字片段），与 trigram 命中合并排序。
+  二字片段无法在触发器中用 SQL 生成：触发器只把变化的卡片 ID 记入 knowledge_cards_bigram_pending
+  （任何连接、任何进程写入卡片都会记入），由写入方在写入、导入后及启动时调用 sync_bigram_index 补齐。
+  检索本身只读：尚未补齐的卡片对两字词做子串匹配
+- 只有单字查询、或 SQLite 未编译 FTS5 时退回 LIKE 子串匹配
+- similarity 按本次查询的最高分归一化到 0~1（最相关的卡片为 1），各检索路径相同
+
+另由触发器维护知识“代数”（knowledge_cards_generation），卡片每次插入、更新、删除都使其递增，
+检索结果缓存据此失效（见 services/card_search_cache.py）。
+"""
+import logging
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "knowledge_cards_fts"
+BIGRAM_TABLE = "knowledge_cards_bigram"
+BIGRAM_PENDING_TABLE = "knowledge_cards_bigram_pending"
+GENERATION_TABLE = "knowledge_cards_generation"
+
+# BM25 列权重：标题, 正文
+BM25_WEIGHTS = (10.0, 1.0)
+
+# 单次查询最多使用的三字片段数（长查询只取前面的片段，控制检索开销）
+MAX_QUERY_TRIGRAMS = 32
+
+# 每个事务补齐二字片段的卡片数
+BIGRAM_SYNC_BATCH = 2000
+
+SNIPPET_TOKENS = 24
+
+_SEGMENT_PATTERN = re.compile(r"[^\s\"'，。！？、；：,.!?;:()（）\[\]【】<>《》]+")
+
+# 已确认建立索引 / 代数触发器的数据库文件（避免每次检索都检查表结构）
+_ready_databases = set()
+_generation_databases = set()
+
+
+def _database_file(conn: sqlite3.Connection) -> str:
+    row = conn.execute("PRAGMA database_list").fetchone()
+    return row[2] if row else ""
+
+
+def ensure_card_fts(conn: sqlite3.Connection) -> bool:
+    """
+    创建全文索引与同步触发器，新建索引时从现有卡片回填
+
+    Args:
+        conn: 数据库连接（knowledge_cards 表需已存在）
+
+    Returns:
+        全文索引是否可用（SQLite 不支持 FTS5 时返回 False）
+    """
+    database = _database_file(conn)
+    if database and database in _ready_databases:
+        return True
+
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).fetchone() is not None
+        if not exists:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+                    title, content,
+                    content='knowledge_cards', content_rowid='id',
+                    tokenize='trigram'
+                )
+            """)
+        conn.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON knowledge_cards BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON knowledge_cards BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON knowledge_cards BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+                VALUES ('delete', old.id, old.title, old.content);
+                INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+            END;
+        """)
+        if not exists:
+            conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            logger.info("[CardSearch] 已建立知识卡片全文索引")
+        _ensure_bigram_index(conn)
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        logger.warning(f"[CardSearch] 全文索引不可用，使用 LIKE 检索: {e}")
+        return False
+
+    if database:
+        _ready_databases.add(database)
+    return True
+
+
+def _ensure_bigram_index(conn: sqlite3.Connection):
+    # 二字片段索引与待同步卡片表；新建索引时全部卡片记为待同步
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (BIGRAM_TABLE,)
+    ).fetchone() is not None
+    if not exists:
+        conn.execute(f"CREATE VIRTUAL TABLE {BIGRAM_TABLE} USING fts5(title, content, tokenize='unicode61')")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {BIGRAM_PENDING_TABLE} (id INTEGER PRIMARY KEY)")
+    for event, suffix, row in (("INSERT", "ai", "new"), ("UPDATE OF title, content", "au", "old"),
+                               ("DELETE", "ad", "old")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {BIGRAM_TABLE}_{suffix} AFTER {event} ON knowledge_cards BEGIN
+                INSERT OR IGNORE INTO {BIGRAM_PENDING_TABLE} (id) VALUES ({row}.id);
+            END
+        """)
+    if not exists:
+        conn.execute(f"INSERT OR IGNORE INTO {BIGRAM_PENDING_TABLE} (id) SELECT id FROM knowledge_cards")
+
+
+def bigram_text(text: Optional[str]) -> str:
+    """
+    将文本转换为空格分隔的重叠二字片段（二字片段索引的内容）
+
+    Args:
+        text: 原文
+
+    Returns:
+        二字片段文本，如 “库存风险” -> “库存 存风 风险”
+    """
+    grams: List[str] = []
+    for segment in _SEGMENT_PATTERN.findall((text or "").lower()):
+        grams.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return " ".join(grams)
+
+
+def sync_bigram_index(conn: sqlite3.Connection) -> int:
+    """
+    补齐待同步卡片的二字片段索引
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        同步的卡片数
+    """
+    pending = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (BIGRAM_PENDING_TABLE,)
+    ).fetchone()
+    if pending is None or conn.execute(f"SELECT 1 FROM {BIGRAM_PENDING_TABLE} LIMIT 1").fetchone() is None:
+        return 0
+
+    synced = 0
+    if conn.in_transaction:
+        conn.commit()
+    while True:
+        # 读取与清除待同步记录在同一写事务中，期间其他连接的写入排在其后，不会漏记
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(f"""
+                SELECT p.id, c.title, c.content FROM {BIGRAM_PENDING_TABLE} p
+                LEFT JOIN knowledge_cards c ON c.id = p.id
+                LIMIT ?
+            """, (BIGRAM_SYNC_BATCH,)).fetchall()
+            ids = [(row[0],) for row in rows]
+            conn.executemany(f"DELETE FROM {BIGRAM_TABLE} WHERE rowid = ?", ids)
+            conn.executemany(
+                f"INSERT INTO {BIGRAM_TABLE}(rowid, title, content) VALUES (?, ?, ?)",
+                [(row[0], bigram_text(row[1]), bigram_text(row[2])) for row in rows if row[1] is not None]
+            )
+            conn.executemany(f"DELETE FROM {BIGRAM_PENDING_TABLE} WHERE id = ?", ids)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        synced += len(rows)
+        if len(rows) < BIGRAM_SYNC_BATCH:
+            break
+    if synced > 1:
+        logger.info(f"[CardSearch] 已同步 {synced} 张卡片的二字片段索引")
+    return synced
+
+
+def ensure_card_generation(conn: sqlite3.Connection):
+    """
+    创建知识代数计数表与递增触发器（任何连接、任何进程写入卡片都会使代数递增）
+
+    Args:
+        conn: 数据库连接（knowledge_cards 表需已存在）
+    """
+    database = _database_file(conn)
+    if database and database in _generation_databases:
+        return
+
+    statements = [f"""
+        CREATE TABLE IF NOT EXISTS {GENERATION_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+    """, f"INSERT OR IGNORE INTO {GENERATION_TABLE} (id, generation) VALUES (1, 0)"]
+    for event, suffix in (("INSERT", "ai"), ("UPDATE", "au"), ("DELETE", "ad")):
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS {GENERATION_TABLE}_{suffix} AFTER {event} ON knowledge_cards BEGIN
+                UPDATE {GENERATION_TABLE} SET generation = generation + 1 WHERE id = 1;
+            END
+        """)
+    for statement in statements:
+        conn.execute(statement)
+    conn.commit()
+
+    if database:
+        _generation_databases.add(database)
+
+
+def get_generation(conn: sqlite3.Connection) -> int:
+    """
+    读取当前知识代数
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        代数（卡片的插入、更新、删除都会使其递增）
+    """
+    ensure_card_generation(conn)
+    row = conn.execute(f"SELECT generation FROM {GENERATION_TABLE} WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+def reset_schema_cache(conn: sqlite3.Connection):
+    """knowledge_cards 表重建后调用：下次检索时重新建立全文索引与代数触发器"""
+    database = _database_file(conn)
+    _ready_databases.discard(database)
+    _generation_databases.discard(database)
+
+
+def build_match_query(query: str, max_trigrams: int = MAX_QUERY_TRIGRAMS) -> Tuple[Optional[str], List[str]]:
+    """
+    将自然语言查询转换为 FTS5 MATCH 表达式
+
+    Args:
+        query: 查询文本
+        max_trigrams: 最多使用的三字片段数
+
+    Returns:
+        (MATCH 表达式, 不足 3 个字的片段)，没有可用片段时表达式为 None
+    """
+    trigrams: List[str] = []
+    short_terms: List[str] = []
+    for segment in _SEGMENT_PATTERN.findall(query.lower()):
+        if len(segment) < 3:
+            short_terms.append(segment)
+            continue
+        for i in range(len(segment) - 2):
+            gram = segment[i:i + 3]
+            if gram not in trigrams:
+                trigrams.append(gram)
+
+    trigrams = trigrams[:max_trigrams]
+    if not trigrams:
+        return None, short_terms
+    return " OR ".join(f'"{gram}"' for gram in trigrams), short_terms
+
+
+def build_bigram_query(terms: List[str]) -> Optional[str]:
+    """
+    将两字词转换为二字片段索引的 MATCH 表达式
+
+    Args:
+        terms: 查询中不足 3 个字的片段
+
+    Returns:
+        MATCH 表达式，没有两字词时为 None
+    """
+    bigrams: List[str] = []
+    for term in terms:
+        if len(term) == 2 and term not in bigrams:
+            bigrams.append(term)
+    if not bigrams:
+        return None
+    return " OR ".join(f'"{gram}"' for gram in bigrams)
+
+
+def _normalize_similarity(cards: List[Dict[str, Any]]):
+    # 按本次查询的最高分归一化（score 为 BM25 分数，越小越相关）
+    top = max((-card["score"] for card in cards), default=0.0)
+    for card in cards:
+        relevance = max(0.0, -card["score"])
+        card["similarity"] = round(relevance / top, 4) if top > 0 else 1.0
+
+
+def _type_column(conn: sqlite3.Connection) -> Optional[str]:
+    # 卡片类型列（迁移前的旧表为 type）
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(knowledge_cards)")}
+    return next((name for name in ("card_type", "type") if name in columns), None)
+
+
+def _like_snippet(text: str, term: str, width: int = SNIPPET_TOKENS) -> str:
+    index = text.lower().find(term)
+    if index < 0:
+        return text[:width * 2]
+    start = max(0, index - width)
+    end = min(len(text), index + len(term) + width)
+    return (
+        ("…" if start > 0 else "")
+        + text[start:index] + "<mark>" + text[index:index + len(term)] + "</mark>" + text[index + len(term):end]
+        + ("…" if end < len(text) else "")
+    )
+
+
+def _like_card(card: Dict[str, Any], terms: List[str]) -> Dict[str, Any]:
+    # 子串命中的卡片：按与 BM25 相同的列权重计分，生成摘要
+    title = (card.get("title") or "").lower()
+    content = card.get("content") or ""
+    card["score"] = -sum(
+        BM25_WEIGHTS[0] * (t in title) + BM25_WEIGHTS[1] * (t in content.lower()) for t in terms
+    )
+    card["snippet"] = _like_snippet(content, next((t for t in terms if t in content.lower()), terms[0]))
+    return card
+
+
+def _like_conditions(terms: List[str]) -> Tuple[str, List[Any]]:
+    conditions = " OR ".join(["LOWER(c.title) LIKE ? OR LOWER(c.content) LIKE ?"] * len(terms))
+    params: List[Any] = []
+    for term in terms:
+        params.extend([f"%{term}%", f"%{term}%"])
+    return conditions, params
+
+
+def _bigram_hits(cursor: sqlite3.Cursor, match: str, terms: List[str], type_filter: str,
+                 type_params: Tuple, limit: int) -> List[Dict[str, Any]]:
+    """
+    二字片段索引命中（只读）
+
+    尚未同步的卡片（knowledge_cards_bigram_pending）不使用索引中可能过期的内容，
+    改为对这部分卡片做子串匹配（通常只有最近写入的少量卡片）
+    """
+    cursor.execute(f"""
+        SELECT c.*, bm25({BIGRAM_TABLE}, ?, ?) AS score
+        FROM {BIGRAM_TABLE}
+        JOIN knowledge_cards c ON c.id = {BIGRAM_TABLE}.rowid
+        WHERE {BIGRAM_TABLE} MATCH ? {type_filter}
+          AND c.id NOT IN (SELECT id FROM {BIGRAM_PENDING_TABLE})
+        ORDER BY score
+        LIMIT ?
+    """, (*BM25_WEIGHTS, match, *type_params, limit))
+    cards = []
+    for row in cursor.fetchall():
+        card = dict(row)
+        content = card.get("content") or ""
+        card["snippet"] = _like_snippet(content, next((t for t in terms if t in content.lower()), terms[0]))
+        cards.append(card)
+
+    conditions, params = _like_conditions(terms)
+    cursor.execute(f"""
+        SELECT c.* FROM {BIGRAM_PENDING_TABLE} p
+        JOIN knowledge_cards c ON c.id = p.id
+        WHERE ({conditions}) {type_filter}
+        LIMIT ?
+    """, (*params, *type_params, limit))
+    cards.extend(_like_card(dict(row), terms) for row in cursor.fetchall())
+    return cards
+
+
+def search_cards(conn: sqlite3.Connection, query: str, limit: int = 10,
+                 card_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    检索知识卡片
+
+    Args:
+        conn: 数据库连接
+        query: 查询文本
+        limit: 返回数量上限
+        card_type: 卡片类型过滤（在 SQL 中过滤，过滤后仍按 limit 返回）
+
+    Returns:
+        卡片字典列表（knowledge_cards 的全部列，另含 score、similarity、snippet），按相关度排序
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    match, short_terms = build_match_query(query)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+
+    type_filter, type_params = "", ()
+    if card_type:
+        column = _type_column(conn)
+        if column is None:
+            return []
+        type_filter, type_params = f"AND c.{column} = ?", (card_type,)
+
+    bigram_match = build_bigram_query(short_terms)
+    if (match is not None or bigram_match is not None) and ensure_card_fts(conn):
+        # 三字片段与二字片段的命中合并排序（如“数据 analysis”的“数据”不会被丢弃），两边都命中时分数相加
+        cards: Dict[int, Dict[str, Any]] = {}
+        if match is not None:
+            cursor.execute(f"""
+                SELECT c.*,
+                       bm25({FTS_TABLE}, ?, ?) AS score,
+                       snippet({FTS_TABLE}, 1, '<mark>', '</mark>', '…', ?) AS snippet
+                FROM {FTS_TABLE}
+                JOIN knowledge_cards c ON c.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH ? {type_filter}
+                ORDER BY score
+                LIMIT ?
+            """, (*BM25_WEIGHTS, SNIPPET_TOKENS, match, *type_params, limit))
+            cards = {row["id"]: dict(row) for row in cursor.fetchall()}
+        if bigram_match is not None:
+            bigram_terms = [t for t in short_terms if len(t) == 2]
+            for card in _bigram_hits(cursor, bigram_match, bigram_terms, type_filter, type_params, limit):
+                found = cards.get(card["id"])
+                if found is None:
+                    cards[card["id"]] = card
+                else:
+                    found["score"] += card["score"]
+        ranked = sorted(cards.values(), key=lambda c: c["score"])[:limit]
+        _normalize_similarity(ranked)
+        return ranked
+
+    # 单字查询或不支持 FTS5：LIKE 子串匹配，按与 BM25 相同的列权重计分
+    terms = short_terms or [query.lower()]
+    conditions, params = _like_conditions(terms)
+    cursor.execute(f"""
+        SELECT * FROM knowledge_cards c
+        WHERE ({conditions}) {type_filter}
+        ORDER BY id DESC
+        LIMIT ?
+    """, (*params, *type_params, limit))
+
+    cards = [_like_card(dict(row), terms) for row in cursor.fetchall()]
+    cards.sort(key=lambda c: c["score"])
+    _normalize_similarity(cards)
+    return cards
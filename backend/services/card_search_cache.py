@@ -0,0 +1,220 @@
+"""
+知识卡片检索结果缓存
+
+对话中的推荐问题、追问常重复相同或仅大小写/空白不同的检索，结果按
+(规范化查询, 过滤条件, 数量) 缓存在内存 LRU 中：
+
+- 失效依据数据库中的知识代数（card_search.get_generation）：卡片的任何插入、更新、删除
+  都由触发器使代数递增，包括其他连接与导入脚本等其他进程的写入
+- 每个数据库文件一个分区，分区记录其缓存时的代数；代数变化时整个分区一次丢弃，不需要逐个扫描键
+- 按条目数与估算内存双重上限淘汰最久未使用的结果
+- 内存数据库（没有文件路径）不缓存
+"""
+import logging
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import card_search
+
+logger = logging.getLogger(__name__)
+
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """规范化查询文本（全角转半角、小写、合并空白）"""
+    return _SPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", query or "")).strip().lower()
+
+
+def _estimate_size(cards: List[Dict[str, Any]]) -> int:
+    """估算结果列表占用的内存（字节）"""
+    size = sys.getsizeof(cards)
+    for card in cards:
+        size += sys.getsizeof(card)
+        for key, value in card.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+    return size
+
+
+class _Partition:
+    """单个数据库文件的缓存分区"""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.entries: "OrderedDict[Tuple, Tuple[List[Dict[str, Any]], int]]" = OrderedDict()
+
+
+class CardSearchCache:
+    """知识卡片检索结果缓存"""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 条目上限（所有数据库合计）
+            max_bytes: 估算内存上限
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._partitions: Dict[str, _Partition] = {}
+        # 跨分区的 LRU 顺序：(数据库, 键) -> None
+        self._order: "OrderedDict[Tuple[str, Tuple], None]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(query: str, limit: int, card_type: Optional[str] = None) -> Tuple:
+        """构建缓存键"""
+        return (normalize_query(query), card_type or None, int(limit))
+
+    def _drop_partition(self, database: str):
+        partition = self._partitions.pop(database, None)
+        if partition is None:
+            return
+        for key, (_, size) in partition.entries.items():
+            self._order.pop((database, key), None)
+            self._bytes -= size
+
+    def _partition(self, database: str, generation: int) -> _Partition:
+        partition = self._partitions.get(database)
+        if partition is not None and partition.generation != generation:
+            self._drop_partition(database)
+            self.stats["invalidations"] += 1
+            partition = None
+        if partition is None:
+            partition = _Partition(generation)
+            self._partitions[database] = partition
+        return partition
+
+    def get(self, database: str, generation: int, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """
+        查询缓存
+
+        Returns:
+            缓存的结果（副本），未命中返回 None
+        """
+        with self._lock:
+            partition = self._partition(database, generation)
+            entry = partition.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            partition.entries.move_to_end(key)
+            self._order.move_to_end((database, key))
+            self.stats["hits"] += 1
+            return [dict(card) for card in entry[0]]
+
+    def put(self, database: str, generation: int, key: Tuple, cards: List[Dict[str, Any]]):
+        """写入缓存（结果对应的代数必须是检索前读取的代数）"""
+        size = _estimate_size(cards)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            partition = self._partition(database, generation)
+            previous = partition.entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            partition.entries[key] = ([dict(card) for card in cards], size)
+            self._order[(database, key)] = None
+            self._order.move_to_end((database, key))
+            self._bytes += size
+
+            while self._order and (len(self._order) > self.max_entries or self._bytes > self.max_bytes):
+                (old_database, old_key), _ = self._order.popitem(last=False)
+                _, old_size = self._partitions[old_database].entries.pop(old_key)
+                self._bytes -= old_size
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._partitions.clear()
+            self._order.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中率与内存占用"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._order),
+                "memory_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "generations": {database: partition.generation for database, partition in self._partitions.items()}
+            }
+
+
+def search_cards_cached(conn, query: str, limit: int = 10, card_type: Optional[str] = None,
+                        cache: Optional[CardSearchCache] = None) -> List[Dict[str, Any]]:
+    """
+    带缓存的知识卡片检索（返回格式同 card_search.search_cards）
+
+    Args:
+        conn: 数据库连接
+        query: 查询文本
+        limit: 返回数量上限
+        card_type: 卡片类型过滤（匹配 card_type 或旧表的 type 列，在 SQL 中过滤）
+        cache: 缓存实例（默认使用全局缓存）
+
+    Returns:
+        卡片字典列表
+    """
+    cache = cache or get_card_search_cache()
+    database = card_search._database_file(conn)
+    # 按缓存键同样的规范化检索：同一键下的结果与原始写法无关
+    normalized = normalize_query(query)
+
+    def _search():
+        return card_search.search_cards(conn, normalized, limit=limit, card_type=card_type)
+
+    if not database or not normalized:
+        return _search()
+
+    # 先读取代数再检索：检索期间发生的写入会使代数再次递增，不会把旧结果挂在新代数下
+    generation = card_search.get_generation(conn)
+    key = cache.make_key(query, limit, card_type)
+    cards = cache.get(database, generation, key)
+    if cards is None:
+        cards = _search()
+        cache.put(database, generation, key, cards)
+    return cards
+
+
+# 全局检索缓存（单例模式）
+_global_card_search_cache: Optional[CardSearchCache] = None
+_global_cache_lock = threading.Lock()
+
+
+def get_card_search_cache() -> CardSearchCache:
+    """
+    获取全局知识卡片检索缓存
+
+    Returns:
+        缓存实例
+    """
+    global _global_card_search_cache
+
+    with _global_cache_lock:
+        if _global_card_search_cache is None:
+            from config import settings
+
+            _global_card_search_cache = CardSearchCache(
+                max_entries=settings.CARD_SEARCH_CACHE_ENTRIES,
+                max_bytes=settings.CARD_SEARCH_CACHE_MAX_MB * 1024 * 1024
+            )
+
+    return _global_card_search_cache
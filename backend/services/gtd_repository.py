@@ -0,0 +1,113 @@
+"""
+GTD 任务仓库
+
+gtd_tasks 表的异步数据访问，查询在数据库线程池中执行（见 services/async_db.py）
+"""
+from typing import Any, Dict, List, Optional, TypedDict
+
+from services.async_db import AsyncDatabase
+from services.pagination import DEFAULT_PAGE_SIZE, Page, fetch_page, parse_fields
+
+TASK_FIELDS = ("id", "title", "description", "category", "priority", "due_date", "created_at", "updated_at")
+TASK_COLUMNS = ", ".join(TASK_FIELDS)
+
+# 允许更新的字段
+UPDATABLE_FIELDS = ("title", "description", "category", "priority", "due_date")
+
+
+class GTDTaskRow(TypedDict):
+    """gtd_tasks 行"""
+    id: int
+    title: str
+    description: Optional[str]
+    category: str
+    priority: Optional[str]
+    due_date: Optional[str]
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+
+class GTDStats(TypedDict):
+    """GTD 统计"""
+    total: int
+    by_category: Dict[str, int]
+    by_priority: Dict[str, int]
+
+
+class GTDRepository:
+    """GTD 任务仓库"""
+
+    def __init__(self, db: AsyncDatabase):
+        self.db = db
+
+    async def list_page(self, category: Optional[str] = None, cursor: Optional[str] = None,
+                        limit: Optional[int] = DEFAULT_PAGE_SIZE, fields: Optional[str] = None) -> Page:
+        """
+        按创建时间倒序分页列出任务（游标分页，见 services/pagination.py；limit 与 cursor 都为空时返回全部任务，最多 MAX_UNPAGED_ROWS 条）
+
+        Raises:
+            ValueError: 游标或 fields 无效
+        """
+        columns = parse_fields(fields, TASK_FIELDS)
+        filters = [("category", category)] if category is not None else []
+        return await self.db.run(fetch_page, "gtd_tasks", columns, filters, cursor, limit)
+
+    async def get_task(self, task_id: int) -> Optional[GTDTaskRow]:
+        """获取任务，不存在返回 None"""
+        return await self.db.fetch_one(f"SELECT {TASK_COLUMNS} FROM gtd_tasks WHERE id = ?", (task_id,))
+
+    async def create_task(self, title: str, description: Optional[str], category: str,
+                          priority: Optional[str], due_date: Optional[str]) -> GTDTaskRow:
+        """创建任务并返回新行"""
+        def _create(conn):
+            cursor = conn.execute("""
+                INSERT INTO gtd_tasks (title, description, category, priority, due_date, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, datetime('now'), datetime('now'))
+            """, (title, description, category, priority, due_date))
+            row = conn.execute(f"SELECT {TASK_COLUMNS} FROM gtd_tasks WHERE id = ?", (cursor.lastrowid,)).fetchone()
+            return dict(row)
+        return await self.db.run(_create)
+
+    async def update_task(self, task_id: int, fields: Dict[str, Any]) -> Optional[GTDTaskRow]:
+        """
+        更新任务（忽略值为 None 与不允许更新的字段）
+
+        Returns:
+            更新后的行，任务不存在返回 None
+        """
+        updates = [(name, fields[name]) for name in UPDATABLE_FIELDS if fields.get(name) is not None]
+
+        def _update(conn):
+            assignments = [f"{name} = ?" for name, _ in updates] + ["updated_at = datetime('now')"]
+            cursor = conn.execute(
+                f"UPDATE gtd_tasks SET {', '.join(assignments)} WHERE id = ?",
+                [value for _, value in updates] + [task_id]
+            )
+            if cursor.rowcount == 0:
+                return None
+            return dict(conn.execute(f"SELECT {TASK_COLUMNS} FROM gtd_tasks WHERE id = ?", (task_id,)).fetchone())
+        return await self.db.run(_update)
+
+    async def delete_task(self, task_id: int) -> bool:
+        """删除任务，返回是否删除了任务"""
+        _, rowcount = await self.db.execute("DELETE FROM gtd_tasks WHERE id = ?", (task_id,))
+        return rowcount > 0
+
+    async def count(self) -> int:
+        """任务总数"""
+        return await self.db.fetch_value("SELECT COUNT(*) FROM gtd_tasks", default=0)
+
+    async def get_stats(self) -> GTDStats:
+        """按类别、优先级统计任务数"""
+        def _stats(conn):
+            by_category = {
+                row["category"]: row["count"]
+                for row in conn.execute("SELECT category, COUNT(*) AS count FROM gtd_tasks GROUP BY category")
+            }
+            by_priority = {
+                row["priority"]: row["count"]
+                for row in conn.execute("SELECT priority, COUNT(*) AS count FROM gtd_tasks GROUP BY priority")
+            }
+            total = conn.execute("SELECT COUNT(*) FROM gtd_tasks").fetchone()[0]
+            return {"total": total, "by_category": by_category, "by_priority": by_priority}
+        return await self.db.run(_stats)
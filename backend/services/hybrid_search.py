@@ -0,0 +1,369 @@
+"""
+混合检索
+
+同时检索词法与向量后端，以倒数排名融合（RRF）合并结果：
+
+- cards：知识卡片 FTS5 全文检索（BM25，词法）
+- memory：太史阁记忆库的哈希 TF-IDF 向量检索
+- cases：历史案例 FAISS 语义检索（向量检索模块可用时）
+
+各后端在线程中并发执行，超时、失败或不可用的后端跳过，不影响其他后端的结果；
+融合分数为 Σ weight / (k + rank)，只依赖排名，不需要对齐各后端的分数尺度。
+不同存储中标题与正文相同的结果按规范化文本指纹去重合并。
+响应包含各后端与融合阶段的耗时。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from services import card_search
+from services.card_search_cache import CardSearchCache, get_card_search_cache, search_cards_cached
+
+logger = logging.getLogger(__name__)
+
+# 去重指纹取规范化正文的前若干字
+FINGERPRINT_CHARS = 200
+
+# 记忆库知识类型对应的卡片颜色
+MEMORY_CARD_TYPES = {
+    "fact": "blue",
+    "explanation": "green",
+    "risk": "yellow",
+    "action": "red"
+}
+
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+class BackendUnavailable(Exception):
+    """检索后端当前不可用（依赖未安装、索引不存在等）"""
+    pass
+
+
+def content_fingerprint(title: Optional[str], body: Optional[str]) -> str:
+    """
+    计算去重指纹（忽略空白与大小写）
+
+    Args:
+        title: 标题
+        body: 正文
+
+    Returns:
+        指纹字符串
+    """
+    text = _SPACE_PATTERN.sub("", f"{title or ''}\0{(body or '')[:FINGERPRINT_CHARS]}").lower()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _hit(backend: str, source_id: Any, title: Optional[str], body: Optional[str], score: float, **extra) -> Dict[str, Any]:
+    """构建统一格式的后端命中结果"""
+    return {
+        "id": f"{backend}:{source_id}",
+        "source": backend,
+        "source_id": source_id,
+        "title": title or "",
+        "body": body or "",
+        "score": float(score) if score is not None else 0.0,
+        **extra
+    }
+
+
+class CardBackend:
+    """知识卡片全文检索后端"""
+
+    name = "cards"
+
+    def __init__(self, db_path: Path, cache: Optional[CardSearchCache] = None):
+        """
+        Args:
+            db_path: 数据库文件路径
+            cache: 检索结果缓存（None 表示不缓存）
+        """
+        self.db_path = db_path
+        self.cache = cache
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            if self.cache is not None:
+                rows = search_cards_cached(conn, query, limit=limit, cache=self.cache)
+            else:
+                rows = card_search.search_cards(conn, query, limit=limit)
+        finally:
+            conn.close()
+
+        return [
+            _hit(
+                self.name, row["id"], row.get("title"), row.get("content"), row["similarity"],
+                card_type=row.get("card_type") or row.get("type") or "blue",
+                category=row.get("category"),
+                snippet=row.get("snippet")
+            )
+            for row in rows
+        ]
+
+
+class MemoryBackend:
+    """太史阁记忆库向量检索后端"""
+
+    name = "memory"
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._agent = None
+        self._lock = threading.Lock()
+
+    def _get_agent(self):
+        with self._lock:
+            if self._agent is None:
+                from agents.memory import MemoryAgent
+
+                self._agent = MemoryAgent(db_path=str(self.db_path))
+            return self._agent
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        if not Path(self.db_path).exists():
+            raise BackendUnavailable(f"记忆库不存在: {self.db_path}")
+
+        hits = []
+        for item in self._get_agent().search_knowledge(query, limit=limit):
+            content = item.get("content")
+            body = item.get("description") or (
+                content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+            )
+            hits.append(_hit(
+                self.name, item["id"], item.get("title"), body, item["score"],
+                card_type=MEMORY_CARD_TYPES.get(item["knowledge_type"], "blue"),
+                category=item["knowledge_type"]
+            ))
+        return hits
+
+
+class CaseBackend:
+    """历史案例 FAISS 语义检索后端（与太史阁 retrieve_cases 使用同一向量检索模块）"""
+
+    name = "cases"
+
+    def __init__(self):
+        self._retrieval = None
+        self._unavailable: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _get_retrieval(self):
+        with self._lock:
+            if self._unavailable:
+                raise BackendUnavailable(self._unavailable)
+            if self._retrieval is None:
+                try:
+                    from scripts.vector_retrieval import VectorRetrieval
+                except ImportError as e:
+                    self._unavailable = f"向量检索模块未安装: {e}"
+                    raise BackendUnavailable(self._unavailable)
+                self._retrieval = VectorRetrieval()
+            return self._retrieval
+
+    def search(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        hits = []
+        for result in self._get_retrieval().search(query, top_k=limit):
+            metadata = result.get("metadata") or {}
+            hits.append(_hit(
+                self.name, result["id"], metadata.get("title"), result.get("text"), result["similarity"],
+                card_type=metadata.get("card_type", "blue"),
+                category=metadata.get("category"),
+                metadata=metadata
+            ))
+        return hits
+
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[Dict[str, Any]]], k: int = 60,
+                           weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """
+    倒数排名融合，按内容指纹合并不同后端的相同结果
+
+    Args:
+        ranked: {后端名: 按相关度排序的命中列表}
+        k: 平滑常数（越大，排名靠后的结果与靠前结果的差距越小）
+        weights: 后端权重（默认均为 1）
+
+    Returns:
+        融合后的结果（含 rrf_score、similarity 与 matches），按 rrf_score 降序
+    """
+    weights = weights or {}
+    fused: Dict[str, Dict[str, Any]] = {}
+    for backend, hits in ranked.items():
+        weight = weights.get(backend, 1.0)
+        seen = set()
+        for rank, hit in enumerate(hits, 1):
+            fingerprint = content_fingerprint(hit["title"], hit["body"])
+            # 同一后端内的重复结果只计排名最高的一次
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+
+            contribution = weight / (k + rank)
+            match = {"backend": backend, "id": hit["id"], "rank": rank, "score": hit["score"]}
+            entry = fused.get(fingerprint)
+            if entry is None:
+                entry = dict(hit)
+                entry["rrf_score"] = 0.0
+                entry["similarity"] = hit["score"]
+                entry["matches"] = []
+                entry["_best"] = contribution
+                fused[fingerprint] = entry
+            elif contribution > entry["_best"]:
+                # 展示字段取自排名贡献最大的后端
+                for key, value in hit.items():
+                    entry[key] = value
+                entry["_best"] = contribution
+            entry["rrf_score"] += contribution
+            entry["similarity"] = max(entry["similarity"], hit["score"])
+            entry["matches"].append(match)
+
+    results = sorted(fused.values(), key=lambda item: item["rrf_score"], reverse=True)
+    for item in results:
+        del item["_best"]
+        item["rrf_score"] = round(item["rrf_score"], 6)
+        item["similarity"] = round(item["similarity"], 4)
+    return results
+
+
+class HybridRetriever:
+    """混合检索服务"""
+
+    def __init__(self, backends: Sequence[Any], rrf_k: int = 60, candidates: int = 20,
+                 timeout_seconds: float = 2.0, weights: Optional[Dict[str, float]] = None):
+        """
+        初始化混合检索
+
+        Args:
+            backends: 检索后端（具有 name 属性与 search(query, limit) 方法）
+            rrf_k: RRF 平滑常数
+            candidates: 每个后端取回的候选数
+            timeout_seconds: 单个后端的超时时间
+            weights: 后端权重
+        """
+        self.backends = {backend.name: backend for backend in backends}
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+        self.timeout_seconds = timeout_seconds
+        self.weights = weights or {}
+
+    @staticmethod
+    def _timed_search(backend, query: str, limit: int):
+        start = time.perf_counter()
+        hits = backend.search(query, limit)
+        return hits, (time.perf_counter() - start) * 1000
+
+    async def _run_backend(self, backend, query: str, limit: int) -> Dict[str, Any]:
+        try:
+            hits, latency_ms = await asyncio.wait_for(
+                asyncio.to_thread(self._timed_search, backend, query, limit),
+                timeout=self.timeout_seconds
+            )
+            return {"status": "ok", "hits": hits, "latency_ms": round(latency_ms, 2)}
+        except asyncio.TimeoutError:
+            logger.warning(f"[HybridSearch] 后端 {backend.name} 超时（{self.timeout_seconds}s），跳过")
+            return {"status": "timeout", "hits": [], "latency_ms": round(self.timeout_seconds * 1000, 2)}
+        except BackendUnavailable as e:
+            return {"status": "unavailable", "hits": [], "latency_ms": 0.0, "error": str(e)}
+        except Exception as e:
+            logger.error(f"[HybridSearch] 后端 {backend.name} 检索失败: {e}", exc_info=True)
+            return {"status": "error", "hits": [], "latency_ms": 0.0, "error": str(e)}
+
+    async def search(self, query: str, limit: int = 10,
+                     backends: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        并发检索各后端并融合结果
+
+        Args:
+            query: 查询文本
+            limit: 返回数量上限
+            backends: 参与检索的后端名（None 表示全部）
+
+        Returns:
+            {"query", "results", "backends": {后端名: 状态/命中数/耗时}, "timings": 各阶段耗时(ms)}
+
+        Raises:
+            ValueError: 指定了未知的后端
+        """
+        names = list(self.backends) if backends is None else backends
+        unknown = [name for name in names if name not in self.backends]
+        if unknown:
+            raise ValueError(f"未知的检索后端: {', '.join(unknown)}，可用: {', '.join(self.backends)}")
+
+        start = time.perf_counter()
+        query = (query or "").strip()
+        if not query:
+            return {"query": query, "results": [], "backends": {}, "timings": {"total_ms": 0.0}}
+
+        limit_per_backend = max(self.candidates, limit)
+        outcomes = await asyncio.gather(*[
+            self._run_backend(self.backends[name], query, limit_per_backend) for name in names
+        ])
+        retrieval_ms = (time.perf_counter() - start) * 1000
+
+        fusion_start = time.perf_counter()
+        ranked = {name: outcome["hits"] for name, outcome in zip(names, outcomes) if outcome["hits"]}
+        results = reciprocal_rank_fusion(ranked, k=self.rrf_k, weights=self.weights)[:limit]
+        fusion_ms = (time.perf_counter() - fusion_start) * 1000
+
+        backend_stats = {}
+        timings = {}
+        for name, outcome in zip(names, outcomes):
+            backend_stats[name] = {
+                "status": outcome["status"],
+                "count": len(outcome["hits"]),
+                "latency_ms": outcome["latency_ms"]
+            }
+            if "error" in outcome:
+                backend_stats[name]["error"] = outcome["error"]
+            timings[f"{name}_ms"] = outcome["latency_ms"]
+        timings["retrieval_ms"] = round(retrieval_ms, 2)
+        timings["fusion_ms"] = round(fusion_ms, 2)
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        logger.info(
+            f"[HybridSearch] 查询 {query[:30]!r}: {len(results)} 条结果, "
+            + ", ".join(f"{name}={stats['status']}/{stats['count']}" for name, stats in backend_stats.items())
+            + f", 总耗时 {timings['total_ms']}ms"
+        )
+        return {"query": query, "results": results, "backends": backend_stats, "timings": timings}
+
+
+# 全局混合检索服务（单例模式）
+_global_hybrid_retriever: Optional[HybridRetriever] = None
+_global_retriever_lock = threading.Lock()
+
+
+def get_hybrid_retriever() -> HybridRetriever:
+    """
+    获取全局混合检索服务
+
+    Returns:
+        混合检索服务实例
+    """
+    global _global_hybrid_retriever
+
+    with _global_retriever_lock:
+        if _global_hybrid_retriever is None:
+            from config import settings
+
+            _global_hybrid_retriever = HybridRetriever(
+                backends=[
+                    CardBackend(settings.DB_PATH, cache=get_card_search_cache()),
+                    MemoryBackend(settings.DATA_DIR / "memory.db"),
+                    CaseBackend()
+                ],
+                rrf_k=settings.HYBRID_SEARCH_RRF_K,
+                candidates=settings.HYBRID_SEARCH_CANDIDATES,
+                timeout_seconds=settings.HYBRID_SEARCH_TIMEOUT_SECONDS
+            )
+
+    return _global_hybrid_retriever
@@ -0,0 +1,157 @@
+"""
+知识卡片仓库
+
+knowledge_cards / knowledge_sources 表的异步数据访问，查询在数据库线程池中执行（见 services/async_db.py），
+供知识管理与聊天路由共用
+"""
+import logging
+import sqlite3
+from typing import Dict, List, Optional, TypedDict
+
+from services.async_db import AsyncDatabase
+from services.card_bulk_import import content_hash
+from services.card_search import sync_bigram_index
+from services.card_search_cache import CardSearchCache, search_cards_cached
+from services.pagination import DEFAULT_PAGE_SIZE, Page, fetch_page, parse_fields
+
+# 列表接口可投影的列
+CARD_FIELDS = ("id", "title", "content", "card_type", "category", "source", "url", "similarity",
+               "created_at", "updated_at")
+
+logger = logging.getLogger(__name__)
+
+
+class KnowledgeCardRow(TypedDict, total=False):
+    """knowledge_cards 行"""
+    id: int
+    title: str
+    content: str
+    card_type: str
+    category: Optional[str]
+    source: Optional[str]
+    url: Optional[str]
+    similarity: Optional[float]
+    created_at: Optional[str]
+    updated_at: Optional[str]
+
+
+class KnowledgeSearchHit(KnowledgeCardRow, total=False):
+    """检索结果（另含 BM25 分数、相似度与摘要）"""
+    score: Optional[float]
+    snippet: str
+
+
+class KnowledgeStats(TypedDict):
+    """知识库统计"""
+    total_cards: int
+    cards_by_type: Dict[str, int]
+    cards_by_category: Dict[str, int]
+
+
+def card_color(card: KnowledgeCardRow) -> str:
+    """卡片颜色"""
+    return card.get("card_type") or "blue"
+
+
+class KnowledgeRepository:
+    """知识卡片仓库"""
+
+    def __init__(self, db: AsyncDatabase, cache: Optional[CardSearchCache] = None):
+        """
+        Args:
+            db: 异步数据库
+            cache: 检索结果缓存（默认使用全局缓存）
+        """
+        self.db = db
+        self.cache = cache
+
+    async def list_page(self, card_type: Optional[str] = None, category: Optional[str] = None,
+                        cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE,
+                        fields: Optional[str] = None, offset: int = 0) -> Page:
+        """
+        按创建时间倒序分页列出卡片（游标分页，见 services/pagination.py；fields 可省去正文等大字段，
+        limit 与 cursor 都为空时返回全部卡片，最多 MAX_UNPAGED_ROWS 张）
+
+        Raises:
+            ValueError: 游标或 fields 无效
+        """
+        columns = parse_fields(fields, CARD_FIELDS)
+        filters = [(column, value) for column, value in (("card_type", card_type), ("category", category)) if value]
+        return await self.db.run(fetch_page, "knowledge_cards", columns, filters, cursor, limit, offset)
+
+    async def count(self, card_type: Optional[str] = None) -> int:
+        """卡片总数（按颜色过滤）"""
+        if card_type:
+            return await self.db.fetch_value(
+                "SELECT COUNT(*) FROM knowledge_cards WHERE card_type = ?", (card_type,), default=0
+            )
+        return await self.db.fetch_value("SELECT COUNT(*) FROM knowledge_cards", default=0)
+
+    async def list_for_graph(self, card_type: Optional[str] = None, limit: int = 100) -> List[KnowledgeCardRow]:
+        """取知识图谱的卡片（按颜色过滤）"""
+        if card_type:
+            return await self.db.fetch_all(
+                "SELECT * FROM knowledge_cards WHERE card_type = ? LIMIT ?", (card_type, limit)
+            )
+        return await self.db.fetch_all("SELECT * FROM knowledge_cards LIMIT ?", (limit,))
+
+    async def get_card(self, card_id: int) -> Optional[KnowledgeCardRow]:
+        """获取卡片，不存在返回 None"""
+        return await self.db.fetch_one("SELECT * FROM knowledge_cards WHERE id = ?", (card_id,))
+
+    async def create_card(self, card_type: str, title: str, content: str, source: Optional[str] = None,
+                          url: Optional[str] = None, category: Optional[str] = None) -> KnowledgeCardRow:
+        """创建卡片并返回新行（已有相同标题与正文的卡片时返回已有卡片，与批量导入按内容哈希去重一致）"""
+        digest = content_hash(title, content)
+
+        def _create(conn):
+            existing = conn.execute("SELECT * FROM knowledge_cards WHERE content_hash = ?", (digest,)).fetchone()
+            if existing is not None:
+                return dict(existing)
+            cursor = conn.execute("""
+                INSERT INTO knowledge_cards (card_type, title, content, source, url, category, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (card_type, title, content, source, url, category, digest))
+            return dict(conn.execute("SELECT * FROM knowledge_cards WHERE id = ?", (cursor.lastrowid,)).fetchone())
+        card = await self.db.run(_create)
+        await self._sync_bigram_index()
+        return card
+
+    async def delete_card(self, card_id: int) -> bool:
+        """删除卡片，返回是否删除了卡片"""
+        _, rowcount = await self.db.execute("DELETE FROM knowledge_cards WHERE id = ?", (card_id,))
+        if rowcount > 0:
+            await self._sync_bigram_index()
+        return rowcount > 0
+
+    async def _sync_bigram_index(self):
+        # 写入后补齐二字片段索引；失败（如数据库忙）时保留待同步记录，检索仍以子串匹配覆盖这些卡片
+        try:
+            await self.db.run(sync_bigram_index)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"[KnowledgeRepository] 二字片段索引同步失败，稍后重试: {e}")
+
+    async def get_stats(self) -> KnowledgeStats:
+        """卡片总数与按类型、分类的分布"""
+        def _stats(conn):
+            total = conn.execute("SELECT COUNT(*) FROM knowledge_cards").fetchone()[0]
+            by_type = {
+                row[0]: row[1] for row in conn.execute(
+                    "SELECT card_type, COUNT(*) FROM knowledge_cards GROUP BY card_type"
+                )
+            }
+            by_category = {
+                row[0]: row[1] for row in conn.execute(
+                    "SELECT category, COUNT(*) FROM knowledge_cards WHERE category IS NOT NULL GROUP BY category"
+                )
+            }
+            return {"total_cards": total, "cards_by_type": by_type, "cards_by_category": by_category}
+        return await self.db.run(_stats)
+
+    async def search(self, query: str, limit: int = 10, card_type: Optional[str] = None) -> List[KnowledgeSearchHit]:
+        """全文检索卡片（经检索结果缓存）"""
+        return await self.db.run(search_cards_cached, query, limit=limit, card_type=card_type, cache=self.cache)
+
+    async def list_sources(self) -> List[Dict]:
+        """按最近导入时间列出知识来源"""
+        return await self.db.fetch_all("SELECT * FROM knowledge_sources ORDER BY last_imported DESC")
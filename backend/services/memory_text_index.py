@@ -0,0 +1,279 @@
+"""
+太史阁文本索引
+
+基于哈希技巧的 TF-IDF 向量与 SQLite 倒排索引：
+
+- 分词：英文/数字按词切分，连续汉字切为二字片段（单字保留原字）
+- 词项经 CRC32 哈希为整数；文档频率按 knowledge_type 增量维护，IDF 随语料实时变化
+- 倒排表记录每个文档的次线性词频，检索时先按查询词项从倒排表取候选文档
+  （按 Σ 词频 × 查询权重 预排序并截断），再对候选打分，开销随查询词项而非语料规模增长
+- 稠密向量：词项哈希折叠到 512 维（带符号哈希，减少碰撞偏差），按 TF-IDF 加权后归一化；
+  文档向量使用写入时的 IDF
+"""
+import math
+import re
+import sqlite3
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+POSTINGS_TABLE = "knowledge_postings"
+TERM_DF_TABLE = "knowledge_term_df"
+INDEXED_TABLE = "knowledge_indexed"
+TYPE_STATS_TABLE = "knowledge_type_stats"
+
+# 候选文档数 = max(返回数量 × 倍数, 下限)
+CANDIDATE_MULTIPLIER = 10
+MIN_CANDIDATES = 100
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9_]+|[一-鿿]+")
+
+
+def ensure_text_index(conn: sqlite3.Connection):
+    """创建倒排索引相关表"""
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS {POSTINGS_TABLE} (
+            knowledge_type TEXT NOT NULL,
+            term INTEGER NOT NULL,
+            knowledge_id TEXT NOT NULL,
+            tf REAL NOT NULL,
+            PRIMARY KEY (knowledge_type, term, knowledge_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_{POSTINGS_TABLE}_knowledge_id ON {POSTINGS_TABLE}(knowledge_id);
+
+        CREATE TABLE IF NOT EXISTS {TERM_DF_TABLE} (
+            knowledge_type TEXT NOT NULL,
+            term INTEGER NOT NULL,
+            df INTEGER NOT NULL,
+            PRIMARY KEY (knowledge_type, term)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS {INDEXED_TABLE} (
+            knowledge_id TEXT PRIMARY KEY,
+            knowledge_type TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS {TYPE_STATS_TABLE} (
+            knowledge_type TEXT PRIMARY KEY,
+            doc_count INTEGER NOT NULL
+        );
+    """)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词
+
+    Args:
+        text: 文本
+
+    Returns:
+        词项列表（英文/数字词，汉字二字片段）
+    """
+    tokens: List[str] = []
+    for segment in _TOKEN_PATTERN.findall((text or "").lower()):
+        if "一" <= segment[0] <= "鿿" and len(segment) > 1:
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+        else:
+            tokens.append(segment)
+    return tokens
+
+
+def term_hash(term: str) -> int:
+    """词项哈希（跨进程稳定）"""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def term_counts(text: str) -> Dict[int, int]:
+    """
+    统计文本的哈希词频
+
+    Args:
+        text: 文本
+
+    Returns:
+        {词项哈希: 出现次数}
+    """
+    return dict(Counter(term_hash(token) for token in tokenize(text)))
+
+
+def _sublinear_tf(count: int) -> float:
+    return 1.0 + math.log(count)
+
+
+def add_document(cursor: sqlite3.Cursor, knowledge_type: str, knowledge_id: str, counts: Dict[int, int]):
+    """
+    将文档写入倒排索引并更新文档频率
+
+    Args:
+        cursor: 数据库游标（由调用方提交事务）
+        knowledge_type: 知识类型
+        knowledge_id: 知识ID
+        counts: 哈希词频
+    """
+    add_documents(cursor, knowledge_type, [(knowledge_id, counts)])
+
+
+def add_documents(cursor: sqlite3.Cursor, knowledge_type: str, documents: List[Tuple[str, Dict[int, int]]]):
+    """
+    批量写入倒排索引（文档频率在内存中汇总后一次更新）
+
+    Args:
+        cursor: 数据库游标（由调用方提交事务）
+        knowledge_type: 知识类型
+        documents: [(知识ID, 哈希词频)]
+    """
+    if not documents:
+        return
+    cursor.executemany(
+        f"INSERT INTO {INDEXED_TABLE} (knowledge_id, knowledge_type) VALUES (?, ?)",
+        [(knowledge_id, knowledge_type) for knowledge_id, _ in documents]
+    )
+    cursor.execute(f"""
+        INSERT INTO {TYPE_STATS_TABLE} (knowledge_type, doc_count) VALUES (?, ?)
+        ON CONFLICT(knowledge_type) DO UPDATE SET doc_count = doc_count + excluded.doc_count
+    """, (knowledge_type, len(documents)))
+    cursor.executemany(
+        f"INSERT INTO {POSTINGS_TABLE} (knowledge_type, term, knowledge_id, tf) VALUES (?, ?, ?, ?)",
+        [
+            (knowledge_type, term, knowledge_id, _sublinear_tf(count))
+            for knowledge_id, counts in documents
+            for term, count in counts.items()
+        ]
+    )
+    df = Counter(term for _, counts in documents for term in counts)
+    cursor.executemany(f"""
+        INSERT INTO {TERM_DF_TABLE} (knowledge_type, term, df) VALUES (?, ?, ?)
+        ON CONFLICT(knowledge_type, term) DO UPDATE SET df = df + excluded.df
+    """, [(knowledge_type, term, count) for term, count in df.items()])
+
+
+def remove_document(cursor: sqlite3.Cursor, knowledge_id: str):
+    """
+    从倒排索引移除文档并更新文档频率（文档未索引时不做处理）
+
+    Args:
+        cursor: 数据库游标（由调用方提交事务）
+        knowledge_id: 知识ID
+    """
+    row = cursor.execute(
+        f"SELECT knowledge_type FROM {INDEXED_TABLE} WHERE knowledge_id = ?", (knowledge_id,)
+    ).fetchone()
+    if row is None:
+        return
+    knowledge_type = row[0]
+
+    terms = [r[0] for r in cursor.execute(
+        f"SELECT term FROM {POSTINGS_TABLE} WHERE knowledge_id = ?", (knowledge_id,)
+    ).fetchall()]
+    cursor.executemany(
+        f"UPDATE {TERM_DF_TABLE} SET df = df - 1 WHERE knowledge_type = ? AND term = ?",
+        [(knowledge_type, term) for term in terms]
+    )
+    cursor.execute(f"DELETE FROM {TERM_DF_TABLE} WHERE knowledge_type = ? AND df <= 0", (knowledge_type,))
+    cursor.execute(f"DELETE FROM {POSTINGS_TABLE} WHERE knowledge_id = ?", (knowledge_id,))
+    cursor.execute(f"DELETE FROM {INDEXED_TABLE} WHERE knowledge_id = ?", (knowledge_id,))
+    cursor.execute(
+        f"UPDATE {TYPE_STATS_TABLE} SET doc_count = doc_count - 1 WHERE knowledge_type = ?", (knowledge_type,)
+    )
+
+
+def idf_weights(cursor: sqlite3.Cursor, knowledge_type: str, terms: Optional[Iterable[int]]) -> Dict[int, float]:
+    """
+    计算词项的平滑 IDF：log((1 + N) / (1 + df)) + 1
+
+    Args:
+        cursor: 数据库游标
+        knowledge_type: 知识类型
+        terms: 词项哈希（None 表示该类型的全部词项，用于批量生成向量）
+
+    Returns:
+        {词项哈希: IDF}
+    """
+    terms = list(terms) if terms is not None else None
+    if terms == []:
+        return {}
+    row = cursor.execute(
+        f"SELECT doc_count FROM {TYPE_STATS_TABLE} WHERE knowledge_type = ?", (knowledge_type,)
+    ).fetchone()
+    doc_count = row[0] if row else 0
+
+    if terms is None:
+        df = dict(cursor.execute(
+            f"SELECT term, df FROM {TERM_DF_TABLE} WHERE knowledge_type = ?", (knowledge_type,)
+        ).fetchall())
+        terms = list(df)
+    else:
+        placeholders = ", ".join("?" * len(terms))
+        df = dict(cursor.execute(
+            f"SELECT term, df FROM {TERM_DF_TABLE} WHERE knowledge_type = ? AND term IN ({placeholders})",
+            (knowledge_type, *terms)
+        ).fetchall())
+    return {term: math.log((1 + doc_count) / (1 + df.get(term, 0))) + 1.0 for term in terms}
+
+
+def dense_vector(counts: Dict[int, int], idf: Dict[int, float], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    将哈希词频折叠为归一化的 TF-IDF 稠密向量
+
+    Args:
+        counts: 哈希词频
+        idf: 词项 IDF
+        dim: 向量维度
+
+    Returns:
+        float32 向量（没有词项时为零向量）
+    """
+    if not counts:
+        return np.zeros(dim, dtype=np.float32)
+    buckets = [term % dim for term in counts]
+    weights = [
+        (-1.0 if (term >> 16) & 1 else 1.0) * _sublinear_tf(count) * idf.get(term, 1.0)
+        for term, count in counts.items()
+    ]
+    vector = np.bincount(buckets, weights=weights, minlength=dim).astype(np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+def candidate_ids(
+    cursor: sqlite3.Cursor,
+    knowledge_type: str,
+    counts: Dict[int, int],
+    idf: Dict[int, float],
+    limit: int
+) -> List[str]:
+    """
+    从倒排表取与查询共享词项的候选文档
+
+    Args:
+        cursor: 数据库游标
+        knowledge_type: 知识类型
+        counts: 查询的哈希词频
+        idf: 查询词项 IDF
+        limit: 最终返回数量（候选数按倍数放大）
+
+    Returns:
+        候选知识ID，按 Σ 文档词频 × 查询权重 降序
+    """
+    if not counts:
+        return []
+    weights: List[Tuple[int, float]] = [
+        (term, _sublinear_tf(count) * idf.get(term, 1.0)) for term, count in counts.items()
+    ]
+    values = ", ".join("(?, ?)" for _ in weights)
+    params: List = [value for pair in weights for value in pair]
+    rows = cursor.execute(f"""
+        WITH query_terms(term, weight) AS (VALUES {values})
+        SELECT p.knowledge_id, SUM(p.tf * q.weight) AS partial_score
+        FROM query_terms q
+        JOIN {POSTINGS_TABLE} p ON p.knowledge_type = ? AND p.term = q.term
+        GROUP BY p.knowledge_id
+        ORDER BY partial_score DESC
+        LIMIT ?
+    """, (*params, knowledge_type, max(limit * CANDIDATE_MULTIPLIER, MIN_CANDIDATES))).fetchall()
+    return [row[0] for row in rows]
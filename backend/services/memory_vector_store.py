@@ -0,0 +1,251 @@
+"""
+太史阁向量存储
+
+知识向量以 float32 BLOB 存入 knowledge.embedding，并按 knowledge_type 在内存中镜像为
+连续矩阵（行已归一化）：
+
+- 某类知识首次检索时从数据库整体加载一次，之后随存储、更新增量写入，不再逐行解析 JSON
+- 检索为一次矩阵-向量乘积（或只取候选行）加 argpartition 取前 k 个；
+  多个查询合并为一次矩阵-矩阵乘积
+- 兼容旧版以 JSON 文本存储的向量：加载时解码并改写为 BLOB
+"""
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 512
+
+# 矩阵初始行数（之后按倍数扩容，追加为均摊 O(1)）
+INITIAL_CAPACITY = 256
+
+
+def encode_embedding(vector: Sequence[float]) -> bytes:
+    """将向量编码为 float32 BLOB"""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_embedding(value: Any, dim: int = EMBEDDING_DIM) -> Optional[np.ndarray]:
+    """
+    解码数据库中的向量
+
+    Args:
+        value: float32 BLOB 或旧版 JSON 文本
+        dim: 向量维度
+
+    Returns:
+        float32 向量，无法解码或维度不符时返回 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        vector = np.frombuffer(value, dtype=np.float32)
+    else:
+        try:
+            vector = np.asarray(json.loads(value), dtype=np.float32)
+        except (TypeError, ValueError):
+            return None
+    if vector.ndim != 1 or vector.shape[0] != dim:
+        return None
+    return vector
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+class _TypeMatrix:
+    """单个知识类型的向量矩阵"""
+
+    def __init__(self, dim: int):
+        self.matrix = np.zeros((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def upsert(self, knowledge_id: str, vector: np.ndarray):
+        row = self.rows.get(knowledge_id)
+        if row is None:
+            row = len(self.ids)
+            if row == self.matrix.shape[0]:
+                grown = np.zeros((row * 2, self.matrix.shape[1]), dtype=np.float32)
+                grown[:row] = self.matrix
+                self.matrix = grown
+            self.ids.append(knowledge_id)
+            self.rows[knowledge_id] = row
+        self.matrix[row] = _normalize(vector)
+
+
+class MemoryVectorStore:
+    """按知识类型镜像向量矩阵的内存索引"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        """
+        初始化向量存储
+
+        Args:
+            dim: 向量维度
+        """
+        self.dim = dim
+        self._types: Dict[str, _TypeMatrix] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, knowledge_type: str) -> bool:
+        """该类型的矩阵是否已加载"""
+        return knowledge_type in self._types
+
+    def load(self, knowledge_type: str, rows: Iterable[Tuple[str, Any]]) -> List[Tuple[str, bytes]]:
+        """
+        从数据库行构建某类型的矩阵
+
+        Args:
+            knowledge_type: 知识类型
+            rows: (知识ID, 数据库中的向量) 序列
+
+        Returns:
+            需要改写为 BLOB 的旧版 JSON 向量 [(BLOB, 知识ID)]
+        """
+        table = _TypeMatrix(self.dim)
+        legacy: List[Tuple[str, bytes]] = []
+        for knowledge_id, value in rows:
+            vector = decode_embedding(value, self.dim)
+            if vector is None:
+                continue
+            if not isinstance(value, (bytes, bytearray, memoryview)):
+                legacy.append((encode_embedding(vector), knowledge_id))
+            table.upsert(knowledge_id, vector)
+
+        with self._lock:
+            self._types[knowledge_type] = table
+        logger.info(f"[MemoryVectorStore] 已加载 {knowledge_type} 向量矩阵: {len(table.ids)} 条")
+        return legacy
+
+    def upsert(self, knowledge_type: str, knowledge_id: str, vector: Sequence[float]):
+        """
+        写入或替换一条向量（该类型尚未加载时跳过，首次检索时会从数据库完整加载）
+
+        Args:
+            knowledge_type: 知识类型
+            knowledge_id: 知识ID
+            vector: 向量
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            return
+        with self._lock:
+            table = self._types.get(knowledge_type)
+            if table is not None:
+                table.upsert(knowledge_id, vector)
+
+    def search(
+        self,
+        knowledge_type: str,
+        query_vector: Sequence[float],
+        limit: int,
+        min_score: float = 0.0,
+        candidates: Optional[Sequence[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        余弦相似度检索
+
+        Args:
+            knowledge_type: 知识类型
+            query_vector: 查询向量
+            limit: 返回数量上限
+            min_score: 相似度下限（不含）
+            candidates: 只对这些知识ID打分（None 表示整个矩阵）
+
+        Returns:
+            [(知识ID, 相似度)]，按相似度降序
+        """
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        return self.search_batch(knowledge_type, query, limit, min_score=min_score, candidates=candidates)[0]
+
+    def search_batch(
+        self,
+        knowledge_type: str,
+        query_vectors: np.ndarray,
+        limit: int,
+        min_score: float = 0.0,
+        candidates: Optional[Sequence[str]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        多查询余弦相似度检索（所有查询一次矩阵乘积打分）
+
+        Args:
+            knowledge_type: 知识类型
+            query_vectors: 查询向量矩阵 (查询数, 维度)
+            limit: 每个查询的返回数量上限
+            min_score: 相似度下限（不含）
+            candidates: 只对这些知识ID打分（None 表示整个矩阵），所有查询共用
+
+        Returns:
+            每个查询的 [(知识ID, 相似度)]，按相似度降序
+        """
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+        empty = [[] for _ in range(queries.shape[0])]
+
+        with self._lock:
+            table = self._types.get(knowledge_type)
+            if table is None or not table.ids or limit <= 0:
+                return empty
+            if candidates is None:
+                ids = list(table.ids)
+                scores = queries @ table.matrix[:len(ids)].T
+            else:
+                ids = [knowledge_id for knowledge_id in dict.fromkeys(candidates) if knowledge_id in table.rows]
+                scores = queries @ table.matrix[[table.rows[knowledge_id] for knowledge_id in ids]].T
+            count = len(ids)
+            if count == 0:
+                return empty
+
+        k = min(limit, count)
+        if k < count:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(count), (scores.shape[0], count))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(ids[i], float(score)) for i, score in zip(row_ids, row_scores) if score > min_score]
+            for row_ids, row_scores in zip(top.tolist(), top_scores.tolist())
+        ]
+
+    def get_stats(self) -> Dict[str, int]:
+        """各类型已加载的向量数"""
+        with self._lock:
+            return {knowledge_type: len(table.ids) for knowledge_type, table in self._types.items()}
+
+
+# 按数据库文件共享的向量存储（同一进程中多个 MemoryAgent 指向同一数据库时共用镜像）
+_global_vector_stores: Dict[str, MemoryVectorStore] = {}
+_global_vector_stores_lock = threading.Lock()
+
+
+def get_memory_vector_store(db_path: str) -> MemoryVectorStore:
+    """
+    获取数据库对应的向量存储
+
+    Args:
+        db_path: 太史阁数据库路径
+
+    Returns:
+        向量存储实例
+    """
+    key = os.path.abspath(db_path)
+    with _global_vector_stores_lock:
+        store = _global_vector_stores.get(key)
+        if store is None:
+            store = MemoryVectorStore()
+            _global_vector_stores[key] = store
+    return store
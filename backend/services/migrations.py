@@ -0,0 +1,352 @@
+"""
+数据库结构迁移
+
+按编号顺序执行迁移，已执行的版本记录在 schema_migrations 表中，每个迁移只执行一次：
+
+1. baseline：原 DatabaseManager.init_database 建立的各表
+2. knowledge_cards_schema：统一知识卡片表结构。历史上 knowledge_cards 有两种定义
+   （card_type 列 / 带 CHECK 约束的 type 列），导入工具又另有一种；统一为以 card_type 为颜色列、
+   包含 source、url、similarity 的结构，原有数据（含 type 列中的颜色）原样迁入，ID 不变；
+   同时建立 knowledge_sources 表
+3. hot_query_indexes：为热点查询建立索引（排序与过滤列组成的复合索引，分组统计走覆盖索引）
+4. knowledge_cards_content_hash：增加内容哈希列与唯一索引，供批量导入去重（见 services/card_bulk_import.py）；
+   已有的重复卡片只为最早的一张填写哈希
+5. page_key_indexes：游标分页的排序表达式 COALESCE(created_at, '') 上的索引（见 services/pagination.py），
+   created_at 为 NULL 的行也能按索引翻到
+
+每个迁移在 BEGIN IMMEDIATE 事务中执行，并在事务内再次确认版本，多个进程同时启动时不会重复执行。
+"""
+import logging
+import sqlite3
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+class Migration:
+    """编号迁移"""
+
+    def __init__(self, version: int, name: str, apply: Callable[[sqlite3.Connection], None]):
+        """
+        Args:
+            version: 版本号（递增）
+            name: 名称
+            apply: 迁移函数，在事务中以数据库连接调用
+        """
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+
+def _columns(conn, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _baseline(conn):
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS team_members (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            role TEXT NOT NULL,
+            avatar TEXT,
+            online BOOLEAN DEFAULT 0,
+            join_date TEXT,
+            last_active TEXT,
+            permissions TEXT,  -- JSON数组
+            contribution INTEGER DEFAULT 0,
+            email TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_spaces (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            members TEXT,  -- JSON数组
+            owner TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            card_count INTEGER DEFAULT 0,
+            is_public BOOLEAN DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS collaboration_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT NOT NULL,
+            action TEXT NOT NULL,
+            content TEXT,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            space_id INTEGER,
+            metadata TEXT  -- JSON
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS analytics_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category TEXT NOT NULL,  -- growth, network, heatmap, roi
+            data_json TEXT NOT NULL,  -- JSON格式的数据
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS comments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT NOT NULL,
+            user_avatar TEXT,
+            content TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            target_id INTEGER,  -- 关联的目标ID
+            target_type TEXT,  -- space, card, etc.
+            parent_id INTEGER,  -- 父评论ID
+            metadata TEXT  -- JSON
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            card_type TEXT DEFAULT 'blue',
+            category TEXT,
+            similarity REAL DEFAULT 0.0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS checklist_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_json TEXT NOT NULL,  -- sections数组的JSON
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS gtd_tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT CHECK(priority IN ('low', 'medium', 'high')),
+            due_date TEXT,
+            category TEXT CHECK(category IN ('inbox', 'today', 'later', 'archive', 'projects')),
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+# 统一后的知识卡片表：列名 -> (定义, 旧表缺少该列时的取值)
+KNOWLEDGE_CARD_COLUMNS = [
+    ("id", "INTEGER PRIMARY KEY AUTOINCREMENT", None),
+    ("title", "TEXT NOT NULL", None),
+    ("content", "TEXT NOT NULL", None),
+    ("card_type", "TEXT NOT NULL DEFAULT 'blue'", "'blue'"),
+    ("category", "TEXT", "NULL"),
+    ("source", "TEXT", "NULL"),
+    ("url", "TEXT", "NULL"),
+    ("similarity", "REAL DEFAULT 0.0", "0.0"),
+    ("created_at", "TEXT DEFAULT CURRENT_TIMESTAMP", "CURRENT_TIMESTAMP"),
+    ("updated_at", "TEXT DEFAULT CURRENT_TIMESTAMP", "CURRENT_TIMESTAMP"),
+]
+
+
+def _knowledge_cards_schema(conn):
+    from services import card_search
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS knowledge_sources (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_path TEXT NOT NULL UNIQUE,
+            source_type TEXT,
+            total_cards INTEGER DEFAULT 0,
+            last_imported TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    existing = _columns(conn, "knowledge_cards")
+    target = [name for name, _, _ in KNOWLEDGE_CARD_COLUMNS]
+    if set(existing) == set(target):
+        return
+
+    expressions = []
+    for name, _, fallback in KNOWLEDGE_CARD_COLUMNS:
+        if name == "card_type":
+            sources = [f"NULLIF({col}, '')" for col in ("card_type", "type") if col in existing]
+            expressions.append(f"COALESCE({', '.join(sources + [fallback])})")
+        elif name in existing:
+            expressions.append(name)
+        else:
+            expressions.append(fallback)
+
+    definitions = ",\n".join(f"{name} {definition}" for name, definition, _ in KNOWLEDGE_CARD_COLUMNS)
+    conn.execute(f"CREATE TABLE knowledge_cards_migrated (\n{definitions}\n)")
+    conn.execute(
+        f"INSERT INTO knowledge_cards_migrated ({', '.join(target)}) "
+        f"SELECT {', '.join(expressions)} FROM knowledge_cards"
+    )
+    # 删除旧表时其上的全文索引、代数触发器一并删除；外部内容全文索引随后按新表重建
+    conn.execute("DROP TABLE knowledge_cards")
+    conn.execute("ALTER TABLE knowledge_cards_migrated RENAME TO knowledge_cards")
+    conn.execute(f"DROP TABLE IF EXISTS {card_search.FTS_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {card_search.BIGRAM_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {card_search.BIGRAM_PENDING_TABLE}")
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (card_search.GENERATION_TABLE,)
+    ).fetchone():
+        conn.execute(f"UPDATE {card_search.GENERATION_TABLE} SET generation = generation + 1 WHERE id = 1")
+    card_search.reset_schema_cache(conn)
+    logger.info(f"[Migrations] knowledge_cards 已统一为 card_type 结构（原有列: {', '.join(existing)}）")
+
+
+HOT_QUERY_INDEXES = [
+    # 协作活动：最近活动
+    "CREATE INDEX IF NOT EXISTS idx_collaboration_activities_timestamp ON collaboration_activities(timestamp)",
+    # 评论：按目标取评论，按时间排序
+    "CREATE INDEX IF NOT EXISTS idx_comments_target ON comments(target_id, target_type, created_at)",
+    # GTD：按类别/全部按时间倒序
+    "CREATE INDEX IF NOT EXISTS idx_gtd_tasks_category_created ON gtd_tasks(category, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_gtd_tasks_created ON gtd_tasks(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_gtd_tasks_priority ON gtd_tasks(priority)",
+    # 分析数据、检查清单：取最新一条
+    "CREATE INDEX IF NOT EXISTS idx_analytics_data_category_updated ON analytics_data(category, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_checklist_data_updated ON checklist_data(updated_at)",
+    # 团队成员、知识空间列表排序
+    "CREATE INDEX IF NOT EXISTS idx_team_members_contribution ON team_members(contribution)",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_spaces_card_count ON knowledge_spaces(card_count)",
+    # 知识卡片：按颜色/分类过滤并按时间排序，按颜色按 ID 倒序翻页，分组统计
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_type_created ON knowledge_cards(card_type, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_type_id ON knowledge_cards(card_type, id)",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_category_created ON knowledge_cards(category, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_created ON knowledge_cards(created_at)",
+    # 知识来源：按最近导入排序
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_sources_last_imported ON knowledge_sources(last_imported)",
+]
+
+
+def _hot_query_indexes(conn):
+    for statement in HOT_QUERY_INDEXES:
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+
+
+def _knowledge_cards_content_hash(conn):
+    from services.card_bulk_import import CONTENT_HASH_INDEX, content_hash
+
+    if "content_hash" not in _columns(conn, "knowledge_cards"):
+        conn.execute("ALTER TABLE knowledge_cards ADD COLUMN content_hash TEXT")
+    conn.create_function("card_content_hash", 2, content_hash, deterministic=True)
+    conn.execute("""
+        UPDATE knowledge_cards SET content_hash = card_content_hash(title, content)
+        WHERE id IN (SELECT MIN(id) FROM knowledge_cards GROUP BY card_content_hash(title, content))
+    """)
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {CONTENT_HASH_INDEX} ON knowledge_cards(content_hash)")
+
+
+PAGE_KEY_INDEXES = [
+    # 游标分页：全部/按过滤列，按 COALESCE(created_at, '') 倒序（表达式须与 services/pagination.py 的 PAGE_KEY 一致）
+    "CREATE INDEX IF NOT EXISTS idx_gtd_tasks_page ON gtd_tasks(COALESCE(created_at, ''))",
+    "CREATE INDEX IF NOT EXISTS idx_gtd_tasks_category_page ON gtd_tasks(category, COALESCE(created_at, ''))",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_page ON knowledge_cards(COALESCE(created_at, ''))",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_type_page ON knowledge_cards(card_type, COALESCE(created_at, ''))",
+    "CREATE INDEX IF NOT EXISTS idx_knowledge_cards_category_page "
+    "ON knowledge_cards(category, COALESCE(created_at, ''))",
+]
+
+
+def _page_key_indexes(conn):
+    for statement in PAGE_KEY_INDEXES:
+        conn.execute(statement)
+    conn.execute("ANALYZE")
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "knowledge_cards_schema", _knowledge_cards_schema),
+    Migration(3, "hot_query_indexes", _hot_query_indexes),
+    Migration(4, "knowledge_cards_content_hash", _knowledge_cards_content_hash),
+    Migration(5, "page_key_indexes", _page_key_indexes),
+]
+
+
+def _ensure_migrations_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def current_version(conn) -> int:
+    """
+    当前结构版本
+
+    Args:
+        conn: 数据库连接
+
+    Returns:
+        已执行的最大迁移版本（未执行过任何迁移为 0）
+    """
+    _ensure_migrations_table(conn)
+    row = conn.execute(f"SELECT MAX(version) FROM {MIGRATIONS_TABLE}").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations: Optional[List[Migration]] = None, target: Optional[int] = None) -> List[int]:
+    """
+    执行尚未执行的迁移
+
+    Args:
+        conn: 数据库连接（不能处于未提交的事务中）
+        migrations: 迁移列表（默认 MIGRATIONS）
+        target: 迁移到的版本（默认最新）
+
+    Returns:
+        本次执行的迁移版本列表
+    """
+    migrations = sorted(migrations or MIGRATIONS, key=lambda item: item.version)
+    if conn.in_transaction:
+        conn.commit()
+    _ensure_migrations_table(conn)
+
+    applied = []
+    for migration in migrations:
+        if target is not None and migration.version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE version = ?", (migration.version,)
+            ).fetchone()
+            if done:
+                conn.rollback()
+                continue
+            start = time.perf_counter()
+            migration.apply(conn)
+            conn.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.name, time.strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"[Migrations] 迁移 {migration.version:03d}_{migration.name} 失败，已回滚", exc_info=True)
+            raise
+        applied.append(migration.version)
+        logger.info(
+            f"[Migrations] 已执行迁移 {migration.version:03d}_{migration.name} "
+            f"({(time.perf_counter() - start) * 1000:.1f}ms)"
+        )
+    return applied
@@ -0,0 +1,448 @@
+"""
+NPU 性能基准测试
+
+对任意提供 infer(prompt, max_new_tokens, temperature, on_token, use_cache) 的加载器运行提示语料：
+- 预热若干轮后正式测量，报告 p50/p95/p99 延迟
+- 通过 on_token 回调测量首 token 延迟（TTFT），分别计算预填充与解码吞吐（tokens/s）
+- 采样进程 RSS 与峰值内存
+- 可选的 CPU 参考后端（可插拔），计算 NPU 加速比
+- 结果保存为 JSON，compare_results 对比两次运行
+
+命令行入口见 tools/npu_benchmark.py；接口见 GET /api/npu/benchmark。
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import importlib
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from models.fake_genie import tokenize
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    psutil = None
+    HAS_PSUTIL = False
+
+
+# ==================== 提示语料 ====================
+
+_WORDS = [
+    '数据', '分析', '模型', '推理', '性能', '测试', '延迟', '吞吐', '优化', '加速',
+    '计算', '算法', '网络', '深度', '学习', '特征', '提取', '分类', '回归', '聚类',
+    '训练', '验证', '评估', '指标', '精度', '召回', '准确', '误差', '损失', '风险'
+]
+
+
+def _synthetic_prompt(word_count: int, seed: int) -> str:
+    """按固定顺序生成指定长度的提示（保证多次运行语料一致）"""
+    words = [_WORDS[(seed * 7 + i * 3) % len(_WORDS)] for i in range(word_count)]
+    return "请分析以下内容并给出结论：" + " ".join(words)
+
+
+BENCHMARK_CORPORA: Dict[str, List[str]] = {
+    # 原 /api/npu/benchmark 使用的五个短提示
+    "default": [
+        "分析这段数据的趋势",
+        "总结关键信息",
+        "提供解决方案",
+        "评估风险因素",
+        "制定行动计划"
+    ],
+    # 不同输入长度（与 /api/performance/benchmark 的序列长度一致）
+    "mixed": [_synthetic_prompt(n, i) for i, n in enumerate([32, 64, 128, 256])],
+    "long": [_synthetic_prompt(512, i) for i in range(3)]
+}
+
+
+def load_corpus(corpus: Union[str, Path, List[str]]) -> List[str]:
+    """
+    加载提示语料
+
+    Args:
+        corpus: 内置语料名、JSON 文件路径（字符串列表或 {"prompts": [...]}）或提示列表
+
+    Returns:
+        提示列表
+    """
+    if isinstance(corpus, list):
+        prompts = corpus
+    elif str(corpus) in BENCHMARK_CORPORA:
+        prompts = BENCHMARK_CORPORA[str(corpus)]
+    else:
+        path = Path(corpus)
+        if not path.exists():
+            raise ValueError(f"未知语料: {corpus}，可用内置语料: {list(BENCHMARK_CORPORA.keys())}")
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        prompts = data.get("prompts", []) if isinstance(data, dict) else data
+
+    prompts = [str(p) for p in prompts if str(p).strip()]
+    if not prompts:
+        raise ValueError(f"语料为空: {corpus}")
+    return prompts
+
+
+# ==================== 内存测量 ====================
+
+def get_process_rss_mb() -> Optional[float]:
+    """当前进程常驻内存（MB），无法获取时返回 None"""
+    if HAS_PSUTIL:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def get_process_peak_mb() -> Optional[float]:
+    """进程生命周期内的峰值内存（MB），无法获取时返回 None"""
+    if HAS_PSUTIL:
+        info = psutil.Process().memory_info()
+        peak = getattr(info, "peak_wset", None)  # Windows
+        if peak is not None:
+            return peak / (1024 * 1024)
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except (ImportError, OSError):
+        return None
+
+
+class MemorySampler:
+    """后台线程定期采样 RSS，记录测量期间的峰值"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start_mb: Optional[float] = None
+        self.end_mb: Optional[float] = None
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        rss = get_process_rss_mb()
+        if rss is not None:
+            self.peak_mb = rss if self.peak_mb is None else max(self.peak_mb, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "MemorySampler":
+        self.start_mb = self._sample()
+        self._thread = threading.Thread(target=self._run, name="benchmark-memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = self._sample()
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        def mb(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            "rss_start_mb": mb(self.start_mb),
+            "rss_end_mb": mb(self.end_mb),
+            "rss_peak_mb": mb(self.peak_mb),
+            "process_peak_mb": mb(get_process_peak_mb())
+        }
+
+
+# ==================== CPU 参考后端 ====================
+
+def _fake_cpu_reference() -> Any:
+    """模拟 CPU 参考后端：模拟 GenieContext，按 CPU 推理的量级放慢预填充与解码"""
+    from models.model_loader import NPUModelLoader
+
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.prefill_delay_per_token = 0.002
+    loader.model.decode_delay = 0.02
+    return loader
+
+
+REFERENCE_BACKENDS: Dict[str, Callable[[], Any]] = {
+    "fake-cpu": _fake_cpu_reference
+}
+
+
+def register_reference_backend(name: str, factory: Callable[[], Any]):
+    """
+    注册 CPU 参考后端
+
+    Args:
+        name: 后端名称
+        factory: 无参工厂函数，返回提供 infer(...) 的加载器
+    """
+    REFERENCE_BACKENDS[name] = factory
+
+
+def create_reference_backend(spec: Optional[str]) -> Optional[Any]:
+    """
+    创建 CPU 参考后端
+
+    Args:
+        spec: 已注册的后端名称，或 "模块:工厂函数" 形式的导入路径（None 表示不对比）
+
+    Returns:
+        加载器实例
+    """
+    if not spec:
+        return None
+    if spec in REFERENCE_BACKENDS:
+        return REFERENCE_BACKENDS[spec]()
+    if ":" in spec:
+        module_name, attr = spec.split(":", 1)
+        return getattr(importlib.import_module(module_name), attr)()
+    raise ValueError(f"未知参考后端: {spec}，已注册: {list(REFERENCE_BACKENDS.keys())}")
+
+
+# ==================== 测量 ====================
+
+def percentile(values: List[float], p: float) -> float:
+    """线性插值百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def measure_once(loader: Any, prompt: str, max_new_tokens: int, temperature: float) -> Dict[str, Any]:
+    """
+    执行一次推理并测量
+
+    预填充时间以首 token 延迟近似，提示 token 数按 fake_genie.tokenize 估算。
+
+    Returns:
+        单次测量结果
+    """
+    token_times: List[float] = []
+    start = time.perf_counter()
+    loader.infer(
+        prompt,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+        on_token=lambda _text: token_times.append(time.perf_counter()),
+        use_cache=False  # 测量真实推理延迟
+    )
+    total = time.perf_counter() - start
+
+    prompt_tokens = len(tokenize(prompt))
+    generated = len(token_times)
+    ttft = (token_times[0] - start) if token_times else total
+    decode_time = (token_times[-1] - token_times[0]) if generated > 1 else 0.0
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "generated_tokens": generated,
+        "latency_ms": round(total * 1000, 2),
+        "ttft_ms": round(ttft * 1000, 2),
+        "prefill_tokens_per_s": round(prompt_tokens / ttft, 2) if ttft > 0 else 0.0,
+        "decode_tokens_per_s": round((generated - 1) / decode_time, 2) if decode_time > 0 else 0.0
+    }
+
+
+def summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总多次测量"""
+    latencies = [s["latency_ms"] for s in samples]
+    ttfts = [s["ttft_ms"] for s in samples]
+
+    def avg(key: str) -> float:
+        return round(sum(s[key] for s in samples) / len(samples), 2) if samples else 0.0
+
+    return {
+        "count": len(samples),
+        "avg_latency_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "min_latency_ms": round(min(latencies), 2) if latencies else 0.0,
+        "max_latency_ms": round(max(latencies), 2) if latencies else 0.0,
+        "p50_latency_ms": round(percentile(latencies, 50), 2),
+        "p95_latency_ms": round(percentile(latencies, 95), 2),
+        "p99_latency_ms": round(percentile(latencies, 99), 2),
+        "ttft_p50_ms": round(percentile(ttfts, 50), 2),
+        "ttft_p95_ms": round(percentile(ttfts, 95), 2),
+        "prefill_tokens_per_s": avg("prefill_tokens_per_s"),
+        "decode_tokens_per_s": avg("decode_tokens_per_s"),
+        "generated_tokens": sum(s["generated_tokens"] for s in samples)
+    }
+
+
+class NPUBenchmark:
+    """NPU 基准测试（可选 CPU 参考后端对比）"""
+
+    def __init__(
+        self,
+        loader: Any,
+        corpus: Union[str, Path, List[str]] = "default",
+        warmup_runs: int = 2,
+        runs: int = 3,
+        max_new_tokens: int = 64,
+        temperature: float = 0.7,
+        reference: Optional[Any] = None,
+        reference_name: Optional[str] = None
+    ):
+        """
+        初始化基准测试
+
+        Args:
+            loader: 被测加载器（NPUModelLoader 或兼容对象）
+            corpus: 提示语料（见 load_corpus）
+            warmup_runs: 预热轮数（不计入结果）
+            runs: 每个提示的正式测量次数
+            max_new_tokens: 每次生成的最大 token 数
+            temperature: 温度参数
+            reference: 可选的 CPU 参考加载器
+            reference_name: 参考后端名称（写入结果）
+        """
+        self.loader = loader
+        self.corpus_name = corpus if isinstance(corpus, (str, Path)) else "custom"
+        self.prompts = load_corpus(corpus)
+        self.warmup_runs = warmup_runs
+        self.runs = runs
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.reference = reference
+        self.reference_name = reference_name
+
+    def _run_backend(self, loader: Any) -> Dict[str, Any]:
+        """对单个后端执行预热与正式测量"""
+        for i in range(self.warmup_runs):
+            measure_once(loader, self.prompts[i % len(self.prompts)], self.max_new_tokens, self.temperature)
+
+        samples = []
+        with MemorySampler() as memory:
+            for prompt in self.prompts:
+                for _ in range(self.runs):
+                    samples.append(measure_once(loader, prompt, self.max_new_tokens, self.temperature))
+
+        return {"summary": summarize(samples), "memory": memory.summary(), "samples": samples}
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行基准测试
+
+        Returns:
+            可 JSON 序列化的结果
+        """
+        model_key = getattr(self.loader, "model_key", "unknown")
+        logger.info(
+            f"[Benchmark] 开始: 模型={model_key}, 语料={self.corpus_name} ({len(self.prompts)} 条), "
+            f"预热 {self.warmup_runs} 轮, 每条 {self.runs} 次"
+        )
+
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "model": model_key,
+            "backend": getattr(self.loader, "backend", "unknown"),
+            "config": {
+                "corpus": str(self.corpus_name),
+                "prompt_count": len(self.prompts),
+                "warmup_runs": self.warmup_runs,
+                "runs": self.runs,
+                "max_new_tokens": self.max_new_tokens,
+                "temperature": self.temperature
+            },
+            "environment": {
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "psutil": HAS_PSUTIL
+            },
+            "npu": self._run_backend(self.loader),
+            "reference": None,
+            "cpu_vs_npu_speedup": None
+        }
+
+        if self.reference is not None:
+            reference = self._run_backend(self.reference)
+            reference["name"] = self.reference_name
+            result["reference"] = reference
+            npu_p50 = result["npu"]["summary"]["p50_latency_ms"]
+            if npu_p50 > 0:
+                result["cpu_vs_npu_speedup"] = round(reference["summary"]["p50_latency_ms"] / npu_p50, 2)
+
+        summary = result["npu"]["summary"]
+        logger.info(
+            f"[Benchmark] 完成: p50 {summary['p50_latency_ms']}ms, p95 {summary['p95_latency_ms']}ms, "
+            f"TTFT p50 {summary['ttft_p50_ms']}ms, 解码 {summary['decode_tokens_per_s']} tokens/s, "
+            f"加速比 {result['cpu_vs_npu_speedup']}"
+        )
+        return result
+
+
+# ==================== 结果持久化与对比 ====================
+
+def save_result(result: Dict[str, Any], results_dir: Union[str, Path]) -> Path:
+    """
+    保存基准测试结果为 JSON
+
+    Returns:
+        结果文件路径
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    path = results_dir / f"benchmark_{result['model']}_{stamp}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    logger.info(f"[Benchmark] 结果已保存: {path}")
+    return path
+
+
+def load_result(path: Union[str, Path]) -> Dict[str, Any]:
+    """读取已保存的基准测试结果"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_COMPARED_METRICS = [
+    "p50_latency_ms", "p95_latency_ms", "p99_latency_ms", "ttft_p50_ms",
+    "prefill_tokens_per_s", "decode_tokens_per_s"
+]
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    对比两次基准测试的 NPU 汇总指标
+
+    Returns:
+        {指标: {"baseline", "current", "change_pct"}}
+    """
+    old = baseline["npu"]["summary"]
+    new = current["npu"]["summary"]
+    diff = {}
+    for metric in _COMPARED_METRICS:
+        before, after = old.get(metric), new.get(metric)
+        if before is None or after is None:
+            continue
+        change = round((after - before) / before * 100, 1) if before else None
+        diff[metric] = {"baseline": before, "current": after, "change_pct": change}
+
+    old_peak = baseline["npu"]["memory"].get("rss_peak_mb")
+    new_peak = current["npu"]["memory"].get("rss_peak_mb")
+    if old_peak is not None and new_peak is not None:
+        diff["rss_peak_mb"] = {
+            "baseline": old_peak,
+            "current": new_peak,
+            "change_pct": round((new_peak - old_peak) / old_peak * 100, 1) if old_peak else None
+        }
+    return diff
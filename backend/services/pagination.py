@@ -0,0 +1,172 @@
+"""
+列表分页（游标分页）
+
+列表接口原先返回全部行（或按 OFFSET 翻页：页越靠后，越要先扫过前面的行），
+响应大小与查询耗时随任务、卡片数量线性增长。这里按 (created_at, id) 倒序做游标（keyset）分页：
+
+- 游标编码上一页最后一行的 (created_at, id)，下一页查询 WHERE (PAGE_KEY, id) < (?, ?)，
+  由以 PAGE_KEY 结尾的表达式索引（索引隐含 rowid，见 services/migrations.py）直接定位，
+  每页只读 limit + 1 行，与总行数无关。PAGE_KEY 为 COALESCE(created_at, '')：
+  created_at 为 NULL 的行（显式插入 NULL 的旧数据）排在最后，仍能翻到，不会因比较结果为 NULL 被跳过
+- fields 只查询列表视图需要的列（如不取卡片正文）；id、created_at 总会返回（游标需要）
+- 每页按内容计算 ETag，客户端带 If-None-Match 重复请求未变化的页时可返回 304
+- 分页由客户端选择：原先返回全部行的接口在 limit 与 cursor 都不传时返回全部行（不读 X-Next-Cursor 的旧客户端不受影响），
+  但最多 MAX_UNPAGED_ROWS 行，超出时与分页请求一样返回 next_cursor
+"""
+import base64
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 不分页请求（limit 与 cursor 都不传）最多返回的行数
+MAX_UNPAGED_ROWS = 5000
+
+# 分页键（排序列）
+KEY_COLUMNS = ("created_at", "id")
+
+# 排序表达式（与 services/migrations.py 中的分页索引一致）
+PAGE_KEY = "COALESCE(created_at, '')"
+
+
+class Page(TypedDict):
+    """一页结果"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    etag: str
+
+
+def encode_cursor(created_at: Optional[str], row_id: int) -> str:
+    """
+    编码游标
+
+    Args:
+        created_at: 上一页最后一行的创建时间
+        row_id: 上一页最后一行的 ID
+
+    Returns:
+        URL 安全的游标字符串
+    """
+    raw = json.dumps([created_at, row_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[str], int]:
+    """
+    解码游标
+
+    Raises:
+        ValueError: 游标无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw.decode("utf-8"))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("无效的翻页游标")
+    if not isinstance(row_id, int) or not (created_at is None or isinstance(created_at, str)):
+        raise ValueError("无效的翻页游标")
+    return created_at, row_id
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    解析 fields 参数（逗号分隔的列名）
+
+    Args:
+        fields: 请求的列，为空时返回全部允许的列
+        allowed: 允许查询的列（按返回顺序）
+
+    Returns:
+        要查询的列（含分页键）
+
+    Raises:
+        ValueError: 包含不允许的列
+    """
+    if not fields:
+        return list(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(unknown)}（可选: {', '.join(allowed)}）")
+    return [name for name in allowed if name in requested or name in KEY_COLUMNS]
+
+
+def clamp_limit(limit: int) -> int:
+    """将每页数量限制在 [1, MAX_PAGE_SIZE]"""
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def page_etag(content: Any, next_cursor: Optional[str]) -> str:
+    """按页内容计算弱 ETag"""
+    payload = json.dumps([content, next_cursor], ensure_ascii=False, sort_keys=True, default=str)
+    return f'W/"{hashlib.sha1(payload.encode("utf-8")).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 请求头是否与 ETag 匹配（弱比较）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == target:
+            return True
+    return False
+
+
+def fetch_page(conn, table: str, columns: Sequence[str],
+               filters: Sequence[Tuple[str, Any]] = (),
+               cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE, offset: int = 0) -> Page:
+    """
+    按 (created_at, id) 倒序查询一页
+
+    Args:
+        conn: 数据库连接
+        table: 表名
+        columns: 查询的列（须含 created_at、id，见 parse_fields）
+        filters: 等值过滤条件 [(列名, 值)]
+        cursor: 上一页返回的 next_cursor，为空时从第一行开始
+        limit: 每页数量（限制在 MAX_PAGE_SIZE 以内）；为 None 时：没有游标返回全部行（最多 MAX_UNPAGED_ROWS 行），
+            有游标按 DEFAULT_PAGE_SIZE
+        offset: 兼容旧客户端的偏移量（仅在没有游标时使用，翻页越深越慢）
+
+    Returns:
+        一页结果（next_cursor 为空表示没有下一页）
+
+    Raises:
+        ValueError: 游标无效
+    """
+    unpaged = limit is None and not cursor
+    if unpaged:
+        limit = MAX_UNPAGED_ROWS
+    else:
+        limit = clamp_limit(DEFAULT_PAGE_SIZE if limit is None else limit)
+    where = [f"{column} = ?" for column, _ in filters]
+    params: List[Any] = [value for _, value in filters]
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # 单独的 <= 条件让 SQLite 在表达式索引上定位起点（只有行值比较时会从头扫描索引）
+        where.append(f"{PAGE_KEY} <= ? AND ({PAGE_KEY}, id) < (?, ?)")
+        params.extend([created_at or "", created_at or "", row_id])
+        offset = 0
+
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        sql += f" WHERE {' AND '.join(where)}"
+    sql += f" ORDER BY {PAGE_KEY} DESC, id DESC LIMIT ? OFFSET ?"
+    rows = [dict(row) for row in conn.execute(sql, params + [limit + 1, max(0, offset)]).fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        if unpaged:
+            logger.warning(f"[Pagination] {table} 不分页请求超过 {MAX_UNPAGED_ROWS} 行，其余行需按 next_cursor 翻页")
+    return {"items": rows, "next_cursor": next_cursor, "etag": page_etag(rows, next_cursor)}
@@ -10,12 +10,19 @@ from pathlib import Path
 
 from config import settings
 from database import DatabaseManager
+from models.generation_policy import GenerationPolicy, json_skill_policy
 
 logger = logging.getLogger(__name__)
 
 
 class Skill:
     """技能基类"""
+
+    # NPU 技能的固定指令模板：放在提示开头、可变数据放在其后，
+    # 作为 prompt_prefix 传给推理，模板的预填充结果可跨调用复用
+    PROMPT_TEMPLATE: Optional[str] = None
+    # NPU 技能的生成策略：token 预算与停止条件，输出完成即提前结束生成
+    GENERATION_POLICY: Optional[GenerationPolicy] = None
     
     def __init__(self, name: str, description: str, category: str, agent_name: str):
         self.name = name
@@ -29,6 +36,30 @@ class Skill:
     async def execute(self, *args, **kwargs) -> Dict[str, Any]:
         """执行技能"""
         raise NotImplementedError("子类必须实现 execute 方法")
+
+    async def _infer(
+        self,
+        prompt: str,
+        max_new_tokens: int = 1024,
+        temperature: float = 0.7,
+        prompt_prefix: Optional[str] = None,
+        policy: Optional[GenerationPolicy] = None
+    ) -> str:
+        """
+        NPU 推理：提交到推理工作线程，不阻塞事件循环
+
+        工作线程从模型池借用模型（引用计数 +1），推理期间模型不会被 LRU 淘汰
+        """
+        from models.inference_worker import get_inference_worker, InferencePriority
+
+        return await get_inference_worker().submit(
+            prompt=prompt,
+            max_new_tokens=max_new_tokens,
+            temperature=temperature,
+            priority=InferencePriority.BATCH,
+            prompt_prefix=prompt_prefix,
+            policy=policy
+        )
     
     def get_info(self) -> Dict:
         """获取技能信息"""
@@ -330,6 +361,25 @@ class DataValidationSkill(Skill):
 
 # 通政司技能
 class FactExtractionSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是事实提取专家，请从以下文本中提取关键事实。
+
+请提取5-10个关键事实，每个事实包含：
+1. 事实内容
+2. 置信度（0.0-1.0）
+
+输出格式（JSON）：
+{
+  "facts": [
+    {
+      "content": "事实内容",
+      "confidence": 0.85
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("fact_extraction", max_new_tokens=512)
+
     def __init__(self):
         super().__init__(
             name="fact_extraction",
@@ -341,38 +391,18 @@ class FactExtractionSkill(Skill):
     async def execute(self, text: str) -> Dict:
         """执行事实提取 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 使用 NPU 模型进行事实提取
-            prompt = f"""
-你是事实提取专家，请从以下文本中提取关键事实。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 文本内容：
 {text}
-
-请提取5-10个关键事实，每个事实包含：
-1. 事实内容
-2. 置信度（0.0-1.0）
-
-输出格式（JSON）：
-{{
-  "facts": [
-    {{
-      "content": "事实内容",
-      "confidence": 0.85
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -412,6 +442,29 @@ class FactExtractionSkill(Skill):
 
 
 class FactClassificationSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是事实分类专家，请将以下事实分类到不同的类别。
+
+类别定义：
+1. quantitative - 量化事实（包含数字、百分比、比率等）
+2. qualitative - 定性事实（描述性、概念性）
+3. temporal - 时间相关事实（包含时间信息）
+4. causal - 因果关系事实（描述因果、影响等）
+
+请为每个事实分类，输出格式（JSON）：
+{
+  "classifications": [
+    {
+      "fact_index": 0,
+      "category": "quantitative",
+      "confidence": 0.9,
+      "reason": "包含数字和百分比"
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("fact_classification", max_new_tokens=768)
+
     def __init__(self):
         super().__init__(
             name="fact_classification",
@@ -423,12 +476,6 @@ class FactClassificationSkill(Skill):
     async def execute(self, facts: List[Dict]) -> Dict:
         """执行事实分类 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 构建事实列表文本
             facts_text = "\n".join([
                 f"{i+1}. {fact.get('content', '')}"
@@ -436,35 +483,17 @@ class FactClassificationSkill(Skill):
             ])
             
             # 使用 NPU 模型进行分类
-            prompt = f"""
-你是事实分类专家，请将以下事实分类到不同的类别。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 事实列表：
 {facts_text}
-
-类别定义：
-1. quantitative - 量化事实（包含数字、百分比、比率等）
-2. qualitative - 定性事实（描述性、概念性）
-3. temporal - 时间相关事实（包含时间信息）
-4. causal - 因果关系事实（描述因果、影响等）
-
-请为每个事实分类，输出格式（JSON）：
-{{
-  "classifications": [
-    {{
-      "fact_index": 0,
-      "category": "quantitative",
-      "confidence": 0.9,
-      "reason": "包含数字和百分比"
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -510,6 +539,28 @@ class FactClassificationSkill(Skill):
 
 
 class FactVerificationSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是事实验证专家，请验证以下事实的准确性和合理性。
+
+请为每个事实验证：
+1. verified - 是否通过验证
+2. confidence - 置信度（0.0-1.0）
+3. issues - 存在的问题列表（如果有）
+
+输出格式（JSON）：
+{
+  "verifications": [
+    {
+      "fact_index": 0,
+      "verified": true,
+      "confidence": 0.9,
+      "issues": []
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("fact_verification", max_new_tokens=512)
+
     def __init__(self):
         super().__init__(
             name="fact_verification",
@@ -521,12 +572,6 @@ class FactVerificationSkill(Skill):
     async def execute(self, facts: List[Dict]) -> Dict:
         """执行事实验证 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 如果没有事实，直接返回
             if not facts:
                 return {
@@ -542,34 +587,17 @@ class FactVerificationSkill(Skill):
             ])
             
             # 使用 NPU 模型进行验证
-            prompt = f"""
-你是事实验证专家，请验证以下事实的准确性和合理性。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 事实列表：
 {facts_text}
-
-请为每个事实验证：
-1. verified - 是否通过验证
-2. confidence - 置信度（0.0-1.0）
-3. issues - 存在的问题列表（如果有）
-
-输出格式（JSON）：
-{{
-  "verifications": [
-    {{
-      "fact_index": 0,
-      "verified": true,
-      "confidence": 0.9,
-      "issues": []
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -612,6 +640,29 @@ class FactVerificationSkill(Skill):
 
 # 监察院技能
 class CauseAnalysisSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是原因分析专家，请分析以下事件发生的根本原因。
+
+请分析：
+1. 主要原因（最直接的导致因素）
+2. 次要原因（其他影响因素）
+3. 每个原因的影响程度
+4. 每个原因的置信度
+
+输出格式（JSON）：
+{
+  "causes": [
+    {
+      "cause_id": "cause_1",
+      "description": "原因描述",
+      "impact": "high/medium/low",
+      "confidence": 0.85
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("cause_analysis", max_new_tokens=512)
+
     def __init__(self):
         super().__init__(
             name="cause_analysis",
@@ -623,45 +674,21 @@ class CauseAnalysisSkill(Skill):
     async def execute(self, event: Dict) -> Dict:
         """执行原因分析 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 将事件转换为文本
             event_text = json.dumps(event, ensure_ascii=False)
             
             # 使用 NPU 模型进行原因分析
-            prompt = f"""
-你是原因分析专家，请分析以下事件发生的根本原因。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 事件描述：
 {event_text}
-
-请分析：
-1. 主要原因（最直接的导致因素）
-2. 次要原因（其他影响因素）
-3. 每个原因的影响程度
-4. 每个原因的置信度
-
-输出格式（JSON）：
-{{
-  "causes": [
-    {{
-      "cause_id": "cause_1",
-      "description": "原因描述",
-      "impact": "high/medium/low",
-      "confidence": 0.85
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -692,6 +719,21 @@ class CauseAnalysisSkill(Skill):
 
 
 class ExplanationGenerationSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是解释生成专家，请基于以下事实和原因生成可理解的解释。
+
+请生成：
+1. 清晰的解释文本
+2. 解释的清晰度评分（0.0-1.0）
+
+输出格式（JSON）：
+{
+  "explanation_text": "完整的解释文本",
+  "clarity_score": 0.9
+}
+"""
+    GENERATION_POLICY = json_skill_policy("explanation_generation", max_new_tokens=384)
+
     def __init__(self):
         super().__init__(
             name="explanation_generation",
@@ -703,12 +745,6 @@ class ExplanationGenerationSkill(Skill):
     async def execute(self, fact: Dict, causes: List[Dict]) -> Dict:
         """执行解释生成 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 构建文本
             fact_text = fact.get("content", "")
             causes_text = "\n".join([
@@ -717,30 +753,20 @@ class ExplanationGenerationSkill(Skill):
             ])
             
             # 使用 NPU 模型生成解释
-            prompt = f"""
-你是解释生成专家，请基于以下事实和原因生成可理解的解释。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 事实：
 {fact_text}
 
 原因：
 {causes_text}
-
-请生成：
-1. 清晰的解释文本
-2. 解释的清晰度评分（0.0-1.0）
-
-输出格式（JSON）：
-{{
-  "explanation_text": "完整的解释文本",
-  "clarity_score": 0.9
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -774,6 +800,30 @@ class ExplanationGenerationSkill(Skill):
 
 # 刑狱司技能
 class RiskDetectionSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是风险检测专家，请从以下数据中识别潜在风险。
+
+请识别 3-5 个潜在风险，每个风险包含：
+1. 风险名称
+2. 风险描述
+3. 风险等级
+4. 发生概率（0.0-1.0）
+
+输出格式（JSON）：
+{
+  "risks": [
+    {
+      "risk_id": "risk_1",
+      "name": "风险名称",
+      "description": "风险描述",
+      "level": "high/medium/low",
+      "probability": 0.7
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("risk_detection", max_new_tokens=512)
+
     def __init__(self):
         super().__init__(
             name="risk_detection",
@@ -785,46 +835,21 @@ class RiskDetectionSkill(Skill):
     async def execute(self, data: List[Dict]) -> Dict:
         """执行风险检测 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 构建数据文本
             data_text = json.dumps(data, ensure_ascii=False)[:2000]  # 限制长度
             
             # 使用 NPU 模型检测风险
-            prompt = f"""
-你是风险检测专家，请从以下数据中识别潜在风险。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 数据内容：
 {data_text}
-
-请识别 3-5 个潜在风险，每个风险包含：
-1. 风险名称
-2. 风险描述
-3. 风险等级
-4. 发生概率（0.0-1.0）
-
-输出格式（JSON）：
-{{
-  "risks": [
-    {{
-      "risk_id": "risk_1",
-      "name": "风险名称",
-      "description": "风险描述",
-      "level": "high/medium/low",
-      "probability": 0.7
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -855,6 +880,28 @@ class RiskDetectionSkill(Skill):
 
 
 class RiskAssessmentSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是风险评估专家，请评估以下风险。
+
+请为每个风险：
+1. 计算风险分数（考虑影响程度和发生概率）
+2. 提供处理建议
+3. 评估结果的置信度
+
+输出格式（JSON）：
+{
+  "assessments": [
+    {
+      "risk_id": "risk_1",
+      "risk_score": 150,
+      "recommendation": "立即处理/优先处理/计划处理/监控",
+      "confidence": 0.9
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("risk_assessment", max_new_tokens=384)
+
     def __init__(self):
         super().__init__(
             name="risk_assessment",
@@ -866,12 +913,6 @@ class RiskAssessmentSkill(Skill):
     async def execute(self, risks: List[Dict]) -> Dict:
         """执行风险评估 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 如果没有风险，直接返回
             if not risks:
                 return {
@@ -887,34 +928,17 @@ class RiskAssessmentSkill(Skill):
             ])
             
             # 使用 NPU 模型评估风险
-            prompt = f"""
-你是风险评估专家，请评估以下风险。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 风险列表：
 {risks_text}
-
-请为每个风险：
-1. 计算风险分数（考虑影响程度和发生概率）
-2. 提供处理建议
-3. 评估结果的置信度
-
-输出格式（JSON）：
-{{
-  "assessments": [
-    {{
-      "risk_id": "risk_1",
-      "risk_score": 150,
-      "recommendation": "立即处理/优先处理/计划处理/监控",
-      "confidence": 0.9
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -957,6 +981,26 @@ class RiskAssessmentSkill(Skill):
 
 
 class WarningGenerationSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是警告生成专家，请为以下高风险生成警告信息。
+
+请为每个高风险生成警告消息，包含：
+1. 警告内容
+2. 紧急程度
+
+输出格式（JSON）：
+{
+  "warnings": [
+    {
+      "risk_name": "风险名称",
+      "message": "警告消息",
+      "urgency": "immediate/high/medium/low"
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("warning_generation", max_new_tokens=384)
+
     def __init__(self):
         super().__init__(
             name="warning_generation",
@@ -978,12 +1022,6 @@ class WarningGenerationSkill(Skill):
                     "method": "npu_inference"
                 }
             
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 构建高风险文本
             high_risks_text = "\n".join([
                 f"- {r.get('name', '')}: {r.get('description', '')} (概率: {r.get('probability', 0)})"
@@ -991,32 +1029,17 @@ class WarningGenerationSkill(Skill):
             ])
             
             # 使用 NPU 模型生成警告
-            prompt = f"""
-你是警告生成专家，请为以下高风险生成警告信息。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 高风险列表：
 {high_risks_text}
-
-请为每个高风险生成警告消息，包含：
-1. 警告内容
-2. 紧急程度
-
-输出格式（JSON）：
-{{
-  "warnings": [
-    {{
-      "risk_name": "风险名称",
-      "message": "警告消息",
-      "urgency": "immediate/high/medium/low"
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -1056,6 +1079,34 @@ class WarningGenerationSkill(Skill):
 
 # 参谋司技能
 class ActionRecommendationSkill(Skill):
+    PROMPT_TEMPLATE = """
+你是行动建议专家，请基于以下风险和事实提供可执行的行动建议。
+
+请提供 3-5 个行动建议，每个建议包含：
+1. 行动标题
+2. 详细描述
+3. 目标（要解决的问题）
+4. 优先级
+5. 所需工作量
+6. 预期影响
+
+输出格式（JSON）：
+{
+  "actions": [
+    {
+      "action_id": "action_1",
+      "title": "行动标题",
+      "description": "详细描述",
+      "goal": "目标",
+      "priority": "high/medium/low",
+      "effort": "high/medium/low",
+      "expected_impact": "high/medium/low"
+    }
+  ]
+}
+"""
+    GENERATION_POLICY = json_skill_policy("action_recommendation", max_new_tokens=768)
+
     def __init__(self):
         super().__init__(
             name="action_recommendation",
@@ -1067,12 +1118,6 @@ class ActionRecommendationSkill(Skill):
     async def execute(self, risks: List[Dict], facts: List[Dict]) -> Dict:
         """执行行动建议 - 使用真实 NPU 推理"""
         try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
             # 构建文本
             risks_text = "\n".join([
                 f"- {r.get('name', '')}: {r.get('description', '')} (等级: {r.get('level', '')})"
@@ -1085,43 +1130,20 @@ class ActionRecommendationSkill(Skill):
             ])
             
             # 使用 NPU 模型生成行动建议
-            prompt = f"""
-你是行动建议专家，请基于以下风险和事实提供可执行的行动建议。
-
+            prompt = self.PROMPT_TEMPLATE + f"""
 风险：
 {risks_text}
 
 事实：
 {facts_text}
-
-请提供 3-5 个行动建议，每个建议包含：
-1. 行动标题
-2. 详细描述
-3. 目标（要解决的问题）
-4. 优先级
-5. 所需工作量
-6. 预期影响
-
-输出格式（JSON）：
-{{
-  "actions": [
-    {{
-      "action_id": "action_1",
-      "title": "行动标题",
-      "description": "详细描述",
-      "goal": "目标",
-      "priority": "high/medium/low",
-      "effort": "high/medium/low",
-      "expected_impact": "high/medium/low"
-    }}
-  ]
-}}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -1396,30 +1418,9 @@ class NotificationSkill(Skill):
 
 # 锦衣卫技能
 class TaskDecompositionSkill(Skill):
-    def __init__(self):
-        super().__init__(
-            name="task_decomposition",
-            description="任务分解：将复杂任务分解为子任务（使用 NPU 推理）",
-            category="任务调度",
-            agent_name="锦衣卫"
-        )
-    
-    async def execute(self, task: str) -> Dict:
-        """执行任务分解 - 使用真实 NPU 推理"""
-        try:
-            from models.model_loader import get_model_loader
-            loader = get_model_loader()
-            
-            if not loader.is_loaded:
-                loader.load()
-            
-            # 使用 NPU 模型分解任务
-            prompt = f"""
+    PROMPT_TEMPLATE = """
 你是任务分解专家（锦衣卫总指挥使），请将以下复杂任务分解为子任务。
 
-原始任务：
-{task}
-
 请将任务分解为 3-6 个子任务，每个子任务包含：
 1. 子任务描述
 2. 负责的 Agent（密卷房/通政司/监察院/刑狱司/参谋司/太史阁/驿传司）
@@ -1427,23 +1428,43 @@ class TaskDecompositionSkill(Skill):
 4. 依赖关系（可选）
 
 输出格式（JSON）：
-{{
+{
   "subtasks": [
-    {{
+    {
       "subtask_id": "sub_1",
       "description": "子任务描述",
       "agent": "密卷房",
       "priority": "high/medium/low",
       "dependencies": []
-    }}
+    }
   ]
-}}
+}
+"""
+    GENERATION_POLICY = json_skill_policy("task_decomposition", max_new_tokens=640)
+
+    def __init__(self):
+        super().__init__(
+            name="task_decomposition",
+            description="任务分解：将复杂任务分解为子任务（使用 NPU 推理）",
+            category="任务调度",
+            agent_name="锦衣卫"
+        )
+    
+    async def execute(self, task: str) -> Dict:
+        """执行任务分解 - 使用真实 NPU 推理"""
+        try:
+            # 使用 NPU 模型分解任务
+            prompt = self.PROMPT_TEMPLATE + f"""
+原始任务：
+{task}
 """
             
-            response = loader.infer(
+            response = await self._infer(
                 prompt=prompt,
                 max_new_tokens=1024,
-                temperature=0.7
+                temperature=0.7,
+                prompt_prefix=self.PROMPT_TEMPLATE,
+                policy=self.GENERATION_POLICY
             )
             
             # 解析 JSON 响应
@@ -0,0 +1,353 @@
+"""
+SQLite 连接池
+
+同一数据库文件的所有 DatabaseManager 与路由共享一个连接池，替代每次调用新建连接：
+
+- 连接只在创建时配置一次：WAL（读不阻塞写）、synchronous=NORMAL、cache_size、mmap_size、busy_timeout
+- 线程优先取回自己上次使用的连接（页缓存保持热），否则取任意空闲连接，未达上限时新建；
+  达到上限时等待归还，超时报错
+- 借出的是代理连接：close() 归还而不关闭，with 块结束时提交/回滚后归还，
+  兼容原有的 conn.close() 与 with get_connection() as conn 写法；归还时回滚未提交的事务
+- 空闲超过检查间隔的连接在借出前执行 SELECT 1，失效则关闭并重建
+- 统计借出等待时间与打开、空闲、借出中的连接数；应用关闭时统一关闭
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """等待空闲连接超时"""
+    pass
+
+
+class PooledConnection:
+    """连接池借出的连接（代理 sqlite3.Connection，close() 归还到连接池）"""
+
+    def __init__(self, pool: "SQLitePool", conn: sqlite3.Connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    @property
+    def raw(self) -> sqlite3.Connection:
+        """底层连接（已归还时报错）"""
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("连接已归还到连接池")
+        return conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.raw, name, value)
+
+    def close(self):
+        """归还到连接池（重复调用无效果）"""
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.release(conn)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.raw.commit()
+            else:
+                self.raw.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class SQLitePool:
+    """SQLite 连接池"""
+
+    def __init__(self, db_path: Path, max_connections: int = 8, timeout_seconds: float = 10.0,
+                 cache_size_kb: int = 16384, mmap_size_mb: int = 256, busy_timeout_ms: int = 5000,
+                 health_check_interval: float = 30.0):
+        """
+        初始化连接池
+
+        Args:
+            db_path: 数据库文件路径
+            max_connections: 最大连接数
+            timeout_seconds: 等待空闲连接的超时时间
+            cache_size_kb: 每个连接的页缓存大小（KB）
+            mmap_size_mb: 内存映射大小（MB，0 表示不使用）
+            busy_timeout_ms: 数据库被锁时的重试等待时间
+            health_check_interval: 空闲超过该秒数的连接借出前先检查
+        """
+        self.db_path = Path(db_path)
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.health_check_interval = health_check_interval
+
+        # 空闲连接：连接 -> 归还时间
+        self._idle: Dict[sqlite3.Connection, float] = {}
+        self._in_use = set()
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {
+            "acquired": 0,
+            "reused_thread_local": 0,
+            "created": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0
+        }
+
+    def _create(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    @staticmethod
+    def _ping(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _take_idle(self) -> Optional[Tuple[sqlite3.Connection, float]]:
+        """在持有锁时取出空闲连接（连接, 归还时间），优先当前线程上次使用的连接"""
+        home = getattr(self._local, "conn", None)
+        if home is not None and home in self._idle:
+            self.stats["reused_thread_local"] += 1
+            return home, self._idle.pop(home)
+        if self._idle:
+            conn = next(reversed(self._idle))
+            return conn, self._idle.pop(conn)
+        return None
+
+    def connect(self) -> PooledConnection:
+        """
+        借出连接（使用完毕调用 close() 或以 with 块归还）
+
+        Raises:
+            PoolTimeout: 等待空闲连接超时
+            sqlite3.ProgrammingError: 连接池已关闭
+        """
+        start = time.perf_counter()
+        waited = False
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise sqlite3.ProgrammingError(f"连接池已关闭: {self.db_path}")
+                taken = self._take_idle()
+                create = taken is None and len(self._in_use) < self.max_connections
+                if taken is None and not create:
+                    remaining = self.timeout_seconds - (time.perf_counter() - start)
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"等待数据库连接超时（{self.timeout_seconds}s，上限 {self.max_connections}）: {self.db_path}"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                    continue
+                # 新建连接时先占位，避免并发超过上限
+                placeholder = object() if create else None
+                self._in_use.add(placeholder if create else taken[0])
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._cond:
+                        self._in_use.discard(placeholder)
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._in_use.discard(placeholder)
+                    self._in_use.add(conn)
+                    self.stats["created"] += 1
+                break
+
+            conn, released_at = taken
+            if time.monotonic() - released_at < self.health_check_interval or self._ping(conn):
+                break
+            logger.warning(f"[SQLitePool] 连接检查失败，重新建立: {self.db_path}")
+            self._discard(conn)
+            with self._cond:
+                self._in_use.discard(conn)
+                self.stats["health_check_failures"] += 1
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self.stats["acquired"] += 1
+            if waited:
+                self.stats["waits"] += 1
+            self.stats["total_wait_ms"] += wait_ms
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+        self._local.conn = conn
+        return PooledConnection(self, conn)
+
+    def release(self, conn: sqlite3.Connection):
+        """归还连接（回滚未提交的事务，恢复默认行工厂）"""
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use.discard(conn)
+            if healthy and not self._closed:
+                self._idle[conn] = time.monotonic()
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def check_health(self) -> Dict[str, Any]:
+        """
+        检查所有空闲连接，关闭失效的连接
+
+        Returns:
+            {"healthy": 空闲连接是否全部可用, "checked": 检查数, "discarded": 关闭数}
+        """
+        with self._cond:
+            idle = list(self._idle)
+            for conn in idle:
+                self._idle.pop(conn)
+                self._in_use.add(conn)
+
+        discarded = 0
+        for conn in idle:
+            if self._ping(conn):
+                self.release(conn)
+            else:
+                discarded += 1
+                self._discard(conn)
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self.stats["health_check_failures"] += 1
+                    self._cond.notify()
+        return {"healthy": discarded == 0, "checked": len(idle), "discarded": discarded}
+
+    def close(self):
+        """关闭连接池：立即关闭空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                self._discard(conn)
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接数与等待时间统计"""
+        with self._cond:
+            acquired = self.stats["acquired"]
+            return {
+                **self.stats,
+                "total_wait_ms": round(self.stats["total_wait_ms"], 3),
+                "max_wait_ms": round(self.stats["max_wait_ms"], 3),
+                "avg_wait_ms": round(self.stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+                "open_connections": len(self._idle) + len(self._in_use),
+                "idle_connections": len(self._idle),
+                "in_use_connections": len(self._in_use),
+                "max_connections": self.max_connections,
+                "closed": self._closed
+            }
+
+
+# 全局连接池（每个数据库文件一个）
+_global_pools: Dict[str, SQLitePool] = {}
+_global_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: Path) -> SQLitePool:
+    """
+    获取数据库文件对应的全局连接池
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        连接池实例
+    """
+    key = str(Path(db_path).resolve())
+    with _global_pools_lock:
+        pool = _global_pools.get(key)
+        if pool is None:
+            from config import settings
+
+            pool = SQLitePool(
+                db_path,
+                max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                timeout_seconds=settings.DB_POOL_TIMEOUT_SECONDS,
+                cache_size_kb=settings.DB_CACHE_SIZE_KB,
+                mmap_size_mb=settings.DB_MMAP_SIZE_MB,
+                busy_timeout_ms=settings.DB_BUSY_TIMEOUT_MS
+            )
+            _global_pools[key] = pool
+            logger.info(f"[SQLitePool] 连接池已创建: {key}")
+    return pool
+
+
+def get_pool_stats(check_health: bool = False) -> List[Dict[str, Any]]:
+    """
+    获取所有连接池的统计
+
+    Args:
+        check_health: 是否同时检查空闲连接
+
+    Returns:
+        [{"database", ...统计}]
+    """
+    with _global_pools_lock:
+        pools = list(_global_pools.items())
+    result = []
+    for key, pool in pools:
+        item = {"database": key, **pool.get_stats()}
+        if check_health:
+            item["health"] = pool.check_health()
+        result.append(item)
+    return result
+
+
+def close_all_pools():
+    """关闭所有连接池（应用关闭时调用）"""
+    with _global_pools_lock:
+        pools = list(_global_pools.values())
+        _global_pools.clear()
+    for pool in pools:
+        pool.close()
+    if pools:
+        logger.info(f"[SQLitePool] 已关闭 {len(pools)} 个连接池")
@@ -0,0 +1,132 @@
+"""
+异步数据库访问与仓库测试
+
+运行: pytest test_async_db.py
+"""
+import asyncio
+import time
+from pathlib import Path
+
+from services.async_db import AsyncDatabase
+from services.card_search_cache import CardSearchCache
+from services.gtd_repository import GTDRepository
+from services.knowledge_repository import KnowledgeRepository, card_color
+from services.sqlite_pool import SQLitePool
+
+# 约 0.5 秒以上的纯计算查询，模拟重统计/图谱查询
+HEAVY_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000000)
+    SELECT SUM(i % 7) FROM n
+"""
+
+
+def _database(path: Path, max_workers: int = 4) -> AsyncDatabase:
+    return AsyncDatabase(path, max_workers=max_workers, pool=SQLitePool(path))
+
+
+def test_gtd_repository_crud_and_stats(db_path):
+    """GTD 任务增删改查与统计"""
+    async def scenario():
+        repo = GTDRepository(_database(db_path))
+        task = await repo.create_task("写周报", None, "today", "high", None)
+        await repo.create_task("整理收件箱", "邮件", "inbox", "low", None)
+        assert task["id"] == 1 and task["category"] == "today" and task["created_at"]
+
+        updated = await repo.update_task(1, {"title": "写月报", "priority": None, "id": 99})
+        assert updated["title"] == "写月报" and updated["priority"] == "high"
+        assert await repo.update_task(42, {"title": "不存在"}) is None
+
+        assert [t["title"] for t in (await repo.list_page("inbox"))["items"]] == ["整理收件箱"]
+        assert len((await repo.list_page())["items"]) == 2
+        stats = await repo.get_stats()
+        assert stats == {"total": 2, "by_category": {"today": 1, "inbox": 1}, "by_priority": {"high": 1, "low": 1}}
+
+        assert await repo.delete_task(1) and not await repo.delete_task(1)
+        assert await repo.get_task(1) is None and await repo.count() == 1
+    asyncio.run(scenario())
+
+
+def test_knowledge_repository(db_path):
+    """知识卡片列表、详情、创建、删除、统计与检索"""
+    async def scenario():
+        repo = KnowledgeRepository(_database(db_path), cache=CardSearchCache())
+        card = await repo.create_card("yellow", "库存积压预警", "当前库存5000", category="风险")
+        assert card["id"] == 1 and card_color(card) == "yellow"
+        await repo.db.execute(
+            "INSERT INTO knowledge_cards (title, content, card_type, category) VALUES (?, ?, ?, ?)",
+            ("团队周会", "讨论招聘计划", "blue", "事实")
+        )
+
+        page = await repo.list_page(limit=1, fields="title")
+        assert [row["id"] for row in page["items"]] == [2] and page["next_cursor"]
+        assert set(page["items"][0]) == {"id", "title", "created_at"}
+        page = await repo.list_page(cursor=page["next_cursor"])
+        assert [row["id"] for row in page["items"]] == [1] and page["next_cursor"] is None
+        page = await repo.list_page(card_type="blue")
+        assert await repo.count("blue") == 1 and card_color(page["items"][0]) == "blue"
+
+        stats = await repo.get_stats()
+        assert stats["total_cards"] == 2 and stats["cards_by_type"] == {"yellow": 1, "blue": 1}
+        assert stats["cards_by_category"] == {"风险": 1, "事实": 1}
+
+        hits = await repo.search("当前库存", limit=5)
+        assert [hit["id"] for hit in hits] == [1] and "<mark>" in hits[0]["snippet"]
+
+        assert await repo.delete_card(1) and await repo.get_card(1) is None
+        assert await repo.search("当前库存", limit=5) == []
+    asyncio.run(scenario())
+
+
+def test_failed_operation_rolls_back(db_path):
+    """操作抛出异常时回滚并计入错误数，连接归还到连接池"""
+    async def scenario():
+        db = _database(db_path)
+
+        def _fail(conn):
+            conn.execute("INSERT INTO gtd_tasks (title, category) VALUES ('半成品', 'inbox')")
+            raise RuntimeError("中途失败")
+
+        try:
+            await db.run(_fail)
+            assert False, "应抛出异常"
+        except RuntimeError:
+            pass
+        assert await db.fetch_value("SELECT COUNT(*) FROM gtd_tasks") == 0
+        stats = db.get_stats()
+        assert stats["errors"] == 1 and stats["calls"] == 2 and stats["pending"] == 0 and stats["active"] == 0
+        assert db.pool.get_stats()["in_use_connections"] == 0
+        db.shutdown()
+    asyncio.run(scenario())
+
+
+def test_cheap_queries_stay_fast_during_heavy_query(db_path):
+    """重查询执行期间，事件循环不被阻塞，轻查询的 p99 延迟保持平稳"""
+    async def scenario():
+        db = _database(db_path)
+        repo = GTDRepository(db)
+        await repo.create_task("写周报", None, "today", "high", None)
+
+        async def cheap_latencies(count):
+            samples = []
+            for _ in range(count):
+                start = time.perf_counter()
+                await repo.get_task(1)
+                samples.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+            return sorted(samples)
+
+        baseline = await cheap_latencies(40)
+
+        heavy_start = time.perf_counter()
+        heavy = asyncio.ensure_future(db.fetch_value(HEAVY_QUERY))
+        await asyncio.sleep(0.01)
+        during = await cheap_latencies(40)
+        assert not heavy.done(), "重查询应在轻查询期间持续执行"
+        await heavy
+        heavy_ms = (time.perf_counter() - heavy_start) * 1000
+
+        p99 = during[int(0.99 * (len(during) - 1))]
+        assert heavy_ms > 300
+        assert p99 < max(50.0, baseline[-1] * 5), f"p99={p99:.1f}ms, heavy={heavy_ms:.0f}ms"
+        db.shutdown()
+    asyncio.run(scenario())
@@ -0,0 +1,205 @@
+"""
+知识卡片批量导入测试
+
+运行: pytest test_card_bulk_import.py
+"""
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+from services import card_search
+from services.card_bulk_import import (
+    BULK_IMPORT_TABLE, _deferred_schema, bulk_import_cards, content_hash, recover_bulk_import
+)
+from services.async_db import AsyncDatabase
+from services.card_search_cache import CardSearchCache
+from services.knowledge_repository import KnowledgeRepository
+from services.sqlite_pool import SQLitePool
+
+
+@pytest.fixture
+def conn(db) -> sqlite3.Connection:
+    """已建立全文索引与知识代数的数据库连接"""
+    card_search.ensure_card_fts(db)
+    card_search.ensure_card_generation(db)
+    return db
+
+
+def _schema(conn):
+    return sorted(
+        (row[0], row[1]) for row in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE tbl_name = 'knowledge_cards' AND type IN ('index', 'trigger')"
+        )
+    )
+
+
+def _cards(count, start=0):
+    for i in range(start, start + count):
+        yield {
+            "card_type": ["blue", "green", "yellow", "red"][i % 4],
+            "title": f"第{i}号卡片",
+            "content": f"库存周转说明{i}：周转天数按月计算，积压超过九十天需要预警。",
+            "category": f"分类{i % 5}",
+        }
+
+
+def test_deduplicates_by_content_hash(conn):
+    """批内、批间与重复导入都按内容哈希去重，缺少标题或正文的卡片计入失败"""
+    cards = list(_cards(5))
+    cards.append(dict(cards[0]))
+    cards.append({**cards[1], "content": "  " + cards[1]["content"] + "\n"})
+    cards.append({"title": "没有正文"})
+
+    stats = bulk_import_cards(conn, cards, batch_size=3)
+    assert stats["processed"] == 8 and stats["batches"] == 3
+    assert (stats["success"], stats["duplicates"], stats["failed"]) == (5, 2, 1)
+
+    again = bulk_import_cards(conn, _cards(7))
+    assert (again["success"], again["duplicates"]) == (2, 5)
+    assert conn.execute("SELECT COUNT(*) FROM knowledge_cards").fetchone()[0] == 7
+
+    row = conn.execute("SELECT * FROM knowledge_cards WHERE id = 1").fetchone()
+    assert row["content_hash"] == content_hash(row["title"], row["content"])
+    assert row["category"] == "分类0" and row["similarity"] == 0.0 and row["created_at"]
+
+
+def test_cards_created_elsewhere_are_deduplicated(conn, db_path):
+    """经仓库创建或由其他途径写入（缺少哈希）的卡片，之后批量导入相同内容时不会重复"""
+    cards = list(_cards(3))
+
+    async def scenario():
+        repo = KnowledgeRepository(AsyncDatabase(db_path, pool=SQLitePool(db_path)), cache=CardSearchCache())
+        created = await repo.create_card(cards[0]["card_type"], cards[0]["title"], cards[0]["content"])
+        assert created["content_hash"] == content_hash(cards[0]["title"], cards[0]["content"])
+        again = await repo.create_card("red", cards[0]["title"], " " + cards[0]["content"])
+        assert again["id"] == created["id"]
+    asyncio.run(scenario())
+
+    # 脚本直接写入、没有哈希的卡片
+    conn.execute(
+        "INSERT INTO knowledge_cards (card_type, title, content) VALUES (?, ?, ?)",
+        (cards[1]["card_type"], cards[1]["title"], cards[1]["content"])
+    )
+    conn.commit()
+
+    stats = bulk_import_cards(conn, cards)
+    assert (stats["success"], stats["duplicates"]) == (1, 2)
+    assert conn.execute("SELECT COUNT(*) FROM knowledge_cards").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM knowledge_cards WHERE content_hash IS NULL").fetchone()[0] == 0
+
+
+def test_search_schema_and_generation_restored(conn):
+    """导入后全文索引包含新卡片，触发器与索引恢复，代数递增，连接参数恢复"""
+    schema = _schema(conn)
+    generation = card_search.get_generation(conn)
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+
+    progress = []
+    stats = bulk_import_cards(conn, _cards(250), batch_size=100, defer_indexes=True, progress=progress.append)
+    assert [p["processed"] for p in progress] == [100, 200, 250]
+    assert progress[-1]["success"] == stats["success"] == 250
+
+    assert _schema(conn) == schema
+    assert card_search.get_generation(conn) > generation
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == synchronous
+    assert conn.execute(f"SELECT COUNT(*) FROM {BULK_IMPORT_TABLE}").fetchone()[0] == 0
+
+    hits = card_search.search_cards(conn, "第123号卡片", limit=3)
+    assert hits and hits[0]["id"] == 124
+
+    # 触发器已恢复：导入后逐条写入的卡片照常进入全文索引
+    conn.execute("INSERT INTO knowledge_cards (title, content) VALUES ('周会纪要', '讨论招聘计划')")
+    conn.commit()
+    assert [hit["id"] for hit in card_search.search_cards(conn, "招聘计划", limit=3)] == [251]
+
+
+def test_failed_progress_callback_still_restores_schema(conn):
+    """导入中途抛出异常时，已提交的批次补齐全文索引，触发器与索引恢复"""
+    schema = _schema(conn)
+
+    def _abort(stats):
+        if stats["batches"] == 2:
+            raise RuntimeError("中止导入")
+
+    try:
+        bulk_import_cards(conn, _cards(500), batch_size=100, defer_indexes=True, progress=_abort)
+        assert False, "应抛出异常"
+    except RuntimeError:
+        pass
+    assert _schema(conn) == schema
+    assert conn.execute("SELECT COUNT(*) FROM knowledge_cards").fetchone()[0] == 200
+    assert card_search.search_cards(conn, "第150号卡片", limit=1)[0]["id"] == 151
+
+
+def test_recover_interrupted_import(conn):
+    """进程在导入中途退出后，恢复时补齐全文索引并重建触发器与索引"""
+    schema = _schema(conn)
+    bulk_import_cards(conn, _cards(10))
+
+    # 模拟导入中途退出：已记录导入、移除触发器与索引，写入部分卡片后未收尾
+    deferred = _deferred_schema(conn, True)
+    conn.execute(
+        f"INSERT INTO {BULK_IMPORT_TABLE} (id, start_id, deferred_json) VALUES (1, 10, ?)", (json.dumps(deferred),)
+    )
+    for item in deferred:
+        conn.execute(f"DROP {item['type'].upper()} {item['name']}")
+    conn.executemany(
+        "INSERT INTO knowledge_cards (card_type, title, content, content_hash) VALUES (?, ?, ?, ?)",
+        [(card["card_type"], card["title"], card["content"], content_hash(card["title"], card["content"]))
+         for card in _cards(5, start=10)]
+    )
+    conn.commit()
+    assert 13 not in [hit["id"] for hit in card_search.search_cards(conn, "第12号卡片", limit=20)]
+
+    assert recover_bulk_import(conn)
+    assert not recover_bulk_import(conn)
+    assert _schema(conn) == schema
+    assert card_search.search_cards(conn, "第12号卡片", limit=1)[0]["id"] == 13
+
+
+def test_concurrent_ensure_card_fts_during_import(conn, db_path):
+    """导入期间另一连接重建了触发器：收尾不报错，全文索引不重复，导入记录清除"""
+    schema = _schema(conn)
+
+    def _other_process(stats):
+        if stats["batches"] == 1:
+            other = sqlite3.connect(str(db_path))
+            card_search.reset_schema_cache(other)
+            card_search.ensure_card_fts(other)
+            card_search.ensure_card_generation(other)
+            other.close()
+
+    stats = bulk_import_cards(conn, _cards(300), batch_size=100, defer_indexes=True, progress=_other_process)
+    assert stats["success"] == 300
+    assert _schema(conn) == schema
+    assert conn.execute(f"SELECT COUNT(*) FROM {BULK_IMPORT_TABLE}").fetchone()[0] == 0
+    indexed = conn.execute(f"SELECT COUNT(*) FROM {card_search.FTS_TABLE}_docsize").fetchone()[0]
+    assert indexed == 300
+    assert [hit["id"] for hit in card_search.search_cards(conn, "第250号卡片", limit=1)] == [251]
+
+
+def test_failed_recovery_does_not_raise(conn):
+    """恢复失败时返回 False、保留导入记录，不抛出异常（不阻塞后端启动）"""
+    bulk_import_cards(conn, _cards(3))
+    conn.execute(
+        f"INSERT INTO {BULK_IMPORT_TABLE} (id, start_id, deferred_json) VALUES (1, 0, ?)",
+        (json.dumps([{"type": "index", "name": "broken", "sql": "CREATE INDEX broken ON missing_table(id)"}]),)
+    )
+    conn.commit()
+    assert recover_bulk_import(conn) is False
+    assert not conn.in_transaction
+    assert conn.execute(f"SELECT COUNT(*) FROM {BULK_IMPORT_TABLE}").fetchone()[0] == 1
+    assert conn.execute(f"SELECT COUNT(*) FROM {card_search.FTS_TABLE}_docsize").fetchone()[0] == 3
+
+
+def test_large_import_throughput(conn):
+    """两万张卡片（含全文索引）数秒内导入完成"""
+    start = time.perf_counter()
+    stats = bulk_import_cards(conn, _cards(20000), defer_indexes=True)
+    elapsed = time.perf_counter() - start
+    assert stats["success"] == 20000
+    assert elapsed < 10, f"导入耗时 {elapsed:.1f}s"
+    assert card_search.search_cards(conn, "第19999号卡片", limit=1)[0]["id"] == 20000
@@ -0,0 +1,103 @@
+"""
+太史阁卡片仓库测试
+
+运行: pytest test_card_repository.py
+"""
+from pathlib import Path
+
+from services.card_repository import CardRepository, decode_cursor
+
+
+def _repo(directory: Path) -> CardRepository:
+    return CardRepository(directory / "cards.db")
+
+
+def _card(card_id: str, card_type: str = "blue", **extra) -> dict:
+    return {"id": card_id, "type": card_type, "title": f"卡片{card_id}", "tags": ["销售"], **extra}
+
+
+def test_knowledge_items_are_expanded_into_cards(tmp_path):
+    """写入知识项时展开卡片，按卡片ID或原始卡片ID查询"""
+    repo = _repo(tmp_path)
+    ids = repo.add_knowledge("K1", {"cards": [_card("a"), _card("b", "red", confidence=0.95)]})
+    assert ids == ["K1_a", "K1_b"]
+    assert repo.add_knowledge("K2", {"type": "green", "title": "单张卡片"}) == ["K2"]
+    assert repo.add_knowledge("K3", {"summary": "没有卡片"}) == []
+
+    card = repo.get_card("K1_b")
+    assert card["type"] == "red" and card["confidence"] == 0.95
+    assert card["knowledge_id"] == "K1" and card["tags"] == ["销售"] and card["references"] == []
+    assert repo.get_card("b")["id"] == "K1_b"
+    assert repo.get_card("K2")["content"] == {"type": "green", "title": "单张卡片"}
+    assert repo.get_card("missing") is None
+
+
+def test_rewriting_knowledge_replaces_its_cards(tmp_path):
+    """同一知识项再次写入时替换其卡片"""
+    repo = _repo(tmp_path)
+    repo.add_knowledge("K1", {"cards": [_card("a"), _card("b")]})
+    repo.add_knowledge("K1", {"cards": [_card("c")]})
+    assert repo.count() == 1
+    assert repo.get_card("K1_a") is None and repo.get_card("K1_c") is not None
+
+
+def test_keyset_pagination_and_type_filter(tmp_path):
+    """游标翻页按时间倒序不重不漏，类型过滤与总数正确"""
+    repo = _repo(tmp_path)
+    for i in range(25):
+        card_type = "yellow" if i % 5 == 0 else "blue"
+        repo.add_knowledge(f"K{i}", {"cards": [_card(str(i), card_type)]},
+                           create_time=f"2026-01-01 00:00:{i // 2:02d}")
+
+    seen = []
+    cursor = None
+    while True:
+        cards, total, cursor = repo.list_cards(limit=7, cursor=cursor)
+        assert total == 25
+        seen.extend(card["id"] for card in cards)
+        if cursor is None:
+            break
+    assert seen == [f"K{i}_{i}" for i in reversed(range(25))]
+
+    cards, total, cursor = repo.list_cards(card_type="yellow", limit=10)
+    assert total == 5 and cursor is None
+    assert [card["id"] for card in cards] == [f"K{i}_{i}" for i in (20, 15, 10, 5, 0)]
+
+    cards, _, _ = repo.list_cards(limit=2, offset=3)
+    assert [card["id"] for card in cards] == ["K21_21", "K20_20"]
+
+    try:
+        decode_cursor("not-a-cursor")
+        assert False, "无效游标应报错"
+    except ValueError:
+        pass
+
+
+def test_delete_and_persistence(tmp_path):
+    """删除卡片，数据在重新打开后仍然存在"""
+    path = tmp_path / "cards.db"
+    repo = CardRepository(path)
+    repo.add_knowledge("Ca", {"cards": [_card("a")]})
+    repo.add_knowledge("Cb", {"cards": [_card("b")]})
+    assert repo.delete_card("a")
+    assert not repo.delete_card("a")
+    repo.close()
+
+    reopened = CardRepository(path)
+    assert reopened.count() == 1
+    assert reopened.get_card("b")["id"] == "Cb_b"
+
+
+def test_lookups_use_indexes(tmp_path):
+    """按ID查询与按类型的时间排序走索引，不全表扫描或临时排序"""
+    repo = _repo(tmp_path)
+    conn = repo._conn
+    plan = " ".join(str(tuple(row)) for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM taishige_cards WHERE id = ?", ("x",)
+    ))
+    assert "USING INDEX" in plan
+    plan = " ".join(str(tuple(row)) for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM taishige_cards WHERE type = ? AND (timestamp, seq) < (?, ?) "
+        "ORDER BY timestamp DESC, seq DESC LIMIT 10", ("blue", "2026-01-01", 5)
+    ))
+    assert "idx_taishige_cards_type_timestamp" in plan and "TEMP B-TREE" not in plan
@@ -0,0 +1,150 @@
+"""
+知识卡片全文检索测试
+
+运行: pytest test_card_search.py
+"""
+import sqlite3
+
+from services.card_search import (
+    BIGRAM_PENDING_TABLE, BIGRAM_TABLE, FTS_TABLE,
+    bigram_text, build_bigram_query, build_match_query, ensure_card_fts, search_cards, sync_bigram_index
+)
+
+
+def _add_cards(conn: sqlite3.Connection, cards) -> sqlite3.Connection:
+    conn.executemany("INSERT INTO knowledge_cards (card_type, title, content, category) VALUES (?, ?, ?, ?)", cards)
+    conn.commit()
+    return conn
+
+
+def test_existing_cards_are_backfilled(db):
+    """新建索引时回填已有卡片"""
+    conn = _add_cards(db, [("blue", "团队协作效率", "提升团队协作效率的方法", "事实")])
+    assert ensure_card_fts(conn)
+    assert [c["title"] for c in search_cards(conn, "协作效率")] == ["团队协作效率"]
+
+
+def test_triggers_keep_index_in_sync(db):
+    """插入、更新、删除卡片后索引同步"""
+    conn = db
+    ensure_card_fts(conn)
+    conn.execute("INSERT INTO knowledge_cards (card_type, title, content) VALUES ('red', '库存预警', '库存周转天数过高')")
+    assert len(search_cards(conn, "周转天数")) == 1
+
+    conn.execute("UPDATE knowledge_cards SET content = '销售回款周期变长' WHERE title = '库存预警'")
+    assert search_cards(conn, "周转天数") == []
+    assert len(search_cards(conn, "回款周期")) == 1
+
+    conn.execute("DELETE FROM knowledge_cards")
+    assert search_cards(conn, "回款周期") == []
+
+
+def test_bm25_ranks_title_and_more_matches_higher(db, make_db_path):
+    """标题命中与更多片段命中的卡片排名靠前，相似度按本次查询最高分归一化、随排名递减"""
+    conn = _add_cards(db, [
+        ("blue", "季度报告", "本季度销售额增长，风险评估见附件", "事实"),
+        ("yellow", "风险评估方法", "介绍常用的风险评估方法", "风险"),
+    ] + [("green", f"无关卡片{i}", "今天天气不错", "解释") for i in range(10)])
+    cards = search_cards(conn, "风险评估方法")
+    assert [c["title"] for c in cards] == ["风险评估方法", "季度报告"]
+    assert cards[0]["similarity"] == 1.0 > cards[1]["similarity"] > 0
+    assert "<mark>" in cards[0]["snippet"]
+
+    # 小语料上标题完全命中的卡片相似度同样为 1
+    small = _add_cards(sqlite3.connect(str(make_db_path())), [("blue", "团队协作效率", "提升团队协作效率的方法", "事实")])
+    assert search_cards(small, "团队协作效率")[0]["similarity"] == 1.0
+
+
+def test_two_char_query_uses_bigram_index(db):
+    """两字词查询走二字片段索引，标题命中优先，相似度与三字片段检索同一尺度"""
+    conn = _add_cards(db, [
+        ("blue", "季度报告", "包含风险提示", "事实"),
+        ("yellow", "风险清单", "列出主要问题", "风险"),
+        ("green", "库存说明", "周转天数", "解释"),
+    ])
+    assert build_match_query("风险")[0] is None
+    assert build_bigram_query(["风险", "a"]) == '"风险"'
+    assert bigram_text("库存风险，高") == "库存 存风 风险"
+    ensure_card_fts(conn)
+    assert sync_bigram_index(conn) == 3
+    assert conn.execute(f"SELECT COUNT(*) FROM {BIGRAM_PENDING_TABLE}").fetchone()[0] == 0
+
+    cards = search_cards(conn, "风险")
+    assert [c["title"] for c in cards] == ["风险清单", "季度报告"]
+    assert cards[0]["similarity"] == 1.0 > cards[1]["similarity"] > 0
+    assert cards[1]["snippet"] == "包含<mark>风险</mark>提示"
+    assert {c["title"] for c in search_cards(conn, "库存 风险")} == {"风险清单", "季度报告", "库存说明"}
+
+    plan = " ".join(row[3] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT c.id FROM {BIGRAM_TABLE} JOIN knowledge_cards c ON c.id = {BIGRAM_TABLE}.rowid "
+        f"WHERE {BIGRAM_TABLE} MATCH ?", ('"风险"',)
+    ))
+    assert "VIRTUAL TABLE" in plan and "SCAN c" not in plan
+
+
+def test_bigram_index_follows_writes_from_other_connections(db, db_path):
+    """其他连接写入的卡片在同步前以子串匹配检索到，检索本身不写数据库"""
+    conn = _add_cards(db, [("blue", "季度报告", "包含风险提示", "事实")])
+    ensure_card_fts(conn)
+    sync_bigram_index(conn)
+    assert len(search_cards(conn, "风险")) == 1
+
+    other = sqlite3.connect(str(db_path))
+    other.execute("INSERT INTO knowledge_cards (card_type, title, content) VALUES ('red', '库存预警', '库存积压')")
+    other.execute("UPDATE knowledge_cards SET content = '销售增长' WHERE title = '季度报告'")
+    other.commit()
+    assert conn.execute(f"SELECT COUNT(*) FROM {BIGRAM_PENDING_TABLE}").fetchone()[0] == 2
+
+    assert search_cards(conn, "风险") == []
+    assert [c["title"] for c in search_cards(conn, "库存")] == ["库存预警"]
+    assert conn.execute(f"SELECT COUNT(*) FROM {BIGRAM_PENDING_TABLE}").fetchone()[0] == 2
+    assert not conn.in_transaction
+
+    assert sync_bigram_index(conn) == 2
+    assert [c["title"] for c in search_cards(conn, "库存")] == ["库存预警"]
+
+    other.execute("DELETE FROM knowledge_cards WHERE title = '库存预警'")
+    other.commit()
+    assert search_cards(conn, "库存") == []
+    assert sync_bigram_index(conn) == 1
+    assert conn.execute(f"SELECT COUNT(*) FROM {BIGRAM_TABLE}").fetchone()[0] == 1
+
+
+def test_mixed_query_keeps_two_char_terms(db):
+    """两字词与长词混合的查询合并两个索引的命中，两边都命中的卡片排在前面"""
+    conn = _add_cards(db, [
+        ("blue", "季度报告", "数据口径说明", "事实"),
+        ("blue", "analysis notes", "quarterly analysis", "事实"),
+        ("blue", "数据 analysis", "数据 analysis 方法", "事实"),
+    ])
+    ensure_card_fts(conn)
+    sync_bigram_index(conn)
+    cards = search_cards(conn, "数据 analysis")
+    assert [c["title"] for c in cards][0] == "数据 analysis"
+    assert {c["title"] for c in cards} == {"季度报告", "analysis notes", "数据 analysis"}
+    assert cards[0]["similarity"] == 1.0
+
+
+def test_single_char_query_falls_back_to_like(db):
+    """单字查询退回 LIKE 匹配，按列权重计分并同样归一化"""
+    conn = _add_cards(db, [
+        ("blue", "季度报告", "包含税务提示", "事实"),
+        ("yellow", "税务清单", "列出主要问题", "风险"),
+    ])
+    cards = search_cards(conn, "税")
+    assert [c["title"] for c in cards] == ["税务清单", "季度报告"]
+    assert cards[0]["similarity"] == 1.0 > cards[1]["similarity"] > 0
+    assert cards[1]["snippet"] == "包含<mark>税</mark>务提示"
+
+
+def test_query_uses_fts_index(db):
+    """检索走 FTS5 虚拟表而不是扫描 knowledge_cards"""
+    conn = _add_cards(db, [("blue", f"卡片{i}", f"内容{i}", "事实") for i in range(100)])
+    ensure_card_fts(conn)
+    match, _ = build_match_query("团队协作效率")
+    plan = " ".join(row[3] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN SELECT c.id FROM {FTS_TABLE} JOIN knowledge_cards c ON c.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH ?", (match,)
+    ))
+    assert "VIRTUAL TABLE" in plan
+    assert "SCAN c" not in plan
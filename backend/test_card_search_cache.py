@@ -0,0 +1,123 @@
+"""
+知识卡片检索缓存测试
+
+运行: pytest test_card_search_cache.py
+"""
+import sqlite3
+from pathlib import Path
+
+from services import card_search
+from services.card_search_cache import CardSearchCache, normalize_query, search_cards_cached
+
+
+def _add_cards(path: Path) -> Path:
+    conn = sqlite3.connect(str(path))
+    conn.executemany("INSERT INTO knowledge_cards (card_type, title, content, category) VALUES (?, ?, ?, ?)", [
+        ("yellow", "库存积压预警", "当前库存5000，预计需求2000", "风险"),
+        ("blue", "库存周转天数", "本月库存周转天数为45天", "事实"),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_normalized_queries_share_entries(db_path):
+    """大小写、全角与空白不同的查询命中同一条缓存"""
+    assert normalize_query("  ＡＢＣ   库存\t积压 ") == "abc 库存 积压"
+    cache = CardSearchCache()
+    conn = sqlite3.connect(str(_add_cards(db_path)))
+
+    first = search_cards_cached(conn, "库存积压", limit=5, cache=cache)
+    second = search_cards_cached(conn, "  库存积压 ", limit=5, cache=cache)
+    assert [card["id"] for card in first] == [card["id"] for card in second] == [1]
+    search_cards_cached(conn, "库存积压", limit=3, cache=cache)
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["entries"] == 2
+    assert stats["hit_rate"] == round(1 / 3, 4) and stats["memory_bytes"] > 0
+
+    # 调用方修改返回结果不影响缓存
+    second[0]["title"] = "已修改"
+    assert search_cards_cached(conn, "库存积压", limit=5, cache=cache)[0]["title"] == "库存积压预警"
+
+
+def test_writes_from_any_connection_invalidate(db_path):
+    """任何连接对卡片的插入、更新、删除都使代数递增并使缓存失效"""
+    path = _add_cards(db_path)
+    cache = CardSearchCache()
+    reader = sqlite3.connect(str(path))
+    assert search_cards_cached(reader, "库存周转", limit=5, cache=cache)[0]["id"] == 2
+    generation = card_search.get_generation(reader)
+
+    writer = sqlite3.connect(str(path))
+    writer.execute("INSERT INTO knowledge_cards (card_type, title, content) VALUES ('red', '库存周转优化', '缩短周转')")
+    writer.commit()
+    assert card_search.get_generation(reader) == generation + 1
+    assert len(search_cards_cached(reader, "库存周转", limit=5, cache=cache)) == 2
+
+    writer.execute("UPDATE knowledge_cards SET title = '周转优化' WHERE id = 3")
+    writer.execute("DELETE FROM knowledge_cards WHERE id = 2")
+    writer.commit()
+    assert card_search.get_generation(reader) == generation + 3
+    assert search_cards_cached(reader, "库存周转", limit=5, cache=cache) == []
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 0 and stats["invalidations"] == 2 and stats["entries"] == 1
+
+
+def test_card_type_filter_is_part_of_key(db_path):
+    """类型过滤参与缓存键"""
+    cache = CardSearchCache()
+    conn = sqlite3.connect(str(_add_cards(db_path)))
+    assert len(search_cards_cached(conn, "库存", limit=5, cache=cache)) == 2
+    assert [card["id"] for card in search_cards_cached(conn, "库存", limit=5, card_type="blue", cache=cache)] == [2]
+    assert cache.get_stats()["hits"] == 0
+
+
+def test_card_type_filter_still_fills_limit(db_path):
+    """类型过滤在检索中完成：相关度更高的其他类型卡片不会挤占名额"""
+    conn = sqlite3.connect(str(_add_cards(db_path)))
+    conn.executemany("INSERT INTO knowledge_cards (card_type, title, content) VALUES (?, ?, ?)", [
+        ("yellow", f"库存周转预警{i}", "库存周转天数过高，库存积压") for i in range(20)
+    ] + [
+        ("blue", f"说明{i}", f"月度库存周转记录{i}") for i in range(5)
+    ])
+    conn.commit()
+    for query in ("库存周转", "库存"):
+        cards = search_cards_cached(conn, query, limit=5, card_type="blue", cache=CardSearchCache())
+        assert len(cards) == 5, query
+        assert {card["card_type"] for card in cards} == {"blue"}
+
+
+def test_query_is_normalized_before_searching(db_path):
+    """全角查询按规范化后的文本检索，与缓存键一致"""
+    conn = sqlite3.connect(str(_add_cards(db_path)))
+    conn.execute("INSERT INTO knowledge_cards (card_type, title, content) VALUES ('green', 'KPI 考核', 'kpi 按季度考核')")
+    conn.commit()
+    cache = CardSearchCache()
+    first = search_cards_cached(conn, "ＫＰＩ考核", limit=5, cache=cache)
+    assert [card["id"] for card in first] == [3]
+    second = search_cards_cached(conn, "kpi考核", limit=5, cache=cache)
+    assert second == first and cache.get_stats()["hits"] == 1
+
+
+def test_lru_eviction_by_entries_and_memory():
+    """超过条目数或估算内存上限时淘汰最久未使用的结果"""
+    cache = CardSearchCache(max_entries=2)
+    cards = [{"id": 1, "title": "库存"}]
+    for query in ("a", "b"):
+        cache.put("db", 0, cache.make_key(query, 5), cards)
+    cache.get("db", 0, cache.make_key("a", 5))
+    cache.put("db", 0, cache.make_key("c", 5), cards)
+    assert cache.get("db", 0, cache.make_key("b", 5)) is None
+    assert cache.get("db", 0, cache.make_key("a", 5)) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    cache = CardSearchCache(max_bytes=2000)
+    big = [{"id": i, "content": "库" * 100} for i in range(3)]
+    cache.put("db", 0, cache.make_key("a", 5), big)
+    cache.put("db", 0, cache.make_key("b", 5), big)
+    stats = cache.get_stats()
+    assert stats["entries"] == 1 and stats["memory_bytes"] <= 2000
+    cache.put("db", 0, cache.make_key("c", 5), [{"content": "库" * 5000}])
+    assert cache.get("db", 0, cache.make_key("c", 5)) is None
@@ -0,0 +1,78 @@
+"""
+生成策略测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_generation_policy.py
+"""
+import os
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.generation_policy import (
+    GenerationPolicy,
+    json_object_complete,
+    code_fence_closed,
+    json_skill_policy
+)
+
+
+def _make_loader(decode_delay: float = 0.0) -> NPUModelLoader:
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.decode_delay = decode_delay
+    loader.model.prefill_delay_per_token = 0
+    loader.model.response_tokens = 1024
+    return loader
+
+
+def test_json_object_complete():
+    """JSON 对象闭合判定忽略字符串中的括号"""
+    assert not json_object_complete('说明文字 {"facts": [')
+    assert not json_object_complete('{"text": "包含 } 的字符串"')
+    assert json_object_complete('```json\n{"text": "包含 } 的字符串", "n": {"a": 1}}')
+    assert not json_object_complete('{"text": "转义 \\" }"')
+    assert code_fence_closed('```json\n{}\n```')
+    assert not code_fence_closed('```json\n{}')
+
+
+def test_skill_policy_stops_when_json_closes():
+    """JSON 输出闭合后立即结束生成，不再消耗解码步数"""
+    loader = _make_loader()
+    policy = json_skill_policy("fact_extraction", max_new_tokens=512)
+    result = loader.infer('{"facts": [1]} 之后还有很多不需要的内容' * 5, max_new_tokens=1024, policy=policy)
+
+    assert result.endswith("}")
+    assert json_object_complete(result)
+    assert loader.model.generated_tokens < 40
+    assert loader.policy_stats["fact_extraction"] == {"complete": 1}
+
+
+def test_budget_caps_max_new_tokens():
+    """策略预算与调用方 max_new_tokens 取较小值"""
+    loader = _make_loader()
+    loader.infer("没有结构化输出的长文本" * 20, max_new_tokens=1024,
+                 policy=GenerationPolicy("short", max_new_tokens=12))
+    assert loader.model.generated_tokens == 12
+    assert loader.policy_stats["short"] == {"budget": 1}
+
+
+def test_timeout_ends_generation():
+    """超过最长生成时间后结束"""
+    loader = _make_loader(decode_delay=0.01)
+    loader.infer("生成很长的回答" * 20, max_new_tokens=1024,
+                 policy=GenerationPolicy("slow", max_time_s=0.05))
+    assert loader.model.generated_tokens < 20
+    assert loader.policy_stats["slow"] == {"timeout": 1}
+
+
+def test_stop_string_across_tokens_is_trimmed():
+    """跨 token 的停止字符串被识别，并从结果中截去"""
+    monitor = GenerationPolicy("chat").start(64)
+    tokens = ["回答", "完毕", "<|im_", "end|>", "多余"]
+    stopped_at = None
+    for i, token in enumerate(tokens):
+        if monitor.feed(token):
+            stopped_at = i
+            break
+    assert stopped_at == 3
+    assert monitor.stop_reason == "stop_string"
+    assert monitor.finalize(monitor.text) == "回答完毕"
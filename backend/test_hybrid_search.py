@@ -0,0 +1,129 @@
+"""
+混合检索测试
+
+运行: pytest test_hybrid_search.py
+"""
+import asyncio
+import sqlite3
+import time
+
+from services.hybrid_search import (
+    BackendUnavailable, CardBackend, HybridRetriever, _hit, reciprocal_rank_fusion
+)
+
+
+class _FakeBackend:
+    """返回固定结果的检索后端"""
+
+    def __init__(self, name, hits=None, delay=0.0, error=None):
+        self.name = name
+        self.hits = hits or []
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def search(self, query, limit):
+        self.calls.append((query, limit))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.hits[:limit]
+
+
+def _hits(backend, titles, score=0.5):
+    return [_hit(backend, i, title, f"{title}的正文", score) for i, title in enumerate(titles)]
+
+
+def test_rrf_rewards_agreement_and_dedups_across_stores():
+    """两个后端都命中的结果排在只被一个后端排第一的结果之前，相同内容合并为一条"""
+    ranked = {
+        "cards": _hits("cards", ["销售下滑", "库存积压", "客户流失"], score=0.9),
+        "memory": _hits("memory", ["价格调整", "库存积压", "销售下滑"], score=0.4),
+    }
+    results = reciprocal_rank_fusion(ranked, k=60)
+
+    titles = [item["title"] for item in results]
+    assert titles[:2] == ["销售下滑", "库存积压"]
+    assert len(results) == 4
+    top = results[0]
+    assert [match["backend"] for match in top["matches"]] == ["cards", "memory"]
+    assert top["id"] == "cards:0" and top["similarity"] == 0.9
+    assert abs(top["rrf_score"] - (1 / 61 + 1 / 63)) < 1e-6
+
+
+def test_backends_run_concurrently_with_stage_timings():
+    """后端并发执行，总耗时接近最慢的后端；响应包含各阶段耗时"""
+    retriever = HybridRetriever([
+        _FakeBackend("cards", _hits("cards", ["销售下滑"]), delay=0.3),
+        _FakeBackend("memory", _hits("memory", ["销售下滑"]), delay=0.3),
+    ], candidates=5)
+
+    start = time.perf_counter()
+    result = asyncio.run(retriever.search("销售", limit=3))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.55
+    assert len(result["results"]) == 1
+    timings = result["timings"]
+    assert set(timings) == {"cards_ms", "memory_ms", "retrieval_ms", "fusion_ms", "total_ms"}
+    assert timings["cards_ms"] >= 290 and timings["total_ms"] >= timings["retrieval_ms"]
+
+
+def test_failed_and_slow_backends_are_skipped():
+    """超时、异常与不可用的后端跳过，其余后端照常返回"""
+    retriever = HybridRetriever([
+        _FakeBackend("cards", _hits("cards", ["销售下滑"])),
+        _FakeBackend("slow", _hits("slow", ["库存积压"]), delay=0.5),
+        _FakeBackend("broken", error=RuntimeError("连接失败")),
+        _FakeBackend("cases", error=BackendUnavailable("向量检索模块未安装")),
+    ], timeout_seconds=0.1)
+
+    result = asyncio.run(retriever.search("销售"))
+    assert [item["title"] for item in result["results"]] == ["销售下滑"]
+    statuses = {name: stats["status"] for name, stats in result["backends"].items()}
+    assert statuses == {"cards": "ok", "slow": "timeout", "broken": "error", "cases": "unavailable"}
+
+
+def test_backend_selection_and_candidates():
+    """可指定参与检索的后端，未知后端报错；每个后端至少取回 limit 条候选"""
+    cards = _FakeBackend("cards", _hits("cards", ["销售下滑"]))
+    memory = _FakeBackend("memory", _hits("memory", ["库存积压"]))
+    retriever = HybridRetriever([cards, memory], candidates=20)
+
+    result = asyncio.run(retriever.search("销售", limit=30, backends=["memory"]))
+    assert cards.calls == [] and memory.calls == [("销售", 30)]
+    assert list(result["backends"]) == ["memory"]
+
+    try:
+        asyncio.run(retriever.search("销售", backends=["unknown"]))
+        assert False, "未知后端应报错"
+    except ValueError:
+        pass
+
+
+def test_card_backend_reads_fts_index(tmp_path):
+    """知识卡片后端走全文检索并转换为统一格式（未迁移的旧版 type 列结构同样可读）"""
+    path = tmp_path / "cards.db"
+    conn = sqlite3.connect(str(path))
+    conn.execute("""
+        CREATE TABLE knowledge_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT
+        )
+    """)
+    conn.executemany("INSERT INTO knowledge_cards (type, title, content, category) VALUES (?, ?, ?, ?)", [
+        ("yellow", "库存积压预警", "当前库存5000，预计需求2000", "风险"),
+        ("blue", "团队周会", "本周讨论招聘计划", "事实"),
+    ])
+    conn.commit()
+    conn.close()
+
+    hits = CardBackend(path).search("库存积压 当前库存", 5)
+    assert len(hits) == 1
+    hit = hits[0]
+    assert hit["id"] == "cards:1" and hit["card_type"] == "yellow"
+    assert hit["body"].startswith("当前库存") and "<mark>" in hit["snippet"]
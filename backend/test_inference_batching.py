@@ -0,0 +1,116 @@
+"""
+推理微批处理测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_inference_batching.py
+"""
+import os
+import asyncio
+import contextlib
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.fake_genie import FakeGenieContext
+from models.inference_worker import InferenceWorker, InferencePriority
+from models.generation_policy import GenerationPolicy
+
+
+class _SequentialContext(FakeGenieContext):
+    """不支持 QueryBatch 的模拟上下文，统计 SetParams 调用次数"""
+    QueryBatch = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_params_calls = 0
+
+    def SetParams(self, *args) -> bool:
+        self.set_params_calls += 1
+        return super().SetParams(*args)
+
+
+def _make_worker(context=None, max_batch_size: int = 4, max_batch_wait_ms: float = 50.0):
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    if context is not None:
+        loader.model = context
+    loader.model.decode_delay = 0.001
+    loader.model.prefill_delay_per_token = 0
+    worker = InferenceWorker(
+        lambda model_key: contextlib.nullcontext(loader),
+        max_batch_size=max_batch_size,
+        max_batch_wait_ms=max_batch_wait_ms
+    )
+    worker.start()
+    return worker, loader
+
+
+async def _submit_all(worker, prompts, **kwargs):
+    return await asyncio.gather(*[worker.submit(p, **kwargs) for p in prompts])
+
+
+def test_concurrent_prompts_share_one_pass():
+    """并发的短提示合并为一次 QueryBatch 调用，结果按提示分发"""
+    worker, loader = _make_worker()
+    try:
+        results = asyncio.run(_submit_all(worker, ["苹果", "香蕉", "橙子", "葡萄"], max_new_tokens=24))
+    finally:
+        worker.stop()
+
+    # 模拟后端复述提示内容，可据此确认结果分发给了对应的调用方
+    assert [f"user{p}" in r for r, p in zip(results, ["苹果", "香蕉", "橙子", "葡萄"])] == [True] * 4
+    assert loader.model.batch_query_count == 1
+    batching = worker.get_stats()["batching"]
+    assert batching["multi_prompt"] == 1
+    assert batching["fill_ratio"] == 1.0
+    assert worker.get_stats()["completed"] == 4
+
+
+def test_pipelined_fallback_reuses_params():
+    """上下文不支持 QueryBatch 时依次执行，同参数只设置一次"""
+    worker, loader = _make_worker(context=_SequentialContext())
+    try:
+        results = asyncio.run(_submit_all(worker, ["苹果", "香蕉", "橙子"], max_new_tokens=24))
+    finally:
+        worker.stop()
+
+    assert [f"user{p}" in r for r, p in zip(results, ["苹果", "香蕉", "橙子"])] == [True] * 3
+    assert loader.model.query_count == 3
+    assert loader.model.set_params_calls == 1
+    batching = worker.get_stats()["batching"]
+    assert batching["pipelined"] == 1
+    assert batching["avg_batch_size"] == 3.0
+
+
+def test_incompatible_jobs_are_not_merged():
+    """采样参数不同或会话任务不合并，且保持排队顺序"""
+    worker, loader = _make_worker()
+
+    async def scenario():
+        return await asyncio.gather(
+            worker.submit("第一", max_new_tokens=4),
+            worker.submit("第二", max_new_tokens=8),
+            worker.submit("第三", max_new_tokens=4, session_id="s1"),
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        worker.stop()
+
+    assert results[1].startswith(results[0]) and len(results[1]) > len(results[0])
+    assert loader.model.batch_query_count == 0
+    assert worker.get_stats()["batching"]["dispatches"] == 2
+
+
+def test_policy_applies_per_prompt_in_batch():
+    """批量调用中每条提示独立检查生成策略"""
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.decode_delay = 0
+    loader.model.response_tokens = 64
+    results = loader.infer_batch(
+        ["甲乙丙丁戊己", "子丑寅卯辰巳"],
+        max_new_tokens=64,
+        policy=GenerationPolicy("stop-at", stop_strings=["丙", "寅"])
+    )
+    assert results[0].endswith("user甲乙") and results[1].endswith("user子丑")
+    assert loader.model.batch_query_count == 1
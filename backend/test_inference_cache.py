@@ -0,0 +1,99 @@
+"""
+推理结果缓存测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_inference_cache.py
+"""
+import os
+import asyncio
+import contextlib
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader, inference_cache_key
+from models.inference_cache import InferenceCache
+from models.inference_worker import InferenceWorker
+
+
+def _make_cache(**kwargs) -> InferenceCache:
+    db_path = Path(tempfile.mkdtemp()) / "inference_cache.db"
+    return InferenceCache(db_path=db_path, **kwargs)
+
+
+def test_loader_hit_skips_npu():
+    """temperature=0 时相同请求第二次直接命中缓存"""
+    cache = _make_cache()
+    loader = NPUModelLoader(backend="fake", result_cache=cache)
+    first = loader.infer("总结关键信息", max_new_tokens=16, temperature=0.0)
+    second = loader.infer("总结关键信息", max_new_tokens=16, temperature=0.0)
+
+    assert first == second
+    assert loader.model.query_count == 1
+    assert cache.get_stats()["memory_hits"] == 1
+
+
+def test_key_includes_sampling_params():
+    """不同 max_new_tokens / temperature 使用不同缓存键"""
+    base = inference_cache_key("qwen2-7b-ssd", "提示", 64, 0.0)
+    assert base != inference_cache_key("qwen2-7b-ssd", "提示", 128, 0.0)
+    assert base != inference_cache_key("qwen2-7b-ssd", "提示", 64, 0.5)
+    assert base != inference_cache_key("llama3.2-3b", "提示", 64, 0.0)
+
+
+def test_temperature_bypass_and_opt_in():
+    """temperature > 0 默认跳过缓存，调用方可显式开启"""
+    cache = _make_cache()
+    loader = NPUModelLoader(backend="fake", result_cache=cache)
+    loader.infer("评估风险因素", temperature=0.7)
+    loader.infer("评估风险因素", temperature=0.7)
+    assert loader.model.query_count == 2
+    assert cache.get_stats()["bypassed"] == 2
+
+    loader.infer("评估风险因素", temperature=0.7, use_cache=True)
+    loader.infer("评估风险因素", temperature=0.7, use_cache=True)
+    assert loader.model.query_count == 3
+
+
+def test_disk_tier_survives_restart():
+    """SQLite 二级缓存在新实例中仍可命中"""
+    db_path = Path(tempfile.mkdtemp()) / "inference_cache.db"
+    InferenceCache(db_path=db_path).put("k", "结果", "qwen2-7b-ssd")
+
+    reopened = InferenceCache(db_path=db_path)
+    assert reopened.get("k") == "结果"
+    assert reopened.get_stats()["disk_hits"] == 1
+    assert reopened.get("k") == "结果"
+    assert reopened.get_stats()["memory_hits"] == 1
+
+
+def test_ttl_and_size_cap():
+    """过期条目不命中，SQLite 条目数不超过上限"""
+    cache = _make_cache(ttl_seconds=0.05, max_entries=3, memory_entries=2)
+    cache.put("old", "旧结果", "m")
+    time.sleep(0.1)
+    assert cache.get("old") is None
+
+    for i in range(5):
+        cache.put(f"k{i}", f"v{i}", "m")
+    stats = cache.get_stats()
+    assert stats["disk_entries"] == 3
+    assert stats["memory_entries"] == 2
+
+
+def test_worker_serves_hit_without_queueing():
+    """推理工作线程在入队前命中缓存"""
+    cache = _make_cache()
+    loader = NPUModelLoader(backend="fake", result_cache=cache)
+    worker = InferenceWorker(lambda key: contextlib.nullcontext(loader), result_cache=cache)
+    worker.start()
+    try:
+        first = asyncio.run(worker.submit("制定行动计划", temperature=0.0))
+        start = time.perf_counter()
+        second = asyncio.run(worker.submit("制定行动计划", temperature=0.0))
+        assert first == second
+        assert worker.get_stats()["submitted"] == 1
+        assert loader.model.query_count == 1
+        assert time.perf_counter() - start < 0.05
+    finally:
+        worker.stop()
@@ -0,0 +1,181 @@
+"""
+推理会话复用测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_inference_session.py
+"""
+import os
+import tempfile
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.fake_genie import FakeGenieContext, tokenize
+from models.inference_session import (
+    DialogSessionManager,
+    PROMPT_TAGS_1,
+    PROMPT_TAGS_2,
+    PROMPT_TURN_SEPARATOR,
+    format_conversation
+)
+
+TEMPLATE = "你是风险评估专家，请评估以下风险。\n\n" + "请为每个风险计算风险分数、提供处理建议并给出置信度。\n" * 10
+
+
+def _make_loader() -> NPUModelLoader:
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.decode_delay = 0
+    loader.model.prefill_delay_per_token = 0
+    loader.sessions = DialogSessionManager(loader.model, snapshot_dir=tempfile.mkdtemp())
+    return loader
+
+
+def test_template_prefix_prefilled_once():
+    """技能模板只预填充一次，后续调用只处理可变部分"""
+    loader = _make_loader()
+    payloads = [f"\n风险列表：\n{i}. 现金流紧张" for i in range(5)]
+    for payload in payloads:
+        loader.infer(TEMPLATE + payload, max_new_tokens=8, prompt_prefix=TEMPLATE)
+
+    stateless = sum(len(tokenize(PROMPT_TAGS_1 + TEMPLATE + p + PROMPT_TAGS_2)) for p in payloads)
+    assert loader.model.processed_prompt_tokens < stateless / 2
+    stats = loader.sessions.get_stats()
+    assert stats["template_misses"] == 1
+    assert stats["template_hits"] == 4
+
+
+def test_template_restore_drops_previous_answer():
+    """恢复快照后对话只包含模板前缀和本次输入"""
+    loader = _make_loader()
+    loader.infer(TEMPLATE + "\n第一次", max_new_tokens=8, prompt_prefix=TEMPLATE)
+    loader.infer(TEMPLATE + "\n第二次", max_new_tokens=8, prompt_prefix=TEMPLATE)
+
+    expected = len(tokenize(PROMPT_TAGS_1 + TEMPLATE)) + len(tokenize("\n第二次" + PROMPT_TAGS_2)) + 8
+    assert loader.model.dialog_tokens == expected
+
+
+def test_conversation_sends_only_new_turn():
+    """同一会话的后续轮次只预填充本轮输入"""
+    loader = _make_loader()
+    loader.infer("介绍一下项目背景" * 10, max_new_tokens=8, session_id="s1")
+    after_first = loader.model.processed_prompt_tokens
+    loader.infer("下一步呢", max_new_tokens=8, session_id="s1")
+
+    second_turn = loader.model.processed_prompt_tokens - after_first
+    assert second_turn == len(tokenize(PROMPT_TURN_SEPARATOR + "下一步呢" + PROMPT_TAGS_2))
+    assert second_turn < after_first / 3
+    assert loader.sessions.get_stats()["conversation_hits"] == 1
+
+
+def test_interleaved_stateless_call_rebuilds_conversation():
+    """无状态调用插入后，会话按保留的历史重建，且无状态调用不受会话残留影响"""
+    loader = _make_loader()
+    loader.infer("第一轮问题", max_new_tokens=8, session_id="s1")
+
+    before = loader.model.dialog_tokens
+    loader.infer("无关的单次请求", max_new_tokens=8)
+    assert loader.model.dialog_tokens < before + len(tokenize(PROMPT_TAGS_1 + "无关的单次请求" + PROMPT_TAGS_2)) + 8
+
+    loader.infer("第二轮问题", max_new_tokens=8, session_id="s1")
+    stats = loader.sessions.get_stats()
+    assert stats["conversation_misses"] == 2
+    assert stats["resets"] >= 2
+
+
+def test_max_turns_truncates_history():
+    """超过轮数上限后截断历史重新预填充"""
+    context = FakeGenieContext(decode_delay=0, prefill_delay_per_token=0)
+    sessions = DialogSessionManager(context, snapshot_dir=tempfile.mkdtemp(), max_turns=4)
+    for i in range(6):
+        sessions.query(f"问题{i}", lambda token: True, session_id="s1")
+
+    stats = sessions.get_stats()
+    assert stats["conversation_misses"] == 2
+    assert stats["conversation_hits"] == 4
+
+
+def test_reset_session_and_template_eviction():
+    """显式结束会话，模板快照按 LRU 淘汰"""
+    context = FakeGenieContext(decode_delay=0, prefill_delay_per_token=0)
+    sessions = DialogSessionManager(context, snapshot_dir=tempfile.mkdtemp(), max_templates=2)
+    for i in range(3):
+        prefix = f"模板{i}："
+        sessions.query(prefix + "数据", lambda token: True, prompt_prefix=prefix)
+    assert sessions.get_stats()["templates"] == 2
+    assert sessions.get_stats()["evictions"] == 1
+
+    sessions.query("你好", lambda token: True, session_id="s1")
+    sessions.reset_session("s1")
+    assert sessions.get_stats()["conversations"] == 0
+    assert context.dialog_tokens == 0
+
+
+def test_snapshots_namespaced_per_model():
+    """多个模型共用快照目录时按模型分目录：淘汰一个模型的快照不影响另一个模型"""
+
+    class DiskContext(FakeGenieContext):
+        def Save(self, path):
+            super().Save(path)
+            os.makedirs(path, exist_ok=True)
+
+        def Restore(self, path):
+            if not os.path.isdir(path):
+                raise FileNotFoundError(f"对话快照不存在: {path}")
+            super().Restore(path)
+
+    snapshot_dir = tempfile.mkdtemp()
+    first = DialogSessionManager(DiskContext(decode_delay=0, prefill_delay_per_token=0),
+                                 snapshot_dir=snapshot_dir, namespace="qwen2-7b-ssd", max_templates=1)
+    second = DialogSessionManager(DiskContext(decode_delay=0, prefill_delay_per_token=0),
+                                  snapshot_dir=snapshot_dir, namespace="llama3.1-8b")
+    first.query(TEMPLATE + "数据", lambda token: True, prompt_prefix=TEMPLATE)
+    second.query(TEMPLATE + "数据", lambda token: True, prompt_prefix=TEMPLATE)
+    assert first.snapshot_dir != second.snapshot_dir
+
+    # 第一个模型淘汰同一模板的快照，第二个模型仍命中自己的快照
+    first.query("其他模板：数据", lambda token: True, prompt_prefix="其他模板：")
+    second.query(TEMPLATE + "数据", lambda token: True, prompt_prefix=TEMPLATE)
+    assert second.get_stats()["template_hits"] == 1
+
+
+def test_missing_snapshot_prefills_again():
+    """快照丢失（如被外部清理）时重新预填充模板，而不是调用失败"""
+    context = FakeGenieContext(decode_delay=0, prefill_delay_per_token=0)
+    sessions = DialogSessionManager(context, snapshot_dir=tempfile.mkdtemp())
+    sessions.query(TEMPLATE + "第一次", lambda token: True, prompt_prefix=TEMPLATE)
+    context._snapshots.clear()
+
+    tokens = []
+    sessions.query(TEMPLATE + "第二次", lambda token: tokens.append(token) is None, prompt_prefix=TEMPLATE)
+    assert tokens
+    stats = sessions.get_stats()
+    assert stats["template_misses"] == 2 and stats["template_hits"] == 0
+    assert stats["templates"] == 1
+
+    sessions.query(TEMPLATE + "第三次", lambda token: True, prompt_prefix=TEMPLATE)
+    assert sessions.get_stats()["template_hits"] == 1
+
+
+def test_stateless_fallback_without_dialog_api():
+    """上下文不支持 Reset / Save / Restore 时退回发送完整提示"""
+
+    class StatelessContext:
+        def __init__(self):
+            self.prompts = []
+
+        def Query(self, prompt, callback):
+            self.prompts.append(prompt)
+            callback("好")
+            return True
+
+    context = StatelessContext()
+    sessions = DialogSessionManager(context)
+    sessions.query(TEMPLATE + "数据", lambda token: True, prompt_prefix=TEMPLATE)
+    sessions.query("第一轮", lambda token: True, session_id="s1")
+    sessions.query("第二轮", lambda token: True, session_id="s1")
+
+    assert context.prompts[0] == PROMPT_TAGS_1 + TEMPLATE + "数据" + PROMPT_TAGS_2
+    # 对话会话退回为每轮发送完整历史
+    assert context.prompts[2] == format_conversation([("第一轮", "好"), ("第二轮", None)])
+    stats = sessions.get_stats()
+    assert stats["stateless"] == 1
+    assert stats["conversation_misses"] == 2
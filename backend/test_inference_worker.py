@@ -0,0 +1,196 @@
+"""
+推理工作线程测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_inference_worker.py
+"""
+import os
+import asyncio
+import contextlib
+import time
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.inference_worker import (
+    InferenceWorker,
+    InferencePriority,
+    QueueFullError,
+    JobCancelledError
+)
+
+
+def _make_worker(decode_delay: float = 0.002, max_depth: int = 8):
+    """创建使用模拟后端的推理工作线程"""
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.decode_delay = decode_delay
+    worker = InferenceWorker(
+        lambda model_key: contextlib.nullcontext(loader),
+        max_queue_depth={
+            InferencePriority.INTERACTIVE: max_depth,
+            InferencePriority.BATCH: max_depth
+        },
+        disconnect_poll_interval=0.01
+    )
+    worker.start()
+    return worker, loader
+
+
+def test_submit_returns_result():
+    """提交任务并获得生成结果"""
+    worker, loader = _make_worker()
+    try:
+        result = asyncio.run(worker.submit("你好", max_new_tokens=8))
+        assert result
+        assert loader.model.query_count == 1
+        assert worker.get_stats()["completed"] == 1
+    finally:
+        worker.stop()
+
+
+def test_event_loop_not_blocked():
+    """推理执行期间事件循环仍可调度其他协程"""
+    worker, _ = _make_worker(decode_delay=0.01)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        await worker.submit("分析数据", max_new_tokens=20)
+        tick_task.cancel()
+        return ticks
+
+    try:
+        assert asyncio.run(scenario()) >= 5
+    finally:
+        worker.stop()
+
+
+def test_interactive_runs_before_batch():
+    """交互式任务优先于排队中的批量任务执行"""
+    worker, _ = _make_worker(decode_delay=0.01)
+    try:
+        # 第一个任务占用工作线程，其余任务进入队列
+        blocker = worker.submit_nowait("占用", max_new_tokens=10)
+        time.sleep(0.02)
+        batch_jobs = [worker.submit_nowait(f"批量{i}", max_new_tokens=2) for i in range(3)]
+        interactive = worker.submit_nowait("对话", max_new_tokens=2,
+                                           priority=InferencePriority.INTERACTIVE)
+
+        for job in [blocker, interactive] + batch_jobs:
+            job.future.result(timeout=5)
+
+        assert all(interactive.started_at < job.started_at for job in batch_jobs)
+    finally:
+        worker.stop()
+
+
+def test_queue_full_rejected():
+    """超过队列深度上限时拒绝新任务"""
+    worker, _ = _make_worker(decode_delay=0.01, max_depth=2)
+    try:
+        worker.submit_nowait("占用", max_new_tokens=20)
+        time.sleep(0.02)
+        worker.submit_nowait("排队1")
+        worker.submit_nowait("排队2")
+        try:
+            worker.submit_nowait("排队3")
+            assert False, "应抛出 QueueFullError"
+        except QueueFullError as e:
+            assert e.priority == InferencePriority.BATCH
+        # 其他优先级不受影响
+        worker.submit_nowait("对话", priority=InferencePriority.INTERACTIVE)
+        assert worker.get_stats()["rejected"] == 1
+    finally:
+        worker.stop()
+
+
+def test_disconnect_cancels_running_job():
+    """客户端断开后执行中的任务在下一个 token 处中止"""
+    worker, loader = _make_worker(decode_delay=0.01)
+
+    async def scenario():
+        start = time.time()
+
+        async def is_disconnected():
+            return time.time() - start > 0.05
+
+        try:
+            await worker.submit("长文本生成", max_new_tokens=64, is_disconnected=is_disconnected)
+            assert False, "应抛出 JobCancelledError"
+        except JobCancelledError:
+            pass
+
+    try:
+        loader.model.response_tokens = 64
+        asyncio.run(scenario())
+        time.sleep(0.05)
+        assert loader.model.generated_tokens < 64
+        assert worker.get_stats()["cancelled"] == 1
+    finally:
+        worker.stop()
+
+
+def test_cancelled_queued_job_is_skipped():
+    """排队中被取消的任务不会执行"""
+    worker, loader = _make_worker(decode_delay=0.01)
+    try:
+        blocker = worker.submit_nowait("占用", max_new_tokens=10)
+        time.sleep(0.02)
+        queued = worker.submit_nowait("取消")
+        queued.cancel()
+        blocker.future.result(timeout=5)
+        time.sleep(0.05)
+        assert loader.model.query_count == 1
+        assert worker.get_stats()["pending"]["batch"] == 0
+    finally:
+        worker.stop()
+
+
+def test_stream_yields_tokens_with_metrics():
+    """流式推理逐 token 返回，并报告首 token 延迟与 token 间隔"""
+    worker, _ = _make_worker(decode_delay=0.005)
+
+    async def scenario():
+        token_stream = worker.stream("流式输出测试", max_new_tokens=10)
+        arrivals = []
+        async for token in token_stream:
+            arrivals.append(time.perf_counter())
+        return token_stream, arrivals
+
+    try:
+        token_stream, arrivals = asyncio.run(scenario())
+        metrics = token_stream.metrics
+        assert len(arrivals) == 10
+        # token 在生成过程中陆续到达，而不是结束后一次性返回
+        assert arrivals[-1] - arrivals[0] >= 0.02
+        assert metrics["tokens"] == 10
+        assert metrics["ttft_ms"] < metrics["total_ms"]
+        assert metrics["inter_token_ms"]["avg"] > 0
+        assert token_stream.text
+    finally:
+        worker.stop()
+
+
+def test_stream_break_cancels_job():
+    """提前结束迭代时取消推理任务"""
+    worker, loader = _make_worker(decode_delay=0.01)
+
+    async def scenario():
+        tokens = worker.stream("提前结束", max_new_tokens=64).__aiter__()
+        async for _ in tokens:
+            break
+        await tokens.aclose()
+
+    try:
+        loader.model.response_tokens = 64
+        asyncio.run(scenario())
+        time.sleep(0.1)
+        assert loader.model.generated_tokens < 64
+    finally:
+        worker.stop()
@@ -0,0 +1,91 @@
+"""
+太史阁哈希 TF-IDF 与倒排索引测试
+
+运行: pytest test_memory_text_index.py
+"""
+import sqlite3
+
+import numpy as np
+
+from services import memory_text_index as text_index
+
+
+def _make_index(documents=None, knowledge_type="fact"):
+    conn = sqlite3.connect(":memory:")
+    text_index.ensure_text_index(conn)
+    cursor = conn.cursor()
+    text_index.add_documents(cursor, knowledge_type, [
+        (knowledge_id, text_index.term_counts(text)) for knowledge_id, text in (documents or [])
+    ])
+    conn.commit()
+    return conn, cursor
+
+
+def test_tokenize_words_and_chinese_bigrams():
+    """英文按词切分，连续汉字切为二字片段"""
+    assert text_index.tokenize("Sales 增长率 Q3") == ["sales", "增长", "长率", "q3"]
+    assert text_index.tokenize("库") == ["库"]
+    assert text_index.term_hash("销售") == text_index.term_hash("销售")
+
+
+def test_idf_tracks_document_frequency():
+    """文档频率随增删维护，常见词 IDF 低于罕见词"""
+    conn, cursor = _make_index([
+        ("a", "销售额 增长"),
+        ("b", "销售额 下滑"),
+        ("c", "库存 积压"),
+    ])
+    common, rare = text_index.term_hash("销售"), text_index.term_hash("库存")
+    idf = text_index.idf_weights(cursor, "fact", [common, rare])
+    assert idf[common] < idf[rare]
+
+    text_index.remove_document(cursor, "a")
+    text_index.remove_document(cursor, "a")  # 重复移除不影响统计
+    df = dict(cursor.execute(f"SELECT term, df FROM {text_index.TERM_DF_TABLE}").fetchall())
+    assert df[common] == 1
+    assert text_index.term_hash("增长") not in df
+    assert cursor.execute(f"SELECT doc_count FROM {text_index.TYPE_STATS_TABLE}").fetchone()[0] == 2
+
+
+def test_candidates_come_from_postings_only():
+    """候选只包含与查询共享词项的文档，按部分得分排序且按类型隔离"""
+    conn, cursor = _make_index([
+        ("a", "销售额 增长 销售额"),
+        ("b", "销售 回款"),
+        ("c", "库存 积压"),
+    ])
+    text_index.add_document(cursor, "risk", "r", text_index.term_counts("销售额 风险"))
+
+    counts = text_index.term_counts("销售额")
+    idf = text_index.idf_weights(cursor, "fact", counts)
+    assert text_index.candidate_ids(cursor, "fact", counts, idf, limit=10) == ["a", "b"]
+    assert text_index.candidate_ids(cursor, "fact", {}, {}, limit=10) == []
+
+
+def test_candidate_query_uses_posting_index():
+    """候选查询按倒排主键查找，不扫描整个倒排表"""
+    conn, cursor = _make_index([(f"k{i}", f"文档 w{i}") for i in range(200)])
+    counts = text_index.term_counts("w7 文档")
+    weights = ", ".join("(?, ?)" for _ in counts)
+    plan = " ".join(str(row) for row in cursor.execute(f"""
+        EXPLAIN QUERY PLAN
+        WITH query_terms(term, weight) AS (VALUES {weights})
+        SELECT p.knowledge_id FROM query_terms q
+        JOIN {text_index.POSTINGS_TABLE} p ON p.knowledge_type = ? AND p.term = q.term
+    """, (*[v for term in counts for v in (term, 1.0)], "fact")))
+    assert "USING PRIMARY KEY" in plan
+    assert "SCAN p" not in plan
+
+
+def test_dense_vector_is_normalized_and_idf_weighted():
+    """稠密向量归一化，同一词项在向量中的权重随 IDF 变化"""
+    counts = text_index.term_counts("销售额 增长")
+    vector = text_index.dense_vector(counts, {})
+    assert vector.shape == (512,) and vector.dtype == np.float32
+    assert abs(float(np.linalg.norm(vector)) - 1.0) < 1e-6
+    assert not text_index.dense_vector({}, {}).any()
+
+    rare = text_index.term_hash("增长")
+    boosted = text_index.dense_vector(counts, {rare: 5.0})
+    bucket = rare % 512
+    assert abs(boosted[bucket]) > abs(vector[bucket])
@@ -0,0 +1,112 @@
+"""
+太史阁向量存储测试
+
+运行: pytest test_memory_vector_store.py
+"""
+import os
+import json
+
+import numpy as np
+
+from services.memory_vector_store import (
+    MemoryVectorStore,
+    encode_embedding,
+    decode_embedding,
+    get_memory_vector_store,
+    INITIAL_CAPACITY
+)
+
+
+def _vector(*values) -> list:
+    vector = [0.0] * 512
+    vector[:len(values)] = values
+    return vector
+
+
+def test_blob_and_legacy_json_decode():
+    """BLOB 与旧版 JSON 文本均可解码，维度不符返回 None"""
+    vector = _vector(0.6, 0.8)
+    blob = encode_embedding(vector)
+    assert len(blob) == 512 * 4
+    assert np.allclose(decode_embedding(blob), vector)
+    assert np.allclose(decode_embedding(json.dumps(vector)), vector)
+    assert decode_embedding("[]") is None
+    assert decode_embedding("not json") is None
+    assert decode_embedding(None) is None
+
+
+def test_load_reports_legacy_rows_and_ranks_by_cosine():
+    """加载时返回需改写为 BLOB 的旧版行，检索按余弦相似度降序并过滤下限"""
+    store = MemoryVectorStore()
+    legacy = store.load("fact", [
+        ("a", encode_embedding(_vector(1.0, 0.0))),
+        ("b", json.dumps(_vector(1.0, 1.0))),
+        ("c", encode_embedding(_vector(0.0, 1.0))),
+        ("broken", "[]"),
+    ])
+    assert [knowledge_id for _, knowledge_id in legacy] == ["b"]
+    assert store.get_stats() == {"fact": 3}
+
+    results = store.search("fact", _vector(2.0, 0.0), limit=10, min_score=0.1)
+    assert [knowledge_id for knowledge_id, _ in results] == ["a", "b"]
+    assert abs(results[0][1] - 1.0) < 1e-6
+    assert abs(results[1][1] - 2 ** -0.5) < 1e-6
+
+
+def test_incremental_upsert_and_growth():
+    """已加载类型增量追加与替换，超过初始容量时扩容；未加载类型跳过"""
+    store = MemoryVectorStore()
+    store.upsert("risk", "skipped", _vector(1.0))
+    assert not store.is_loaded("risk")
+
+    store.load("risk", [])
+    for i in range(INITIAL_CAPACITY + 10):
+        store.upsert("risk", f"r{i}", _vector(0.0, 1.0))
+    store.upsert("risk", "r7", _vector(1.0))
+    assert store.get_stats() == {"risk": INITIAL_CAPACITY + 10}
+
+    top = store.search("risk", _vector(1.0), limit=1)
+    assert top == [("r7", 1.0)]
+
+
+def test_top_k_matches_full_sort():
+    """argpartition 取前 k 与完整排序结果一致"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 512)).astype(np.float32)
+    store = MemoryVectorStore()
+    store.load("fact", ((f"k{i}", vector.tobytes()) for i, vector in enumerate(vectors)))
+
+    query = rng.standard_normal(512).astype(np.float32)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+
+    results = store.search("fact", query, limit=5, min_score=-1.0)
+    assert [knowledge_id for knowledge_id, _ in results] == [f"k{i}" for i in expected]
+
+
+def test_batch_search_matches_single_queries():
+    """多查询一次打分与逐个检索结果一致，候选限定对所有查询生效"""
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((500, 512)).astype(np.float32)
+    store = MemoryVectorStore()
+    store.load("fact", ((f"k{i}", vector.tobytes()) for i, vector in enumerate(vectors)))
+
+    queries = rng.standard_normal((20, 512)).astype(np.float32)
+    queries[3] = 0.0
+    batch = store.search_batch("fact", queries, limit=5, min_score=-1.0)
+    assert len(batch) == 20
+    for query, results in zip(queries, batch):
+        single = store.search("fact", query, limit=5, min_score=-1.0)
+        assert [knowledge_id for knowledge_id, _ in results] == [knowledge_id for knowledge_id, _ in single]
+        assert np.allclose([score for _, score in results], [score for _, score in single], atol=1e-5)
+
+    candidates = ["k1", "k2", "k2", "missing"]
+    batch = store.search_batch("fact", queries[:2], limit=5, min_score=-1.0, candidates=candidates)
+    assert all(sorted(knowledge_id for knowledge_id, _ in results) == ["k1", "k2"] for results in batch)
+    assert store.search_batch("unloaded", queries[:2], limit=5) == [[], []]
+
+
+def test_store_is_shared_per_database():
+    """同一数据库文件共用一个向量存储"""
+    assert get_memory_vector_store("./data/memory.db") is get_memory_vector_store(os.path.abspath("./data/memory.db"))
+    assert get_memory_vector_store("./data/memory.db") is not get_memory_vector_store("./data/other.db")
@@ -0,0 +1,208 @@
+"""
+数据库结构迁移测试
+
+热点查询的执行计划断言：database.py 与各仓库的列表、排序、分组查询都应走索引，
+不出现整表扫描（SCAN 表名 且未使用索引）或临时排序（USE TEMP B-TREE）
+
+运行: pytest test_migrations.py
+"""
+import sqlite3
+from pathlib import Path
+
+from services import card_search
+from services.migrations import MIGRATIONS, current_version, migrate
+
+# (查询, 期望使用的索引)
+HOT_QUERIES = [
+    # database.py
+    ("SELECT * FROM team_members ORDER BY contribution DESC", "idx_team_members_contribution"),
+    ("SELECT * FROM knowledge_spaces ORDER BY card_count DESC", "idx_knowledge_spaces_card_count"),
+    ("SELECT * FROM collaboration_activities ORDER BY timestamp DESC LIMIT ?",
+     "idx_collaboration_activities_timestamp"),
+    ("SELECT * FROM comments WHERE target_id = ? AND target_type = ? ORDER BY created_at ASC",
+     "idx_comments_target"),
+    ("SELECT * FROM analytics_data WHERE category = ? ORDER BY updated_at DESC LIMIT 1",
+     "idx_analytics_data_category_updated"),
+    ("SELECT * FROM checklist_data ORDER BY updated_at DESC LIMIT 1", "idx_checklist_data_updated"),
+    ("SELECT * FROM gtd_tasks ORDER BY created_at DESC", "idx_gtd_tasks_created"),
+    ("SELECT * FROM gtd_tasks WHERE category = ? ORDER BY created_at DESC", "idx_gtd_tasks_category_created"),
+    # services/gtd_repository.py
+    # 以 category 开头的两个索引都能覆盖
+    ("SELECT category, COUNT(*) AS count FROM gtd_tasks GROUP BY category", "idx_gtd_tasks_category_"),
+    ("SELECT priority, COUNT(*) AS count FROM gtd_tasks GROUP BY priority", "idx_gtd_tasks_priority"),
+    # services/knowledge_repository.py
+    ("SELECT * FROM knowledge_cards WHERE 1=1 ORDER BY created_at DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_created"),
+    ("SELECT * FROM knowledge_cards WHERE 1=1 AND card_type = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_type_created"),
+    ("SELECT * FROM knowledge_cards WHERE 1=1 AND category = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_category_created"),
+    # services/pagination.py（游标分页）
+    ("SELECT id, title, created_at FROM gtd_tasks ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ? OFFSET ?",
+     "idx_gtd_tasks_page"),
+    ("SELECT id, title, created_at FROM gtd_tasks WHERE category = ? AND COALESCE(created_at, '') <= ? "
+     "AND (COALESCE(created_at, ''), id) < (?, ?) ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ? OFFSET ?",
+     "idx_gtd_tasks_category_page"),
+    ("SELECT id, title, created_at FROM knowledge_cards WHERE card_type = ? AND COALESCE(created_at, '') <= ? "
+     "AND (COALESCE(created_at, ''), id) < (?, ?) ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_type_page"),
+    ("SELECT id, title, created_at FROM knowledge_cards WHERE category = ? AND COALESCE(created_at, '') <= ? "
+     "AND (COALESCE(created_at, ''), id) < (?, ?) ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_category_page"),
+    ("SELECT id, title, created_at FROM knowledge_cards WHERE COALESCE(created_at, '') <= ? "
+     "AND (COALESCE(created_at, ''), id) < (?, ?) ORDER BY COALESCE(created_at, '') DESC, id DESC LIMIT ? OFFSET ?",
+     "idx_knowledge_cards_page"),
+    # 以 card_type 开头的索引都能覆盖
+    ("SELECT COUNT(*) FROM knowledge_cards WHERE card_type = ?", "idx_knowledge_cards_type_"),
+    ("SELECT * FROM knowledge_cards WHERE card_type = ? LIMIT ?", "idx_knowledge_cards_type_"),
+    ("SELECT * FROM knowledge_sources ORDER BY last_imported DESC", "idx_knowledge_sources_last_imported"),
+]
+
+# 分组统计只读索引，不回表
+COVERING_QUERIES = [
+    "SELECT card_type, COUNT(*) FROM knowledge_cards GROUP BY card_type",
+    "SELECT category, COUNT(*) FROM knowledge_cards WHERE category IS NOT NULL GROUP BY category",
+    "SELECT category, COUNT(*) AS count FROM gtd_tasks GROUP BY category",
+]
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _plan(conn, sql):
+    params = [1] * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _assert_indexed(conn, sql, index):
+    plan = _plan(conn, sql)
+    text = " | ".join(plan)
+    assert "TEMP B-TREE" not in text, f"{sql}: {text}"
+    for step in plan:
+        if step.startswith("SCAN"):
+            assert "USING" in step, f"整表扫描 {sql}: {text}"
+    assert index in text, f"{sql} 未使用 {index}: {text}"
+
+
+def _populate(conn):
+    colors = ["blue", "green", "yellow", "red"]
+    categories = ["inbox", "today", "later", "archive", "projects"]
+    conn.executemany(
+        "INSERT INTO knowledge_cards (title, content, card_type, category, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f"卡片{i}", f"内容{i}", colors[i % 4], f"分类{i % 7}", f"2025-01-{i % 28 + 1:02d} 10:00:00")
+         for i in range(2000)]
+    )
+    conn.executemany(
+        "INSERT INTO gtd_tasks (title, category, priority, created_at) VALUES (?, ?, ?, ?)",
+        [(f"任务{i}", categories[i % 5], ["low", "medium", "high"][i % 3], f"2025-02-{i % 28 + 1:02d}")
+         for i in range(500)]
+    )
+    conn.executemany(
+        "INSERT INTO comments (user_name, content, target_id, target_type) VALUES (?, ?, ?, ?)",
+        [("张三", f"评论{i}", i % 50, "space") for i in range(500)]
+    )
+    conn.commit()
+
+
+def test_fresh_database_migrates_once(tmp_path):
+    """新数据库迁移到最新版本，重复执行不再执行任何迁移"""
+    conn = _connect(tmp_path / "antinet.db")
+    assert current_version(conn) == 0
+    assert migrate(conn) == [migration.version for migration in MIGRATIONS]
+    assert current_version(conn) == MIGRATIONS[-1].version
+    assert migrate(conn) == []
+    assert not conn.in_transaction
+
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(knowledge_cards)")]
+    assert "card_type" in columns and "type" not in columns and "source" in columns
+    assert conn.execute("SELECT COUNT(*) FROM knowledge_sources").fetchone()[0] == 0
+
+
+def test_target_version_and_failed_migration_rolls_back(tmp_path):
+    """迁移到指定版本；失败的迁移整体回滚，版本不前进"""
+    conn = _connect(tmp_path / "antinet.db")
+    assert migrate(conn, target=1) == [1]
+    assert current_version(conn) == 1
+
+    from services.migrations import Migration
+
+    def _broken(c):
+        c.execute("CREATE TABLE half_done (id INTEGER)")
+        raise RuntimeError("迁移中途失败")
+
+    try:
+        migrate(conn, MIGRATIONS + [Migration(99, "broken", _broken)])
+        assert False, "应抛出异常"
+    except RuntimeError:
+        pass
+    assert current_version(conn) == MIGRATIONS[-1].version
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def test_legacy_type_column_is_migrated(tmp_path):
+    """旧的 type 列（带 CHECK 约束）迁移为 card_type，ID、颜色保留，全文检索按新表重建"""
+    path = tmp_path / "antinet.db"
+    conn = _connect(path)
+    conn.executescript("""
+        CREATE TABLE knowledge_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL CHECK(type IN ('blue', 'green', 'yellow', 'red')),
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            source TEXT,
+            category TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO knowledge_cards (id, type, title, content, category) VALUES
+            (3, 'red', '库存积压预警', '当前库存5000件', '风险'),
+            (7, 'green', '库存周转说明', '周转天数按月计算', '解释');
+    """)
+    card_search.ensure_card_fts(conn)
+    card_search.ensure_card_generation(conn)
+    before = card_search.get_generation(conn)
+
+    migrate(conn)
+    rows = conn.execute("SELECT id, card_type, category FROM knowledge_cards ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [(3, "red", "风险"), (7, "green", "解释")]
+    assert card_search.get_generation(conn) > before
+
+    hits = card_search.search_cards(conn, "当前库存", limit=5)
+    assert [hit["id"] for hit in hits] == [3]
+
+    # 迁移后的表不再有 CHECK 约束，新卡片延续原 ID 序列并进入全文索引
+    migrated = card_search.get_generation(conn)
+    cursor = conn.execute(
+        "INSERT INTO knowledge_cards (title, content, category) VALUES ('周会纪要', '讨论招聘计划', '未分类')"
+    )
+    conn.commit()
+    assert card_search.get_generation(conn) > migrated
+    assert cursor.lastrowid == 8
+    assert conn.execute("SELECT card_type FROM knowledge_cards WHERE id = 8").fetchone()[0] == "blue"
+    assert [hit["id"] for hit in card_search.search_cards(conn, "招聘计划", limit=5)] == [8]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    """热点查询走索引：没有整表扫描，也没有临时排序"""
+    conn = _connect(tmp_path / "antinet.db")
+    migrate(conn)
+    for sql, index in HOT_QUERIES:
+        _assert_indexed(conn, sql, index)
+
+    # 有数据并更新统计信息后，执行计划保持不变
+    _populate(conn)
+    conn.execute("ANALYZE")
+    for sql, index in HOT_QUERIES:
+        _assert_indexed(conn, sql, index)
+
+
+def test_group_by_statistics_use_covering_indexes(tmp_path):
+    """分组统计使用覆盖索引"""
+    conn = _connect(tmp_path / "antinet.db")
+    migrate(conn)
+    _populate(conn)
+    for sql in COVERING_QUERIES:
+        text = " | ".join(_plan(conn, sql))
+        assert "COVERING INDEX" in text and "TEMP B-TREE" not in text, f"{sql}: {text}"
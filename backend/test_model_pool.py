@@ -0,0 +1,116 @@
+"""
+常驻模型池测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_model_pool.py
+"""
+import os
+import threading
+import time
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader, ModelConfig
+from models.model_pool import ModelPool
+
+QWEN = "qwen2-7b-ssd"
+LLAMA8B = "llama3.1-8b"
+LLAMA3B = "llama3.2-3b"
+
+
+def _make_pool(budget_mb: int) -> ModelPool:
+    return ModelPool(budget_mb, loader_factory=lambda key: NPUModelLoader(key, backend="fake"))
+
+
+def _mem(key: str) -> int:
+    return ModelConfig.MODELS[key]["memory_mb"]
+
+
+def test_loaded_once_and_reused():
+    """同一模型只加载一次，后续获取直接复用"""
+    pool = _make_pool(100000)
+    first = pool.acquire(QWEN)
+    pool.release(QWEN)
+    second = pool.acquire(QWEN)
+    pool.release(QWEN)
+
+    assert first is second
+    stats = pool.get_stats()
+    assert stats["loads"] == 1
+    assert stats["hits"] == 1
+
+
+def test_lru_eviction_under_budget():
+    """超出内存预算时淘汰最久未使用的空闲模型"""
+    pool = _make_pool(_mem(QWEN) + _mem(LLAMA3B))
+    with pool.lease(QWEN):
+        pass
+    with pool.lease(LLAMA3B):
+        pass
+    with pool.lease(LLAMA8B):
+        pass
+
+    models = pool.get_stats()["models"]
+    assert not models[QWEN]["loaded"]
+    assert models[LLAMA8B]["loaded"]
+    assert pool.get_stats()["loaded_memory_mb"] <= pool.memory_budget_mb
+
+
+def test_in_use_model_never_evicted():
+    """引用计数大于 0 的模型不会被卸载"""
+    pool = _make_pool(_mem(QWEN))
+    in_use = pool.acquire(QWEN)
+    with pool.lease(LLAMA3B):
+        assert in_use.is_loaded
+    pool.release(QWEN)
+    assert pool.get_stats()["models"][QWEN]["refcount"] == 0
+
+
+def test_model_inferring_outside_pool_not_evicted():
+    """未经模型池直接推理（引用计数为 0）的模型在推理结束前不会被淘汰"""
+    pool = _make_pool(_mem(QWEN))
+    direct = pool.acquire(QWEN)
+    pool.release(QWEN)
+    direct.model.decode_delay = 0.02
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(direct.infer("分析库存", max_new_tokens=20)))
+    worker.start()
+    deadline = time.time() + 5
+    while direct.model.dialog_tokens == 0 and time.time() < deadline:
+        time.sleep(0.005)
+
+    with pool.lease(LLAMA3B):
+        assert direct.is_loaded
+    worker.join()
+    assert results and results[0]
+
+    # 推理结束后可以正常淘汰
+    with pool.lease(LLAMA8B):
+        pass
+    assert not direct.is_loaded
+
+
+def test_record_selection_preloads_in_background():
+    """路由选择后后台预加载，并按历史序列预测下一个模型"""
+    pool = _make_pool(100000)
+    assert pool.record_selection(LLAMA3B) is None
+    pool.record_selection(QWEN)
+    pool.record_selection(LLAMA3B)
+    predicted = pool.record_selection(QWEN)
+    assert predicted == LLAMA3B
+
+    deadline = time.time() + 5
+    while pool.get_stats()["preloading"] and time.time() < deadline:
+        time.sleep(0.01)
+
+    models = pool.get_stats()["models"]
+    assert models[LLAMA3B]["loaded"]
+    assert models[QWEN]["loaded"]
+
+
+def test_speculative_preload_respects_budget():
+    """预测预加载不会为腾出空间而淘汰其他模型"""
+    pool = _make_pool(_mem(QWEN))
+    with pool.lease(QWEN):
+        pass
+    assert pool.preload(LLAMA3B, evict=False) is False
+    assert pool.get_stats()["models"][QWEN]["loaded"]
@@ -0,0 +1,91 @@
+"""
+模型后台加载与就绪状态测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_model_readiness.py
+"""
+import os
+import time
+import threading
+import contextlib
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.model_readiness import ModelReadiness, ModelState
+
+
+class _SlowLoader(NPUModelLoader):
+    """加载需等待放行的模拟加载器"""
+
+    def __init__(self, fail_times: int = 0):
+        super().__init__(backend="fake")
+        self.release = threading.Event()
+        self.fail_times = fail_times
+
+    def load(self):
+        self.release.wait(5)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("Failed to create device: 14001")
+        return super().load()
+
+
+def _readiness(loader, **kwargs) -> ModelReadiness:
+    return ModelReadiness(lambda model_key: contextlib.nullcontext(loader), **kwargs)
+
+
+def test_start_returns_immediately_and_gates_until_ready():
+    """start() 不阻塞；加载期间 check() 返回 Retry-After，就绪后放行"""
+    loader = _SlowLoader()
+    readiness = _readiness(loader, retry_after_s=7)
+
+    begin = time.time()
+    assert readiness.start()
+    assert time.time() - begin < 0.5
+    assert readiness.state == ModelState.LOADING
+    assert readiness.check() == (7, "模型正在加载")
+    assert not readiness.start()
+
+    loader.release.set()
+    assert readiness.wait(5)
+    assert readiness.is_ready
+    assert readiness.check() is None
+    assert readiness.get_status()["load_time_ms"] is not None
+
+
+def test_warmup_queries_run_after_load():
+    """加载后执行预热查询"""
+    loader = _SlowLoader()
+    loader.release.set()
+    readiness = _readiness(loader, warmup_prompts=["预热一", "预热二", "预热三"], warmup_max_new_tokens=4)
+    readiness.start()
+    readiness.wait(5)
+
+    assert readiness.state == ModelState.READY
+    assert loader.model.query_count == 3
+    assert readiness.get_status()["warmup_prompts"] == 3
+
+
+def test_failed_load_retries_after_interval():
+    """加载失败后返回 503 原因，超过重试间隔后在后台重新加载"""
+    loader = _SlowLoader(fail_times=1)
+    loader.release.set()
+    readiness = _readiness(loader, warmup_prompts=[], failed_retry_s=0.05)
+    readiness.start()
+    readiness.wait(5)
+
+    assert readiness.state == ModelState.FAILED
+    retry_after, reason = readiness.check()
+    assert "14001" in reason
+
+    time.sleep(0.06)
+    assert readiness.check()[1] == "模型加载失败，正在重新加载"
+    readiness.wait(5)
+    assert readiness.is_ready
+    assert readiness.attempts == 2
+
+
+def test_idle_state_does_not_gate():
+    """未自动加载（按需加载）时不拦截请求"""
+    readiness = _readiness(_SlowLoader())
+    assert readiness.state == ModelState.IDLE
+    assert readiness.check() is None
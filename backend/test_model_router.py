@@ -0,0 +1,111 @@
+"""
+模型路由器测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_model_router.py
+"""
+import os
+import asyncio
+import tempfile
+import contextlib
+from pathlib import Path
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from models.model_performance import ModelPerformanceStore
+from models.inference_worker import InferenceWorker
+from routes.model_router import (
+    estimate_complexity,
+    predict_latency,
+    route_model,
+    select_model,
+    _estimate_complexity_cached
+)
+
+COMPLEX_QUERY = "请详细分析NPU推理延迟的原因，评估量化部署方案的影响，并给出优化建议？有哪些风险？"
+
+
+def _observe(store: ModelPerformanceStore, model_key: str, tokens_per_s: float, ttft_ms: float = 100.0, n: int = 3):
+    tokens = 128
+    latency_ms = ttft_ms + (tokens - 1) / tokens_per_s * 1000
+    for _ in range(n):
+        store.record(model_key, latency_ms, tokens=tokens, ttft_ms=ttft_ms)
+
+
+def test_complexity_is_memoized():
+    """相同查询的复杂度评分只计算一次，返回值可安全修改"""
+    _estimate_complexity_cached.cache_clear()
+    first = estimate_complexity(COMPLEX_QUERY)
+    first['reasons'].append("调用方修改")
+    second = estimate_complexity(COMPLEX_QUERY)
+
+    assert first['complexity'] == second['complexity'] == 'complex'
+    assert "调用方修改" not in second['reasons']
+    assert _estimate_complexity_cached.cache_info().hits == 1
+
+
+def test_prediction_uses_observations():
+    """样本足够时按实测首 token 延迟与解码速度预测，否则使用先验"""
+    store = ModelPerformanceStore()
+    assert predict_latency('qwen2-7b-ssd', 128, store)['source'] == 'prior'
+
+    _observe(store, 'qwen2-7b-ssd', tokens_per_s=100.0, ttft_ms=50.0)
+    prediction = predict_latency('qwen2-7b-ssd', 128, store)
+    assert prediction['source'] == 'observed'
+    assert prediction['latency_ms'] == round(50.0 + 127 / 100.0 * 1000, 2)
+
+
+def test_sla_picks_cheapest_model_meeting_it():
+    """SLA 路由在可胜任的模型中选择成本最低且预计满足 SLA 的模型"""
+    store = ModelPerformanceStore()
+    _observe(store, 'qwen2-7b-ssd', tokens_per_s=10.0)
+    _observe(store, 'llama3.1-8b', tokens_per_s=50.0)
+
+    # 中等复杂度：qwen2（4800MB）成本更低，但实测太慢，选择 llama3.1-8b
+    query = "比较这两个方案"
+    assert estimate_complexity(query)['complexity'] == 'medium'
+    decision = route_model(query, latency_sla_ms=5000, store=store)
+    assert decision['model_key'] == 'llama3.1-8b'
+    assert decision['meets_sla']
+
+    small = next(c for c in decision['candidates'] if c['model_key'] == 'llama3.2-3b')
+    assert not small['eligible'] and "质量等级不足" in small['note']
+
+    # 宽松 SLA 下选择成本更低的 qwen2
+    assert route_model(query, latency_sla_ms=60000, store=store)['model_key'] == 'qwen2-7b-ssd'
+    # 不满足任何 SLA 时选择预测延迟最低的模型
+    decision = route_model(query, latency_sla_ms=10, store=store)
+    assert decision['model_key'] == 'llama3.1-8b' and not decision['meets_sla']
+
+
+def test_failing_model_is_skipped_and_default_routing_unchanged():
+    """失败率过高的模型不参与 SLA 路由；未给出 SLA 时沿用复杂度映射"""
+    store = ModelPerformanceStore()
+    for _ in range(4):
+        store.record('qwen2-7b-ssd', 10.0, failed=True)
+    decision = route_model(COMPLEX_QUERY, latency_sla_ms=60000, store=store)
+    qwen = next(c for c in decision['candidates'] if c['model_key'] == 'qwen2-7b-ssd')
+    assert not qwen['eligible'] and "失败率过高" in qwen['note']
+
+    assert select_model("你好") == 'llama3.2-3b'
+    assert select_model(COMPLEX_QUERY) == 'qwen2-7b-ssd'
+
+
+def test_worker_records_observations_and_store_persists():
+    """推理工作线程记录实际观测，重启后从 SQLite 恢复"""
+    db_path = Path(tempfile.mkdtemp()) / "model_performance.db"
+    store = ModelPerformanceStore(db_path)
+
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.prefill_delay_per_token = 0
+    loader.model.decode_delay = 0.001
+    worker = InferenceWorker(lambda model_key: contextlib.nullcontext(loader), performance_store=store)
+    worker.start()
+    try:
+        asyncio.run(worker.submit("测试提示", max_new_tokens=16, temperature=0.7))
+    finally:
+        worker.stop()
+
+    record = ModelPerformanceStore(db_path).get(loader.model_key)
+    assert record['samples'] == 1 and record['failures'] == 0
+    assert record['ttft_ms'] is not None and record['tokens_per_s'] > 0
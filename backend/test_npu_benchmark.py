@@ -0,0 +1,95 @@
+"""
+NPU 基准测试模块测试（使用模拟 GenieContext，无需 NPU）
+
+运行: pytest test_npu_benchmark.py
+"""
+import os
+import json
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault('INFERENCE_BACKEND', 'fake')
+from models.model_loader import NPUModelLoader
+from services.npu_benchmark import (
+    NPUBenchmark,
+    percentile,
+    load_corpus,
+    register_reference_backend,
+    create_reference_backend,
+    save_result,
+    load_result,
+    compare_results
+)
+
+
+def _make_loader(prefill_delay: float = 0.0001, decode_delay: float = 0.001) -> NPUModelLoader:
+    loader = NPUModelLoader(backend="fake")
+    loader.load()
+    loader.model.prefill_delay_per_token = prefill_delay
+    loader.model.decode_delay = decode_delay
+    return loader
+
+
+def test_percentile_interpolates():
+    """百分位数线性插值"""
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.5
+    assert round(percentile(values, 95), 2) == 95.05
+    assert percentile([], 99) == 0.0
+
+
+def test_benchmark_reports_latency_ttft_and_throughput():
+    """报告延迟分位数、首 token 延迟与预填充/解码吞吐"""
+    benchmark = NPUBenchmark(_make_loader(), corpus="default", warmup_runs=1, runs=2, max_new_tokens=8)
+    result = benchmark.run()
+    summary = result["npu"]["summary"]
+
+    assert summary["count"] == 10
+    assert summary["p50_latency_ms"] <= summary["p95_latency_ms"] <= summary["p99_latency_ms"]
+    assert 0 < summary["ttft_p50_ms"] < summary["p50_latency_ms"]
+    assert summary["prefill_tokens_per_s"] > 0
+    assert summary["decode_tokens_per_s"] > 0
+    assert result["cpu_vs_npu_speedup"] is None
+    # 预热不计入：正式测量 5 条提示 × 2 次
+    assert benchmark.loader.model.query_count == 11
+
+
+def test_reference_backend_speedup():
+    """可插拔参考后端用于计算加速比"""
+    register_reference_backend("slow-test", lambda: _make_loader(prefill_delay=0.0005, decode_delay=0.004))
+    benchmark = NPUBenchmark(
+        _make_loader(),
+        corpus=["总结关键信息"],
+        warmup_runs=0,
+        runs=2,
+        max_new_tokens=8,
+        reference=create_reference_backend("slow-test"),
+        reference_name="slow-test"
+    )
+    result = benchmark.run()
+    assert result["reference"]["name"] == "slow-test"
+    assert result["cpu_vs_npu_speedup"] > 1
+
+
+def test_corpus_file_and_result_roundtrip():
+    """JSON 语料文件加载、结果保存与对比"""
+    tmp = Path(tempfile.mkdtemp())
+    corpus_file = tmp / "corpus.json"
+    corpus_file.write_text(json.dumps({"prompts": ["分析趋势", "评估风险"]}, ensure_ascii=False), encoding="utf-8")
+    assert load_corpus(str(corpus_file)) == ["分析趋势", "评估风险"]
+
+    result = NPUBenchmark(_make_loader(), corpus=str(corpus_file), warmup_runs=0, runs=1, max_new_tokens=4).run()
+    path = save_result(result, tmp / "results")
+    assert load_result(path)["config"]["prompt_count"] == 2
+
+    diff = compare_results(load_result(path), result)
+    assert diff["p50_latency_ms"]["change_pct"] == 0.0
+
+
+def test_unknown_corpus_rejected():
+    """未知语料名抛出 ValueError"""
+    try:
+        load_corpus("不存在的语料")
+        assert False, "应抛出 ValueError"
+    except ValueError:
+        pass
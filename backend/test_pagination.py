@@ -0,0 +1,163 @@
+"""
+游标分页测试
+
+运行: pytest test_pagination.py
+"""
+import sqlite3
+import time
+
+from services.gtd_repository import TASK_FIELDS
+from services.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, MAX_UNPAGED_ROWS, decode_cursor, encode_cursor, etag_matches, fetch_page,
+    parse_fields
+)
+
+
+def _add_tasks(conn: sqlite3.Connection, tasks: int) -> sqlite3.Connection:
+    categories = ["inbox", "today", "later"]
+    # 每 4 个任务共用同一创建时间，翻页边界落在相同时间上
+    conn.executemany(
+        "INSERT INTO gtd_tasks (title, description, category, priority, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(f"任务{i}", "说明" * 50, categories[i % 3], "medium", f"2025-03-{i // 4 % 28 + 1:02d} {i // 112:02d}:00:00")
+         for i in range(tasks)]
+    )
+    conn.commit()
+    return conn
+
+
+def _walk(conn, filters=(), limit=7, fields=None):
+    columns = parse_fields(fields, TASK_FIELDS)
+    pages, cursor = [], None
+    while True:
+        page = fetch_page(conn, "gtd_tasks", columns, filters, cursor, limit)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip_and_validation():
+    """游标编码可还原，格式无效时抛出 ValueError"""
+    assert decode_cursor(encode_cursor("2025-03-01 10:00:00", 42)) == ("2025-03-01 10:00:00", 42)
+    assert decode_cursor(encode_cursor(None, 1)) == (None, 1)
+    for bad in ("不是游标", "e30", encode_cursor("2025-03-01", 1)[:-3] + "!!!"):
+        try:
+            decode_cursor(bad)
+            assert False, f"应拒绝 {bad}"
+        except ValueError:
+            pass
+
+
+def test_parse_fields():
+    """fields 只保留请求的列与分页键，未知列报错"""
+    assert parse_fields(None, TASK_FIELDS) == list(TASK_FIELDS)
+    assert parse_fields(" title , category", TASK_FIELDS) == ["id", "title", "category", "created_at"]
+    try:
+        parse_fields("title,password", TASK_FIELDS)
+        assert False, "应拒绝未知列"
+    except ValueError as e:
+        assert "password" in str(e)
+
+
+def test_pages_cover_every_row_once(db):
+    """逐页翻完所有行：无重复、无遗漏，顺序与 ORDER BY created_at DESC, id DESC 一致"""
+    conn = _add_tasks(db, 100)
+    expected = [row[0] for row in conn.execute("SELECT id FROM gtd_tasks ORDER BY created_at DESC, id DESC")]
+    pages = _walk(conn, limit=7)
+    assert [row["id"] for page in pages for row in page["items"]] == expected
+    assert len(pages) == 15 and all(len(page["items"]) == 7 for page in pages[:-1])
+
+    today = [row[0] for row in conn.execute(
+        "SELECT id FROM gtd_tasks WHERE category = 'today' ORDER BY created_at DESC, id DESC"
+    )]
+    pages = _walk(conn, filters=[("category", "today")], limit=5, fields="title")
+    assert [row["id"] for page in pages for row in page["items"]] == today
+    assert set(pages[0]["items"][0]) == {"id", "title", "created_at"}
+
+
+def test_limit_clamp_and_legacy_offset(db):
+    """每页数量有上限；没有游标时仍支持 offset"""
+    conn = _add_tasks(db, 300)
+    columns = parse_fields("title", TASK_FIELDS)
+    assert len(fetch_page(conn, "gtd_tasks", columns, limit=10000)["items"]) == MAX_PAGE_SIZE
+    assert len(fetch_page(conn, "gtd_tasks", columns, limit=0)["items"]) == 1
+
+    first = fetch_page(conn, "gtd_tasks", columns, limit=10)
+    shifted = fetch_page(conn, "gtd_tasks", columns, limit=5, offset=10)
+    second = fetch_page(conn, "gtd_tasks", columns, cursor=first["next_cursor"], limit=5, offset=10)
+    assert shifted["items"] == second["items"]
+
+
+def test_unpaged_request_returns_every_row(db):
+    """limit 与 cursor 都不传时返回全部行（旧客户端不读 X-Next-Cursor）；只传 cursor 时按默认页大小"""
+    conn = _add_tasks(db, 300)
+    columns = parse_fields(None, TASK_FIELDS)
+    everything = fetch_page(conn, "gtd_tasks", columns, limit=None)
+    assert len(everything["items"]) == 300 and everything["next_cursor"] is None
+    today = fetch_page(conn, "gtd_tasks", columns, [("category", "today")], limit=None)
+    assert len(today["items"]) == 100
+
+    first = fetch_page(conn, "gtd_tasks", columns, limit=10)
+    rest = fetch_page(conn, "gtd_tasks", columns, cursor=first["next_cursor"], limit=None)
+    assert len(rest["items"]) == DEFAULT_PAGE_SIZE
+    assert rest["items"][0]["id"] == everything["items"][10]["id"]
+
+
+def test_unpaged_request_is_capped(db):
+    """不分页请求最多返回 MAX_UNPAGED_ROWS 行，超出时返回 next_cursor 接着翻页"""
+    conn = _add_tasks(db, MAX_UNPAGED_ROWS + 30)
+    columns = parse_fields("title", TASK_FIELDS)
+    capped = fetch_page(conn, "gtd_tasks", columns, limit=None)
+    assert len(capped["items"]) == MAX_UNPAGED_ROWS and capped["next_cursor"] is not None
+    rest = fetch_page(conn, "gtd_tasks", columns, cursor=capped["next_cursor"], limit=None)
+    assert len(rest["items"]) == 30 and rest["next_cursor"] is None
+
+
+def test_rows_without_created_at_are_paged(db):
+    """created_at 为 NULL 的行排在最后，翻页时不会被跳过"""
+    conn = _add_tasks(db, 20)
+    conn.executemany("INSERT INTO gtd_tasks (title, category, priority, created_at) VALUES (?, 'inbox', 'low', NULL)",
+                     [(f"旧任务{i}",) for i in range(8)])
+    conn.commit()
+    expected = [row[0] for row in conn.execute(
+        "SELECT id FROM gtd_tasks ORDER BY created_at IS NULL, created_at DESC, id DESC"
+    )]
+    pages = _walk(conn, limit=3)
+    assert [row["id"] for page in pages for row in page["items"]] == expected
+    assert pages[-1]["items"][-1]["created_at"] is None
+
+
+def test_etag_changes_with_page_content(db):
+    """同一页内容不变时 ETag 不变，页内任务修改后 ETag 变化"""
+    conn = _add_tasks(db, 20)
+    columns = parse_fields(None, TASK_FIELDS)
+    first = fetch_page(conn, "gtd_tasks", columns, limit=5)
+    assert fetch_page(conn, "gtd_tasks", columns, limit=5)["etag"] == first["etag"]
+    assert etag_matches(first["etag"], first["etag"])
+    assert etag_matches(f'"other", {first["etag"][2:]}', first["etag"])
+    assert etag_matches("*", first["etag"]) and not etag_matches(None, first["etag"])
+
+    conn.execute("UPDATE gtd_tasks SET title = '已修改' WHERE id = ?", (first["items"][0]["id"],))
+    changed = fetch_page(conn, "gtd_tasks", columns, limit=5)
+    assert changed["etag"] != first["etag"] and not etag_matches(first["etag"], changed["etag"])
+
+
+def test_deep_pages_stay_cheap(db):
+    """深翻页与第一页耗时相当（按索引定位，不跳过前面的行）"""
+    conn = _add_tasks(db, 50000)
+    columns = parse_fields("title,category", TASK_FIELDS)
+    last = conn.execute("SELECT created_at, id FROM gtd_tasks ORDER BY created_at, id LIMIT 1 OFFSET 100").fetchone()
+    deep_cursor = encode_cursor(last[0], last[1])
+
+    def _timed(**kwargs):
+        start = time.perf_counter()
+        for _ in range(20):
+            page = fetch_page(conn, "gtd_tasks", columns, limit=50, **kwargs)
+        return (time.perf_counter() - start) / 20, page
+
+    first_time, _ = _timed()
+    deep_time, deep = _timed(cursor=deep_cursor)
+    offset_time, _ = _timed(offset=49800)
+    assert len(deep["items"]) == 50
+    assert deep_time < max(first_time * 5, 0.002), f"first={first_time * 1000:.2f}ms deep={deep_time * 1000:.2f}ms"
+    assert deep_time < offset_time
@@ -0,0 +1,133 @@
+"""
+SQLite 连接池测试
+
+运行: pytest test_sqlite_pool.py
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from services.sqlite_pool import PoolTimeout, SQLitePool
+
+
+def _pool(directory: Path, **kwargs) -> SQLitePool:
+    pool = SQLitePool(directory / "test.db", **kwargs)
+    with pool.connect() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    return pool
+
+
+def test_connections_are_configured_and_reused(tmp_path):
+    """连接创建时配置 WAL 等参数；同一线程归还后再次借出的是同一连接"""
+    pool = _pool(tmp_path, cache_size_kb=4096, busy_timeout_ms=1234)
+    conn = pool.connect()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    assert conn.execute("PRAGMA cache_size").fetchone()[0] == -4096
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    raw = conn.raw
+    conn.close()
+    conn.close()
+
+    again = pool.connect()
+    assert again.raw is raw
+    again.close()
+    stats = pool.get_stats()
+    assert stats["created"] == 1 and stats["reused_thread_local"] >= 1
+    assert stats["open_connections"] == 1 and stats["idle_connections"] == 1 and stats["in_use_connections"] == 0
+
+
+def test_with_block_commits_and_release_rolls_back(tmp_path):
+    """with 块结束时提交并归还；直接归还时回滚未提交的写入，恢复行工厂"""
+    pool = _pool(tmp_path)
+    with pool.connect() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+    assert pool.get_stats()["in_use_connections"] == 0
+
+    conn = pool.connect()
+    conn.row_factory = None
+    conn.execute("INSERT INTO items (name) VALUES ('b')")
+    conn.close()
+    try:
+        conn.execute("SELECT 1")
+        assert False, "归还后的连接不能再使用"
+    except sqlite3.ProgrammingError:
+        pass
+
+    conn = pool.connect()
+    rows = conn.execute("SELECT name FROM items").fetchall()
+    assert [row["name"] for row in rows] == ["a"]
+    conn.close()
+
+
+def test_nested_borrow_and_wait_for_release(tmp_path):
+    """同一线程嵌套借出得到不同连接；达到上限时等待归还，超时报错并记录等待时间"""
+    pool = _pool(tmp_path, max_connections=2, timeout_seconds=0.2)
+    first = pool.connect()
+    second = pool.connect()
+    assert first.raw is not second.raw
+
+    start = time.perf_counter()
+    try:
+        pool.connect()
+        assert False, "连接池耗尽时应超时"
+    except PoolTimeout:
+        pass
+    assert time.perf_counter() - start >= 0.19
+
+    threading.Timer(0.05, second.close).start()
+    third = pool.connect()
+    stats = pool.get_stats()
+    assert stats["waits"] == 1 and stats["timeouts"] == 1 and stats["max_wait_ms"] >= 40
+    assert stats["open_connections"] == 2
+    first.close()
+    third.close()
+
+
+def test_readers_not_blocked_by_writer(tmp_path):
+    """WAL 模式下未提交的写事务不阻塞其他连接读取"""
+    pool = _pool(tmp_path, busy_timeout_ms=100)
+    writer = pool.connect()
+    writer.execute("INSERT INTO items (name) VALUES ('pending')")
+    assert writer.in_transaction
+
+    reader = pool.connect()
+    assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    reader.close()
+    writer.commit()
+    writer.close()
+
+
+def test_health_check_and_shutdown(tmp_path):
+    """健康检查关闭失效连接；关闭连接池后借出报错，借出中的连接归还时关闭"""
+    pool = _pool(tmp_path, health_check_interval=0)
+    first = pool.connect()
+    second = pool.connect()
+    broken = first.raw
+    first.close()
+    second.close()
+    broken.close()
+
+    health = pool.check_health()
+    assert health == {"healthy": False, "checked": 2, "discarded": 1}
+    assert pool.get_stats()["open_connections"] == 1
+
+    # 借出前检查：空闲连接失效时重新建立
+    conn = pool.connect()
+    stale = conn.raw
+    conn.close()
+    stale.close()
+    conn = pool.connect()
+    assert conn.raw is not stale
+    assert conn.execute("SELECT 1").fetchone()[0] == 1
+    assert pool.get_stats()["health_check_failures"] == 2
+
+    pool.close()
+    conn.close()
+    assert pool.get_stats()["open_connections"] == 0
+    try:
+        pool.connect()
+        assert False, "关闭后不能再借出"
+    except sqlite3.ProgrammingError:
+        pass
@@ -71,7 +71,15 @@ def batch_import(html_dir: str, db_path: str = "C:/test/antinet/data/antinet.db"
         importer.init_tables()
         logger.info("数据表初始化完成")
 
-        stats = importer.import_cards(cards)
+        # 导入卡片多于现有卡片时，导入期间移除二级索引、结束时重建
+        existing_count = importer.get_import_stats()['total_cards']
+        stats = importer.import_cards(
+            cards,
+            progress=lambda p: logger.info(
+                f"  已处理 {p['processed']}/{len(cards)} 张（新增 {p['success']}，重复 {p['duplicates']}）"
+            ),
+            defer_indexes=len(cards) > existing_count
+        )
         logger.info(f"\n导入统计:")
         logger.info(f"  成功: {stats['success']}")
         logger.info(f"  [WARN] 重复: {stats['duplicates']}")
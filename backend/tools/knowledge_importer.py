@@ -2,12 +2,19 @@
 知识导入工具
 将解析的知识数据导入到 SQLite 数据库
 """
+import os
+import sys
 import sqlite3
 import json
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Callable
 from datetime import datetime
 
+# 添加项目路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import card_bulk_import, card_search, migrations
+
 
 class KnowledgeImporter:
     """知识导入器"""
@@ -33,84 +40,42 @@ class KnowledgeImporter:
             self.conn.close()
 
     def init_tables(self):
-        """初始化数据表"""
-        cursor = self.conn.cursor()
+        """初始化数据表（与后端共用结构迁移，见 services/migrations.py）"""
+        migrations.migrate(self.conn)
 
-        # 创建知识卡片表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS knowledge_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                card_type TEXT NOT NULL,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                source TEXT,
-                url TEXT,
-                category TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 创建知识来源表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS knowledge_sources (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                source_path TEXT NOT NULL UNIQUE,
-                source_type TEXT,
-                total_cards INTEGER DEFAULT 0,
-                last_imported TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # 全文索引与知识代数（触发器随卡片写入同步，检索缓存据代数失效）
+        card_search.ensure_card_fts(self.conn)
+        card_search.ensure_card_generation(self.conn)
 
         self.conn.commit()
 
-    def import_cards(self, cards: List[Dict[str, Any]]) -> Dict[str, int]:
+    def import_cards(self, cards: Iterable[Dict[str, Any]], batch_size: int = 2000,
+                     progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                     defer_indexes: bool = False) -> Dict[str, int]:
         """
-        导入知识卡片到数据库
+        导入知识卡片到数据库（批量导入，按内容哈希去重，见 services/card_bulk_import.py）
 
         Args:
-            cards: 知识卡片列表
+            cards: 知识卡片列表（或按需生成卡片的迭代器）
+            batch_size: 每批（每个事务）的卡片数
+            progress: 每批提交后以当前统计调用
+            defer_indexes: 导入期间移除二级索引、结束时重建（导入卡片数远多于现有卡片时开启）
 
         Returns:
             导入统计信息
         """
-        cursor = self.conn.cursor()
+        return card_bulk_import.bulk_import_cards(
+            self.conn, cards, batch_size=batch_size, defer_indexes=defer_indexes, progress=progress
+        )
 
-        stats = {
-            'success': 0,
-            'failed': 0,
-            'duplicates': 0
-        }
-
-        for card in cards:
-            try:
-                cursor.execute('''
-                    INSERT INTO knowledge_cards (card_type, title, content, source, url, category)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    card.get('card_type', 'blue'),
-                    card.get('title', ''),
-                    card.get('content', ''),
-                    card.get('source', ''),
-                    card.get('url', ''),
-                    card.get('category', '未分类')
-                ))
-                stats['success'] += 1
-            except sqlite3.IntegrityError:
-                stats['duplicates'] += 1
-            except Exception as e:
-                stats['failed'] += 1
-                print(f" 导入失败: {card.get('title', '')} - {e}")
-
-        self.conn.commit()
-        return stats
-
-    def import_from_json(self, json_file: str) -> Dict[str, int]:
+    def import_from_json(self, json_file: str,
+                         progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
         """
         从 JSON 文件导入知识卡片
 
         Args:
             json_file: JSON 文件路径
+            progress: 每批提交后以当前统计调用
 
         Returns:
             导入统计信息
@@ -118,7 +83,7 @@ class KnowledgeImporter:
         with open(json_file, 'r', encoding='utf-8') as f:
             cards = json.load(f)
 
-        return self.import_cards(cards)
+        return self.import_cards(cards, progress=progress)
 
     def register_source(self, source_path: str, source_type: str = 'html', total_cards: int = 0):
         """
@@ -153,11 +118,11 @@ class KnowledgeImporter:
 
         # 按类型分组
         cursor.execute('''
-            SELECT type, COUNT(*) as count
+            SELECT card_type, COUNT(*) as count
             FROM knowledge_cards
-            GROUP BY type
+            GROUP BY card_type
         ''')
-        cards_by_type = {row['type']: row['count'] for row in cursor.fetchall()}
+        cards_by_type = {row['card_type']: row['count'] for row in cursor.fetchall()}
 
         # 按来源分组
         cursor.execute('SELECT * FROM knowledge_sources')
@@ -171,7 +136,7 @@ class KnowledgeImporter:
 
     def search_cards(self, keyword: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
-        搜索知识卡片
+        搜索知识卡片（FTS5 全文索引，按 BM25 相关度排序）
 
         Args:
             keyword: 搜索关键词
@@ -180,16 +145,7 @@ class KnowledgeImporter:
         Returns:
             匹配的卡片列表
         """
-        cursor = self.conn.cursor()
-
-        cursor.execute('''
-            SELECT * FROM knowledge_cards
-            WHERE title LIKE ? OR content LIKE ?
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (f'%{keyword}%', f'%{keyword}%', limit))
-
-        return [dict(row) for row in cursor.fetchall()]
+        return card_search.search_cards(self.conn, keyword, limit=limit)
 
 
 def main():
@@ -208,7 +164,10 @@ def main():
         # 从 JSON 导入卡片
         json_file = "C:/test/antinet/data/knowledge/knowledge_cards.json"
         if Path(json_file).exists():
-            stats = importer.import_from_json(json_file)
+            stats = importer.import_from_json(
+                json_file,
+                progress=lambda p: print(f"  已处理 {p['processed']} 张（新增 {p['success']}）")
+            )
             print(f"\n导入统计:")
             print(f"  成功: {stats['success']}")
             print(f"  [WARN] 重复: {stats['duplicates']}")
@@ -0,0 +1,106 @@
+"""
+NPU 性能基准测试命令行工具
+
+示例：
+    # 在 AIPC 上测量真实 NPU
+    python tools/npu_benchmark.py --corpus mixed --runs 5
+
+    # CI 中使用模拟后端，并与模拟 CPU 参考后端对比
+    python tools/npu_benchmark.py --backend fake --reference fake-cpu --output-dir data/benchmarks
+
+    # 与上一次结果对比
+    python tools/npu_benchmark.py --compare data/benchmarks/benchmark_qwen2-7b-ssd_xxx.json
+"""
+import sys
+import os
+import json
+import logging
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='NPU 性能基准测试')
+    parser.add_argument('--model', default=None, help='模型键名（默认使用推荐模型）')
+    parser.add_argument('--backend', default=None, choices=['genie', 'fake'], help='推理后端（默认读取 INFERENCE_BACKEND）')
+    parser.add_argument('--corpus', default='default', help='内置语料名（default/mixed/long）或 JSON 语料文件路径')
+    parser.add_argument('--runs', type=int, default=3, help='每个提示的测量次数')
+    parser.add_argument('--warmup', type=int, default=2, help='预热轮数')
+    parser.add_argument('--max-new-tokens', type=int, default=64, help='每次生成的最大 token 数')
+    parser.add_argument('--reference', default=None, help='CPU 参考后端（名称或 "模块:工厂函数"）')
+    parser.add_argument('--output-dir', default='./data/benchmarks', help='结果保存目录')
+    parser.add_argument('--no-save', action='store_true', help='不保存 JSON 结果')
+    parser.add_argument('--compare', default=None, help='与指定的历史结果文件对比')
+
+    args = parser.parse_args()
+
+    if args.backend:
+        os.environ['INFERENCE_BACKEND'] = args.backend
+
+    from models.model_loader import NPUModelLoader
+    from services.npu_benchmark import (
+        NPUBenchmark,
+        create_reference_backend,
+        save_result,
+        load_result,
+        compare_results
+    )
+
+    loader = NPUModelLoader(args.model, backend=args.backend)
+    loader.load()
+
+    try:
+        benchmark = NPUBenchmark(
+            loader,
+            corpus=args.corpus,
+            warmup_runs=args.warmup,
+            runs=args.runs,
+            max_new_tokens=args.max_new_tokens,
+            reference=create_reference_backend(args.reference),
+            reference_name=args.reference
+        )
+    except ValueError as e:
+        logger.error(f" {e}")
+        return 1
+
+    result = benchmark.run()
+    summary = result["npu"]["summary"]
+    memory = result["npu"]["memory"]
+
+    print("=" * 60)
+    print(f"模型: {result['model']}  后端: {result['backend']}  语料: {result['config']['corpus']}")
+    print(f"延迟 p50/p95/p99: {summary['p50_latency_ms']} / {summary['p95_latency_ms']} / {summary['p99_latency_ms']} ms")
+    print(f"首 token 延迟 p50/p95: {summary['ttft_p50_ms']} / {summary['ttft_p95_ms']} ms")
+    print(f"预填充: {summary['prefill_tokens_per_s']} tokens/s  解码: {summary['decode_tokens_per_s']} tokens/s")
+    print(f"RSS: {memory['rss_end_mb']} MB  峰值: {memory['rss_peak_mb']} MB  进程峰值: {memory['process_peak_mb']} MB")
+    if result["cpu_vs_npu_speedup"] is not None:
+        print(f"CPU 参考后端 ({args.reference}) 加速比: {result['cpu_vs_npu_speedup']}x")
+    print("=" * 60)
+
+    if not args.no_save:
+        print(f"结果已保存: {save_result(result, args.output_dir)}")
+
+    if args.compare:
+        if not Path(args.compare).exists():
+            logger.error(f" 对比文件不存在: {args.compare}")
+            return 1
+        diff = compare_results(load_result(args.compare), result)
+        print(json.dumps(diff, ensure_ascii=False, indent=2))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
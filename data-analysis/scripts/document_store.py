@@ -0,0 +1,189 @@
+"""
+文档存储
+以 SQLite 按索引ID存储向量检索的文档，替代整体 pickle 的文档列表
+
+- 列存储：doc_id、text、metadata（JSON）、extra（其余字段 JSON）
+- 检索时只读取 Top-K 结果对应的文档，启动时不加载全部文档
+- 每次写入为一个事务（WAL 模式），追加写入不重写已有数据，异常退出不会破坏已提交的数据
+"""
+import json
+import pickle
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# SQLite 单条语句的参数上限（旧版本为 999）
+MAX_SQL_VARIABLES = 500
+
+_COLUMNS = ("id", "text", "metadata")
+
+
+class DocumentStore:
+    """按索引ID存取文档的 SQLite 存储"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化文档存储
+
+        参数：
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                index_id INTEGER PRIMARY KEY,
+                doc_id TEXT UNIQUE,
+                text TEXT NOT NULL,
+                metadata TEXT,
+                extra TEXT
+            );
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _to_row(index_id: int, doc: Dict) -> Tuple:
+        extra = {key: value for key, value in doc.items() if key not in _COLUMNS}
+        return (
+            index_id,
+            doc.get("id"),
+            doc.get("text", ""),
+            json.dumps(doc.get("metadata"), ensure_ascii=False) if "metadata" in doc else None,
+            json.dumps(extra, ensure_ascii=False) if extra else None
+        )
+
+    @staticmethod
+    def _to_doc(row: Tuple) -> Dict:
+        _, doc_id, text, metadata, extra = row
+        doc = {"id": doc_id, "text": text}
+        if metadata is not None:
+            doc["metadata"] = json.loads(metadata)
+        if extra:
+            doc.update(json.loads(extra))
+        return doc
+
+    def put_many(self, items: Sequence[Tuple[int, Dict]]):
+        """
+        写入文档（单个事务；同一 doc_id 的旧文档被替换）
+
+        参数：
+            items: [(索引ID, 文档)]
+        """
+        if not items:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO documents (index_id, doc_id, text, metadata, extra) VALUES (?, ?, ?, ?, ?)",
+                [self._to_row(index_id, doc) for index_id, doc in items]
+            )
+            self._bump_next_id(max(index_id for index_id, _ in items) + 1)
+
+    def _bump_next_id(self, value: int):
+        self.conn.execute("""
+            INSERT INTO store_meta (key, value) VALUES ('next_id', ?)
+            ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)
+        """, (value,))
+
+    def delete_many(self, index_ids: Sequence[int]) -> int:
+        """
+        按索引ID删除文档
+
+        返回：
+            删除的文档数
+        """
+        with self._lock, self.conn:
+            cursor = self.conn.executemany(
+                "DELETE FROM documents WHERE index_id = ?", [(int(i),) for i in index_ids]
+            )
+            return cursor.rowcount
+
+    def get_many(self, index_ids: Sequence[int]) -> Dict[int, Dict]:
+        """
+        按索引ID读取文档
+
+        返回：
+            {索引ID: 文档}，不存在的ID不包含在结果中
+        """
+        ids = [int(i) for i in index_ids]
+        docs = {}
+        with self._lock:
+            for start in range(0, len(ids), MAX_SQL_VARIABLES):
+                chunk = ids[start:start + MAX_SQL_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                for row in self.conn.execute(
+                    f"SELECT index_id, doc_id, text, metadata, extra FROM documents WHERE index_id IN ({placeholders})",
+                    chunk
+                ):
+                    docs[row[0]] = self._to_doc(row)
+        return docs
+
+    def lookup(self, doc_ids: Sequence[str]) -> Dict[str, int]:
+        """
+        按文档ID查找索引ID
+
+        返回：
+            {文档ID: 索引ID}
+        """
+        doc_ids = [doc_id for doc_id in doc_ids if doc_id is not None]
+        found = {}
+        with self._lock:
+            for start in range(0, len(doc_ids), MAX_SQL_VARIABLES):
+                chunk = doc_ids[start:start + MAX_SQL_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(self.conn.execute(
+                    f"SELECT doc_id, index_id FROM documents WHERE doc_id IN ({placeholders})", chunk
+                ).fetchall())
+        return found
+
+    def iter_texts(self, batch_size: int = 1000) -> Iterator[Tuple[int, str]]:
+        """按索引ID顺序遍历 (索引ID, 文本)"""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT index_id, text FROM documents WHERE index_id > ? ORDER BY index_id LIMIT ?",
+                    (last, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    @property
+    def next_id(self) -> int:
+        """下一个可用的索引ID（删除的ID不复用）"""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM store_meta WHERE key = 'next_id'").fetchone()
+        return row[0] if row else 0
+
+    def count(self) -> int:
+        """文档数"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def import_pickle(self, data_path: str) -> int:
+        """
+        导入旧版 pickle 文档数据（文档列表按位置编号，或 {"documents": {索引ID: 文档}}）
+
+        返回：
+            导入的文档数
+        """
+        with open(data_path, "rb") as f:
+            data = pickle.load(f)
+        documents = dict(enumerate(data)) if isinstance(data, list) else data["documents"]
+        self.put_many(list(documents.items()))
+        if isinstance(data, dict) and "next_id" in data:
+            with self._lock, self.conn:
+                self._bump_next_id(data["next_id"])
+        return len(documents)
+
+    def close(self):
+        """关闭存储"""
+        with self._lock:
+            self.conn.close()
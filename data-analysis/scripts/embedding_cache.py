@@ -0,0 +1,220 @@
+"""
+向量缓存
+按 (模型名, 规范化文本) 的哈希缓存文本向量，避免重复编码
+
+存储：
+    vectors.f32   内存映射的 float32 矩阵（按行追加，容量不足时翻倍扩展文件）
+    keys.db       SQLite 键索引（哈希 -> 行号），向量落盘后再提交键，保证键指向的行已写入
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+INITIAL_CAPACITY = 1024
+
+# SQLite 单条语句的参数上限（旧版本为 999）
+MAX_SQL_VARIABLES = 500
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：NFKC、合并空白、去除首尾空白"""
+    return _WHITESPACE_PATTERN.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """缓存键：sha256(模型名 + 规范化文本)"""
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """持久化的文本向量缓存"""
+
+    def __init__(self, cache_dir: str, model_name: str, dim: int):
+        """
+        初始化向量缓存
+
+        参数：
+            cache_dir: 缓存根目录（每个模型使用独立子目录）
+            model_name: 向量模型名称
+            dim: 向量维度
+        """
+        self.model_name = model_name
+        self.dim = dim
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.f32")
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, "keys.db"), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_keys (
+                key TEXT PRIMARY KEY,
+                row INTEGER NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        self.count = self.conn.execute("SELECT COUNT(*) FROM embedding_keys").fetchone()[0]
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._open(max(INITIAL_CAPACITY, self.count))
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def _open(self, capacity: int):
+        """打开内存映射，文件不足 capacity 行时扩展"""
+        # 先释放旧映射（Windows 不允许扩展仍被映射的文件）
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+
+        size = capacity * self.dim * 4
+        with open(self.vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._matrix = np.memmap(self.vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dim))
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        批量读取缓存
+
+        参数：
+            keys: 缓存键
+
+        返回：
+            {缓存键: 向量}，只包含命中的键
+        """
+        unique = list(dict.fromkeys(keys))
+        rows = {}
+        with self._lock:
+            for start in range(0, len(unique), MAX_SQL_VARIABLES):
+                chunk = unique[start:start + MAX_SQL_VARIABLES]
+                placeholders = ", ".join("?" * len(chunk))
+                rows.update(self.conn.execute(
+                    f"SELECT key, row FROM embedding_keys WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            if not rows:
+                return {}
+            found = list(rows)
+            vectors = np.array(self._matrix[[rows[key] for key in found]])
+        return dict(zip(found, vectors))
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray):
+        """
+        批量写入缓存（已存在的键跳过）
+
+        参数：
+            keys: 缓存键
+            vectors: 对应的向量 (n, dim)
+        """
+        with self._lock:
+            existing = set()
+            for start in range(0, len(keys), MAX_SQL_VARIABLES):
+                chunk = list(keys[start:start + MAX_SQL_VARIABLES])
+                placeholders = ", ".join("?" * len(chunk))
+                existing.update(row[0] for row in self.conn.execute(
+                    f"SELECT key FROM embedding_keys WHERE key IN ({placeholders})", chunk
+                ))
+
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in existing and key not in new_rows:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+
+            needed = self.count + len(new_rows)
+            if needed > self._matrix.shape[0]:
+                capacity = self._matrix.shape[0]
+                while capacity < needed:
+                    capacity *= 2
+                self._open(capacity)
+
+            first = self.count
+            self._matrix[first:needed] = np.asarray(list(new_rows.values()), dtype="float32")
+            self._matrix.flush()
+            self.conn.executemany(
+                "INSERT INTO embedding_keys (key, row) VALUES (?, ?)",
+                [(key, first + i) for i, key in enumerate(new_rows)]
+            )
+            self.conn.commit()
+            self.count = needed
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "encoded": self.encoded,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "encode_throughput": round(self.encoded / self.encode_seconds, 2) if self.encode_seconds else 0.0,
+            "file_size": os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        }
+
+    def close(self):
+        """关闭缓存"""
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self.conn.close()
+
+
+def encode_with_cache(texts: List[str], encode: Callable[[List[str]], np.ndarray],
+                      cache: Optional[EmbeddingCache], batch_size: int = 64) -> np.ndarray:
+    """
+    编码文本，命中缓存的文本不经过模型，未命中的文本去重后分批编码并写入缓存
+
+    参数：
+        texts: 文本列表
+        encode: 编码函数（文本列表 -> 向量数组）
+        cache: 向量缓存（None 表示不使用缓存）
+        batch_size: 每批编码的文本数
+
+    返回：
+        向量数组，顺序与 texts 一致
+    """
+    if cache is None:
+        return encode(texts)
+    if not texts:
+        return np.zeros((0, cache.dim), dtype="float32")
+
+    keys = [cache_key(cache.model_name, text) for text in texts]
+    found = cache.get_many(keys)
+
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in pending:
+            pending[key] = text
+
+    missed = sum(1 for key in keys if key not in found)
+    cache.hits += len(keys) - missed
+    cache.misses += missed
+
+    pending_keys = list(pending)
+    for start in range(0, len(pending_keys), batch_size):
+        batch_keys = pending_keys[start:start + batch_size]
+        begin = time.time()
+        vectors = np.asarray(encode([pending[key] for key in batch_keys]), dtype="float32")
+        cache.encode_seconds += time.time() - begin
+        cache.encoded += len(batch_keys)
+        cache.put_many(batch_keys, vectors)
+        found.update(zip(batch_keys, vectors))
+
+    return np.vstack([found[key] for key in keys]).astype("float32")
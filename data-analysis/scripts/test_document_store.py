@@ -0,0 +1,94 @@
+"""
+文档存储测试脚本
+测试按索引ID读写、按文档ID替换与删除、持久化与旧版 pickle 导入
+"""
+import sys
+import os
+import pickle
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.document_store import DocumentStore
+
+
+def _doc(doc_id: str, text: str, **extra) -> dict:
+    return {"id": doc_id, "text": text, "metadata": {"card_type": "blue", "tags": ["销售"]}, **extra}
+
+
+def test_put_get_and_lookup():
+    """按索引ID读取文档，按文档ID查找索引ID，附加字段原样保留"""
+    store = DocumentStore(os.path.join(tempfile.mkdtemp(), "docs.db"))
+    store.put_many([(0, _doc("card_001", "销售数据")), (1, _doc("card_002", "库存风险", source="报表"))])
+
+    docs = store.get_many([1, 0, 99])
+    assert set(docs) == {0, 1}
+    assert docs[1] == _doc("card_002", "库存风险", source="报表")
+    assert store.lookup(["card_001", "card_404"]) == {"card_001": 0}
+    assert store.next_id == 2 and store.count() == 2
+
+
+def test_same_doc_id_replaces_old_row():
+    """同一文档ID写入新索引ID时替换旧文档，删除的ID不复用"""
+    store = DocumentStore(os.path.join(tempfile.mkdtemp(), "docs.db"))
+    store.put_many([(0, _doc("card_001", "旧文本")), (1, _doc("card_002", "库存风险"))])
+    store.put_many([(2, _doc("card_001", "新文本"))])
+
+    assert store.count() == 2
+    assert store.get_many([0]) == {}
+    assert store.lookup(["card_001"]) == {"card_001": 2}
+
+    assert store.delete_many([2]) == 1
+    assert store.next_id == 3
+    assert [index_id for index_id, _ in store.iter_texts(batch_size=1)] == [1]
+
+
+def test_persists_across_instances():
+    """写入提交后重新打开可读取"""
+    path = os.path.join(tempfile.mkdtemp(), "docs.db")
+    store = DocumentStore(path)
+    store.put_many([(i, _doc(f"card_{i}", f"文本{i}")) for i in range(1200)])
+    store.close()
+
+    reopened = DocumentStore(path)
+    assert reopened.count() == 1200 and reopened.next_id == 1200
+    assert len(reopened.get_many(range(1200))) == 1200
+    assert len(reopened.lookup([f"card_{i}" for i in range(1200)])) == 1200
+
+
+def test_import_legacy_pickle():
+    """旧版文档列表按位置编号导入，新版字典保留 next_id"""
+    tmp = tempfile.mkdtemp()
+    legacy_path = os.path.join(tmp, "legacy.pkl")
+    with open(legacy_path, "wb") as f:
+        pickle.dump([_doc("card_001", "销售数据"), _doc("card_002", "库存风险")], f)
+    store = DocumentStore(os.path.join(tmp, "legacy.db"))
+    assert store.import_pickle(legacy_path) == 2
+    assert store.lookup(["card_002"]) == {"card_002": 1}
+
+    data_path = os.path.join(tmp, "data.pkl")
+    with open(data_path, "wb") as f:
+        pickle.dump({"documents": {5: _doc("card_005", "客户分析")}, "next_id": 9}, f)
+    store = DocumentStore(os.path.join(tmp, "data.db"))
+    assert store.import_pickle(data_path) == 1
+    assert store.get_many([5])[5]["text"] == "客户分析"
+    assert store.next_id == 9
+
+
+if __name__ == "__main__":
+    tests = [
+        test_put_get_and_lookup,
+        test_same_doc_id_replaces_old_row,
+        test_persists_across_instances,
+        test_import_legacy_pickle,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,105 @@
+"""
+向量缓存测试脚本
+测试缓存命中、持久化、扩容与分批编码
+"""
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import embedding_cache
+from scripts.embedding_cache import EmbeddingCache, cache_key, encode_with_cache
+
+DIM = 8
+
+
+class _FakeModel:
+    """记录调用的模拟编码模型"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[float(len(text))] + [float(ord(text[0]))] * (DIM - 1) for text in texts], dtype="float32")
+
+
+def test_hits_skip_model_and_misses_are_batched():
+    """命中缓存的文本不经过模型，未命中的文本去重后分批编码"""
+    cache = EmbeddingCache(tempfile.mkdtemp(), "bge-test", DIM)
+    model = _FakeModel()
+
+    texts = ["销售数据", "库存风险", "销售数据", "客户分析", "市场趋势"]
+    first = encode_with_cache(texts, model.encode, cache, batch_size=2)
+    assert [len(batch) for batch in model.calls] == [2, 2]
+    assert np.array_equal(first[0], first[2])
+
+    model.calls.clear()
+    second = encode_with_cache(["库存风险", " 销售数据 ", "新文本"], model.encode, cache, batch_size=2)
+    assert model.calls == [["新文本"]]
+    assert np.array_equal(second[1], first[0])
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 5
+    assert stats["hits"] == 2 and stats["misses"] == 6
+    assert stats["hit_rate"] == 0.25
+    assert stats["encoded"] == 5
+
+
+def test_cache_persists_and_grows():
+    """缓存跨实例持久化，超过初始容量时扩展文件"""
+    cache_dir = tempfile.mkdtemp()
+    original_capacity = embedding_cache.INITIAL_CAPACITY
+    embedding_cache.INITIAL_CAPACITY = 4
+    try:
+        cache = EmbeddingCache(cache_dir, "bge-test", DIM)
+        model = _FakeModel()
+        texts = [f"文本{i}" for i in range(10)]
+        vectors = encode_with_cache(texts, model.encode, cache)
+        assert cache._matrix.shape[0] == 16
+        cache.close()
+
+        reopened = EmbeddingCache(cache_dir, "bge-test", DIM)
+        assert reopened.count == 10
+        model.calls.clear()
+        again = encode_with_cache(texts, model.encode, reopened)
+        assert model.calls == []
+        assert np.array_equal(again, vectors)
+    finally:
+        embedding_cache.INITIAL_CAPACITY = original_capacity
+
+
+def test_key_depends_on_model_and_normalized_text():
+    """缓存键区分模型，规范化后相同的文本共用缓存"""
+    assert cache_key("bge-m3", "销售  数据\n") == cache_key("bge-m3", "销售 数据")
+    assert cache_key("bge-m3", "ＡＢＣ") == cache_key("bge-m3", "ABC")
+    assert cache_key("bge-m3", "销售数据") != cache_key("minilm", "销售数据")
+
+
+def test_without_cache_calls_model_directly():
+    """不使用缓存时直接调用模型"""
+    model = _FakeModel()
+    encode_with_cache(["a", "a"], model.encode, None)
+    assert model.calls == [["a", "a"]]
+
+
+if __name__ == "__main__":
+    tests = [
+        test_hits_skip_model_and_misses_are_batched,
+        test_cache_persists_and_grows,
+        test_key_depends_on_model_and_normalized_text,
+        test_without_cache_calls_model_directly,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
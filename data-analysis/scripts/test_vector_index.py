@@ -0,0 +1,136 @@
+"""
+向量索引策略测试脚本
+测试索引策略切换、按ID删除/更新、持久化与召回率评估
+"""
+import sys
+import os
+import tempfile
+
+import numpy as np
+import faiss
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.vector_index import VectorIndex, format_recall_report
+
+DIM = 32
+
+
+def _vectors(count: int, seed: int = 0, topics: int = 20) -> np.ndarray:
+    """生成聚簇分布的归一化向量"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, DIM)).astype("float32")
+    data = centers[rng.integers(0, topics, count)] + 0.3 * rng.standard_normal((count, DIM)).astype("float32")
+    faiss.normalize_L2(data)
+    return data
+
+
+def test_auto_strategy_switches_by_size():
+    """auto 策略低于阈值使用 flat，超过阈值用已存储向量训练 IVF，增长后重新训练"""
+    index = VectorIndex(DIM, flat_threshold=500, retrain_factor=2.0)
+    data = _vectors(2000)
+
+    index.add(data[:400], np.arange(400))
+    assert index.kind == "flat"
+
+    index.add(data[400:600], np.arange(400, 600))
+    assert index.kind == "ivf_flat"
+    assert index.trained_on == 600 and index.ntotal == 600
+
+    index.add(data[600:1200], np.arange(600, 1200))
+    assert index.trained_on == 1200
+
+    scores, ids = index.search(data[:5], 1)
+    assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_delete_and_update_by_id():
+    """flat、IVF、HNSW 均支持按ID删除与更新"""
+    data = _vectors(600)
+    replacement = _vectors(1, seed=42)
+    for strategy in ("flat", "ivf_flat", "ivf_pq", "hnsw"):
+        index = VectorIndex(DIM, strategy=strategy, nprobe=64, ef_search=128)
+        index.add(data, np.arange(1000, 1600))
+        assert index.kind == strategy
+
+        assert index.remove([1000, 1001, 99999]) == 2
+        assert index.ntotal == 598
+        _, ids = index.search(data[:1], 10)
+        assert 1000 not in ids[0].tolist(), strategy
+
+        index.update(replacement, [1005])
+        _, ids = index.search(replacement, 1)
+        assert ids[0, 0] == 1005, strategy
+
+        index.add(data[:1], [1000])
+        _, ids = index.search(data[:1], 1)
+        assert ids[0, 0] == 1000, strategy
+
+
+def test_hnsw_tombstones_are_compacted():
+    """HNSW 逻辑删除超过比例后压缩重建"""
+    index = VectorIndex(DIM, strategy="hnsw")
+    index.add(_vectors(100), np.arange(100))
+    index.remove(np.arange(10))
+    assert len(index.tombstones) == 10
+    index.remove(np.arange(10, 30))
+    assert index.tombstones == set() and index.index.ntotal == 70
+
+
+def test_save_load_and_legacy_index():
+    """保存后恢复索引类型与逻辑删除；旧版 IndexFlatIP 按位置编号加载"""
+    tmp = tempfile.mkdtemp()
+    data = _vectors(300)
+
+    path = os.path.join(tmp, "hnsw.bin")
+    index = VectorIndex(DIM, strategy="hnsw")
+    index.add(data, np.arange(300))
+    index.remove([3])
+    index.save(path)
+    loaded = VectorIndex.load(path)
+    assert loaded.kind == "hnsw" and loaded.tombstones == {3} and loaded.ntotal == 299
+
+    legacy_path = os.path.join(tmp, "legacy.bin")
+    legacy = faiss.IndexFlatIP(DIM)
+    legacy.add(data)
+    faiss.write_index(legacy, legacy_path)
+    loaded = VectorIndex.load(legacy_path)
+    assert loaded.kind == "flat"
+    _, ids = loaded.search(data[7:8], 1)
+    assert ids[0, 0] == 7
+    assert loaded.remove([7]) == 1
+
+
+def test_recall_report_against_flat():
+    """召回率报告以精确检索为基准，nprobe 增大时召回率不降低"""
+    data = _vectors(3000)
+    index = VectorIndex(DIM, strategy="ivf_flat")
+    index.add(data, np.arange(3000))
+
+    report = index.recall_report(_vectors(50, seed=7), top_k=5, nprobe_values=(1, 8, 64))
+    rows = report["rows"]
+    assert [row["params"] for row in rows] == ["flat", "nprobe=1", "nprobe=8", "nprobe=64"]
+    assert rows[1]["recall"] <= rows[2]["recall"] <= rows[3]["recall"]
+    assert rows[3]["recall"] > 0.95
+    assert index.nprobe == 16  # 评估后恢复原参数
+    print(format_recall_report(report))
+
+
+if __name__ == "__main__":
+    tests = [
+        test_auto_strategy_switches_by_size,
+        test_delete_and_update_by_id,
+        test_hnsw_tombstones_are_compacted,
+        test_save_load_and_legacy_index,
+        test_recall_report_against_flat,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
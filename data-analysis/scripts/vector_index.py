@@ -0,0 +1,504 @@
+"""
+向量索引策略
+在FAISS索引之上提供按规模切换的索引策略、按ID删除/更新以及召回率评估
+
+策略：
+    flat      精确检索（IndexFlatIP），适合小规模
+    ivf_flat  倒排聚类 + 原始向量，nprobe 控制召回率与延迟
+    ivf_pq    倒排聚类 + 乘积量化，内存占用约为原始向量的 1/16 ~ 1/32
+    hnsw      图索引，efSearch 控制召回率与延迟（删除为逻辑删除，累积到一定比例后压缩重建）
+    auto      低于 flat_threshold 使用 flat，之后使用 ivf_flat，超过 pq_threshold 使用 ivf_pq；
+              向量数比上次训练时增长 retrain_factor 倍后，用已存储的向量重新训练
+"""
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+
+STRATEGIES = ("auto", "flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# 乘积量化子空间数候选（需整除向量维度）
+PQ_M_CANDIDATES = (64, 48, 32, 24, 16, 8, 4)
+
+# 每个聚类中心至少需要的训练样本数（FAISS 建议 39 个以上）
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS_PER_CENTROID = 256
+
+# 逻辑删除占比超过该值时压缩重建 HNSW 索引
+MAX_TOMBSTONE_RATIO = 0.2
+
+
+def _choose_nlist(count: int) -> int:
+    """聚类中心数：约 4·√N，且保证每个中心有足够的训练样本"""
+    nlist = int(4 * math.sqrt(max(count, 1)))
+    nlist = min(nlist, count // MIN_POINTS_PER_CENTROID, 65536)
+    return max(nlist, 1)
+
+
+def _choose_pq_m(dim: int) -> int:
+    for m in PQ_M_CANDIDATES:
+        if dim % m == 0 and m <= dim:
+            return m
+    return 1
+
+
+def _choose_pq_nbits(count: int) -> int:
+    """每个子空间的编码位数：样本不足以训练 256 个中心时减少位数"""
+    nbits = 8
+    while nbits > 4 and count < MIN_POINTS_PER_CENTROID * (1 << nbits):
+        nbits -= 1
+    return nbits
+
+
+class VectorIndex:
+    """支持策略切换与按ID删除的向量索引（内积相似度，向量需预先归一化）"""
+
+    def __init__(self, dim: int, strategy: str = "auto",
+                 flat_threshold: int = 50000,
+                 pq_threshold: int = 1000000,
+                 retrain_factor: float = 4.0,
+                 nprobe: int = 16,
+                 ef_search: int = 64,
+                 hnsw_m: int = 32):
+        """
+        初始化向量索引
+
+        参数：
+            dim: 向量维度
+            strategy: 索引策略（auto/flat/ivf_flat/ivf_pq/hnsw）
+            flat_threshold: auto 策略下切换到 IVF 的向量数
+            pq_threshold: auto 策略下切换到 IVF-PQ 的向量数
+            retrain_factor: 向量数增长到上次训练时的该倍数后重新训练 IVF
+            nprobe: IVF 检索的聚类数
+            ef_search: HNSW 检索的候选队列长度
+            hnsw_m: HNSW 每个节点的连接数
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"不支持的索引策略: {strategy}，可选: {', '.join(STRATEGIES)}")
+
+        self.dim = dim
+        self.strategy = strategy
+        self.flat_threshold = flat_threshold
+        self.pq_threshold = pq_threshold
+        self.retrain_factor = retrain_factor
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+
+        self.kind = None
+        self.index = None
+        self.trained_on = 0
+        self.tombstones = set()
+
+        self._build(self._target_kind(0), np.zeros((0, dim), dtype="float32"), np.zeros(0, dtype="int64"))
+
+    # ------------------------------------------------------------------
+    # 构建与重建
+    # ------------------------------------------------------------------
+
+    def _target_kind(self, count: int) -> str:
+        if self.strategy != "auto":
+            kind = self.strategy
+        elif count < self.flat_threshold:
+            kind = "flat"
+        elif count < self.pq_threshold:
+            kind = "ivf_flat"
+        else:
+            kind = "ivf_pq"
+
+        # 样本不足以训练聚类时暂用精确检索
+        if kind in ("ivf_flat", "ivf_pq") and count < MIN_POINTS_PER_CENTROID * 2:
+            return "flat"
+        return kind
+
+    def _build(self, kind: str, vectors: np.ndarray, ids: np.ndarray):
+        """按策略新建索引并写入向量（IVF 先用这些向量训练）"""
+        if kind == "flat":
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        elif kind == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            base.hnsw.efConstruction = max(2 * self.hnsw_m, 40)
+            index = faiss.IndexIDMap2(base)
+        else:
+            nlist = _choose_nlist(len(vectors))
+            quantizer = faiss.IndexFlatIP(self.dim)
+            if kind == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, _choose_pq_m(self.dim),
+                                         _choose_pq_nbits(len(vectors)), faiss.METRIC_INNER_PRODUCT)
+
+            sample_size = min(len(vectors), nlist * MAX_TRAINING_POINTS_PER_CENTROID)
+            if sample_size < len(vectors):
+                sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+            else:
+                sample = vectors
+            index.train(np.ascontiguousarray(sample, dtype="float32"))
+
+        self.index = index
+        self.kind = kind
+        self.trained_on = len(vectors)
+        self.tombstones = set()
+        self._apply_search_params()
+        if len(vectors):
+            self.index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), ids.astype("int64"))
+
+    def _apply_search_params(self):
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            self.index.nprobe = min(self.nprobe, self.index.nlist)
+        elif self.kind == "hnsw":
+            faiss.downcast_index(self.index.index).hnsw.efSearch = self.ef_search
+
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        导出索引中的全部向量与ID（IVF-PQ 为量化后的近似向量；不含逻辑删除的向量）
+
+        返回：
+            (向量, ID)
+        """
+        if self.kind in ("flat", "hnsw"):
+            ids = faiss.vector_to_array(self.index.id_map).astype("int64")
+            vectors = self.index.index.reconstruct_n(0, self.index.ntotal) if len(ids) else \
+                np.zeros((0, self.dim), dtype="float32")
+        else:
+            invlists = self.index.invlists
+            code_size = invlists.code_size
+            all_ids, all_vectors = [], []
+            for list_no in range(self.index.nlist):
+                size = invlists.list_size(list_no)
+                if size == 0:
+                    continue
+                all_ids.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+                codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * code_size).copy()
+                if self.kind == "ivf_flat":
+                    all_vectors.append(codes.view("float32").reshape(size, self.dim))
+                else:
+                    decoded = self.index.pq.decode(codes.reshape(size, code_size))
+                    if self.index.by_residual:
+                        decoded += self.index.quantizer.reconstruct(list_no)
+                    all_vectors.append(decoded)
+            if all_ids:
+                ids, vectors = np.concatenate(all_ids).astype("int64"), np.vstack(all_vectors)
+            else:
+                ids, vectors = np.zeros(0, dtype="int64"), np.zeros((0, self.dim), dtype="float32")
+
+        if self.tombstones:
+            keep = ~np.isin(ids, np.fromiter(self.tombstones, dtype="int64"))
+            ids, vectors = ids[keep], vectors[keep]
+        return vectors, ids
+
+    def rebuild(self, kind: Optional[str] = None):
+        """
+        用已存储的向量重新训练并重建索引
+
+        参数：
+            kind: 目标索引类型（None 表示按当前规模选择）
+        """
+        vectors, ids = self.export()
+        kind = kind or self._target_kind(len(ids))
+        start = time.time()
+        self._build(kind, vectors, ids)
+        print(f"向量索引已重建: {kind}, 向量数: {len(ids)}, 耗时: {time.time() - start:.2f}s")
+
+    def _maybe_rebuild(self):
+        count = self.ntotal
+        target = self._target_kind(count)
+        if target != self.kind:
+            self.rebuild(target)
+        elif self.kind in ("ivf_flat", "ivf_pq") and count >= self.trained_on * self.retrain_factor:
+            self.rebuild(target)
+        elif self.kind == "hnsw" and len(self.tombstones) > MAX_TOMBSTONE_RATIO * max(self.index.ntotal, 1):
+            self.rebuild(target)
+
+    # ------------------------------------------------------------------
+    # 写入、删除与检索
+    # ------------------------------------------------------------------
+
+    @property
+    def ntotal(self) -> int:
+        """有效向量数（不含逻辑删除）"""
+        return self.index.ntotal - len(self.tombstones)
+
+    def add(self, vectors: np.ndarray, ids: Sequence[int]):
+        """
+        写入新向量（ID 可能已存在时使用 update）
+
+        参数：
+            vectors: 向量数组 (n, dim)
+            ids: 整数ID
+        """
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0:
+            return
+        if self.tombstones and not self.tombstones.isdisjoint(ids.tolist()):
+            # 逻辑删除的ID被重新写入：先压缩，避免新向量被检索过滤
+            self.rebuild(self.kind)
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), ids)
+        self._maybe_rebuild()
+
+    def update(self, vectors: np.ndarray, ids: Sequence[int]):
+        """
+        更新向量（先删除同ID的旧向量再写入）
+
+        参数：
+            vectors: 向量数组 (n, dim)
+            ids: 整数ID
+        """
+        self.remove(ids)
+        self.add(vectors, ids)
+
+    def remove(self, ids: Sequence[int]) -> int:
+        """
+        按ID删除向量
+
+        参数：
+            ids: 整数ID
+
+        返回：
+            删除的向量数
+        """
+        ids = np.asarray(ids, dtype="int64")
+        if len(ids) == 0 or self.index.ntotal == 0:
+            return 0
+        if self.kind == "hnsw":
+            # HNSW 不支持物理删除：记录逻辑删除，检索时过滤
+            existing = set(faiss.vector_to_array(self.index.id_map).tolist())
+            removed = {int(i) for i in ids if int(i) in existing and int(i) not in self.tombstones}
+            self.tombstones |= removed
+            self._maybe_rebuild()
+            return len(removed)
+        return int(self.index.remove_ids(faiss.IDSelectorBatch(ids)))
+
+    def search(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        检索最相似的向量
+
+        参数：
+            queries: 查询向量 (n, dim)
+            top_k: 返回数量
+
+        返回：
+            (相似度, ID)，形状均为 (n, top_k)，不足时 ID 为 -1
+        """
+        queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.dim)
+        if self.index.ntotal == 0:
+            return (np.full((len(queries), top_k), -np.inf, dtype="float32"),
+                    np.full((len(queries), top_k), -1, dtype="int64"))
+        if not self.tombstones:
+            return self.index.search(queries, top_k)
+
+        fetch = min(top_k + len(self.tombstones), self.index.ntotal)
+        scores, ids = self.index.search(queries, fetch)
+        out_scores = np.full((len(queries), top_k), -np.inf, dtype="float32")
+        out_ids = np.full((len(queries), top_k), -1, dtype="int64")
+        for row in range(len(queries)):
+            keep = [j for j, i in enumerate(ids[row]) if i >= 0 and int(i) not in self.tombstones][:top_k]
+            out_scores[row, :len(keep)] = scores[row, keep]
+            out_ids[row, :len(keep)] = ids[row, keep]
+        return out_scores, out_ids
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        调整检索参数
+
+        参数：
+            nprobe: IVF 检索的聚类数
+            ef_search: HNSW 检索的候选队列长度
+        """
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._apply_search_params()
+
+    # ------------------------------------------------------------------
+    # 评估与持久化
+    # ------------------------------------------------------------------
+
+    def recall_report(self, queries: np.ndarray, top_k: int = 10,
+                      nprobe_values: Sequence[int] = (1, 4, 16, 64),
+                      ef_values: Sequence[int] = (16, 32, 64, 128),
+                      base_vectors: Optional[np.ndarray] = None,
+                      base_ids: Optional[np.ndarray] = None) -> Dict:
+        """
+        以精确检索（flat）为基准，评估不同检索参数下的召回率与延迟
+
+        参数：
+            queries: 查询向量 (n, dim)
+            top_k: 评估的 Top-K
+            nprobe_values: IVF 评估的 nprobe 取值
+            ef_values: HNSW 评估的 efSearch 取值
+            base_vectors: 基准向量（默认导出索引中的向量；IVF-PQ 的导出向量为近似值）
+            base_ids: 基准向量对应的ID
+
+        返回：
+            报告字典，rows 为每组参数的 recall@k 与平均延迟
+        """
+        queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.dim)
+        if base_vectors is None:
+            base_vectors, base_ids = self.export()
+
+        exact = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        exact.add_with_ids(np.ascontiguousarray(base_vectors, dtype="float32"), np.asarray(base_ids, dtype="int64"))
+
+        def timed(search):
+            start = time.perf_counter()
+            _, ids = search(queries, top_k)
+            return ids, (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+        truth, flat_latency = timed(exact.search)
+
+        def recall(ids):
+            hits = sum(len(set(t[t >= 0].tolist()) & set(r[r >= 0].tolist())) for t, r in zip(truth, ids))
+            expected = sum(int((t >= 0).sum()) for t in truth)
+            return hits / expected if expected else 1.0
+
+        rows = [{"params": "flat", "recall": 1.0, "latency_ms": round(flat_latency, 4)}]
+        saved = (self.nprobe, self.ef_search)
+        try:
+            if self.kind in ("ivf_flat", "ivf_pq"):
+                settings = [("nprobe", value) for value in nprobe_values]
+            elif self.kind == "hnsw":
+                settings = [("ef_search", value) for value in ef_values]
+            else:
+                settings = [(None, None)]
+            for name, value in settings:
+                if name:
+                    self.set_search_params(**{name: value})
+                ids, latency = timed(self.search)
+                rows.append({
+                    "params": f"{name}={value}" if name else self.kind,
+                    "recall": round(recall(ids), 4),
+                    "latency_ms": round(latency, 4)
+                })
+        finally:
+            self.set_search_params(nprobe=saved[0], ef_search=saved[1])
+
+        return {
+            "index_type": self.kind,
+            "vector_count": int(len(base_ids)),
+            "query_count": int(len(queries)),
+            "top_k": top_k,
+            "rows": rows
+        }
+
+    def get_stats(self) -> Dict:
+        """获取索引统计信息"""
+        stats = {
+            "index_type": self.kind,
+            "strategy": self.strategy,
+            "vector_count": self.ntotal,
+            "trained_on": self.trained_on,
+            "tombstones": len(self.tombstones)
+        }
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            stats.update({"nlist": self.index.nlist, "nprobe": self.index.nprobe})
+        elif self.kind == "hnsw":
+            stats["ef_search"] = self.ef_search
+        return stats
+
+    def save(self, path: str):
+        """保存索引（参数与逻辑删除记录写入同名 .meta.json；先写临时文件再替换，中断不会留下半截文件）"""
+        faiss.write_index(self.index, path + ".tmp")
+        with open(path + ".meta.json.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "kind": self.kind,
+                "strategy": self.strategy,
+                "flat_threshold": self.flat_threshold,
+                "pq_threshold": self.pq_threshold,
+                "retrain_factor": self.retrain_factor,
+                "nprobe": self.nprobe,
+                "ef_search": self.ef_search,
+                "hnsw_m": self.hnsw_m,
+                "trained_on": self.trained_on,
+                "tombstones": sorted(self.tombstones)
+            }, f)
+        os.replace(path + ".tmp", path)
+        os.replace(path + ".meta.json.tmp", path + ".meta.json")
+
+    @classmethod
+    def load(cls, path: str, **overrides) -> "VectorIndex":
+        """
+        加载索引
+
+        旧版索引（无ID映射的 IndexFlatIP）按位置编号转换为 ID 映射的 flat 索引
+
+        参数：
+            path: 索引文件路径
+            overrides: 覆盖保存的构造参数（如 strategy、nprobe）
+        """
+        raw = faiss.read_index(path)
+        meta_path = path + ".meta.json"
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+        params = {key: meta[key] for key in (
+            "strategy", "flat_threshold", "pq_threshold", "retrain_factor", "nprobe", "ef_search", "hnsw_m"
+        ) if key in meta}
+        params.update(overrides)
+        index = cls(raw.d, **params)
+
+        if "kind" not in meta:
+            vectors = raw.reconstruct_n(0, raw.ntotal) if raw.ntotal else np.zeros((0, raw.d), dtype="float32")
+            index._build("flat", vectors, np.arange(raw.ntotal, dtype="int64"))
+            index._maybe_rebuild()
+            return index
+
+        index.index = raw
+        index.kind = meta["kind"]
+        index.trained_on = meta.get("trained_on", raw.ntotal)
+        index.tombstones = set(meta.get("tombstones", []))
+        index._apply_search_params()
+        if index._target_kind(index.ntotal) != index.kind:
+            index.rebuild()
+        return index
+
+
+def format_recall_report(report: Dict) -> str:
+    """将召回率报告格式化为文本表格"""
+    lines = [
+        f"索引类型: {report['index_type']}  向量数: {report['vector_count']}  "
+        f"查询数: {report['query_count']}  Top-K: {report['top_k']}",
+        f"{'参数':<16}{'recall@k':>10}{'平均延迟(ms)':>16}"
+    ]
+    for row in report["rows"]:
+        lines.append(f"{row['params']:<16}{row['recall']:>10.4f}{row['latency_ms']:>16.4f}")
+    return "\n".join(lines)
+
+
+# 召回率-延迟评估（聚簇分布的随机向量，近似文本向量的分布）
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="向量索引召回率-延迟评估")
+    parser.add_argument("--count", type=int, default=100000, help="向量数")
+    parser.add_argument("--dim", type=int, default=384, help="向量维度")
+    parser.add_argument("--topics", type=int, default=1000, help="主题（簇）数")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.topics, args.dim)).astype("float32")
+    data = centers[rng.integers(0, args.topics, args.count)] + \
+        0.5 * rng.standard_normal((args.count, args.dim)).astype("float32")
+    faiss.normalize_L2(data)
+    query_vectors = data[rng.choice(args.count, args.queries, replace=False)] + \
+        0.1 * rng.standard_normal((args.queries, args.dim)).astype("float32")
+    faiss.normalize_L2(query_vectors)
+
+    for strategy in ("ivf_flat", "ivf_pq", "hnsw"):
+        start = time.time()
+        vector_index = VectorIndex(args.dim, strategy=strategy)
+        vector_index.add(data, np.arange(args.count))
+        print(f"\n[{strategy}] 构建耗时: {time.time() - start:.2f}s")
+        print(format_recall_report(vector_index.recall_report(
+            query_vectors, args.top_k, base_vectors=data, base_ids=np.arange(args.count)
+        )))
@@ -1,32 +1,62 @@
 """
 向量检索模块
 使用BGE-M3模型生成向量嵌入，通过FAISS进行语义搜索
+索引策略（精确/IVF/IVF-PQ/HNSW）见 vector_index.VectorIndex
+文档内容存储在 SQLite（document_store.DocumentStore），检索时只读取 Top-K 文档
 """
 import numpy as np
-import faiss
 from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple
-import pickle
+from typing import List, Dict, Optional, Sequence
 import os
 
+try:
+    from .vector_index import VectorIndex
+    from .embedding_cache import EmbeddingCache, encode_with_cache
+    from .document_store import DocumentStore
+except ImportError:
+    from vector_index import VectorIndex
+    from embedding_cache import EmbeddingCache, encode_with_cache
+    from document_store import DocumentStore
+
 
 class VectorRetrieval:
     """向量检索类"""
     
     def __init__(self, model_name: str = "BAAI/bge-m3", 
                  index_path: str = "./faiss_index.bin",
-                 data_path: str = "./vector_data.pkl"):
+                 data_path: str = "./vector_data.pkl",
+                 doc_store_path: str = "./vector_docs.db",
+                 index_strategy: str = "auto",
+                 flat_threshold: int = 50000,
+                 nprobe: int = 16,
+                 ef_search: int = 64,
+                 cache_dir: Optional[str] = "./embedding_cache",
+                 encode_batch_size: int = 64):
         """
         初始化向量检索
         
         参数：
             model_name: 向量模型名称
             index_path: FAISS索引文件路径
-            data_path: 向量数据文件路径
+            data_path: 旧版 pickle 文档数据路径（文档存储为空时一次性导入）
+            doc_store_path: 文档存储（SQLite）路径
+            index_strategy: 索引策略（auto/flat/ivf_flat/ivf_pq/hnsw）
+            flat_threshold: auto 策略下切换到近似索引的文档数
+            nprobe: IVF 检索的聚类数
+            ef_search: HNSW 检索的候选队列长度
+            cache_dir: 向量缓存目录（None 表示不缓存）
+            encode_batch_size: 未命中缓存的文本每批编码数量
         """
         self.model_name = model_name
         self.index_path = index_path
         self.data_path = data_path
+        self.doc_store_path = doc_store_path
+        self.index_options = {
+            "strategy": index_strategy,
+            "flat_threshold": flat_threshold,
+            "nprobe": nprobe,
+            "ef_search": ef_search
+        }
         
         # 加载BGE-M3模型
         print(f"正在加载模型: {model_name}...")
@@ -34,26 +64,44 @@ class VectorRetrieval:
         self.embedding_dim = self.model.get_sentence_embedding_dimension()
         print(f"模型加载完成，向量维度: {self.embedding_dim}")
         
-        # 初始化FAISS索引
-        self.index = faiss.IndexFlatIP(self.embedding_dim)  # 内积相似度
-        self.documents = []  # 存储文档内容
+        # 向量缓存（按模型名与规范化文本寻址）
+        self.encode_batch_size = encode_batch_size
+        self.embedding_cache = EmbeddingCache(cache_dir, model_name, self.embedding_dim) if cache_dir else None
+        
+        # 初始化FAISS索引（内积相似度，按ID映射）
+        self.index = VectorIndex(self.embedding_dim, **self.index_options)
+        
+        # 文档存储（索引ID -> 文档内容）
+        self.doc_store = DocumentStore(doc_store_path)
+        if self.doc_store.count() == 0 and os.path.exists(data_path):
+            imported = self.doc_store.import_pickle(data_path)
+            print(f"已从旧版文档数据导入 {imported} 个文档: {data_path}")
         
         # 如果存在索引文件，加载索引
-        if os.path.exists(index_path) and os.path.exists(data_path):
+        if os.path.exists(index_path):
             self.load_index()
     
-    def encode_text(self, texts: List[str]) -> np.ndarray:
+    def encode_text(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
         """
-        将文本编码为向量
+        将文本编码为向量（命中缓存的文本不经过模型）
         
         参数：
             texts: 文本列表
+            use_cache: 是否使用向量缓存
         
         返回：
             向量数组
         """
+        return encode_with_cache(
+            texts, self._encode_with_model,
+            self.embedding_cache if use_cache else None,
+            batch_size=self.encode_batch_size
+        )
+    
+    def _encode_with_model(self, texts: List[str]) -> np.ndarray:
         embeddings = self.model.encode(
             texts,
+            batch_size=self.encode_batch_size,
             normalize_embeddings=True,  # 归一化，适合内积相似度
             show_progress_bar=len(texts) > 100
         )
@@ -61,7 +109,7 @@ class VectorRetrieval:
     
     def add_documents(self, documents: List[Dict]):
         """
-        添加文档到索引
+        添加文档到索引（id 已存在的文档视为更新）
         
         参数：
             documents: 文档列表，每个文档包含id、text、metadata等
@@ -75,13 +123,63 @@ class VectorRetrieval:
         # 生成向量
         embeddings = self.encode_text(texts)
         
+        # 已存在的文档先删除旧向量
+        existing = self.doc_store.lookup([doc.get("id") for doc in documents])
+        if existing:
+            self.index.remove(list(existing.values()))
+        
+        # 分配索引ID（删除的ID不复用），文档写入为一个事务
+        first_id = self.doc_store.next_id
+        index_ids = list(range(first_id, first_id + len(documents)))
+        self.doc_store.put_many(list(zip(index_ids, documents)))
+        
         # 添加到索引
-        self.index.add(embeddings.astype('float32'))
+        self.index.add(embeddings.astype('float32'), index_ids)
+        
+        if self.embedding_cache:
+            cache_stats = self.embedding_cache.get_stats()
+            print(f"已添加 {len(documents)} 个文档到索引（向量缓存命中率: {cache_stats['hit_rate']:.1%}, "
+                  f"编码吞吐: {cache_stats['encode_throughput']} 条/秒）")
+        else:
+            print(f"已添加 {len(documents)} 个文档到索引")
+    
+    def update_documents(self, documents: List[Dict]):
+        """
+        更新文档（重新编码并替换旧向量）
+        
+        参数：
+            documents: 文档列表
+        """
+        self.add_documents(documents)
+    
+    def remove_documents(self, doc_ids: Sequence[str]) -> int:
+        """
+        按文档ID删除
+        
+        参数：
+            doc_ids: 文档ID列表
         
-        # 保存文档
-        self.documents.extend(documents)
+        返回：
+            删除的文档数
+        """
+        index_ids = list(self.doc_store.lookup(list(doc_ids)).values())
+        if not index_ids:
+            return 0
+        
+        self.index.remove(index_ids)
+        self.doc_store.delete_many(index_ids)
         
-        print(f"已添加 {len(documents)} 个文档到索引")
+        return len(index_ids)
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+        """
+        调整近似检索参数（nprobe 用于 IVF，ef_search 用于 HNSW）
+        """
+        self.index.set_search_params(nprobe=nprobe, ef_search=ef_search)
+        if nprobe is not None:
+            self.index_options["nprobe"] = nprobe
+        if ef_search is not None:
+            self.index_options["ef_search"] = ef_search
     
     def search(self, query: str, top_k: int = 10) -> List[Dict]:
         """
@@ -97,44 +195,66 @@ class VectorRetrieval:
         if self.index.ntotal == 0:
             return []
         
-        # 编码查询
-        query_embedding = self.encode_text([query])[0]
+        # 编码查询（查询文本不写入缓存）
+        query_embedding = self.encode_text([query], use_cache=False)[0]
         query_embedding = query_embedding.reshape(1, -1).astype('float32')
         
         # 搜索
         scores, indices = self.index.search(query_embedding, top_k)
         
+        # 只读取命中的文档
+        hits = [(float(score), int(idx)) for score, idx in zip(scores[0], indices[0]) if idx >= 0]
+        docs = self.doc_store.get_many([idx for _, idx in hits])
+        
         # 返回结果
         results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx >= 0 and idx < len(self.documents):
-                doc = self.documents[idx].copy()
-                doc["similarity"] = float(score)
+        for score, idx in hits:
+            if idx in docs:
+                doc = docs[idx]
+                doc["similarity"] = score
                 results.append(doc)
         
         return results
     
-    def save_index(self):
-        """保存索引到文件"""
-        # 保存FAISS索引
-        faiss.write_index(self.index, self.index_path)
+    def recall_report(self, queries: List[str], top_k: int = 10,
+                      nprobe_values: Sequence[int] = (1, 4, 16, 64),
+                      ef_values: Sequence[int] = (16, 32, 64, 128)) -> Dict:
+        """
+        以精确检索为基准评估当前索引的召回率与延迟
         
-        # 保存文档数据
-        with open(self.data_path, 'wb') as f:
-            pickle.dump(self.documents, f)
+        参数：
+            queries: 评估用查询文本
+            top_k: 评估的 Top-K
+            nprobe_values: IVF 评估的 nprobe 取值
+            ef_values: HNSW 评估的 efSearch 取值
+        
+        返回：
+            报告字典（可用 vector_index.format_recall_report 格式化）
+        """
+        query_embeddings = self.encode_text(queries, use_cache=False).astype('float32')
+        
+        base_vectors = base_ids = None
+        if self.index.kind == "ivf_pq":
+            # 量化向量无法还原原始向量，基准向量重新编码
+            rows = list(self.doc_store.iter_texts())
+            base_ids = np.array([index_id for index_id, _ in rows], dtype="int64")
+            base_vectors = self.encode_text([text for _, text in rows])
+        
+        return self.index.recall_report(query_embeddings, top_k, nprobe_values, ef_values,
+                                        base_vectors=base_vectors, base_ids=base_ids)
+    
+    def save_index(self):
+        """保存索引到文件（文档在添加时已写入文档存储）"""
+        self.index.save(self.index_path)
         
         print(f"索引已保存: {self.index_path}")
     
     def load_index(self):
         """从文件加载索引"""
         # 加载FAISS索引
-        self.index = faiss.read_index(self.index_path)
-        
-        # 加载文档数据
-        with open(self.data_path, 'rb') as f:
-            self.documents = pickle.load(f)
+        self.index = VectorIndex.load(self.index_path, **self.index_options)
         
-        print(f"索引已加载: {self.index_path}, 文档数: {len(self.documents)}")
+        print(f"索引已加载: {self.index_path}, 文档数: {self.doc_store.count()}")
     
     def get_stats(self) -> Dict:
         """
@@ -143,11 +263,14 @@ class VectorRetrieval:
         返回：
             统计信息字典
         """
+        index_stats = self.index.get_stats()
         return {
-            "document_count": len(self.documents),
-            "index_type": "IndexFlatIP",
+            "document_count": self.doc_store.count(),
+            "index_type": index_stats.pop("index_type"),
             "embedding_dim": self.embedding_dim,
-            "index_size": os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+            "index_size": os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0,
+            **index_stats,
+            "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None
         }
 
 